@@ -6,13 +6,20 @@ AI Package
 """
 
 from .message_analyzer import MessageAnalyzer
-from .speech_to_text import SpeechToText
+from .speech_to_text import SpeechToText, StubSpeechToText
 from .game_analyzer import GameAnalyzer
 from .stats_analyzer import StatsAnalyzer
+from .moderation_pipeline import ModerationPipeline
+from .analysis_cache import AnalysisCache
+from .transcription_queue import TranscriptionQueue
 
 __all__ = [
     'MessageAnalyzer',
     'SpeechToText',
+    'StubSpeechToText',
     'GameAnalyzer',
-    'StatsAnalyzer'
+    'StatsAnalyzer',
+    'ModerationPipeline',
+    'AnalysisCache',
+    'TranscriptionQueue'
 ]
\ No newline at end of file
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ذاكرة نتائج تحليل OpenAI
+AI Analysis Cache
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from .pattern_matcher import normalize_arabic
+
+class AnalysisCache:
+    """ذاكرة LRU بمدة صلاحية لنتائج التحليل، مفتاحها المحتوى المطبّع ومرحلة اللعبة
+
+    النتائج الناجحة تحفظ لمدة ttl، وفشل الاستدعاء يحفظ كنتيجة سلبية لمدة
+    negative_ttl حتى لا تتكرر المحاولة مع كل رسالة. عند تحديد path تحفظ
+    النتائج الناجحة أيضاً في ملف SQLite لتبقى بعد إعادة التشغيل.
+    """
+
+    def __init__(self, max_entries: int = 5000, ttl: float = 3600, negative_ttl: float = 60,
+                 path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.path = path
+
+        self._entries: 'OrderedDict[str, Tuple[float, Optional[Dict]]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+
+        # المقاييس
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        self.failures = 0
+
+        if path:
+            self._open_store(path)
+
+    def _open_store(self, path: str):
+        """فتح ملف التخزين الدائم"""
+        try:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS analysis_cache ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)'
+            )
+            self._db.execute('DELETE FROM analysis_cache WHERE expires_at < ?', (time.time(),))
+            self._db.commit()
+        except sqlite3.Error as e:
+            print(f"⚠️ فشل في فتح ذاكرة التحليل الدائمة: {e}")
+            self._db = None
+
+    @staticmethod
+    def make_key(content: str, game_phase: Optional[str] = None) -> str:
+        """مفتاح المحتوى: المحتوى المطبّع بدون مسافات زائدة + مرحلة اللعبة"""
+        normalized = ' '.join(normalize_arabic(content).split())
+        return hashlib.sha256(f"{game_phase or ''}|{normalized}".encode('utf-8')).hexdigest()
+
+    def get(self, content: str, game_phase: Optional[str] = None) -> Tuple[bool, Optional[Dict]]:
+        """البحث عن نتيجة: (موجودة؟، النتيجة) - النتيجة None تعني فشلاً حديثاً"""
+        key = self.make_key(content, game_phase)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    if value is None:
+                        self.negative_hits += 1
+                    else:
+                        self.hits += 1
+                    return True, value
+                del self._entries[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    'SELECT value, expires_at FROM analysis_cache WHERE key = ?', (key,)
+                ).fetchone()
+                if row and row[1] > now:
+                    value = json.loads(row[0])
+                    self._store(key, row[1], value)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return True, value
+
+            self.misses += 1
+            return False, None
+
+    def put(self, content: str, game_phase: Optional[str], value: Dict):
+        """حفظ نتيجة ناجحة"""
+        key = self.make_key(content, game_phase)
+        expires_at = time.time() + self.ttl
+
+        with self._lock:
+            self._store(key, expires_at, value)
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        'INSERT OR REPLACE INTO analysis_cache (key, value, expires_at) VALUES (?, ?, ?)',
+                        (key, json.dumps(value, ensure_ascii=False), expires_at)
+                    )
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    print(f"⚠️ فشل في حفظ نتيجة التحليل: {e}")
+
+    def put_failure(self, content: str, game_phase: Optional[str] = None):
+        """حفظ فشل الاستدعاء (في الذاكرة فقط ولمدة قصيرة)"""
+        key = self.make_key(content, game_phase)
+        with self._lock:
+            self.failures += 1
+            self._store(key, time.time() + self.negative_ttl, None)
+
+    def _store(self, key: str, expires_at: float, value: Any):
+        """إضافة مدخل مع إخراج الأقدم (يجب استدعاؤها مع القفل)"""
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """مسح الذاكرة"""
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute('DELETE FROM analysis_cache')
+                self._db.commit()
+
+    def get_statistics(self) -> Dict:
+        """إحصائيات الذاكرة"""
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'negative_hits': self.negative_hits,
+            'misses': self.misses,
+            'failures': self.failures,
+            'evictions': self.evictions,
+            'hit_rate': (self.hits + self.negative_hits) / lookups if lookups else 0.0,
+            'persistent': self._db is not None
+        }
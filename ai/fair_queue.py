@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+طابور عادل بين الغرف
+Per-Room Fair Queue
+"""
+
+import queue
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+class RoomFairQueue:
+    """طابور لكل غرفة مع دور بالتناوب بين الغرف
+
+    العامل يأخذ غرفة ودفعة من رسائلها، وتبقى الغرفة محجوزة له حتى يستدعي
+    release() فلا يعالج عاملان نفس الغرفة معاً (ترتيب الرسائل محفوظ)، ثم
+    تعود الغرفة لآخر الدور إن بقي فيها عمل. غرفة مزدحمة لا تؤخر الغرف الأخرى.
+    """
+
+    def __init__(self, max_pending: int = 1000):
+        self.max_pending = max_pending
+        self.pending = 0
+
+        self._rooms: Dict[int, Deque[Any]] = {}
+        self._ready: queue.Queue = queue.Queue()
+        self._scheduled: Set[int] = set()
+        self._lock = threading.Lock()
+
+    def put(self, room_id: int, item: Any, force: bool = False) -> bool:
+        """إضافة عنصر لطابور الغرفة (False عند الامتلاء)"""
+        with self._lock:
+            if not force and self.pending >= self.max_pending:
+                return False
+
+            self._rooms.setdefault(room_id, deque()).append(item)
+            self.pending += 1
+            if room_id not in self._scheduled:
+                self._scheduled.add(room_id)
+                self._ready.put(room_id)
+            return True
+
+    def take(self, max_items: int, timeout: float = 0.5) -> Optional[Tuple[int, List[Any]]]:
+        """أخذ الغرفة التالية ودفعة من عناصرها (يجب استدعاء release بعد المعالجة)"""
+        try:
+            room_id = self._ready.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+        with self._lock:
+            items = self._rooms.get(room_id)
+            batch = []
+            while items and len(batch) < max_items:
+                batch.append(items.popleft())
+            self.pending -= len(batch)
+            return room_id, batch
+
+    def release(self, room_id: int):
+        """إعادة الغرفة للدور بعد انتهاء دفعتها"""
+        with self._lock:
+            if self._rooms.get(room_id):
+                # بقية عناصر الغرفة تنتظر دورها بعد الغرف الأخرى
+                self._ready.put(room_id)
+            else:
+                self._rooms.pop(room_id, None)
+                self._scheduled.discard(room_id)
+
+    @property
+    def rooms_waiting(self) -> int:
+        return len(self._scheduled)
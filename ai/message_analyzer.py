@@ -5,10 +5,11 @@
 AI Message Analyzer
 """
 
-import re
 from typing import Dict, List, Optional
 from datetime import datetime
 import json
+from .pattern_matcher import PatternMatcher, normalize_arabic
+from .analysis_cache import AnalysisCache
 
 try:
     import openai
@@ -16,13 +17,22 @@ try:
 except ImportError:
     OPENAI_AVAILABLE = False
 
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
 class MessageAnalyzer:
     """محلل الرسائل للكشف عن الغش والمحتوى المشبوه"""
     
-    def __init__(self, openai_api_key: str = None):
+    def __init__(self, openai_api_key: str = None, cache: Optional[AnalysisCache] = None):
         """إنشاء محلل الرسائل"""
         self.openai_available = OPENAI_AVAILABLE and openai_api_key
         
+        # ذاكرة نتائج OpenAI للمحتوى المتكرر
+        self.ai_cache = cache or AnalysisCache()
+        
         if self.openai_available:
             try:
                 # محاولة إنشاء العميل مع الإصدار الجديد
@@ -79,11 +89,45 @@ class MessageAnalyzer:
         self.negative_words = [
             'سيء', 'خطأ', 'غلط', 'مخطئ', 'أكره', 'ممل', 'صعب', 'مستحيل'
         ]
+        
+        # أنماط السياق حسب مرحلة اللعبة
+        self.context_patterns = {
+            'night': {
+                'night_action_leak': [
+                    r'سأقتل\s+\w+',
+                    r'سأعالج\s+\w+',
+                    r'سأتحقق\s+من\s+\w+',
+                ]
+            },
+            'voting': {
+                'vote_manipulation': [
+                    r'صوتوا\s+معي',
+                    r'لا\s+تصوتوا\s+ضدي',
+                    r'أعرف\s+الحقيقة',
+                ]
+            }
+        }
+        
+        # أسباب وأوزان أنماط السياق
+        self.context_rules = {
+            'night_action_leak': ('كشف عمل ليلي في الدردشة العامة', 0.7),
+            'vote_manipulation': ('محاولة تلاعب في التصويت', 0.4)
+        }
+        
+        # ترجمة كل الأنماط مرة واحدة (مع التطبيع العربي)
+        self.pattern_matcher = PatternMatcher(self.suspicious_patterns)
+        self.sentiment_matcher = PatternMatcher(
+            {'positive': self.positive_words, 'negative': self.negative_words},
+            literal=True
+        )
+        self.context_matchers = {
+            phase: PatternMatcher(patterns) for phase, patterns in self.context_patterns.items()
+        }
     
     def analyze_message(self, message_id: int, content: str, user_id: int, 
                        room_id: int, game_round: Optional[int] = None, 
-                       game_phase: Optional[str] = None) -> Dict:
-        """تحليل رسالة واحدة"""
+                       game_phase: Optional[str] = None, use_ai: bool = True) -> Dict:
+        """تحليل رسالة واحدة (use_ai=False للاكتفاء بالقواعد المحلية)"""
         
         analysis = {
             'message_id': message_id,
@@ -102,20 +146,22 @@ class MessageAnalyzer:
         }
         
         try:
+            normalized = normalize_arabic(content)
+            
             # 1. تحليل الأنماط المشبوهة
-            pattern_analysis = self._analyze_patterns(content)
+            pattern_analysis = self._analyze_patterns(content, normalized)
             analysis.update(pattern_analysis)
             
             # 2. تحليل المشاعر
-            sentiment_analysis = self._analyze_sentiment(content)
+            sentiment_analysis = self._analyze_sentiment(content, normalized)
             analysis.update(sentiment_analysis)
             
             # 3. تحليل السياق
-            context_analysis = self._analyze_context(content, game_phase)
+            context_analysis = self._analyze_context(content, game_phase, normalized)
             analysis.update(context_analysis)
             
             # 4. تحليل OpenAI (إذا كان المحتوى مشبوهاً)
-            if analysis['suspicion_score'] > 0.3:
+            if use_ai and self.openai_available and analysis['suspicion_score'] > 0.3:
                 ai_analysis = self._get_ai_analysis(content, game_phase)
                 analysis['ai_analysis'] = ai_analysis
                 
@@ -136,33 +182,32 @@ class MessageAnalyzer:
             analysis['error'] = str(e)
             return analysis
     
-    def _analyze_patterns(self, content: str) -> Dict:
-        """تحليل الأنماط المشبوهة"""
+    def _analyze_patterns(self, content: str, normalized: Optional[str] = None) -> Dict:
+        """تحليل الأنماط المشبوهة (مرور واحد على النص المطبّع)"""
         detected_patterns = []
         suspicion_score = 0.0
         flags = []
         
-        content_lower = content.lower()
-        
-        for category, patterns in self.suspicious_patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, content_lower, re.IGNORECASE):
-                    detected_patterns.append({
-                        'category': category,
-                        'pattern': pattern,
-                        'severity': self._get_pattern_severity(category)
-                    })
-                    
-                    # زيادة درجة الشك
-                    severity_score = self._get_pattern_severity(category)
-                    suspicion_score += severity_score
-                    
-                    # إضافة علم
-                    flags.append({
-                        'type': category,
-                        'reason': self._get_pattern_reason(category),
-                        'severity': severity_score
-                    })
+        if normalized is None:
+            normalized = normalize_arabic(content)
+        
+        for category, pattern in self.pattern_matcher.scan(normalized):
+            severity_score = self._get_pattern_severity(category)
+            detected_patterns.append({
+                'category': category,
+                'pattern': pattern,
+                'severity': severity_score
+            })
+            
+            # زيادة درجة الشك
+            suspicion_score += severity_score
+            
+            # إضافة علم
+            flags.append({
+                'type': category,
+                'reason': self._get_pattern_reason(category),
+                'severity': severity_score
+            })
         
         return {
             'detected_patterns': detected_patterns,
@@ -170,12 +215,14 @@ class MessageAnalyzer:
             'flags': flags
         }
     
-    def _analyze_sentiment(self, content: str) -> Dict:
+    def _analyze_sentiment(self, content: str, normalized: Optional[str] = None) -> Dict:
         """تحليل المشاعر"""
-        content_lower = content.lower()
+        if normalized is None:
+            normalized = normalize_arabic(content)
         
-        positive_count = sum(1 for word in self.positive_words if word in content_lower)
-        negative_count = sum(1 for word in self.negative_words if word in content_lower)
+        word_counts = self.sentiment_matcher.count_by_category(normalized)
+        positive_count = word_counts.get('positive', 0)
+        negative_count = word_counts.get('negative', 0)
         
         if positive_count > negative_count:
             sentiment = 'positive'
@@ -203,43 +250,24 @@ class MessageAnalyzer:
             'caps_ratio': caps_ratio
         }
     
-    def _analyze_context(self, content: str, game_phase: Optional[str]) -> Dict:
+    def _analyze_context(self, content: str, game_phase: Optional[str], normalized: Optional[str] = None) -> Dict:
         """تحليل السياق"""
         context_flags = []
         context_score = 0.0
         
-        # تحليل حسب مرحلة اللعبة
-        if game_phase == 'night':
-            # في الليل، الحديث عن الأعمال قد يكون مشبوهاً
-            night_patterns = [
-                r'سأقتل\s+\w+',
-                r'سأعالج\s+\w+',
-                r'سأتحقق\s+من\s+\w+',
-            ]
+        # تحليل حسب مرحلة اللعبة: كشف أعمال الليل، والتلاعب أثناء التصويت
+        matcher = self.context_matchers.get(game_phase)
+        if matcher:
+            if normalized is None:
+                normalized = normalize_arabic(content)
             
-            for pattern in night_patterns:
-                if re.search(pattern, content, re.IGNORECASE):
-                    context_flags.append({
-                        'type': 'night_action_leak',
-                        'reason': 'كشف عمل ليلي في الدردشة العامة'
-                    })
-                    context_score += 0.7
-        
-        elif game_phase == 'voting':
-            # أثناء التصويت، تحليل محاولات التلاعب
-            voting_patterns = [
-                r'صوتوا\s+معي',
-                r'لا\s+تصوتوا\s+ضدي',
-                r'أعرف\s+الحقيقة',
-            ]
-            
-            for pattern in voting_patterns:
-                if re.search(pattern, content, re.IGNORECASE):
-                    context_flags.append({
-                        'type': 'vote_manipulation',
-                        'reason': 'محاولة تلاعب في التصويت'
-                    })
-                    context_score += 0.4
+            for category, _ in matcher.scan(normalized):
+                reason, score = self.context_rules[category]
+                context_flags.append({
+                    'type': category,
+                    'reason': reason
+                })
+                context_score += score
         
         # تحليل طول الرسالة
         if len(content) > 500:
@@ -254,8 +282,199 @@ class MessageAnalyzer:
             'context_suspicion_score': min(context_score, 1.0)
         }
     
+    def analyze_messages(self, messages: List[Dict], use_ai: bool = False) -> List[Dict]:
+        """تحليل دفعة رسائل دفعة واحدة (للمراجعة بعد اللعبة وإعادة التقييم)
+        
+        كل رسالة قاموس يحتوي: id, content, user_id, room_id, game_round, game_phase.
+        تطبّع النصوص مرة واحدة، وتحسب مطابقات الأنماط والكلمات كمصفوفات NumPy
+        ثم تجمع الدرجات لكل الرسائل معاً. النتيجة مطابقة لـ analyze_message
+        بدون OpenAI.
+        """
+        if not messages:
+            return []
+        
+        if use_ai or not NUMPY_AVAILABLE:
+            return [
+                self.analyze_message(
+                    m.get('id'), m.get('content') or '', m.get('user_id'), m.get('room_id'),
+                    m.get('game_round'), m.get('game_phase'), use_ai=use_ai
+                )
+                for m in messages
+            ]
+        
+        contents = [m.get('content') or '' for m in messages]
+        texts = [normalize_arabic(content) for content in contents]
+        
+        # 1. الأنماط المشبوهة: مصفوفة (رسائل × أنماط) مضروبة في شدة كل نمط
+        pattern_entries = self.pattern_matcher.entries
+        pattern_hits = np.array(self.pattern_matcher.hits(texts), dtype=bool).T
+        severities = np.array([self._get_pattern_severity(category) for category, _, _ in pattern_entries])
+        suspicion_scores = np.minimum(pattern_hits @ severities, 1.0)
+        
+        # 2. المشاعر: عدد الكلمات الإيجابية والسلبية لكل رسالة
+        sentiment_hits = np.array(self.sentiment_matcher.hits(texts), dtype=bool).T
+        positive_mask = np.array([category == 'positive' for category, _, _ in self.sentiment_matcher.entries])
+        positive_counts = sentiment_hits[:, positive_mask].sum(axis=1)
+        negative_counts = sentiment_hits[:, ~positive_mask].sum(axis=1)
+        
+        lengths = np.array([len(content) for content in contents])
+        exclamation_counts = np.array([content.count('!') for content in contents])
+        upper_counts = np.array([sum(1 for c in content if c.isupper()) for content in contents])
+        caps_ratios = np.divide(upper_counts, lengths, out=np.zeros(len(contents)), where=lengths > 0)
+        emotional_intensity = (
+            np.where(exclamation_counts > 3, 0.3, 0.0) +
+            np.where((caps_ratios > 0.5) & (lengths > 10), 0.4, 0.0)
+        )
+        
+        # 3. السياق: كل مرحلة تفحص رسائلها فقط
+        context_hits: Dict[int, List[str]] = {}
+        phases = [m.get('game_phase') for m in messages]
+        for phase, matcher in self.context_matchers.items():
+            rows = [i for i, p in enumerate(phases) if p == phase]
+            if not rows:
+                continue
+            hits = np.array(matcher.hits([texts[i] for i in rows]), dtype=bool).T
+            categories = [category for category, _, _ in matcher.entries]
+            for row_index, pattern_index in zip(*np.nonzero(hits)):
+                context_hits.setdefault(rows[row_index], []).append(categories[pattern_index])
+        
+        timestamp = datetime.utcnow().isoformat()
+        results = []
+        for i, message in enumerate(messages):
+            detected_patterns = []
+            flags = []
+            for pattern_index in np.flatnonzero(pattern_hits[i]):
+                category, pattern, _ = pattern_entries[pattern_index]
+                severity_score = float(severities[pattern_index])
+                detected_patterns.append({'category': category, 'pattern': pattern, 'severity': severity_score})
+                flags.append({
+                    'type': category,
+                    'reason': self._get_pattern_reason(category),
+                    'severity': severity_score
+                })
+            
+            context_flags = []
+            context_score = 0.0
+            for category in context_hits.get(i, []):
+                reason, score = self.context_rules[category]
+                context_flags.append({'type': category, 'reason': reason})
+                context_score += score
+            if lengths[i] > 500:
+                context_flags.append({
+                    'type': 'excessive_length',
+                    'reason': 'رسالة طويلة جداً قد تكون محاولة إرباك'
+                })
+                context_score += 0.2
+            
+            positive_count = int(positive_counts[i])
+            negative_count = int(negative_counts[i])
+            if positive_count > negative_count:
+                sentiment = 'positive'
+            elif negative_count > positive_count:
+                sentiment = 'negative'
+            else:
+                sentiment = 'neutral'
+            
+            suspicion_score = float(suspicion_scores[i])
+            results.append({
+                'message_id': message.get('id'),
+                'user_id': message.get('user_id'),
+                'room_id': message.get('room_id'),
+                'game_round': message.get('game_round'),
+                'game_phase': message.get('game_phase'),
+                'timestamp': timestamp,
+                'content_length': int(lengths[i]),
+                'is_suspicious': suspicion_score > 0.5,
+                'suspicion_score': suspicion_score,
+                'flags': flags,
+                'sentiment': sentiment,
+                'detected_patterns': detected_patterns,
+                'ai_analysis': None,
+                'positive_words_count': positive_count,
+                'negative_words_count': negative_count,
+                'emotional_intensity': float(emotional_intensity[i]),
+                'exclamation_count': int(exclamation_counts[i]),
+                'caps_ratio': float(caps_ratios[i]),
+                'context_flags': context_flags,
+                'context_suspicion_score': min(context_score, 1.0)
+            })
+        
+        return results
+    
+    def rescore_messages(self, room_id: int, batch_size: int = 2000, since: Optional[datetime] = None) -> Dict:
+        """إعادة تقييم رسائل غرفة بدفعات وكتابة النتائج بتحديث جماعي واحد لكل دفعة"""
+        from models import db
+        from models.message import Message
+        
+        columns = (
+            Message.id, Message.content, Message.user_id, Message.room_id,
+            Message.game_round, Message.game_phase, Message.suspicion_score,
+            Message.is_flagged, Message.ai_analysis
+        )
+        
+        summary = {'room_id': room_id, 'processed': 0, 'suspicious': 0, 'batches': 0}
+        last_id = 0
+        
+        while True:
+            query = db.session.query(*columns).filter(Message.room_id == room_id, Message.id > last_id)
+            if since:
+                query = query.filter(Message.sent_at >= since)
+            rows = query.order_by(Message.id).limit(batch_size).all()
+            if not rows:
+                break
+            
+            analyses = self.analyze_messages([row._asdict() for row in rows])
+            
+            updates = []
+            for row, analysis in zip(rows, analyses):
+                stored = json.loads(row.ai_analysis) if row.ai_analysis else {}
+                stored.update({
+                    'suspicion_score': analysis['suspicion_score'],
+                    'is_suspicious': analysis['is_suspicious'],
+                    'detected_patterns': analysis['detected_patterns'],
+                    'sentiment': analysis['sentiment'],
+                    'context_flags': analysis['context_flags'],
+                    'analysis_type': 'batch',
+                    'analyzed_at': analysis['timestamp']
+                })
+                
+                # الرسائل المبلغ عنها يدوياً تحتفظ بعلمها ودرجتها الأعلى
+                score = analysis['suspicion_score']
+                if row.is_flagged:
+                    score = max(score, row.suspicion_score)
+                
+                updates.append({
+                    'id': row.id,
+                    'suspicion_score': score,
+                    'is_flagged': row.is_flagged or analysis['is_suspicious'],
+                    'ai_analysis': json.dumps(stored, ensure_ascii=False)
+                })
+                if analysis['is_suspicious']:
+                    summary['suspicious'] += 1
+            
+            Message.bulk_update_analysis(updates)
+            
+            summary['processed'] += len(rows)
+            summary['batches'] += 1
+            last_id = rows[-1].id
+        
+        return summary
+    
     def _get_ai_analysis(self, content: str, game_phase: Optional[str] = None) -> Optional[Dict]:
-        """الحصول على تحليل من OpenAI"""
+        """الحصول على تحليل من OpenAI (من الذاكرة إن سبق تحليل نفس المحتوى)"""
+        found, cached = self.ai_cache.get(content, game_phase)
+        if found:
+            return cached
+        
+        result = self._request_ai_analysis(content, game_phase)
+        if result is None:
+            self.ai_cache.put_failure(content, game_phase)
+        else:
+            self.ai_cache.put(content, game_phase, result)
+        return result
+    
+    def _request_ai_analysis(self, content: str, game_phase: Optional[str] = None) -> Optional[Dict]:
+        """طلب تحليل من OpenAI"""
         try:
             prompt = f"""
             أنت محلل ذكي للمحتوى في لعبة المافيا العربية. قم بتحليل الرسالة التالية:
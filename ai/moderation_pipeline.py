@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+خط معالجة الإشراف على الرسائل
+Asynchronous Message Moderation Pipeline
+"""
+
+import threading
+import time
+from typing import Dict, List, Optional
+from models import db
+from models.message import Message
+from models.statistics import UserStatistics
+from monitoring.metrics import Histogram
+from .fair_queue import RoomFairQueue
+
+class ModerationJob:
+    """رسالة بانتظار التحليل"""
+
+    __slots__ = (
+        'message_id', 'content', 'user_id', 'room_id', 'channel',
+        'game_round', 'game_phase', 'enqueued_at'
+    )
+
+    def __init__(self, message_id: int, content: str, user_id: int, room_id: int,
+                 channel: str, game_round: Optional[int] = None, game_phase: Optional[str] = None):
+        self.message_id = message_id
+        self.content = content
+        self.user_id = user_id
+        self.room_id = room_id
+        self.channel = channel  # القناة التي أذيعت فيها الرسالة
+        self.game_round = game_round
+        self.game_phase = game_phase
+        self.enqueued_at = time.monotonic()
+
+class ModerationPipeline:
+    """تحليل الرسائل في مجمع عمال بعد إذاعتها
+
+    الرسائل تجمع في طابور لكل غرفة، والعمال يأخذون الغرف بالتناوب ويحللون
+    دفعة من رسائل الغرفة ثم يحفظون النتائج في معاملة واحدة ويرسلون
+    message_flagged / message_hidden. عند تراكم الطابور يتم الاكتفاء
+    بالقواعد المحلية بدون OpenAI، وعند امتلائه يحلل بالقواعد فوراً.
+    """
+
+    HIDE_THRESHOLD = 0.8  # إخفاء الرسالة فوق هذه الدرجة
+
+    def __init__(self, analyzer, socketio=None, app=None, workers: int = 4,
+                 batch_size: int = 16, max_queue: int = 2000, regex_only_depth: int = 200):
+        self.analyzer = analyzer
+        self.socketio = socketio
+        self.app = app
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_queue = max_queue
+        self.regex_only_depth = regex_only_depth
+
+        # طوابير الغرف والغرف الجاهزة للمعالجة (بالتناوب)
+        self._queue = RoomFairQueue(max_queue)
+
+        self._stop_event = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+        # المقاييس
+        self.processed_total = 0
+        self.flagged_total = 0
+        self.hidden_total = 0
+        self.regex_only_total = 0
+        self.overflow_total = 0
+        self.errors_total = 0
+        self.queue_wait = Histogram()
+        self.analysis_latency = Histogram()
+        self.end_to_end = Histogram()
+
+    def start(self):
+        """تشغيل العمال"""
+        if any(thread.is_alive() for thread in self._threads):
+            return
+
+        self._stop_event.clear()
+        self._threads = [
+            threading.Thread(target=self._run, name=f'moderation-worker-{i}', daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        """إيقاف العمال"""
+        self._stop_event.set()
+        for thread in self._threads:
+            thread.join(timeout=1)
+        self._threads = []
+
+    def submit(self, message_id: int, content: str, user_id: int, room_id: int, channel: str,
+               game_round: Optional[int] = None, game_phase: Optional[str] = None) -> bool:
+        """إضافة رسالة للتحليل (لا تنتظر نتيجة التحليل)"""
+        if not self._threads:
+            self.start()
+
+        job = ModerationJob(message_id, content, user_id, room_id, channel, game_round, game_phase)
+
+        if not self._queue.put(room_id, job):
+            # الطابور ممتلئ: تحليل بالقواعد المحلية فقط في الخيط الحالي
+            self.overflow_total += 1
+            self._process_batch([job], use_ai=False)
+            return False
+
+        return True
+
+    @property
+    def pending(self) -> int:
+        return self._queue.pending
+
+    def _run(self):
+        """حلقة العامل"""
+        while not self._stop_event.is_set():
+            taken = self._queue.take(self.batch_size)
+            if taken is None:
+                continue
+
+            # الغرفة تبقى محجوزة لهذا العامل حتى تنتهي دفعتها (ترتيب الرسائل محفوظ)
+            room_id, batch = taken
+            try:
+                if batch:
+                    # الضغط العالي: الاكتفاء بالقواعد المحلية
+                    self._process_batch(batch, use_ai=self.pending < self.regex_only_depth)
+            finally:
+                self._queue.release(room_id)
+
+    def _process_batch(self, batch: List[ModerationJob], use_ai: bool = True):
+        """تحليل دفعة وحفظ نتائجها"""
+        started = time.monotonic()
+        results = []
+
+        for job in batch:
+            self.queue_wait.observe(started - job.enqueued_at)
+            job_started = time.monotonic()
+            try:
+                analysis = self.analyzer.analyze_message(
+                    job.message_id, job.content, job.user_id, job.room_id,
+                    job.game_round, job.game_phase, use_ai=use_ai
+                )
+            except Exception as e:
+                self.errors_total += 1
+                print(f"خطأ في تحليل الرسالة {job.message_id}: {e}")
+                analysis = {}
+            self.analysis_latency.observe(time.monotonic() - job_started)
+            results.append((job, analysis))
+
+        if not use_ai:
+            self.regex_only_total += len(batch)
+
+        try:
+            if self.app is not None:
+                with self.app.app_context():
+                    events = self._apply_results(results)
+            else:
+                events = self._apply_results(results)
+        except Exception as e:
+            self.errors_total += 1
+            print(f"خطأ في حفظ نتائج الإشراف: {e}")
+            return
+
+        self._emit_events(events)
+
+        finished = time.monotonic()
+        for job in batch:
+            self.end_to_end.observe(finished - job.enqueued_at)
+        self.processed_total += len(batch)
+
+    def _apply_results(self, results) -> List[tuple]:
+        """حفظ نتائج الدفعة في معاملة واحدة"""
+        message_ids = [job.message_id for job, _ in results]
+        user_ids = {job.user_id for job, _ in results}
+
+        messages = {m.id: m for m in Message.query.filter(Message.id.in_(message_ids)).all()}
+        statistics = {
+            s.user_id: s for s in UserStatistics.query.filter(UserStatistics.user_id.in_(user_ids)).all()
+        }
+
+        events = []
+        try:
+            for job, analysis in results:
+                message = messages.get(job.message_id)
+                if not message:
+                    continue
+
+                if analysis.get('is_suspicious', False):
+                    reason = analysis.get('reason', 'محتوى مشبوه')
+                    score = analysis.get('suspicion_score', 0.5)
+                    message.flag_as_suspicious(reason, score, commit=False)
+                    self.flagged_total += 1
+                    events.append(('message_flagged', job, reason, score))
+
+                    # إخفاء الرسالة إذا كانت مخالفة شديدة
+                    if score > self.HIDE_THRESHOLD:
+                        reason = analysis.get('reason', 'مخالفة شديدة')
+                        message.hide_message(reason, commit=False)
+                        self.hidden_total += 1
+                        events.append(('message_hidden', job, reason, score))
+
+                # تحديث إحصائيات الدردشة بعد معرفة نتيجة التحليل
+                stats = statistics.get(job.user_id)
+                if stats:
+                    stats.update_chat_stats(
+                        len(job.content),
+                        message.suspicion_score,
+                        message.is_flagged,
+                        commit=False
+                    )
+
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        return events
+
+    def _emit_events(self, events: List[tuple]):
+        """إرسال نتائج الإشراف للعملاء"""
+        if not self.socketio:
+            return
+
+        for event, job, reason, score in events:
+            payload = {
+                'message_id': job.message_id,
+                'reason': reason,
+                'suspicion_score': score
+            }
+            if event == 'message_hidden':
+                # كل من استلم الرسالة يزيلها
+                self.socketio.emit('message_hidden', payload, room=job.channel)
+                
+                # الرسالة الخاصة تذاع لقناة المستقبل، والمرسل استلمها على اتصاله
+                sender_channel = f"user_{job.user_id}"
+                if job.channel.startswith('user_') and job.channel != sender_channel:
+                    self.socketio.emit('message_hidden', payload, room=sender_channel)
+            else:
+                self.socketio.emit('message_flagged', payload, room=f"user_{job.user_id}")
+
+    def get_statistics(self) -> Dict:
+        """إحصائيات خط الإشراف"""
+        return {
+            'pending': self.pending,
+            'rooms_waiting': self._queue.rooms_waiting,
+            'workers': self.workers,
+            'processed_total': self.processed_total,
+            'flagged_total': self.flagged_total,
+            'hidden_total': self.hidden_total,
+            'regex_only_total': self.regex_only_total,
+            'overflow_total': self.overflow_total,
+            'errors_total': self.errors_total,
+            'queue_wait_seconds': self.queue_wait.to_dict(),
+            'analysis_seconds': self.analysis_latency.to_dict(),
+            'end_to_end_seconds': self.end_to_end.to_dict(),
+            'ai_cache': self.analyzer.ai_cache.get_statistics() if hasattr(self.analyzer, 'ai_cache') else None
+        }
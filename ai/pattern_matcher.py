@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+مطابقة الأنماط المترجمة مسبقاً
+Precompiled Pattern Matcher
+"""
+
+import re
+from typing import Dict, Iterable, List, Tuple
+
+# توحيد أشكال الحروف: الهمزات على الألف، التاء المربوطة، الألف المقصورة، الهمزة على الواو والياء
+# وحذف التشكيل (الفتحة..السكون، الألف الخنجرية) والتطويل - كلها في جدول ترجمة واحد
+_NORMALIZE_TABLE = {
+    ord('أ'): 'ا',
+    ord('إ'): 'ا',
+    ord('آ'): 'ا',
+    ord('ٱ'): 'ا',
+    ord('ة'): 'ه',
+    ord('ى'): 'ي',
+    ord('ؤ'): 'و',
+    ord('ئ'): 'ي'
+}
+_NORMALIZE_TABLE.update({code: None for code in range(0x064B, 0x0653)})
+_NORMALIZE_TABLE.update({0x0670: None, 0x0640: None})
+
+def normalize_arabic(text: str) -> str:
+    """تطبيع النص العربي للمطابقة (حذف التشكيل وتوحيد الحروف وتصغير اللاتينية)"""
+    if not text:
+        return ''
+    return text.translate(_NORMALIZE_TABLE).lower()
+
+class PatternMatcher:
+    """مجموعة أنماط مصنفة تترجم مرة واحدة عند الإنشاء
+
+    الأنماط تطبّع بنفس طريقة النص حتى تطابق الكتابات المختلفة للكلمة نفسها،
+    وscan() تعيد كل الأنماط المطابقة مع فئاتها في استدعاء واحد. الكلمات
+    الحرفية (literal=True) تفحص بالبحث النصي المباشر بدون تعابير نمطية.
+
+    ملاحظة: دمج كل الأنماط في تعبير بديل واحد كان أبطأ بمرتين تقريباً في
+    محرك re (يجرب كل البدائل عند كل حرف)، لذلك يترجم كل نمط على حدة.
+    """
+
+    def __init__(self, categories: Dict[str, Iterable[str]], literal: bool = False):
+        self.literal = literal
+        self.entries: List[Tuple[str, str, object]] = []  # (الفئة، النمط الأصلي، المطابق)
+
+        for category, patterns in categories.items():
+            for pattern in patterns:
+                if literal:
+                    matcher = normalize_arabic(pattern)
+                else:
+                    matcher = re.compile(pattern.translate(_NORMALIZE_TABLE), re.IGNORECASE).search
+                self.entries.append((category, pattern, matcher))
+
+        self.pattern_count = len(self.entries)
+
+    def scan(self, normalized_text: str) -> List[Tuple[str, str]]:
+        """كل الأنماط المطابقة (الفئة، النمط) بترتيب تعريفها"""
+        if not normalized_text:
+            return []
+
+        if self.literal:
+            return [(category, pattern) for category, pattern, word in self.entries if word in normalized_text]
+        return [(category, pattern) for category, pattern, search in self.entries if search(normalized_text)]
+
+    def hits(self, normalized_texts: List[str]) -> List[List[bool]]:
+        """مصفوفة المطابقة لدفعة نصوص (صف لكل نمط، عمود لكل نص)"""
+        if self.literal:
+            return [[word in text for text in normalized_texts] for _, _, word in self.entries]
+        return [[search(text) is not None for text in normalized_texts] for _, _, search in self.entries]
+    
+    def count_by_category(self, normalized_text: str) -> Dict[str, int]:
+        """عدد الأنماط المختلفة المطابقة في كل فئة"""
+        counts: Dict[str, int] = {}
+        for category, _ in self.scan(normalized_text):
+            counts[category] = counts.get(category, 0) + 1
+        return counts
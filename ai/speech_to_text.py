@@ -6,7 +6,11 @@ Speech to Text Converter
 """
 
 import os
-from typing import Optional
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Iterable, Iterator, Optional, Tuple
 import tempfile
 
 try:
@@ -216,27 +220,129 @@ class SpeechToText:
             print(f"خطأ في الحصول على مدة الملف: {e}")
             return None
     
-    def batch_transcribe(self, file_paths: list) -> dict:
-        """تحويل عدة ملفات صوتية إلى نص"""
+    def batch_transcribe(self, file_paths: list, max_workers: int = 4, max_in_flight: int = None,
+                         timeout: float = None, deduplicate: bool = True,
+                         callback: Callable[[str, dict], None] = None) -> dict:
+        """تحويل عدة ملفات صوتية إلى نص بالتوازي
+        
+        callback(file_path, result) تستدعى فور اكتمال كل ملف.
+        """
         results = {}
         
-        for file_path in file_paths:
-            try:
-                transcript = self.transcribe(file_path)
-                results[file_path] = {
-                    'success': True,
-                    'transcript': transcript,
-                    'error': None
-                }
-            except Exception as e:
-                results[file_path] = {
-                    'success': False,
-                    'transcript': None,
-                    'error': str(e)
-                }
+        for file_path, result in self.iter_batch_transcribe(
+            file_paths, max_workers, max_in_flight, timeout, deduplicate
+        ):
+            results[file_path] = result
+            if callback:
+                callback(file_path, result)
         
         return results
     
+    def iter_batch_transcribe(self, file_paths: Iterable[str], max_workers: int = 4,
+                              max_in_flight: int = None, timeout: float = None,
+                              deduplicate: bool = True, language: str = 'ar') -> Iterator[Tuple[str, dict]]:
+        """تحويل عدة ملفات بالتوازي مع إرجاع (المسار، النتيجة) فور اكتمال كل ملف
+        
+        - max_in_flight: أقصى عدد طلبات مرسلة في نفس الوقت (افتراضياً max_workers)
+        - timeout: مهلة كل ملف بالثواني من بدء تحويله؛ الطلب المتأخر يعتبر فاشلاً
+          (الخيط يكمل في الخلفية وتهمل نتيجته)
+        - deduplicate: الملفات المتطابقة في المحتوى (sha256) تحول مرة واحدة
+        """
+        max_in_flight = max(1, max_in_flight or max_workers)
+        paths = iter(file_paths)
+        exhausted = False
+        
+        in_flight = {}   # future -> (البصمة، المسار، [وقت البدء])
+        waiting = {}     # البصمة -> مسارات مكررة بانتظار نتيجة الملف الأصلي
+        completed = {}   # البصمة -> (المسار الأصلي، النتيجة)
+        
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='speech-batch')
+        try:
+            while True:
+                # ملء الطلبات الجارية حتى الحد الأقصى
+                while not exhausted and len(in_flight) < max_in_flight:
+                    file_path = next(paths, None)
+                    if file_path is None:
+                        exhausted = True
+                        break
+                    
+                    digest = self._audio_digest(file_path) if deduplicate else None
+                    if digest is not None:
+                        if digest in completed:
+                            original, result = completed[digest]
+                            yield file_path, dict(result, duplicate_of=original)
+                            continue
+                        if digest in waiting:
+                            waiting[digest].append(file_path)
+                            continue
+                        waiting[digest] = []
+                    
+                    started = [None]
+                    future = executor.submit(self._timed_transcribe, file_path, language, started)
+                    in_flight[future] = (digest, file_path, started)
+                
+                if not in_flight:
+                    break
+                
+                wait_timeout = None
+                if timeout is not None:
+                    # الانتظار حتى أقرب مهلة لطلب بدأ فعلاً
+                    starts = [s[0] for _, _, s in in_flight.values() if s[0] is not None]
+                    wait_timeout = max(0.0, min(starts) + timeout - time.monotonic()) if starts else timeout
+                
+                done, _ = wait(in_flight, timeout=wait_timeout, return_when=FIRST_COMPLETED)
+                
+                finished = [(future, self._batch_result(future)) for future in done]
+                if timeout is not None:
+                    now = time.monotonic()
+                    for future, (_, _, started) in in_flight.items():
+                        if future not in done and started[0] is not None and now - started[0] >= timeout:
+                            finished.append((future, {
+                                'success': False,
+                                'transcript': None,
+                                'error': f'انتهت مهلة التحويل ({timeout} ثانية)'
+                            }))
+                
+                for future, result in finished:
+                    digest, file_path, _ = in_flight.pop(future)
+                    yield file_path, result
+                    
+                    if digest is not None:
+                        completed[digest] = (file_path, result)
+                        for duplicate in waiting.pop(digest, []):
+                            yield duplicate, dict(result, duplicate_of=file_path)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    def _timed_transcribe(self, file_path: str, language: str, started: list) -> Optional[str]:
+        """تحويل ملف مع تسجيل وقت بدء التنفيذ الفعلي (لحساب المهلة)"""
+        started[0] = time.monotonic()
+        return self.transcribe(file_path, language)
+    
+    @staticmethod
+    def _batch_result(future) -> dict:
+        """نتيجة ملف واحد في التحويل الجماعي"""
+        try:
+            transcript = future.result()
+        except Exception as e:
+            return {'success': False, 'transcript': None, 'error': str(e)}
+        
+        if transcript is None:
+            return {'success': False, 'transcript': None, 'error': 'تعذر تحويل الملف الصوتي'}
+        return {'success': True, 'transcript': transcript, 'error': None}
+    
+    @staticmethod
+    def _audio_digest(file_path: str) -> Optional[str]:
+        """بصمة محتوى الملف الصوتي (None إذا تعذرت قراءته)"""
+        try:
+            digest = hashlib.sha256()
+            with open(file_path, 'rb') as audio_file:
+                for chunk in iter(lambda: audio_file.read(1024 * 1024), b''):
+                    digest.update(chunk)
+            return digest.hexdigest()
+        except OSError:
+            return None
+    
     def analyze_speech_quality(self, transcript_with_timestamps: dict) -> dict:
         """تحليل جودة الكلام"""
         if not transcript_with_timestamps or 'words' not in transcript_with_timestamps:
@@ -312,4 +418,42 @@ class SpeechToText:
             'total_words': word_count,
             'duration': duration,
             'issues': issues if issues else ['جودة الكلام جيدة']
-        }
\ No newline at end of file
+        }
+
+class StubSpeechToText(SpeechToText):
+    """محول محلي بدون OpenAI للتطوير والاختبار
+
+    يعيد نصاً ثابتاً مبنياً على اسم الملف بعد تأخير اختياري، ويمكن جعله يفشل
+    في أول fail_first محاولة لكل ملف لاختبار إعادة المحاولة.
+    """
+
+    def __init__(self, delay: float = 0.0, fail_first: int = 0, text: str = None):
+        super().__init__(None)
+        self.delay = delay
+        self.fail_first = fail_first
+        self.text = text
+        self.calls = 0
+        self._attempts = {}
+        self._lock = threading.Lock()
+
+    def transcribe(self, audio_file_path: str, language: str = 'ar') -> Optional[str]:
+        """تحويل وهمي (None عند الفشل مثل المحول الحقيقي)"""
+        with self._lock:
+            self.calls += 1
+            attempt = self._attempts.get(audio_file_path, 0) + 1
+            self._attempts[audio_file_path] = attempt
+
+        if self.delay:
+            time.sleep(self.delay)
+
+        if attempt <= self.fail_first:
+            print(f"خطأ في تحويل الصوت إلى نص: فشل تجريبي ({attempt}/{self.fail_first})")
+            return None
+
+        if not os.path.exists(audio_file_path):
+            print(f"خطأ في تحويل الصوت إلى نص: الملف الصوتي غير موجود: {audio_file_path}")
+            return None
+
+        if self.text is not None:
+            return self.text
+        return f"[نص تجريبي: {os.path.basename(audio_file_path)}]"
\ No newline at end of file
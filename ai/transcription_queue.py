@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+طابور تحويل الرسائل الصوتية إلى نص
+Background Voice Transcription Queue
+"""
+
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+from models import db
+from models.message import Message
+from models.statistics import UserStatistics
+from monitoring.metrics import Histogram
+from game.timer_wheel import get_timer_wheel
+from .fair_queue import RoomFairQueue
+
+class TranscriptionJob:
+    """رسالة صوتية بانتظار التحويل"""
+
+    __slots__ = (
+        'message_id', 'file_path', 'user_id', 'room_id', 'channel',
+        'game_round', 'game_phase', 'attempts', 'submitted_at', 'enqueued_at'
+    )
+
+    def __init__(self, message_id: int, file_path: str, user_id: int, room_id: int,
+                 channel: str, game_round: Optional[int] = None, game_phase: Optional[str] = None):
+        self.message_id = message_id
+        self.file_path = file_path
+        self.user_id = user_id
+        self.room_id = room_id
+        self.channel = channel  # القناة التي أذيعت فيها الرسالة
+        self.game_round = game_round
+        self.game_phase = game_phase
+        self.attempts = 0
+        self.submitted_at = time.monotonic()
+        self.enqueued_at = self.submitted_at
+
+class TranscriptionQueue:
+    """تحويل الرسائل الصوتية في مجمع عمال محدود بعد إذاعتها
+
+    الرسالة تحفظ وتذاع فوراً بحالة pending، ثم يأخذ العمال الغرف بالتناوب
+    (رسالة واحدة لكل دور لأن التحويل بطيء) ويحفظون النص ويرسلون
+    transcription_result للغرفة. عند الفشل تعاد المحاولة بتأخير متزايد عبر
+    عجلة المؤقتات، وبعد max_retries تصبح الحالة failed. النص الناتج يرسل
+    لخط الإشراف إن وجد.
+    """
+
+    def __init__(self, speech_to_text, socketio=None, app=None, moderation=None,
+                 workers: int = 2, max_pending: int = 500, max_retries: int = 3,
+                 retry_backoff: float = 2.0, max_backoff: float = 30.0):
+        self.speech_to_text = speech_to_text
+        self.socketio = socketio
+        self.app = app
+        self.moderation = moderation
+        self.workers = workers
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.max_backoff = max_backoff
+
+        self._queue = RoomFairQueue(max_pending)
+        self._stop_event = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()  # العدادات تحدث من العمال وعجلة المؤقتات
+        self.retrying = 0
+
+        # المقاييس
+        self.completed_total = 0
+        self.failed_total = 0
+        self.retries_total = 0
+        self.rejected_total = 0
+        self.errors_total = 0
+        self.queue_wait = Histogram()
+        self.transcription_latency = Histogram()
+        self.end_to_end = Histogram()
+
+    def start(self):
+        """تشغيل العمال"""
+        if any(thread.is_alive() for thread in self._threads):
+            return
+
+        self._stop_event.clear()
+        self._threads = [
+            threading.Thread(target=self._run, name=f'transcription-worker-{i}', daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        """إيقاف العمال"""
+        self._stop_event.set()
+        for thread in self._threads:
+            thread.join(timeout=1)
+        self._threads = []
+
+    @property
+    def pending(self) -> int:
+        return self._queue.pending
+
+    def submit(self, message_id: int, file_path: str, user_id: int, room_id: int, channel: str,
+               game_round: Optional[int] = None, game_phase: Optional[str] = None) -> bool:
+        """إضافة رسالة صوتية للتحويل (False عند امتلاء الطابور)"""
+        if not self._threads:
+            self.start()
+
+        job = TranscriptionJob(message_id, file_path, user_id, room_id, channel, game_round, game_phase)
+        if not self._queue.put(room_id, job):
+            with self._lock:
+                self.rejected_total += 1
+            return False
+        return True
+
+    def _run(self):
+        """حلقة العامل"""
+        while not self._stop_event.is_set():
+            taken = self._queue.take(1)
+            if taken is None:
+                continue
+
+            room_id, batch = taken
+            try:
+                for job in batch:
+                    self._process(job)
+            finally:
+                self._queue.release(room_id)
+
+    def _resolve_path(self, file_path: str) -> str:
+        """المسارات المحفوظة نسبية لمجلد التطبيق"""
+        if self.app is not None and not os.path.isabs(file_path):
+            return os.path.join(self.app.root_path, file_path)
+        return file_path
+
+    def _process(self, job: TranscriptionJob):
+        """تحويل رسالة واحدة"""
+        started = time.monotonic()
+        self.queue_wait.observe(started - job.enqueued_at)
+        job.attempts += 1
+
+        try:
+            transcription = self.speech_to_text.transcribe(self._resolve_path(job.file_path))
+        except Exception as e:
+            print(f"خطأ في تحويل الرسالة الصوتية {job.message_id}: {e}")
+            transcription = None
+        self.transcription_latency.observe(time.monotonic() - started)
+
+        if transcription is None:
+            if job.attempts <= self.max_retries:
+                self._schedule_retry(job)
+                return
+            self._finish(job, None, 'failed')
+        else:
+            self._finish(job, transcription, 'done')
+
+    def _schedule_retry(self, job: TranscriptionJob):
+        """إعادة المحاولة بعد تأخير متزايد"""
+        delay = min(self.retry_backoff * (2 ** (job.attempts - 1)), self.max_backoff)
+        with self._lock:
+            self.retries_total += 1
+            self.retrying += 1
+
+        def requeue():
+            with self._lock:
+                self.retrying -= 1
+            job.enqueued_at = time.monotonic()
+            # المحاولة قبلت سابقاً فلا ترفض بسبب امتلاء الطابور
+            self._queue.put(job.room_id, job, force=True)
+
+        get_timer_wheel().schedule(delay, requeue)
+
+    def _finish(self, job: TranscriptionJob, transcription: Optional[str], status: str):
+        """حفظ النتيجة وإرسالها"""
+        try:
+            if self.app is not None:
+                with self.app.app_context():
+                    self._apply_result(job, transcription, status)
+            else:
+                self._apply_result(job, transcription, status)
+        except Exception as e:
+            with self._lock:
+                self.errors_total += 1
+            print(f"خطأ في حفظ تحويل الرسالة الصوتية {job.message_id}: {e}")
+            return
+
+        with self._lock:
+            if status == 'done':
+                self.completed_total += 1
+            else:
+                self.failed_total += 1
+        self.end_to_end.observe(time.monotonic() - job.submitted_at)
+
+        if self.socketio:
+            self.socketio.emit('transcription_result', {
+                'message_id': job.message_id,
+                'transcription': transcription,
+                'status': status
+            }, room=job.channel)
+
+        # تحليل النص المحول مثل الرسائل النصية
+        if transcription and self.moderation is not None:
+            self.moderation.submit(
+                job.message_id, transcription, job.user_id, job.room_id,
+                job.channel, job.game_round, job.game_phase
+            )
+
+    def _apply_result(self, job: TranscriptionJob, transcription: Optional[str], status: str):
+        """حفظ النص وحالة التحويل في معاملة واحدة"""
+        message = Message.query.get(job.message_id)
+        if not message:
+            return
+
+        try:
+            message.set_transcription(transcription, status, commit=False)
+
+            # خط الإشراف يحدث إحصائيات الدردشة بعد التحليل
+            if not transcription or self.moderation is None:
+                stats = UserStatistics.query.filter_by(user_id=job.user_id).first()
+                if stats:
+                    stats.update_chat_stats(
+                        len(transcription) if transcription else 10,  # تقدير طول الرسالة الصوتية
+                        message.suspicion_score,
+                        message.is_flagged,
+                        commit=False
+                    )
+
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    def get_statistics(self) -> Dict:
+        """إحصائيات طابور التحويل"""
+        return {
+            'pending': self.pending,
+            'retrying': self.retrying,
+            'rooms_waiting': self._queue.rooms_waiting,
+            'workers': self.workers,
+            'completed_total': self.completed_total,
+            'failed_total': self.failed_total,
+            'retries_total': self.retries_total,
+            'rejected_total': self.rejected_total,
+            'errors_total': self.errors_total,
+            'queue_wait_seconds': self.queue_wait.to_dict(),
+            'transcription_seconds': self.transcription_latency.to_dict(),
+            'end_to_end_seconds': self.end_to_end.to_dict()
+        }
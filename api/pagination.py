@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+التصفح بالمؤشرات
+Keyset (Cursor) Pagination
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import and_, func, or_, select
+
+class InvalidCursor(ValueError):
+    """مؤشر صفحة غير صالح"""
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """ترميز قيم مفتاح الترتيب كنص معتم"""
+    payload = [{'dt': value.isoformat()} if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(token: str) -> List[Any]:
+    """فك ترميز المؤشر (InvalidCursor إذا كان غير صالح)"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, list):
+            raise ValueError('payload')
+        return [
+            datetime.fromisoformat(value['dt']) if isinstance(value, dict) else value
+            for value in payload
+        ]
+    except (ValueError, TypeError, KeyError) as e:
+        raise InvalidCursor(str(e))
+
+def keyset_filter(order: Sequence[Tuple[Any, bool]], values: Sequence[Any]):
+    """شرط "بعد المؤشر" لترتيب مركب: (a, b, id) > (x, y, z) حسب اتجاه كل عمود
+
+    order: قائمة (العمود، تنازلي؟) بنفس ترتيب ORDER BY.
+    """
+    if len(values) != len(order):
+        raise InvalidCursor('عدد قيم المؤشر لا يطابق الترتيب')
+
+    clauses = []
+    for i, (column, descending) in enumerate(order):
+        equal = [order[j][0] == values[j] for j in range(i)]
+        beyond = column < values[i] if descending else column > values[i]
+        clauses.append(and_(*equal, beyond))
+    return or_(*clauses)
+
+def paginate(query, order: Sequence[Tuple[Any, bool]], key: Callable[[Any], Sequence[Any]],
+             limit: int, after: Optional[Sequence[Any]] = None) -> Tuple[List[Any], Optional[List[Any]]]:
+    """صفحة واحدة بالمؤشر بدون OFFSET ولا COUNT
+
+    key(row) تعيد قيم مفتاح الترتيب لصف (بنفس ترتيب order). after قيم مفتاح
+    آخر صف في الصفحة السابقة. يعيد (الصفوف، مفتاح آخر صف أو None إذا كانت
+    الصفحة الأخيرة) والمفتاح يرمز بـ encode_cursor.
+    """
+    if after:
+        query = query.filter(keyset_filter(order, after))
+
+    ordering = [column.desc() if descending else column.asc() for column, descending in order]
+    rows = query.order_by(*ordering).limit(limit + 1).all()
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, list(key(rows[-1]))
+    return rows, None
+
+def approximate_count(query, cap: int = 1000) -> Dict:
+    """عدد تقريبي محدود: يتوقف العد عند cap بدل مسح الجدول كاملاً"""
+    limited = query.order_by(None).limit(cap + 1).subquery()
+    count = query.session.execute(select(func.count()).select_from(limited)).scalar()
+    return {
+        'total': min(count, cap),
+        'total_is_exact': count <= cap
+    }
+
+def pagination_args(request, default_limit: int = 20, max_limit: int = 50) -> Tuple[int, Optional[List[Any]], bool]:
+    """قراءة limit و cursor (مفكوكاً) و with_total من الطلب"""
+    limit = request.args.get('limit') or request.args.get('per_page') or default_limit
+    limit = max(1, min(int(limit), max_limit))
+    cursor = request.args.get('cursor')
+    after = decode_cursor(cursor) if cursor else None
+    with_total = request.args.get('with_total', '').lower() in ('1', 'true', 'yes')
+    return limit, after, with_total
@@ -9,6 +9,8 @@ from flask import Blueprint, request, jsonify, current_app
 from flask_login import login_required, current_user
 from models import db, Room, Player
 from models.room import RoomStatus
+from models.eager_loading import room_list
+from .pagination import InvalidCursor, approximate_count, encode_cursor, paginate, pagination_args
 
 room_bp = Blueprint('room', __name__)
 
@@ -150,35 +152,54 @@ def get_my_room():
 def list_rooms():
     """الحصول على قائمة الغرف"""
     try:
-        limit = min(int(request.args.get('limit', 20)), 50)
+        limit, after, with_total = pagination_args(request, default_limit=20, max_limit=50)
         room_type = request.args.get('type', 'public')  # public, all, my
         
         room_manager = current_app.room_manager
+        open_statuses = [RoomStatus.WAITING, RoomStatus.STARTING, RoomStatus.PLAYING]
         
-        if room_type == 'public':
-            # الغرف العامة فقط
-            rooms = room_manager.get_public_rooms(limit)
-        elif room_type == 'all' and current_user.is_authenticated:
+        if room_type == 'all' and current_user.is_authenticated:
             # جميع الغرف (للمستخدمين المُسجّلين)
-            rooms = Room.query.filter(
-                Room.status.in_([RoomStatus.WAITING, RoomStatus.ACTIVE])
-            ).order_by(Room.created_at.desc()).limit(limit).all()
+            query = Room.query.filter(Room.status.in_(open_statuses))
         elif room_type == 'my' and current_user.is_authenticated:
             # غرف المستخدم فقط
-            rooms = Room.query.join(Player).filter(
+            query = Room.query.join(Player).filter(
                 Player.user_id == current_user.id,
-                Room.status.in_([RoomStatus.WAITING, RoomStatus.ACTIVE])
-            ).order_by(Room.created_at.desc()).limit(limit).all()
+                Room.status.in_(open_statuses)
+            )
         else:
-            # افتراضي: الغرف العامة
-            rooms = room_manager.get_public_rooms(limit)
+            # افتراضي: الغرف العامة فقط
+            query = room_manager.public_rooms_query()
+        
+        # الأحدث أولاً بالمؤشر
+        rooms, last_key = paginate(
+            room_list(query),
+            [(Room.created_at, True), (Room.id, True)],
+            lambda room: (room.created_at, room.id),
+            limit,
+            after
+        )
+        
+        pagination = {
+            'limit': limit,
+            'has_more': last_key is not None,
+            'next_cursor': encode_cursor(last_key) if last_key else None
+        }
+        if with_total:
+            pagination.update(approximate_count(query))
         
         return jsonify({
             'success': True,
             'rooms': [room.to_dict() for room in rooms],
-            'count': len(rooms)
+            'count': len(rooms),
+            'pagination': pagination
         })
         
+    except InvalidCursor:
+        return jsonify({
+            'success': False,
+            'message': 'مؤشر الصفحة غير صالح'
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -9,7 +9,10 @@ from flask import Blueprint, request, jsonify, current_app
 from flask_login import login_required, current_user
 from models import db, User, Game, Player
 from models.statistics import UserStatistics
+from models.eager_loading import game_history
+from models.leaderboard import SORT_MODES, leaderboard
 from sqlalchemy import func, desc
+from .pagination import InvalidCursor, approximate_count, encode_cursor, paginate, pagination_args
 
 stats_bp = Blueprint('stats', __name__)
 
@@ -81,130 +84,123 @@ def get_leaderboard():
     try:
         # نوع الترتيب
         sort_by = request.args.get('sort', 'win_rate')  # win_rate, total_games, games_won
-        limit = min(int(request.args.get('limit', 50)), 100)
+        if sort_by not in SORT_MODES:
+            sort_by = 'total_games'
+        limit, after, with_total = pagination_args(request, default_limit=50, max_limit=100)
         
-        # بناء الاستعلام
-        query = db.session.query(
-            UserStatistics,
-            User.username,
-            User.display_name,
-            User.avatar_url
-        ).join(User, UserStatistics.user_id == User.id).filter(
-            User.is_active == True,
-            UserStatistics.total_games_played > 0
-        )
-        
-        # ترتيب حسب النوع المطلوب
-        if sort_by == 'win_rate':
-            # ترتيب حسب معدل الفوز (مع الحد الأدنى من الألعاب)
-            query = query.filter(UserStatistics.total_games_played >= 5).order_by(
-                desc(UserStatistics.games_won * 100.0 / UserStatistics.total_games_played),
-                desc(UserStatistics.total_games_played)
-            )
-        elif sort_by == 'total_games':
-            query = query.order_by(desc(UserStatistics.total_games_played))
-        elif sort_by == 'games_won':
-            query = query.order_by(desc(UserStatistics.games_won))
-        else:
-            query = query.order_by(desc(UserStatistics.total_games_played))
+        # المؤشر يحمل ترتيب آخر لاعب في الصفحة السابقة
+        after_rank = 0
+        if after:
+            after_rank = after[-1]
+            if not isinstance(after_rank, int) or after_rank < 0:
+                raise InvalidCursor('ترتيب المؤشر')
         
-        results = query.limit(limit).all()
+        # صفحة من الترتيب المحسوب مسبقاً (فهرس sort_mode, rank)
+        page = leaderboard.get_page(sort_by, after_rank, limit)
         
-        # تنسيق النتائج
-        leaderboard = []
-        for rank, (stats, username, display_name, avatar_url) in enumerate(results, 1):
-            leaderboard.append({
-                'rank': rank,
-                'user_id': stats.user_id,
-                'username': username,
-                'display_name': display_name,
-                'avatar_url': avatar_url,
-                'total_games': stats.total_games_played,
-                'games_won': stats.games_won,
-                'win_rate': stats.get_win_rate(),
-                'survival_rate': stats.get_survival_rate(),
-                'favorite_role': stats.get_favorite_role()
-            })
+        pagination = {
+            'limit': limit,
+            'has_more': page['last_rank'] is not None,
+            'next_cursor': encode_cursor([page['last_rank']]) if page['last_rank'] else None
+        }
+        if with_total:
+            pagination.update({'total': leaderboard.count(sort_by), 'total_is_exact': True})
         
         return jsonify({
             'success': True,
-            'leaderboard': leaderboard,
+            'leaderboard': page['entries'],
             'sort_by': sort_by,
-            'count': len(leaderboard)
+            'count': len(page['entries']),
+            'pagination': pagination
         })
         
+    except InvalidCursor:
+        return jsonify({
+            'success': False,
+            'message': 'مؤشر الصفحة غير صالح'
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
             'message': f'خطأ: {str(e)}'
         }), 500
 
+def _global_aggregates():
+    """تجميعات الجداول الكاملة للإحصائيات العامة (تحفظ لمدة قصيرة)"""
+    # إحصائيات المستخدمين
+    total_users = User.query.filter_by(is_active=True).count()
+    online_users = User.query.filter_by(is_active=True, is_online=True).count()
+    
+    # إحصائيات الألعاب
+    total_games = Game.query.count()
+    
+    # إحصائيات متقدمة
+    stats_query = db.session.query(
+        func.sum(UserStatistics.total_games_played).label('total_games_played'),
+        func.avg(UserStatistics.total_games_played).label('avg_games_per_user'),
+        func.sum(UserStatistics.total_messages_sent).label('total_messages'),
+        func.avg(UserStatistics.average_suspicion_score).label('avg_suspicion_score')
+    ).first()
+    
+    # الأدوار الأكثر لعباً
+    popular_roles = db.session.query(
+        func.sum(UserStatistics.games_as_citizen).label('citizen'),
+        func.sum(UserStatistics.games_as_mafia).label('mafia'),
+        func.sum(UserStatistics.games_as_doctor).label('doctor'),
+        func.sum(UserStatistics.games_as_detective).label('detective'),
+        func.sum(UserStatistics.games_as_vigilante).label('vigilante'),
+        func.sum(UserStatistics.games_as_mayor).label('mayor'),
+        func.sum(UserStatistics.games_as_jester).label('jester')
+    ).first()
+    
+    return {
+        'users': {
+            'total': total_users,
+            'online': online_users,
+            'offline': total_users - online_users
+        },
+        'games': {
+            'total_completed': total_games,
+            'total_games_played': int(stats_query.total_games_played or 0),
+            'average_per_user': round(float(stats_query.avg_games_per_user or 0), 2)
+        },
+        'chat': {
+            'total_messages': int(stats_query.total_messages or 0),
+            'average_suspicion': round(float(stats_query.avg_suspicion_score or 0), 3)
+        },
+        'roles': {
+            'citizen': int(popular_roles.citizen or 0),
+            'mafia': int(popular_roles.mafia or 0),
+            'doctor': int(popular_roles.doctor or 0),
+            'detective': int(popular_roles.detective or 0),
+            'vigilante': int(popular_roles.vigilante or 0),
+            'mayor': int(popular_roles.mayor or 0),
+            'jester': int(popular_roles.jester or 0)
+        }
+    }
+
 @stats_bp.route('/global', methods=['GET'])
 def get_global_statistics():
     """الحصول على الإحصائيات العامة للموقع"""
     try:
-        # إحصائيات المستخدمين
-        total_users = User.query.filter_by(is_active=True).count()
-        online_users = User.query.filter_by(is_active=True, is_online=True).count()
-        
-        # إحصائيات الألعاب
-        total_games = Game.query.count()
-        active_games = current_app.game_manager.get_active_games_count()
-        
-        # إحصائيات الغرف
-        active_rooms = current_app.room_manager.get_active_rooms_count()
-        total_players_in_rooms = current_app.room_manager.get_total_players_count()
-        
-        # إحصائيات متقدمة
-        stats_query = db.session.query(
-            func.sum(UserStatistics.total_games_played).label('total_games_played'),
-            func.avg(UserStatistics.total_games_played).label('avg_games_per_user'),
-            func.sum(UserStatistics.total_messages_sent).label('total_messages'),
-            func.avg(UserStatistics.average_suspicion_score).label('avg_suspicion_score')
-        ).first()
+        # التجميعات من ذاكرة لوحة المتصدرين قصيرة المدة
+        aggregates = leaderboard.cached(('global',), _global_aggregates)
         
-        # الأدوار الأكثر لعباً
-        popular_roles = db.session.query(
-            func.sum(UserStatistics.games_as_citizen).label('citizen'),
-            func.sum(UserStatistics.games_as_mafia).label('mafia'),
-            func.sum(UserStatistics.games_as_doctor).label('doctor'),
-            func.sum(UserStatistics.games_as_detective).label('detective'),
-            func.sum(UserStatistics.games_as_vigilante).label('vigilante'),
-            func.sum(UserStatistics.games_as_mayor).label('mayor'),
-            func.sum(UserStatistics.games_as_jester).label('jester')
-        ).first()
+        # الألعاب والغرف الجارية من الذاكرة
+        games = dict(aggregates['games'])
+        games['currently_active'] = current_app.game_manager.get_active_games_count()
         
         return jsonify({
             'success': True,
             'statistics': {
-                'users': {
-                    'total': total_users,
-                    'online': online_users,
-                    'offline': total_users - online_users
-                },
-                'games': {
-                    'total_completed': total_games,
-                    'currently_active': active_games,
-                    'total_games_played': int(stats_query.total_games_played or 0),
-                    'average_per_user': round(float(stats_query.avg_games_per_user or 0), 2)
-                },
+                'users': aggregates['users'],
+                'games': games,
                 'rooms': {
-                    'active_rooms': active_rooms,
-                    'players_in_rooms': total_players_in_rooms
+                    'active_rooms': current_app.room_manager.get_active_rooms_count(),
+                    'players_in_rooms': current_app.room_manager.get_total_players_count()
                 },
-                'chat': {
-                    'total_messages': int(stats_query.total_messages or 0),
-                    'average_suspicion': round(float(stats_query.avg_suspicion_score or 0), 3)
-                },
-                'roles': {
-                    'citizen': int(popular_roles.citizen or 0),
-                    'mafia': int(popular_roles.mafia or 0),
-                    'doctor': int(popular_roles.doctor or 0),
-                    'detective': int(popular_roles.detective or 0),
-                    'vigilante': int(popular_roles.vigilante or 0),
-                    'mayor': int(popular_roles.mayor or 0),
-                    'jester': int(popular_roles.jester or 0)
-                }
+                'chat': aggregates['chat'],
+                'roles': aggregates['roles']
             }
         })
         
@@ -259,45 +255,51 @@ def analyze_game(game_id):
 def get_my_games():
     """الحصول على ألعابي"""
     try:
-        page = int(request.args.get('page', 1))
-        per_page = min(int(request.args.get('per_page', 10)), 50)
+        limit, after, with_total = pagination_args(request, default_limit=10, max_limit=50)
         
-        # الحصول على الألعاب التي شارك فيها المستخدم
-        games_query = db.session.query(Game).join(
+        # الألعاب التي شارك فيها المستخدم مع سجل اللاعب في نفس الاستعلام
+        games_query = db.session.query(Game, Player).join(
             Player, Game.room_id == Player.room_id
         ).filter(
             Player.user_id == current_user.id
-        ).order_by(desc(Game.started_at))
+        )
         
-        # تطبيق التصفح
-        total = games_query.count()
-        games = games_query.offset((page - 1) * per_page).limit(per_page).all()
+        # تطبيق التصفح بالمؤشر (الأحدث أولاً)
+        rows, last_key = paginate(
+            game_history(games_query),
+            [(Game.started_at, True), (Game.id, True)],
+            lambda row: (row[0].started_at, row[0].id),
+            limit,
+            after
+        )
         
         # تنسيق النتائج
         games_data = []
-        for game in games:
-            # الحصول على معلومات اللاعب في هذه اللعبة
-            player = Player.query.filter_by(
-                user_id=current_user.id,
-                room_id=game.room_id
-            ).first()
-            
+        for game, player in rows:
             games_data.append({
                 'game': game.to_dict(),
-                'player': player.to_dict(include_role=True) if player else None
+                'player': player.to_dict(include_role=True)
             })
         
+        pagination = {
+            'limit': limit,
+            'has_more': last_key is not None,
+            'next_cursor': encode_cursor(last_key) if last_key else None
+        }
+        if with_total:
+            pagination.update(approximate_count(games_query))
+        
         return jsonify({
             'success': True,
             'games': games_data,
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': total,
-                'pages': (total + per_page - 1) // per_page
-            }
+            'pagination': pagination
         })
         
+    except InvalidCursor:
+        return jsonify({
+            'success': False,
+            'message': 'مؤشر الصفحة غير صالح'
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -5,10 +5,15 @@
 Main Mafia Game Application
 """
 
-from flask import Flask
-from flask_socketio import SocketIO
-from flask_login import LoginManager
+# ترقيع المكتبة القياسية لوضع eventlet/gevent قبل أي استيراد آخر
+from async_mode import monkey_patch
+monkey_patch()
+
+from flask import Flask, request
+from flask_socketio import SocketIO, join_room
+from flask_login import LoginManager, current_user
 from flask_cors import CORS
+import click
 import os
 from datetime import timedelta
 
@@ -16,10 +21,21 @@ from datetime import timedelta
 from config import config
 
 # استيراد النماذج
-from models import db, User
+from models import db, User, ensure_columns, ensure_indexes
+from models.game_log import log_writer
+from models.leaderboard import LeaderboardEntry, leaderboard
+from websocket.voice_upload import voice_uploads
+from websocket.message_history import message_history
+from websocket.local_broker import create_client_manager
+from monitoring.query_counter import request_query_counter
+from monitoring.query_profiler import query_profiler
+from monitoring.socket_metrics import socket_metrics
+from monitoring.stats_snapshot import StatsSnapshot
 
 # استيراد المدراء
 from game import GameManager, RoomManager
+from game.room_ownership import room_ownership
+from game.membership import MembershipIndex
 
 # استيراد مسارات API
 from api import auth_bp, game_bp, room_bp, stats_bp
@@ -28,7 +44,10 @@ from api import auth_bp, game_bp, room_bp, stats_bp
 from websocket import register_game_events, register_room_events, register_chat_events, register_voice_events
 
 # استيراد الذكاء الاصطناعي
-from ai import MessageAnalyzer, SpeechToText, GameAnalyzer, StatsAnalyzer
+from ai import (
+    MessageAnalyzer, SpeechToText, StubSpeechToText, GameAnalyzer, StatsAnalyzer,
+    ModerationPipeline, AnalysisCache, TranscriptionQueue
+)
 
 # استيراد مسارات الواجهات
 from routes import register_routes
@@ -43,18 +62,44 @@ def create_app(config_name='development'):
     
     # تهيئة الإضافات
     db.init_app(app)
+    log_writer.init_app(app)
+    voice_uploads.init_app(app)
+    message_history.init_app(app)
+    request_query_counter.init_app(app)
+    query_profiler.init_app(app)
+    leaderboard.init_app(app)
+    room_ownership.init_app(app)
     
     # إعداد CORS
     CORS(app, 
          origins=["http://localhost:3000"],  # للواجهة الأمامية المستقبلية
          supports_credentials=True)
     
+    # طابور الرسائل بين العمليات (redis:// أو kombu أو الوسيط المحلي local://)
+    socketio_options = {}
+    message_queue = app.config.get('SOCKETIO_MESSAGE_QUEUE')
+    if message_queue:
+        client_manager = create_client_manager(
+            message_queue,
+            channel=app.config.get('SOCKETIO_CHANNEL', 'flask-socketio'),
+            authkey=app.config.get('SOCKETIO_BROKER_KEY')
+        )
+        if client_manager is not None:
+            socketio_options['client_manager'] = client_manager
+        else:
+            socketio_options['message_queue'] = message_queue
+            socketio_options['channel'] = app.config.get('SOCKETIO_CHANNEL', 'flask-socketio')
+    
     # إعداد SocketIO
     socketio = SocketIO(app, 
                        cors_allowed_origins="*",
-                       async_mode='threading',
+                       async_mode=monkey_patch(app.config.get('SOCKETIO_ASYNC_MODE')),
                        logger=True,
-                       engineio_logger=True)
+                       engineio_logger=True,
+                       **socketio_options)
+    
+    # قياس كل معالجات الأحداث (قبل تسجيلها)
+    socket_metrics.init_app(app, socketio)
     
     # إعداد إدارة تسجيل الدخول
     login_manager = LoginManager()
@@ -73,7 +118,32 @@ def create_app(config_name='development'):
     # إنشاء قاعدة البيانات
     with app.app_context():
         db.create_all()
+        ensure_columns()
+        ensure_indexes()
         print("✅ تم إنشاء قاعدة البيانات بنجاح")
+        
+        # ملء لوحة المتصدرين أول مرة (الجدول الجديد فارغ)
+        if LeaderboardEntry.query.first() is None:
+            leaderboard.rebuild()
+    
+    @app.cli.command('rebuild-leaderboard')
+    def rebuild_leaderboard_command():
+        """إعادة حساب لوحة المتصدرين بالكامل (للإصلاح الدوري)"""
+        counts = leaderboard.rebuild()
+        print(f"✅ تم إعادة بناء لوحة المتصدرين: {counts}")
+    
+    @app.cli.command('grant-admin')
+    @click.argument('username')
+    @click.option('--revoke', is_flag=True, help='سحب الصلاحية')
+    def grant_admin_command(username, revoke):
+        """منح صلاحية الإدارة لمستخدم (أو سحبها)"""
+        user = User.query.filter_by(username=username).first()
+        if not user:
+            print(f"❌ المستخدم {username} غير موجود")
+            return
+        user.is_admin = not revoke
+        db.session.commit()
+        print(f"✅ {username}: is_admin={user.is_admin}")
     
     # تسجيل مسارات API
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
@@ -85,20 +155,63 @@ def create_app(config_name='development'):
     register_routes(app)
     
     # إنشاء مدراء اللعبة
-    app.game_manager = GameManager()
-    app.room_manager = RoomManager()
+    app.game_manager = GameManager(app, lock_stripes=app.config.get('LOCK_STRIPES', 64))
+    app.room_manager = RoomManager(
+        lock_stripes=app.config.get('LOCK_STRIPES', 64),
+        membership=MembershipIndex(
+            negative_ttl=app.config.get('MEMBERSHIP_NEGATIVE_TTL', 5.0),
+            positive_ttl=app.config.get('MEMBERSHIP_POSITIVE_TTL', 0.0)
+        )
+    )
+    
+    # عدادات الصحة والإحصائيات السريعة في الذاكرة
+    app.stats_snapshot = StatsSnapshot(
+        app,
+        interval=app.config.get('STATS_SNAPSHOT_INTERVAL', 15),
+        quick_stats_ttl=app.config.get('QUICK_STATS_TTL', 30)
+    )
     
     # إعداد الذكاء الاصطناعي
     openai_api_key = app.config.get('OPENAI_API_KEY')
     if openai_api_key:
-        app.ai_analyzer = MessageAnalyzer(openai_api_key)
+        ai_cache = AnalysisCache(
+            max_entries=app.config.get('AI_CACHE_SIZE', 5000),
+            ttl=app.config.get('AI_CACHE_TTL', 3600),
+            negative_ttl=app.config.get('AI_CACHE_NEGATIVE_TTL', 60),
+            path=app.config.get('AI_CACHE_PATH')
+        )
+        app.ai_analyzer = MessageAnalyzer(openai_api_key, cache=ai_cache)
         app.speech_to_text = SpeechToText(openai_api_key)
         app.game_analyzer = GameAnalyzer(openai_api_key)
         app.stats_analyzer = StatsAnalyzer(openai_api_key)
+        app.moderation_pipeline = ModerationPipeline(
+            app.ai_analyzer,
+            socketio,
+            app,
+            workers=app.config.get('MODERATION_WORKERS', 4),
+            batch_size=app.config.get('MODERATION_BATCH_SIZE', 16),
+            max_queue=app.config.get('MODERATION_MAX_QUEUE', 2000),
+            regex_only_depth=app.config.get('MODERATION_REGEX_ONLY_DEPTH', 200)
+        )
         print("✅ تم تهيئة محركات الذكاء الاصطناعي")
     else:
         print("⚠️ لم يتم تعيين مفتاح OpenAI - الذكاء الاصطناعي معطل")
     
+    # تحويل الرسائل الصوتية في الخلفية (المحول المحلي للتطوير بدون OpenAI)
+    if app.config.get('SPEECH_TO_TEXT_BACKEND') == 'stub':
+        app.speech_to_text = StubSpeechToText()
+    if hasattr(app, 'speech_to_text'):
+        app.transcription_queue = TranscriptionQueue(
+            app.speech_to_text,
+            socketio,
+            app,
+            moderation=getattr(app, 'moderation_pipeline', None),
+            workers=app.config.get('TRANSCRIPTION_WORKERS', 2),
+            max_pending=app.config.get('TRANSCRIPTION_MAX_PENDING', 500),
+            max_retries=app.config.get('TRANSCRIPTION_MAX_RETRIES', 3),
+            retry_backoff=app.config.get('TRANSCRIPTION_RETRY_BACKOFF', 2.0)
+        )
+    
     # تسجيل أحداث WebSocket
     register_game_events(socketio)
     register_room_events(socketio)
@@ -108,10 +221,15 @@ def create_app(config_name='development'):
     # إعداد أحداث الاتصال
     @socketio.on('connect')
     def handle_connect(auth):
+        if current_user.is_authenticated:
+            # قناة المستخدم للرسائل الخاصة وإشعارات الإشراف
+            join_room(f"user_{current_user.id}")
         print(f"🔗 اتصال جديد من العميل")
     
     @socketio.on('disconnect')
     def handle_disconnect():
+        # الرفع الصوتي الجاري من هذا الاتصال لن يكتمل
+        voice_uploads.abort_session(request.sid)
         print(f"❌ انقطع الاتصال مع العميل")
     
     # المسارات يتم تسجيلها من routes.py
@@ -171,8 +289,8 @@ def setup_development_data(app):
 
 def run_cleanup_tasks(app):
     """تشغيل مهام التنظيف الدورية"""
-    import threading
-    import time
+    # مهمة خلفية من SocketIO: خيط عادي أو خيط أخضر حسب وضع التزامن
+    socketio = app.extensions['socketio']
     
     def cleanup_worker():
         while True:
@@ -187,15 +305,28 @@ def run_cleanup_tasks(app):
                     from websocket.voice_events import cleanup_old_voice_files
                     cleanup_old_voice_files()
                     
+                    # الرفع الصوتي المتروك (ملف مؤقت مفتوح)
+                    abandoned = voice_uploads.sweep()
+                    if abandoned:
+                        print(f"🧹 تم حذف {abandoned} رفع صوتي متروك")
+                    
+                    # مطابقة فهرس العضوية مع قاعدة البيانات
+                    repaired = app.room_manager.membership.check_consistency()
+                    if repaired:
+                        print(f"⚠️ تم إصلاح {repaired} عضوية في فهرس الغرف")
+                    
+                    # إصلاح أي انحراف في ترتيب لوحة المتصدرين
+                    if app.config.get('LEADERBOARD_PERIODIC_REBUILD'):
+                        leaderboard.rebuild()
+                    
             except Exception as e:
                 print(f"❌ خطأ في مهمة التنظيف: {e}")
             
             # انتظار ساعة
-            time.sleep(3600)
+            socketio.sleep(3600)
     
-    # تشغيل مهمة التنظيف في خيط منفصل
-    cleanup_thread = threading.Thread(target=cleanup_worker, daemon=True)
-    cleanup_thread.start()
+    # تشغيل مهمة التنظيف في الخلفية
+    socketio.start_background_task(cleanup_worker)
     print("🧹 تم بدء مهام التنظيف الدورية")
 
 if __name__ == '__main__':
@@ -212,6 +343,7 @@ if __name__ == '__main__':
     print("🎮 بدء تشغيل خادم لعبة المافيا...")
     print(f"🌐 الخادم يعمل على: http://{app.config['HOST']}:{app.config['PORT']}")
     print(f"🔧 وضع التطوير: {'مفعل' if app.config['DEBUG'] else 'معطل'}")
+    print(f"⚡ وضع التزامن: {socketio.async_mode}")
     print(f"🤖 الذكاء الاصطناعي: {'مفعل' if app.config.get('OPENAI_API_KEY') else 'معطل'}")
     print("📝 لمشاهدة API: /api/info")
     print("💚 للتحقق من الصحة: /health")
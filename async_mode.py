@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+وضع التزامن لخادم Socket.IO
+Socket.IO Async Mode
+
+threading: خيط نظام لكل اتصال (الافتراضي، مناسب للتطوير).
+eventlet / gevent: خيوط خضراء تعاونية لآلاف الاتصالات في عملية واحدة.
+
+الوضعان الأخيران يحتاجان ترقيع المكتبة القياسية (monkey patching) قبل
+استيراد أي وحدة تنشئ خيوطاً أو أقفالاً أو مقابس، لذلك يستدعى monkey_patch
+في أول app.py. بعد الترقيع تصبح threading.Thread و time.sleep والأقفال
+والطوابير تعاونية، فخيوط الخلفية الحالية (عجلة المؤقتات، كاتب السجلات،
+لقطة الإحصائيات، عمال الذكاء الاصطناعي) تعمل كخيوط خضراء دون تعديل.
+"""
+
+import importlib.util
+import os
+from typing import Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+ASYNC_MODES = ('threading', 'eventlet', 'gevent')
+
+_active_mode: Optional[str] = None
+
+def requested_mode() -> str:
+    """الوضع المطلوب من متغير البيئة SOCKETIO_ASYNC_MODE"""
+    return os.environ.get('SOCKETIO_ASYNC_MODE', 'threading').strip().lower()
+
+def is_available(mode: str) -> bool:
+    """التحقق من تثبيت حزمة الوضع"""
+    return mode == 'threading' or importlib.util.find_spec(mode) is not None
+
+def monkey_patch(mode: Optional[str] = None) -> str:
+    """ترقيع المكتبة القياسية للوضع المطلوب (مرة واحدة) وإرجاع الوضع الفعلي"""
+    global _active_mode
+
+    mode = (mode or requested_mode()).lower()
+    if mode not in ASYNC_MODES:
+        raise ValueError(f"وضع التزامن غير مدعوم: {mode} (المتاح: {', '.join(ASYNC_MODES)})")
+
+    if _active_mode is not None:
+        if mode != _active_mode:
+            print(f"⚠️ وضع التزامن محدد مسبقاً ({_active_mode}) - تجاهل {mode}")
+        return _active_mode
+
+    if not is_available(mode):
+        print(f"⚠️ الحزمة {mode} غير مثبتة - استخدام threading")
+        mode = 'threading'
+
+    if mode == 'eventlet':
+        import eventlet
+        eventlet.monkey_patch()
+    elif mode == 'gevent':
+        from gevent import monkey
+        monkey.patch_all()
+
+    _active_mode = mode
+    return mode
+
+def active_mode() -> str:
+    """الوضع الفعلي بعد الترقيع"""
+    return _active_mode or 'threading'
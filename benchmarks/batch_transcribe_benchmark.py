@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+قياس أداء التحويل الجماعي للرسائل الصوتية
+Batch Transcription Benchmark
+
+ينشئ ملفات صوتية وهمية (بعضها مكرر المحتوى) ويحولها بالمحول المحلي
+StubSpeechToText بتأخير ثابت يحاكي زمن استجابة الخدمة، مرة بشكل متسلسل
+ومرة بالتوازي مع إزالة التكرار، ثم يطبع الزمن وعدد الاستدعاءات.
+
+الاستخدام:
+    python benchmarks/batch_transcribe_benchmark.py --files 200 --latency 0.2 --workers 16
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai.speech_to_text import StubSpeechToText
+
+def create_files(directory: str, count: int, duplicate_ratio: float) -> list:
+    """إنشاء ملفات وهمية، نسبة منها نسخ من ملفات سابقة"""
+    paths = []
+    contents = []
+    for i in range(count):
+        if contents and random.random() < duplicate_ratio:
+            content = random.choice(contents)
+        else:
+            content = os.urandom(4096)
+            contents.append(content)
+
+        path = os.path.join(directory, f'voice_{i}.wav')
+        with open(path, 'wb') as f:
+            f.write(content)
+        paths.append(path)
+    return paths
+
+def run(paths: list, latency: float, **kwargs):
+    """تحويل كل الملفات وإرجاع (الزمن، عدد الاستدعاءات، عدد النتائج الناجحة)"""
+    stt = StubSpeechToText(delay=latency)
+    started = time.perf_counter()
+    results = stt.batch_transcribe(paths, **kwargs)
+    elapsed = time.perf_counter() - started
+    return elapsed, stt.calls, sum(1 for r in results.values() if r['success'])
+
+def main():
+    """الدالة الرئيسية"""
+    parser = argparse.ArgumentParser(description='قياس أداء التحويل الجماعي')
+    parser.add_argument('--files', type=int, default=200, help='عدد الملفات')
+    parser.add_argument('--latency', type=float, default=0.2, help='زمن تحويل الملف الواحد بالثواني')
+    parser.add_argument('--workers', type=int, default=16, help='عدد الخيوط')
+    parser.add_argument('--duplicates', type=float, default=0.2, help='نسبة الملفات المكررة')
+    parser.add_argument('--skip-serial', action='store_true', help='تخطي التشغيل المتسلسل')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='voice_batch_')
+    try:
+        paths = create_files(directory, args.files, args.duplicates)
+
+        print("=" * 60)
+        print(f"الملفات: {args.files} | زمن الملف: {args.latency * 1000:.0f} ms | الخيوط: {args.workers}")
+
+        if not args.skip_serial:
+            elapsed, calls, ok = run(paths, args.latency, max_workers=1, deduplicate=False)
+            print(f"متسلسل: {elapsed:.2f} s | استدعاءات: {calls} | ناجحة: {ok}")
+
+        elapsed, calls, ok = run(paths, args.latency, max_workers=args.workers)
+        print(f"متوازي مع إزالة التكرار: {elapsed:.2f} s | استدعاءات: {calls} | ناجحة: {ok}")
+        print("=" * 60)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
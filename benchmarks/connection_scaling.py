@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+قياس توسع الاتصالات حسب وضع التزامن
+Connection Scaling Benchmark
+
+يشغل خادم Socket.IO صغيراً في عملية منفصلة لكل وضع (threading / eventlet /
+gevent)، ويفتح عليه آلاف اتصالات WebSocket تنضم كل منها لغرفة، ثم يطبع
+زمن الاتصال وذاكرة الخادم وعدد خيوط النظام فيه وزمن بث رسالة لكل العملاء.
+الأوضاع غير المثبتة تتخطى.
+
+الاستخدام:
+    python benchmarks/connection_scaling.py --connections 2000 --modes threading,eventlet
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def serve(mode: str, port: int):
+    """خادم القياس (يعمل في عملية فرعية)"""
+    from async_mode import monkey_patch
+    mode = monkey_patch(mode)
+
+    from flask import Flask
+    from flask_socketio import SocketIO, emit, join_room
+
+    app = Flask(__name__)
+    socketio = SocketIO(app, async_mode=mode, cors_allowed_origins="*")
+
+    @socketio.on('join')
+    def on_join(data):
+        join_room(data['room'])
+        emit('joined', data['room'])
+
+    @socketio.on('broadcast')
+    def on_broadcast():
+        socketio.emit('tick', time.time())
+
+    print('ready', flush=True)
+    socketio.run(app, host='127.0.0.1', port=port, log_output=False, allow_unsafe_werkzeug=True)
+
+def process_status(pid: int) -> dict:
+    """الذاكرة وعدد الخيوط من /proc"""
+    status = {}
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key in ('VmRSS', 'Threads'):
+                    status[key] = int(value.split()[0])
+    except OSError:
+        pass
+    return status
+
+def receive_event(ws, name: str, timeout: float = 30) -> bool:
+    """انتظار حدث Socket.IO مع الرد على ping"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        packet = ws.receive(timeout=deadline - time.monotonic())
+        if packet is None:
+            return False
+        if packet == '2':
+            ws.send('3')
+        elif packet.startswith(f'42["{name}"'):
+            return True
+    return False
+
+def run_mode(mode: str, port: int, connections: int, rooms: int) -> dict:
+    """قياس وضع واحد"""
+    import simple_websocket
+    from monitoring.metrics import Histogram
+
+    server = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), '--serve', mode, '--port', str(port)],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+    )
+    try:
+        if server.stdout.readline().strip() != 'ready':
+            raise RuntimeError(f'فشل تشغيل الخادم في وضع {mode}')
+        time.sleep(0.5)
+
+        baseline = process_status(server.pid)
+        url = f'ws://127.0.0.1:{port}/socket.io/?EIO=4&transport=websocket'
+        connect_latency = Histogram()
+        clients = []
+        failed = 0
+
+        started = time.perf_counter()
+        for i in range(connections):
+            connect_started = time.perf_counter()
+            try:
+                ws = simple_websocket.Client.connect(url)
+                ws.receive(timeout=10)  # حزمة open من engine.io
+                ws.send('40')
+                ws.receive(timeout=10)  # تأكيد اتصال Socket.IO
+                ws.send(f'42["join",{{"room":"R{i % rooms}"}}]')
+                if not receive_event(ws, 'joined', timeout=10):
+                    raise TimeoutError()
+            except Exception:
+                failed += 1
+                continue
+            connect_latency.observe(time.perf_counter() - connect_started)
+            clients.append(ws)
+        connect_time = time.perf_counter() - started
+
+        loaded = process_status(server.pid)
+
+        # بث رسالة واحدة لكل العملاء
+        broadcast_started = time.perf_counter()
+        delivered = 0
+        if clients:
+            clients[0].send('42["broadcast"]')
+            delivered = sum(1 for ws in clients if receive_event(ws, 'tick'))
+        broadcast_time = time.perf_counter() - broadcast_started
+
+        for ws in clients:
+            ws.close()
+
+        per_connection_kb = (loaded.get('VmRSS', 0) - baseline.get('VmRSS', 0)) / max(1, len(clients))
+        return {
+            'mode': mode,
+            'connected': len(clients),
+            'failed': failed,
+            'connect_time': connect_time,
+            'latency': connect_latency.to_dict(),
+            'rss_mb': loaded.get('VmRSS', 0) / 1024,
+            'per_connection_kb': per_connection_kb,
+            'threads': loaded.get('Threads', 0),
+            'delivered': delivered,
+            'broadcast_time': broadcast_time
+        }
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+def main():
+    """الدالة الرئيسية"""
+    parser = argparse.ArgumentParser(description='قياس توسع الاتصالات حسب وضع التزامن')
+    parser.add_argument('--connections', type=int, default=500, help='عدد الاتصالات المتزامنة')
+    parser.add_argument('--rooms', type=int, default=50, help='عدد الغرف')
+    parser.add_argument('--modes', default='threading,eventlet,gevent', help='الأوضاع مفصولة بفواصل')
+    parser.add_argument('--port', type=int, default=5055, help='منفذ الخادم')
+    parser.add_argument('--serve', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port)
+        return
+
+    from async_mode import is_available
+
+    results = []
+    for mode in args.modes.split(','):
+        mode = mode.strip()
+        if not is_available(mode):
+            print(f"⚠️ {mode} غير مثبت - تخطي")
+            continue
+        print(f"🔌 {mode}: فتح {args.connections} اتصال...")
+        results.append(run_mode(mode, args.port, args.connections, args.rooms))
+
+    print("=" * 60)
+    for result in results:
+        latency = result['latency']
+        print(f"[{result['mode']}] متصل {result['connected']} | فشل {result['failed']} | "
+              f"زمن الاتصال الكلي {result['connect_time']:.2f} s")
+        print(f"    الاتصال: p50 ≤ {latency['p50'] * 1000:.0f} ms | p99 ≤ {latency['p99'] * 1000:.0f} ms")
+        print(f"    ذاكرة الخادم {result['rss_mb']:.1f} MB ({result['per_connection_kb']:.1f} KB لكل اتصال) | "
+              f"خيوط النظام {result['threads']}")
+        print(f"    البث: وصل {result['delivered']}/{result['connected']} في {result['broadcast_time'] * 1000:.1f} ms")
+    print("=" * 60)
+
+if __name__ == '__main__':
+    main()
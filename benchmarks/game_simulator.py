@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+محاكي ألعاب بدون متصفح
+Headless Game Simulator
+
+يشغل ألعاباً كاملة عبر المحرك نفسه بدون WebSocket: الغرف تنشأ وتملأ عبر
+RoomManager، واللعبة تبدأ بـ GameManager.start_game، ولاعبون آليون يصوتون
+ويقدمون أعمال الليل عبر GameManager.cast_vote و submit_action (وهما يمران
+بـ VotingManager و PhaseManager كما في معالجات الأحداث). مدد المراحل مضغوطة،
+والمحاكي يقوم بدور مشرف الغرفة: يغلق التصويت ويعدم صاحب الأغلبية ويبدأ الليل.
+
+يطبع الألعاب في الثانية، وزمن انتقال كل مرحلة (المئينات)، وعدد عبارات SQL
+لكل لعبة، وأقصى ذاكرة. يخرج برمز 1 إذا فشلت ألعاب أو تجاوزت عبارات SQL
+الحد --max-statements-per-game (لاكتشاف التراجعات).
+
+الاستخدام:
+    python benchmarks/game_simulator.py --games 200 --concurrency 20 --players 8
+    python benchmarks/game_simulator.py --database-url mysql+pymysql://... --games 1000
+"""
+
+import argparse
+import contextlib
+import itertools
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import event
+
+from game import GameManager, RoomManager
+from game.phase_manager import PhaseManager
+from game.timer_wheel import get_timer_wheel
+from models import db, User
+from models.game import GamePhase, WinCondition
+from models.game_log import log_writer
+from models.player import DeathCause, PlayerRole
+from monitoring.metrics import Histogram
+
+# أعمال الليل لكل دور
+NIGHT_ACTIONS = {
+    PlayerRole.MAFIA: 'kill',
+    PlayerRole.DOCTOR: 'heal',
+    PlayerRole.DETECTIVE: 'investigate',
+    PlayerRole.VIGILANTE: 'vigilante_kill'
+}
+
+class StatementCounter:
+    """عدد عبارات SQL في كل الخيوط"""
+
+    def __init__(self, engine):
+        self._counter = itertools.count()
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count = next(self._counter) + 1
+
+class SimulatedGame:
+    """لعبة واحدة يقودها لاعبون آليون"""
+
+    def __init__(self, simulator: 'Simulator', room_id: int):
+        self.simulator = simulator
+        self.room_id = room_id
+        self.session = None
+        self.outcome: Optional[str] = None
+        self.started_at = time.perf_counter()
+
+    def attach(self, session):
+        """ربط جلسة اللعبة وقياس انتقال المراحل"""
+        self.session = session
+        session.add_event_listener('phase_change', self._on_phase_change)
+        session.add_event_listener('game_end', self._on_game_end)
+
+        phase_manager = session.phase_manager
+        start_phase = phase_manager.start_phase
+        latency = self.simulator.phase_latency
+
+        def timed_start_phase(phase, duration=None, **kwargs):
+            started = time.perf_counter()
+            try:
+                return start_phase(phase, duration, **kwargs)
+            finally:
+                latency[phase.value].observe(time.perf_counter() - started)
+
+        # الاستدعاءات الداخلية (self.start_phase) تمر بالنسخة المقاسة أيضاً
+        phase_manager.start_phase = timed_start_phase
+
+    # ==================== الأحداث ====================
+
+    def _on_phase_change(self, session, phase: GamePhase, duration, **kwargs):
+        simulator = self.simulator
+        if not session.is_active:
+            return
+        if phase == GamePhase.DAY and session.current_round > simulator.max_rounds:
+            simulator.later(0, self._abort)
+        elif phase == GamePhase.VOTING:
+            simulator.later(simulator.think_time(), self._vote)
+            simulator.later(simulator.phase_seconds, self._close_voting)
+        elif phase == GamePhase.NIGHT:
+            simulator.later(simulator.think_time(), self._night_actions)
+
+    def _on_game_end(self, session, winner: WinCondition, team: Optional[str]):
+        self.outcome = winner.value
+        self.simulator.finish(self)
+
+    # ==================== اللاعبون الآليون ====================
+
+    def _alive(self):
+        return self.session.state.get_alive_players()
+
+    def _vote(self):
+        """كل لاعب حي يصوت؛ المافيا تتفق على مواطن والباقون يتبعون متهماً عشوائياً"""
+        alive = self._alive()
+        if len(alive) < 2:
+            return
+        citizens = [p for p in alive if p.role != PlayerRole.MAFIA]
+        mafia_target = random.choice(citizens) if citizens else random.choice(alive)
+        suspect = random.choice(alive)
+
+        for player in alive:
+            target = mafia_target if player.role == PlayerRole.MAFIA else suspect
+            if target.id == player.id or random.random() < 0.2:
+                target = random.choice([p for p in alive if p.id != player.id])
+            self.simulator.timed('vote', self.simulator.game_manager.cast_vote,
+                                 self.room_id, player.id, target.id)
+
+    def _close_voting(self):
+        """دور المشرف: إغلاق التصويت وتنفيذ الإعدام وبدء الليل"""
+        session = self.session
+        if not session.is_active:
+            return
+        success, _, result = session.voting_manager.complete_voting(self.room_id)
+        if success and result and result.get('eliminated_player_id'):
+            session.state.kill_player(result['eliminated_player_id'], DeathCause.LYNCH)
+        session.phase_manager.start_phase(GamePhase.NIGHT)
+
+    def _night_actions(self):
+        """كل دور خاص يختار هدفاً حياً"""
+        alive = self._alive()
+        for player in alive:
+            action = NIGHT_ACTIONS.get(player.role)
+            if not action:
+                continue
+            if action == 'heal':
+                targets = [p for p in alive if p.id != player.id]
+            elif action == 'kill':
+                targets = [p for p in alive if p.role != PlayerRole.MAFIA]
+            else:
+                targets = [p for p in alive if p.id != player.id]
+            if targets:
+                self.simulator.timed('action', self.simulator.game_manager.submit_action,
+                                     self.room_id, player.id, action, random.choice(targets).id)
+
+    def _abort(self):
+        """إنهاء لعبة تجاوزت الحد الأقصى للجولات"""
+        self.simulator.game_manager.end_game(self.room_id, "تجاوزت الحد الأقصى للجولات")
+
+class Simulator:
+    """تشغيل ألعاب متزامنة وجمع القياسات"""
+
+    def __init__(self, app: Flask, players: int, phase_seconds: float, max_rounds: int):
+        self.app = app
+        self.players = players
+        self.phase_seconds = phase_seconds
+        self.max_rounds = max_rounds
+
+        self.room_manager = RoomManager()
+        self.game_manager = GameManager(app)
+        self.wheel = get_timer_wheel()
+
+        self.phase_latency: Dict[str, Histogram] = defaultdict(Histogram)
+        self.call_latency: Dict[str, Histogram] = defaultdict(Histogram)
+        self.game_duration = Histogram((0.5, 1, 2, 5, 10, 20, 30, 60, 120))
+        self.outcomes: Dict[str, int] = defaultdict(int)
+        self.failed = 0
+        self.errors = 0
+        self._done = threading.Semaphore(0)
+        self._users = iter(())
+
+    def prepare_users(self, count: int):
+        """إنشاء المستخدمين مسبقاً (خارج القياس)"""
+        base = User.query.count()
+        users = []
+        for i in range(count):
+            user = User(f'bot{base + i}', f'بوت {base + i}')
+            user.password_hash = '-'
+            users.append(user)
+        db.session.add_all(users)
+        db.session.commit()
+        self._users = iter([user.id for user in users])
+
+    def think_time(self) -> float:
+        """تأخير عشوائي قبل أعمال اللاعبين داخل المرحلة"""
+        return random.uniform(0.1, 0.5) * self.phase_seconds
+
+    def later(self, delay: float, callback):
+        """تنفيذ في عجلة المؤقتات داخل سياق التطبيق"""
+        def run():
+            try:
+                with self.app.app_context():
+                    callback()
+            except Exception as e:
+                self.errors += 1
+                print(f"⚠️ خطأ في اللاعب الآلي: {e}", file=sys.__stderr__)
+        self.wheel.schedule(delay, run)
+
+    def timed(self, name: str, func, *args, **kwargs):
+        """استدعاء مع قياس الزمن"""
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.call_latency[name].observe(time.perf_counter() - started)
+
+    def start_game(self) -> bool:
+        """إنشاء غرفة وملؤها وبدء اللعبة"""
+        user_ids = [next(self._users) for _ in range(self.players)]
+        success, message, room = self.timed(
+            'create_room', self.room_manager.create_room,
+            user_ids[0], 'غرفة محاكاة', max_players=self.players
+        )
+        if not success:
+            print(f"⚠️ فشل إنشاء الغرفة: {message}", file=sys.__stderr__)
+            return False
+
+        for user_id in user_ids[1:]:
+            self.timed('join_room', self.room_manager.join_room, user_id, room.room_code)
+
+        game = SimulatedGame(self, room.id)
+        success, message, _ = self.timed('start_game', self.game_manager.start_game, room.id)
+        session = self.game_manager.get_game_session(room.id)
+        if not success or session is None:
+            print(f"⚠️ فشل بدء اللعبة: {message}", file=sys.__stderr__)
+            return False
+
+        game.attach(session)
+        return True
+
+    def finish(self, game: SimulatedGame):
+        """تسجيل نهاية لعبة"""
+        self.game_duration.observe(time.perf_counter() - game.started_at)
+        self.outcomes[game.outcome] += 1
+        self._done.release()
+
+    def run(self, games: int, concurrency: int, timeout: float) -> int:
+        """تشغيل games لعبة، concurrency منها في نفس الوقت (عدد المكتملة)"""
+        running = 0
+        started = 0
+        completed = 0
+        deadline = time.monotonic() + timeout
+
+        while completed + self.failed < games and time.monotonic() < deadline:
+            while running < concurrency and started < games:
+                started += 1
+                with self.app.app_context():
+                    if self.start_game():
+                        running += 1
+                    else:
+                        self.failed += 1
+
+            if running and self._done.acquire(timeout=0.5):
+                running -= 1
+                completed += 1
+                if completed % 50 == 0:
+                    with self.app.app_context():
+                        self.game_manager.cleanup_finished_games()
+            elif not running:
+                break
+
+        self.failed += games - completed - self.failed
+        return completed
+
+def create_simulation_app(database_url: Optional[str]) -> Flask:
+    """تطبيق Flask صغير بقاعدة البيانات والكاتب الخلفي للسجلات فقط"""
+    app = Flask(__name__)
+    if not database_url:
+        database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'simulation.db')}"
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    app.config['SECRET_KEY'] = 'simulation'
+    db.init_app(app)
+    log_writer.init_app(app)
+    with app.app_context():
+        db.create_all()
+    return app
+
+def format_histogram(histogram: Histogram) -> str:
+    data = histogram.to_dict()
+    return (f"n={data['count']} | متوسط {data['mean'] * 1000:.1f} ms | p50 ≤ {data['p50'] * 1000:.0f} ms | "
+            f"p90 ≤ {data['p90'] * 1000:.0f} ms | p99 ≤ {data['p99'] * 1000:.0f} ms | أقصى {data['max'] * 1000:.1f} ms")
+
+def main():
+    """الدالة الرئيسية"""
+    parser = argparse.ArgumentParser(description='محاكي ألعاب بدون متصفح')
+    parser.add_argument('--games', type=int, default=100, help='عدد الألعاب')
+    parser.add_argument('--concurrency', type=int, default=10, help='الألعاب المتزامنة')
+    parser.add_argument('--players', type=int, default=8, help='اللاعبون في كل لعبة')
+    parser.add_argument('--phase-seconds', type=float, default=0.2, help='مدة النهار والتصويت والليل بالثواني')
+    parser.add_argument('--max-rounds', type=int, default=10, help='إلغاء اللعبة بعد هذا العدد من الجولات')
+    parser.add_argument('--timeout', type=float, default=600, help='أقصى زمن للتشغيل بالثواني')
+    parser.add_argument('--database-url', help='قاعدة البيانات (افتراضياً SQLite مؤقتة)')
+    parser.add_argument('--max-statements-per-game', type=float, help='الخروج برمز 1 عند تجاوز هذا الحد')
+    parser.add_argument('--seed', type=int, help='بذرة العشوائية')
+    parser.add_argument('--verbose', action='store_true', help='إظهار مخرجات المحرك')
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    # مدد مضغوطة؛ التصويت بدون مؤقت لأن المحاكي يغلقه كمشرف
+    PhaseManager.DEFAULT_PHASE_DURATIONS = {
+        GamePhase.DAY: args.phase_seconds,
+        GamePhase.VOTING: 0,
+        GamePhase.NIGHT: args.phase_seconds,
+        GamePhase.TRIAL: args.phase_seconds
+    }
+
+    app = create_simulation_app(args.database_url)
+    with app.app_context():
+        simulator = Simulator(app, args.players, args.phase_seconds, args.max_rounds)
+        simulator.prepare_users(args.games * args.players)
+        statements = StatementCounter(db.engine)
+
+    print(f"🎮 محاكاة {args.games} لعبة ({args.concurrency} متزامنة، {args.players} لاعبين، "
+          f"مراحل {args.phase_seconds} ث)...")
+    statements_before = statements.count
+    output = sys.stdout if args.verbose else open(os.devnull, 'w')
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(output):
+        completed = simulator.run(args.games, args.concurrency, args.timeout)
+        log_writer.flush()
+    elapsed = time.perf_counter() - started
+    total_statements = statements.count - statements_before
+
+    per_game = total_statements / completed if completed else 0.0
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    print("=" * 60)
+    print(f"الألعاب: مكتملة {completed} | فاشلة {simulator.failed} | أخطاء اللاعبين الآليين {simulator.errors}")
+    print(f"النتائج: {dict(simulator.outcomes)}")
+    print(f"الإنتاجية: {completed / elapsed:.2f} لعبة/ث في {elapsed:.1f} s")
+    print(f"مدة اللعبة: {format_histogram(simulator.game_duration)}")
+    print("انتقال المراحل (start_phase مع الكتابة لقاعدة البيانات):")
+    for phase, histogram in sorted(simulator.phase_latency.items()):
+        print(f"    {phase:<8} {format_histogram(histogram)}")
+    print("العمليات:")
+    for name, histogram in sorted(simulator.call_latency.items()):
+        print(f"    {name:<12} {format_histogram(histogram)}")
+    lateness = simulator.wheel.get_statistics()['lateness_seconds']
+    print(f"تأخر المؤقتات: p99 ≤ {lateness['p99'] * 1000:.0f} ms | أقصى {lateness['max'] * 1000:.1f} ms")
+    print(f"عبارات SQL: {total_statements} ({per_game:.1f} لكل لعبة)")
+    print(f"أقصى ذاكرة: {peak_rss_mb:.1f} MB")
+    print("=" * 60)
+
+    simulator.wheel.stop()
+    log_writer.stop()
+
+    if simulator.failed:
+        sys.exit(1)
+    if args.max_statements_per_game is not None and per_game > args.max_statements_per_game:
+        print(f"❌ عبارات SQL لكل لعبة {per_game:.1f} تتجاوز الحد {args.max_statements_per_game}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
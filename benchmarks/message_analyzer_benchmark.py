@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+قياس أداء محلل الرسائل
+Message Analyzer Benchmark
+
+يقارن فحص الأنماط والمشاعر بالطريقة القديمة (re.search لكل نمط وبحث
+خطي في قوائم الكلمات) بالمطابق المترجم مسبقاً، ويطبع عدد الرسائل في الثانية
+وعدد الرسائل التي لم تكتشفها الطريقة القديمة بسبب التشكيل أو الهمزات.
+التحليل محلي فقط (بدون OpenAI).
+
+الاستخدام:
+    python benchmarks/message_analyzer_benchmark.py --messages 20000
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai.message_analyzer import MessageAnalyzer
+from ai.pattern_matcher import normalize_arabic
+
+SAMPLE_MESSAGES = [
+    'مرحباً بالجميع، من تظنون أنه المافيا؟',
+    'أنا مواطن بريء صدقوني',
+    'أنا من المافيا ولن أكذب عليكم',
+    'تعالوا على الواتساب نتكلم',
+    'هذه لعبة غبية لن ألعب',
+    'صوتوا ضد أحمد لأنه مافيا',
+    'رأيي أن سارة تتصرف بشكل غريب اليوم',
+    'جيد، أنا موافق على التصويت',
+    'I think the doctor should protect me tonight',
+    'أنَا مَافِيَا',  # مع التشكيل
+    'سيء جداً، هذا خطأ واضح!!!!',
+    'لا تصوتوا ضدي أرجوكم',
+]
+
+def legacy_scan(analyzer: MessageAnalyzer, content: str):
+    """الفحص القديم: re.search لكل نمط وبحث خطي في قوائم الكلمات"""
+    content_lower = content.lower()
+    detected_patterns = []
+    flags = []
+    suspicion_score = 0.0
+
+    for category, patterns in analyzer.suspicious_patterns.items():
+        for pattern in patterns:
+            if re.search(pattern, content_lower, re.IGNORECASE):
+                severity_score = analyzer._get_pattern_severity(category)
+                detected_patterns.append({'category': category, 'pattern': pattern, 'severity': severity_score})
+                suspicion_score += severity_score
+                flags.append({
+                    'type': category,
+                    'reason': analyzer._get_pattern_reason(category),
+                    'severity': severity_score
+                })
+
+    positive_count = sum(1 for word in analyzer.positive_words if word in content_lower)
+    negative_count = sum(1 for word in analyzer.negative_words if word in content_lower)
+    return detected_patterns, flags, min(suspicion_score, 1.0), positive_count, negative_count
+
+def compiled_scan(analyzer: MessageAnalyzer, content: str):
+    """الفحص الجديد: أنماط مترجمة على النص المطبّع"""
+    normalized = normalize_arabic(content)
+    analyzer._analyze_patterns(content, normalized)
+    analyzer._analyze_sentiment(content, normalized)
+
+def run(label: str, func, analyzer: MessageAnalyzer, messages):
+    """تشغيل قياس واحد"""
+    started = time.perf_counter()
+    for message in messages:
+        func(analyzer, message)
+    elapsed = time.perf_counter() - started
+    rate = len(messages) / elapsed
+    print(f"{label:<12} {elapsed * 1000:9.1f} ms | {rate:12,.0f} رسالة/ثانية")
+    return rate
+
+def main():
+    """الدالة الرئيسية"""
+    parser = argparse.ArgumentParser(description='قياس أداء محلل الرسائل')
+    parser.add_argument('--messages', type=int, default=20000, help='عدد الرسائل')
+    parser.add_argument('--seed', type=int, default=42, help='بذرة العشوائية')
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    messages = [random.choice(SAMPLE_MESSAGES) for _ in range(args.messages)]
+
+    started = time.perf_counter()
+    analyzer = MessageAnalyzer()
+    build_time = time.perf_counter() - started
+
+    print("=" * 60)
+    print(f"الرسائل: {args.messages} | الأنماط المترجمة: {analyzer.pattern_matcher.pattern_count} "
+          f"| زمن البناء: {build_time * 1000:.2f} ms")
+
+    legacy_rate = run('القديم', legacy_scan, analyzer, messages)
+    compiled_rate = run('المترجم', compiled_scan, analyzer, messages)
+
+    print(f"التسريع: {compiled_rate / legacy_rate:.2f}x")
+
+    # الرسائل التي يكتشفها التطبيع فقط
+    missed = [
+        message for message in SAMPLE_MESSAGES
+        if not legacy_scan(analyzer, message)[0] and analyzer._analyze_patterns(message)['detected_patterns']
+    ]
+    print(f"رسائل نموذجية يكتشفها التطبيع فقط: {len(missed)} / {len(SAMPLE_MESSAGES)}")
+    print("=" * 60)
+
+if __name__ == '__main__':
+    main()
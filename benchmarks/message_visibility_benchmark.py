@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+قياس استعلامات تحويل صفحة رسائل
+Message Visibility Query Count Benchmark
+
+ينشئ غرفة في قاعدة SQLite مؤقتة فيها لاعبون (بعضهم مافيا) ورسائل مختلطة
+(نصية، خاصة، مخفية، عمل في اللعبة من المافيا وغيرهم)، ثم يحول صفحة لكل
+مشاهد بالطريقة القديمة (to_dict لكل رسالة باستعلامات المافيا لكل رسالة)
+وبـ MessageVisibility.serialize، ويطبع عدد استعلامات SQL لكل منهما.
+ينتهي برمز خطأ إذا اختلفت النتيجة أو تجاوزت الطريقة الجديدة --max-queries.
+اختبار الرجوع الذي يشغله pytest في tests/test_message_visibility.py.
+
+الاستخدام:
+    python benchmarks/message_visibility_benchmark.py --messages 50 --max-queries 3
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from models import db, User, Room, Player, Message
+from models.message import MessageStatus, MessageType
+from models.message_visibility import MessageVisibility
+from models.player import PlayerRole
+from monitoring.query_counter import count_queries
+
+def legacy_can_see(message: Message, user_id):
+    """قواعد الرؤية القديمة: استعلام للمشاهد واستعلام للمرسل لكل رسالة عمل"""
+    if message.status == MessageStatus.DELETED:
+        return False
+    if message.message_type == MessageType.SYSTEM:
+        return True
+    if message.status == MessageStatus.HIDDEN:
+        return message.user_id == user_id
+    if message.message_type == MessageType.PRIVATE:
+        return user_id in [message.user_id, message.get_metadata().get('target_user_id')]
+    if message.message_type == MessageType.GAME_ACTION:
+        player = Player.query.filter_by(user_id=user_id, room_id=message.room_id).first()
+        if message.is_from_mafia():
+            return bool(player and player.role == PlayerRole.MAFIA)
+    return True
+
+def legacy_page(messages, viewer_user_id):
+    """الطريقة القديمة: can_be_seen_by مرتين لكل رسالة وتحميل المرسل لكل رسالة"""
+    page = []
+    for message in messages:
+        if not legacy_can_see(message, viewer_user_id):
+            continue
+        data = message.to_dict(viewer_user_id, visible=legacy_can_see(message, viewer_user_id))
+        page.append(data)
+    return page
+
+def create_room(players: int, mafia: int, messages: int):
+    """إنشاء غرفة برسائل مختلطة وإرجاع معرفها ومعرفات اللاعبين"""
+    users = [User(f'user{i}', f'لاعب {i}') for i in range(players)]
+    for user in users:
+        user.password_hash = '-'  # بدون تكلفة تشفير كلمة المرور
+    db.session.add_all(users)
+    db.session.flush()
+
+    room = Room('غرفة القياس', users[0].id)
+    db.session.add(room)
+    db.session.flush()
+
+    for i, user in enumerate(users):
+        role = PlayerRole.MAFIA if i < mafia else PlayerRole.CITIZEN
+        db.session.add(Player(user.id, room.id, role=role))
+
+    for i in range(messages):
+        sender = random.choice(users)
+        kind = random.random()
+        if kind < 0.3:
+            message = Message(room.id, f'عمل {i}', sender.id, MessageType.GAME_ACTION)
+        elif kind < 0.4:
+            target = random.choice(users)
+            message = Message(room.id, f'خاصة {i}', sender.id, MessageType.PRIVATE)
+            message.set_metadata({'target_user_id': target.id})
+        elif kind < 0.45:
+            message = Message(room.id, f'نظام {i}', None, MessageType.SYSTEM)
+        else:
+            message = Message(room.id, f'رسالة {i}', sender.id)
+            if kind > 0.95:
+                message.status = MessageStatus.HIDDEN
+        db.session.add(message)
+
+    db.session.commit()
+    return room.id, [user.id for user in users]
+
+def load_page(room_id: int, limit: int):
+    """تحميل صفحة بجلسة نظيفة حتى لا تستفيد الطريقتان من ذاكرة الجلسة"""
+    db.session.expunge_all()
+    return Message.query.filter_by(room_id=room_id).order_by(Message.sent_at.desc(), Message.id.desc()).limit(limit).all()
+
+def main():
+    """الدالة الرئيسية"""
+    parser = argparse.ArgumentParser(description='قياس استعلامات تحويل صفحة رسائل')
+    parser.add_argument('--players', type=int, default=10, help='عدد اللاعبين')
+    parser.add_argument('--mafia', type=int, default=3, help='عدد المافيا')
+    parser.add_argument('--messages', type=int, default=50, help='عدد رسائل الصفحة')
+    parser.add_argument('--max-queries', type=int, default=3, help='الحد الأقصى لاستعلامات الطريقة الجديدة')
+    parser.add_argument('--seed', type=int, default=1, help='بذرة التوليد العشوائي')
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    directory = tempfile.mkdtemp(prefix='message_visibility_')
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+    db.init_app(app)
+
+    failed = False
+    try:
+        with app.app_context():
+            db.create_all()
+            room_id, user_ids = create_room(args.players, args.mafia, args.messages)
+
+            print("=" * 60)
+            print(f"الرسائل: {args.messages} | اللاعبون: {args.players} | المافيا: {args.mafia}")
+
+            for viewer_user_id in (user_ids[0], user_ids[-1], None):
+                with count_queries() as counter:
+                    legacy = legacy_page(load_page(room_id, args.messages), viewer_user_id)
+                legacy_queries = counter.count - 1  # بدون استعلام الصفحة
+
+                with count_queries() as counter:
+                    page = MessageVisibility(room_id, viewer_user_id).serialize(load_page(room_id, args.messages))
+                queries = counter.count - 1
+
+                same = legacy == page
+                print(f"المشاهد {viewer_user_id}: قديم {legacy_queries} استعلام | "
+                      f"جديد {queries} استعلام | رسائل مرئية {len(page)} | "
+                      f"{'متطابق' if same else 'مختلف'}")
+                failed |= not same or queries > args.max_queries
+
+            print("=" * 60)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    if failed:
+        print(f"❌ النتيجة مختلفة أو الاستعلامات أكثر من {args.max_queries}")
+        sys.exit(1)
+    print("✅ عدد الاستعلامات ضمن الحد")
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
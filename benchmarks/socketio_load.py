@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبار حمل Socket.IO بلاعبين متزامنين
+Socket.IO Load Test
+
+كل لاعب آلي عميل python-socketio حقيقي: يسجل الدخول عبر /api/auth/login
+(بعد التسجيل إن لم يكن موجوداً)، وينضم لغرفته بحدث join_room، ويرسل رسائل
+send_message، ويصوت بـ cast_vote، وينقطع ويعيد الاتصال عشوائياً (--churn).
+منشئ كل غرفة يبدأ اللعبة ويبدل بين النهار والتصويت بحدث phase_change.
+
+زمن الوصول من الإرسال إلى الاستقبال يقاس عند كل مستقبل في الغرفة لأحداث
+new_message و vote_update و phase_changed (كل العملاء في نفس العملية فالساعة
+مشتركة)، مع زمن تسجيل الدخول والاتصال وإعادة الاتصال، والأخطاء وعدد الاتصالات.
+
+بدون --url يشغل الخادم (create_app) في عملية فرعية بقاعدة SQLite مؤقتة وبدون
+مفتاح OpenAI. --url يقبل العناوين المحلية فقط.
+
+الاستخدام:
+    python benchmarks/socketio_load.py --rooms 25 --players 8 --duration 60
+    python benchmarks/socketio_load.py --url http://127.0.0.1:5000 --rooms 250 --churn 0.01
+"""
+
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+# قبل إضافة جذر المشروع: حزمة websocket المحلية تحجب websocket-client
+import engineio.client
+import requests
+import socketio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LOCAL_HOSTS = ('127.0.0.1', 'localhost', '::1')
+
+# بادئة رسائل الحمل (يليها وقت الإرسال)
+MESSAGE_PREFIX = 'حمل '
+
+PASSWORD = 'load-test'
+
+def serve(port: int, database_path: str):
+    """خادم اللعبة الكامل (يعمل في عملية فرعية)"""
+    # قبل استيراد الإعدادات: load_dotenv لا يستبدل المتغيرات الموجودة
+    os.environ['OPENAI_API_KEY'] = ''
+    os.environ['DATABASE_TYPE'] = 'sqlite'
+    os.environ['DATABASE_URL'] = f'sqlite:///{database_path}'
+
+    from app import create_app
+    app, socketio_server = create_app('development')
+    socketio_server.run(app, host='127.0.0.1', port=port, debug=False, use_reloader=False,
+                        log_output=False, allow_unsafe_werkzeug=True)
+
+def wait_for_server(url: str, timeout: float = 60) -> bool:
+    """انتظار استجابة /health"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f'{url}/health', timeout=2).status_code == 200:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    return False
+
+class LatencySamples:
+    """كل أزمنة الوصول كما هي: المئينات دقيقة وليست حدود حاويات
+
+    عدد العينات في تشغيل واحد (عشرات الآلاف) صغير بما يكفي لحفظها كلها.
+    """
+
+    def __init__(self):
+        self.samples: List[float] = []
+
+    def observe(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, percent: float) -> float:
+        """المئين بالاستيفاء الخطي بين أقرب عينتين مرتبتين"""
+        ordered = sorted(self.samples)
+        if not ordered:
+            return 0.0
+        position = (len(ordered) - 1) * percent / 100.0
+        lower = int(position)
+        upper = min(lower + 1, len(ordered) - 1)
+        return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+    def to_dict(self) -> Dict:
+        count = len(self.samples)
+        return {
+            'count': count,
+            'mean': sum(self.samples) / count if count else 0.0,
+            'max': max(self.samples, default=0.0),
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'p999': self.percentile(99.9)
+        }
+
+class LoadReport:
+    """قياسات مشتركة بين كل العملاء"""
+
+    def __init__(self):
+        self.latency: Dict[str, LatencySamples] = defaultdict(LatencySamples)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.counters: Dict[str, int] = defaultdict(int)
+        self.connected = 0
+        self.peak_connected = 0
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, seconds: float):
+        with self._lock:
+            self.latency[name].observe(seconds)
+
+    def error(self, kind: str):
+        with self._lock:
+            self.errors[kind] += 1
+
+    def count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def connection(self, delta: int):
+        with self._lock:
+            self.connected += delta
+            self.peak_connected = max(self.peak_connected, self.connected)
+
+class LoadClient:
+    """لاعب آلي بجلسة HTTP واتصال Socket.IO"""
+
+    def __init__(self, test: 'LoadTest', room: 'LoadRoom', username: str):
+        self.test = test
+        self.room = room
+        self.username = username
+        self.http = requests.Session()
+        self.sio: Optional[socketio.Client] = None
+        self.joined = threading.Event()
+        self._closing = False
+
+    def login(self):
+        """التسجيل (إن لم يكن موجوداً) ثم تسجيل الدخول"""
+        url = self.test.url
+        self.http.post(f'{url}/api/auth/register', json={
+            'username': self.username, 'display_name': self.username, 'password': PASSWORD
+        }, timeout=30)
+
+        started = time.perf_counter()
+        response = self.http.post(f'{url}/api/auth/login', json={
+            'username': self.username, 'password': PASSWORD
+        }, timeout=30)
+        if response.status_code != 200:
+            raise RuntimeError(f'فشل تسجيل الدخول: {response.status_code}')
+        self.test.report.observe('login', time.perf_counter() - started)
+
+        # بقايا تشغيل سابق على نفس الخادم
+        self.http.post(f'{url}/api/room/leave', timeout=30)
+
+    def connect(self, metric: str = 'connect'):
+        """فتح اتصال والانضمام لغرفة WebSocket"""
+        sio = socketio.Client(reconnection=False, http_session=self.http)
+        sio.on('room_joined', lambda data: self.joined.set())
+        sio.on('game_started', lambda data: self.room.started.set())
+        sio.on('new_message', self._on_new_message)
+        sio.on('vote_update', self._on_vote_update)
+        sio.on('phase_changed', self._on_phase_changed)
+        sio.on('error', self._on_error)
+        sio.on('disconnect', self._on_disconnect)
+
+        self.joined.clear()
+        self._closing = False
+        started = time.perf_counter()
+        sio.connect(self.test.url, transports=self.test.transports, wait_timeout=10)
+        self.test.report.connection(1)
+        sio.emit('join_room', {'room_code': self.room.room_code})
+        if not self.joined.wait(10):
+            self.close(sio)
+            raise TimeoutError('لم يصل room_joined')
+
+        self.test.report.observe(metric, time.perf_counter() - started)
+        self.sio = sio
+
+    def close(self, sio: Optional[socketio.Client] = None):
+        """قطع الاتصال عمداً"""
+        sio = sio or self.sio
+        self.sio = None
+        if sio is not None:
+            self._closing = True
+            sio.disconnect()
+
+    def reconnect(self):
+        """انقطاع وإعادة اتصال"""
+        self.close()
+        try:
+            self.connect('reconnect')
+            self.test.report.count('reconnects')
+        except Exception as e:
+            self.test.report.error(f'إعادة الاتصال: {type(e).__name__}')
+
+    def emit(self, event: str, data: Optional[Dict] = None) -> bool:
+        sio = self.sio
+        if sio is None:
+            return False
+        try:
+            sio.emit(event, data)
+            return True
+        except Exception as e:
+            self.test.report.error(f'{event}: {type(e).__name__}')
+            return False
+
+    # ==================== الأحداث ====================
+
+    def _on_new_message(self, data):
+        content = (data.get('message') or {}).get('content') or ''
+        if content.startswith(MESSAGE_PREFIX):
+            sent = float(content[len(MESSAGE_PREFIX):])
+            self.test.report.observe('new_message', time.perf_counter() - sent)
+
+    def _on_vote_update(self, data):
+        sent = self.room.vote_sent.get(data.get('voter_name'))
+        if sent is not None:
+            self.test.report.observe('vote_update', time.perf_counter() - sent)
+
+    def _on_phase_changed(self, data):
+        if self.room.phase_sent is not None:
+            self.test.report.observe('phase_changed', time.perf_counter() - self.room.phase_sent)
+        # التصويت بعد وصول إعلان المرحلة كما يفعل المتصفح
+        if data.get('phase') == 'voting':
+            self.room.vote(self)
+
+    def _on_error(self, data):
+        self.test.report.error((data or {}).get('message', 'error'))
+
+    def _on_disconnect(self):
+        self.test.report.connection(-1)
+        if not self._closing:
+            self.test.report.error('انقطاع غير متوقع')
+            self.sio = None
+
+class LoadRoom:
+    """غرفة لاعبين آليين يديرها منشئها"""
+
+    def __init__(self, test: 'LoadTest', index: int):
+        self.test = test
+        self.index = index
+        self.clients = [LoadClient(test, self, f'{test.user_prefix}{index}_{i}') for i in range(test.players)]
+        self.creator = self.clients[0]
+        self.room_code: Optional[str] = None
+        self.player_ids: List[int] = []
+        self.started = threading.Event()
+        self.vote_sent: Dict[str, float] = {}
+        self.phase_sent: Optional[float] = None
+        self.rng = random.Random(index)
+
+    def setup(self):
+        """إنشاء الغرفة وانضمام اللاعبين وبدء اللعبة"""
+        url = self.test.url
+        for client in self.clients:
+            client.login()
+
+        response = self.creator.http.post(f'{url}/api/room/create', json={
+            'name': f'غرفة حمل {self.index}',
+            'max_players': len(self.clients),
+            'min_players': 4
+        }, timeout=30)
+        if response.status_code != 201:
+            raise RuntimeError(f'فشل إنشاء الغرفة: {response.json().get("message")}')
+        self.room_code = response.json()['room']['room_code']
+
+        for client in self.clients:
+            client.connect()
+
+        room = self.creator.http.get(f'{url}/api/room/{self.room_code}', timeout=30).json()['room']
+        self.player_ids = [player['id'] for player in room['players']]
+
+        self.creator.emit('start_game')
+        if not self.started.wait(30):
+            raise TimeoutError('لم تبدأ اللعبة')
+
+    def run(self, deadline: float):
+        """تكرار النهار (دردشة) ثم التصويت حتى انتهاء المدة"""
+        test = self.test
+        while time.monotonic() < deadline:
+            day_end = min(deadline, time.monotonic() + test.day_seconds)
+            while time.monotonic() < day_end:
+                # كل لاعب يرسل رسالة كل chat_interval ثانية في المتوسط
+                pause = self.rng.expovariate(len(self.clients) / test.chat_interval)
+                time.sleep(min(pause, max(0.0, day_end - time.monotonic())))
+                client = self.rng.choice(self.clients)
+                if client.emit('send_message', {'content': f'{MESSAGE_PREFIX}{time.perf_counter():.6f}'}):
+                    test.report.count('messages')
+                self._churn(pause)
+
+            if time.monotonic() >= deadline:
+                break
+
+            self._change_phase('voting')
+            time.sleep(test.vote_seconds)
+            self._change_phase('day')
+
+    def vote(self, client: LoadClient):
+        """صوت اللاعب ضد لاعب عشوائي"""
+        self.vote_sent[client.username] = time.perf_counter()
+        if client.emit('cast_vote', {'target_id': random.choice(self.player_ids)}):
+            self.test.report.count('votes')
+
+    def _change_phase(self, phase: str):
+        self.phase_sent = time.perf_counter()
+        if self.creator.emit('phase_change', {'phase': phase, 'duration': 0}):
+            self.test.report.count('phase_changes')
+
+    def _churn(self, elapsed: float):
+        """إعادة اتصال عشوائية (والمنقطعون يحاولون العودة)"""
+        probability = self.test.churn * elapsed
+        for client in self.clients:
+            if client.sio is None or self.rng.random() < probability:
+                client.reconnect()
+
+    def close(self):
+        for client in self.clients:
+            client.close()
+
+class LoadTest:
+    """إعدادات الاختبار والقياسات"""
+
+    def __init__(self, args):
+        self.url = args.url.rstrip('/')
+        self.players = args.players
+        self.day_seconds = args.day_seconds
+        self.vote_seconds = args.vote_seconds
+        self.chat_interval = args.chat_interval
+        self.churn = args.churn
+        self.user_prefix = args.user_prefix
+        self.transports = args.transports.split(',')
+        self.report = LoadReport()
+
+    def run(self, rooms: int, duration: float, setup_concurrency: int) -> int:
+        """تجهيز الغرف ثم تشغيلها (عدد الغرف العاملة)"""
+        load_rooms = [LoadRoom(self, i) for i in range(rooms)]
+
+        def setup(room: LoadRoom) -> Optional[LoadRoom]:
+            try:
+                room.setup()
+                return room
+            except Exception as e:
+                self.report.error(f'تجهيز الغرفة: {e}')
+                room.close()
+                return None
+
+        print(f"🔌 تجهيز {rooms} غرفة ({rooms * self.players} لاعب)...")
+        started = time.perf_counter()
+        with ThreadPoolExecutor(setup_concurrency) as pool:
+            ready = [room for room in pool.map(setup, load_rooms) if room]
+        print(f"✅ {len(ready)}/{rooms} غرفة جاهزة في {time.perf_counter() - started:.1f} s - "
+              f"{self.report.connected} اتصال")
+
+        print(f"🎮 تشغيل لمدة {duration:.0f} s...")
+        deadline = time.monotonic() + duration
+        threads = [threading.Thread(target=room.run, args=(deadline,), daemon=True) for room in ready]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # مهلة قصيرة لوصول آخر الأحداث
+        time.sleep(1)
+        for room in load_rooms:
+            room.close()
+        return len(ready)
+
+def format_latency(latency: LatencySamples) -> str:
+    data = latency.to_dict()
+    return (f"n={data['count']} | متوسط {data['mean'] * 1000:.1f} ms | p50 {data['p50'] * 1000:.1f} ms | "
+            f"p90 {data['p90'] * 1000:.1f} ms | p99 {data['p99'] * 1000:.1f} ms | "
+            f"p99.9 {data['p999'] * 1000:.1f} ms | أقصى {data['max'] * 1000:.1f} ms")
+
+def main():
+    """الدالة الرئيسية"""
+    parser = argparse.ArgumentParser(description='اختبار حمل Socket.IO بلاعبين متزامنين')
+    parser.add_argument('--url', help='خادم محلي قائم (افتراضياً يشغل خادماً مؤقتاً)')
+    parser.add_argument('--port', type=int, default=5056, help='منفذ الخادم المؤقت')
+    parser.add_argument('--rooms', type=int, default=10, help='عدد الغرف')
+    parser.add_argument('--players', type=int, default=8, help='اللاعبون في كل غرفة')
+    parser.add_argument('--duration', type=float, default=30, help='مدة التشغيل بالثواني')
+    parser.add_argument('--day-seconds', type=float, default=5, help='مدة النهار (دردشة)')
+    parser.add_argument('--vote-seconds', type=float, default=2, help='مدة التصويت')
+    parser.add_argument('--chat-interval', type=float, default=5, help='متوسط الثواني بين رسائل كل لاعب')
+    parser.add_argument('--churn', type=float, default=0.0, help='احتمال إعادة الاتصال لكل لاعب في الثانية')
+    # websocket يحتاج حزمة websocket-client
+    default_transports = 'polling,websocket' if engineio.client.websocket else 'polling'
+    parser.add_argument('--transports', default=default_transports, help='وسائل النقل مفصولة بفواصل')
+    parser.add_argument('--setup-concurrency', type=int, default=8, help='الغرف التي تجهز معاً')
+    parser.add_argument('--user-prefix', default='load', help='بادئة أسماء المستخدمين')
+    parser.add_argument('--serve', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port, args.serve)
+        return
+
+    server = None
+    if args.url:
+        if urlparse(args.url).hostname not in LOCAL_HOSTS:
+            parser.error('--url يجب أن يكون خادماً محلياً')
+    else:
+        database_path = os.path.join(tempfile.mkdtemp(), 'load_test.db')
+        server = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), '--serve', database_path, '--port', str(args.port)],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        args.url = f'http://127.0.0.1:{args.port}'
+
+    try:
+        if not wait_for_server(args.url):
+            print(f"❌ الخادم لا يستجيب: {args.url}")
+            sys.exit(1)
+
+        test = LoadTest(args)
+        ready = test.run(args.rooms, args.duration, args.setup_concurrency)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+
+    report = test.report
+    print("=" * 60)
+    print(f"الغرف: {ready}/{args.rooms} | أقصى اتصالات {report.peak_connected} | "
+          f"إعادة اتصال {report.counters['reconnects']}")
+    print(f"المرسل: رسائل {report.counters['messages']} | أصوات {report.counters['votes']} | "
+          f"تغيير مراحل {report.counters['phase_changes']}")
+    print("زمن الوصول (من الإرسال إلى كل مستقبل):")
+    for name in ('new_message', 'vote_update', 'phase_changed'):
+        print(f"    {name:<14} {format_latency(report.latency[name])}")
+    print("الاتصال:")
+    for name in ('login', 'connect', 'reconnect'):
+        if name in report.latency:
+            print(f"    {name:<14} {format_latency(report.latency[name])}")
+    total_errors = sum(report.errors.values())
+    print(f"الأخطاء: {total_errors}")
+    for message, count in sorted(report.errors.items(), key=lambda item: -item[1])[:10]:
+        print(f"    {count:>6} × {message}")
+    print("=" * 60)
+
+    if ready < args.rooms:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
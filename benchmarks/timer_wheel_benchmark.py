@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+قياس أداء عجلة المؤقتات
+Timer Wheel Benchmark
+
+يحاكي آلاف الألعاب المتزامنة في عملية واحدة: كل لعبة تمر بسلسلة مراحل
+يقودها PhaseTimer، مع تمديد وإلغاء بعض المؤقتات، ثم يطبع عدد الخيوط
+وتأخر تنفيذ المؤقتات.
+
+الاستخدام:
+    python benchmarks/timer_wheel_benchmark.py --games 10000 --phases 3
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game.phase_manager import PhaseTimer
+from game.timer_wheel import get_timer_wheel
+
+class SimulatedGame:
+    """لعبة وهمية تنتقل بين المراحل عند انتهاء المؤقت"""
+
+    def __init__(self, phases: int, max_duration: int, done: threading.Semaphore):
+        self.remaining_phases = phases
+        self.max_duration = max_duration
+        self.done = done
+        self.timer = None
+        self._next_phase()
+
+    def _next_phase(self):
+        """بدء المرحلة التالية"""
+        if self.remaining_phases == 0:
+            self.done.release()
+            return
+
+        self.remaining_phases -= 1
+        self.timer = PhaseTimer(random.randint(1, self.max_duration), self._next_phase)
+
+def main():
+    """الدالة الرئيسية"""
+    parser = argparse.ArgumentParser(description='قياس أداء عجلة المؤقتات')
+    parser.add_argument('--games', type=int, default=10000, help='عدد الألعاب المتزامنة')
+    parser.add_argument('--phases', type=int, default=3, help='عدد المراحل لكل لعبة')
+    parser.add_argument('--max-duration', type=int, default=2, help='أقصى مدة للمرحلة بالثواني')
+    parser.add_argument('--extend-ratio', type=float, default=0.1, help='نسبة الألعاب التي يمدد مؤقتها')
+    args = parser.parse_args()
+
+    wheel = get_timer_wheel()
+    done = threading.Semaphore(0)
+    threads_before = threading.active_count()
+
+    print(f"⏱️ بدء {args.games} لعبة، {args.phases} مراحل لكل لعبة...")
+    started = time.perf_counter()
+
+    games = [SimulatedGame(args.phases, args.max_duration, done) for _ in range(args.games)]
+    schedule_time = time.perf_counter() - started
+
+    # تمديد بعض المؤقتات لقياس كلفة التمديد
+    extend_started = time.perf_counter()
+    extended = 0
+    for game in random.sample(games, int(len(games) * args.extend_ratio)):
+        game.timer.extend(1)
+        extended += 1
+    extend_time = time.perf_counter() - extend_started
+
+    peak_threads = threading.active_count()
+    peak_pending = wheel.get_statistics()['pending_timers']
+
+    completed = 0
+    while completed < len(games):
+        if done.acquire(timeout=0.05):
+            completed += 1
+        peak_threads = max(peak_threads, threading.active_count())
+    total_time = time.perf_counter() - started
+
+    stats = wheel.get_statistics()
+    lateness = stats['lateness_seconds']
+
+    print("=" * 60)
+    print(f"الألعاب: {args.games} | المؤقتات المنفذة: {stats['fired_total']}")
+    print(f"زمن الجدولة الأولى: {schedule_time * 1000:.1f} ms "
+          f"({schedule_time / args.games * 1e6:.2f} µs لكل مؤقت)")
+    print(f"زمن تمديد {extended} مؤقت: {extend_time * 1000:.1f} ms")
+    print(f"أقصى عدد مؤقتات معلقة: {peak_pending}")
+    print(f"الخيوط قبل/أثناء: {threads_before}/{peak_threads}")
+    print(f"التأخر: متوسط {lateness['mean'] * 1000:.1f} ms | p50 ≤ {lateness['p50'] * 1000:.0f} ms | "
+          f"p99 ≤ {lateness['p99'] * 1000:.0f} ms | أقصى {lateness['max'] * 1000:.1f} ms")
+    print(f"الزمن الكلي: {total_time:.2f} s")
+    print("=" * 60)
+
+    wheel.stop()
+
+if __name__ == '__main__':
+    main()
@@ -43,10 +43,43 @@ class Config:
     MAX_PLAYERS = int(os.environ.get('MAX_PLAYERS', 20))
     GAME_TIME_LIMIT = int(os.environ.get('GAME_TIME_LIMIT', 300))  # 5 دقائق
     VOTE_TIME_LIMIT = int(os.environ.get('VOTE_TIME_LIMIT', 60))   # دقيقة واحدة
+    LOCK_STRIPES = int(os.environ.get('LOCK_STRIPES', 64))  # شرائح أقفال الغرف في مدراء الألعاب والغرف
+    MEMBERSHIP_NEGATIVE_TTL = float(os.environ.get('MEMBERSHIP_NEGATIVE_TTL', 5.0))  # ثوانٍ لحفظ "ليس في غرفة"
+    # ثوانٍ قبل إعادة التحقق من عضوية معروفة (0 = بلا انتهاء؛ افتراضياً 10 مع عدة عمليات)
+    MEMBERSHIP_POSITIVE_TTL = float(os.environ.get(
+        'MEMBERSHIP_POSITIVE_TTL', 10.0 if os.environ.get('SOCKETIO_MESSAGE_QUEUE') else 0.0
+    ))
+    
+    # إعدادات كتابة سجلات اللعبة (دفعات مؤجلة)
+    GAME_LOG_BATCH_SIZE = int(os.environ.get('GAME_LOG_BATCH_SIZE', 200))
+    GAME_LOG_FLUSH_INTERVAL = float(os.environ.get('GAME_LOG_FLUSH_INTERVAL', 1.0))
+    GAME_LOG_QUEUE_SIZE = int(os.environ.get('GAME_LOG_QUEUE_SIZE', 10000))
+    GAME_LOG_MAX_RETRIES = int(os.environ.get('GAME_LOG_MAX_RETRIES', 3))  # لكل دفعة قبل إرجاعها للمخزن
+    GAME_LOG_MAX_REQUEUES = int(os.environ.get('GAME_LOG_MAX_REQUEUES', 3))  # مرات إرجاع الصف قبل عزله
+    GAME_LOG_RETRY_BACKOFF = float(os.environ.get('GAME_LOG_RETRY_BACKOFF', 0.2))  # ثوانٍ، تتضاعف مع كل محاولة
     
     # إعدادات الذكاء الاصطناعي
     OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
     
+    # خط الإشراف على الرسائل
+    MODERATION_WORKERS = int(os.environ.get('MODERATION_WORKERS', 4))
+    MODERATION_BATCH_SIZE = int(os.environ.get('MODERATION_BATCH_SIZE', 16))
+    MODERATION_MAX_QUEUE = int(os.environ.get('MODERATION_MAX_QUEUE', 2000))
+    MODERATION_REGEX_ONLY_DEPTH = int(os.environ.get('MODERATION_REGEX_ONLY_DEPTH', 200))  # بعدها بدون OpenAI
+    
+    # ذاكرة نتائج تحليل OpenAI
+    AI_CACHE_SIZE = int(os.environ.get('AI_CACHE_SIZE', 5000))
+    AI_CACHE_TTL = int(os.environ.get('AI_CACHE_TTL', 3600))            # ساعة
+    AI_CACHE_NEGATIVE_TTL = int(os.environ.get('AI_CACHE_NEGATIVE_TTL', 60))  # بعد فشل الاستدعاء
+    AI_CACHE_PATH = os.environ.get('AI_CACHE_PATH')  # ملف SQLite اختياري للحفظ الدائم
+    
+    # تحويل الرسائل الصوتية في الخلفية
+    SPEECH_TO_TEXT_BACKEND = os.environ.get('SPEECH_TO_TEXT_BACKEND', 'openai')  # openai / stub
+    TRANSCRIPTION_WORKERS = int(os.environ.get('TRANSCRIPTION_WORKERS', 2))
+    TRANSCRIPTION_MAX_PENDING = int(os.environ.get('TRANSCRIPTION_MAX_PENDING', 500))
+    TRANSCRIPTION_MAX_RETRIES = int(os.environ.get('TRANSCRIPTION_MAX_RETRIES', 3))
+    TRANSCRIPTION_RETRY_BACKOFF = float(os.environ.get('TRANSCRIPTION_RETRY_BACKOFF', 2.0))  # يتضاعف مع كل محاولة
+    
     # إعدادات الشبكة
     HOST = os.environ.get('HOST', '127.0.0.1')
     PORT = int(os.environ.get('PORT', 5000))
@@ -55,6 +88,49 @@ class Config:
     UPLOAD_FOLDER = 'uploads'
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB
     
+    # رفع الرسائل الصوتية على أجزاء
+    VOICE_CHUNK_SIZE = int(os.environ.get('VOICE_CHUNK_SIZE', 64 * 1024))  # أقل من max_http_buffer_size
+    VOICE_UPLOAD_IDLE_TIMEOUT = int(os.environ.get('VOICE_UPLOAD_IDLE_TIMEOUT', 60))  # حذف الرفع المتروك
+    VOICE_UPLOADS_PER_USER = int(os.environ.get('VOICE_UPLOADS_PER_USER', 2))
+    
+    # سجل الرسائل الأخيرة في الذاكرة
+    MESSAGE_HISTORY_SIZE = int(os.environ.get('MESSAGE_HISTORY_SIZE', 200))    # رسائل لكل غرفة
+    MESSAGE_HISTORY_ROOMS = int(os.environ.get('MESSAGE_HISTORY_ROOMS', 1000))  # أقصى عدد غرف في الذاكرة
+    # الذاكرة ترى كتابات عمليتها فقط: معطلة افتراضياً مع عدة عمليات (SOCKETIO_MESSAGE_QUEUE)
+    MESSAGE_HISTORY_ENABLED = os.environ.get(
+        'MESSAGE_HISTORY_ENABLED', 'False' if os.environ.get('SOCKETIO_MESSAGE_QUEUE') else 'True'
+    ).lower() == 'true'
+    
+    # عد استعلامات SQL لكل طلب (مفعل دائماً في التطوير والاختبار)
+    SQL_QUERY_COUNTING = os.environ.get('SQL_QUERY_COUNTING', 'False').lower() == 'true'
+    SQL_QUERY_WARNING_THRESHOLD = int(os.environ.get('SQL_QUERY_WARNING_THRESHOLD', 30))  # تحذير عند تجاوز هذا العدد
+    
+    # محلل الاستعلامات (/admin/sql-profile) - معطل افتراضياً
+    SQL_PROFILER_ENABLED = os.environ.get('SQL_PROFILER_ENABLED', 'False').lower() == 'true'
+    SQL_SLOW_QUERY_THRESHOLD = float(os.environ.get('SQL_SLOW_QUERY_THRESHOLD', 0.1))  # ثوانٍ
+    SQL_PROFILER_TOP_N = int(os.environ.get('SQL_PROFILER_TOP_N', 20))
+    SQL_N_PLUS_ONE_THRESHOLD = int(os.environ.get('SQL_N_PLUS_ONE_THRESHOLD', 10))  # تكرار نفس الاستعلام في طلب أو حدث واحد
+    
+    # لوحة المتصدرين المحسوبة مسبقاً
+    LEADERBOARD_CACHE_TTL = float(os.environ.get('LEADERBOARD_CACHE_TTL', 10))  # ثوانٍ
+    LEADERBOARD_PERIODIC_REBUILD = os.environ.get('LEADERBOARD_PERIODIC_REBUILD', 'False').lower() == 'true'  # مع مهام التنظيف كل ساعة (الافتراضي: flask rebuild-leaderboard عند الحاجة)
+    
+    # لقطة الإحصائيات لـ /health والصفحة الرئيسية
+    STATS_SNAPSHOT_INTERVAL = float(os.environ.get('STATS_SNAPSHOT_INTERVAL', 15))  # ثوانٍ بين التحديثات
+    QUICK_STATS_TTL = float(os.environ.get('QUICK_STATS_TTL', 30))  # ثوانٍ لإحصائيات لوحة التحكم
+    
+    # مقاييس Prometheus على /metrics
+    SOCKET_METRICS_ENABLED = os.environ.get('SOCKET_METRICS_ENABLED', 'True').lower() == 'true'  # زمن وأخطاء كل حدث Socket.IO
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # إن عين: Authorization: Bearer <token>
+    
+    # التوسع على عدة عمليات
+    SOCKETIO_ASYNC_MODE = os.environ.get('SOCKETIO_ASYNC_MODE', 'threading')  # threading أو eventlet أو gevent
+    SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE')  # redis://... أو local:///tmp/mafia-socketio.sock
+    SOCKETIO_CHANNEL = os.environ.get('SOCKETIO_CHANNEL', 'flask-socketio')
+    SOCKETIO_BROKER_KEY = os.environ.get('SOCKETIO_BROKER_KEY')  # مفتاح مصادقة الوسيط المحلي (إلزامي مع local://)
+    WORKER_INDEX = int(os.environ.get('WORKER_INDEX', 0))  # رقم هذه العملية
+    WORKER_COUNT = int(os.environ.get('WORKER_COUNT', 1))  # عدد العمليات (الغرف توزع بتجزئة رمزها)
+    
     # إعدادات الأمان
     WTF_CSRF_ENABLED = True
     WTF_CSRF_TIME_LIMIT = None
@@ -67,6 +143,7 @@ class DevelopmentConfig(Config):
     """إعدادات التطوير"""
     DEBUG = True
     TESTING = False
+    SQL_QUERY_COUNTING = True
 
 class ProductionConfig(Config):
     """إعدادات الإنتاج"""
@@ -77,6 +154,7 @@ class TestingConfig(Config):
     """إعدادات الاختبار"""
     DEBUG = True
     TESTING = True
+    SQL_QUERY_COUNTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     WTF_CSRF_ENABLED = False
 
@@ -5,38 +5,46 @@
 Game Manager
 """
 
-import threading
+from contextlib import nullcontext
 from datetime import datetime
 from typing import Dict, List, Optional, Callable
+from flask import has_app_context
 from models import db
 from models.room import Room, RoomStatus
 from models.game import Game, GamePhase, GameStatus, WinCondition
 from models.player import Player, PlayerRole
+from models.user import User
+from models.statistics import UserStatistics
 from models.message import Message
-from models.game_log import GameLog
+from models.game_log import GameLog, log_writer
+from models.leaderboard import leaderboard
 from .role_manager import RoleManager
 from .voting_manager import VotingManager
 from .phase_manager import PhaseManager
+from .game_state import GameState, PlayerState
+from .timer_wheel import get_timer_wheel
+from .room_ownership import room_ownership
+from .locks import InstrumentedLock, StripedLock, lock_statistics
 
 class GameSession:
     """جلسة لعبة واحدة"""
     
-    def __init__(self, game_id: int, room_id: int):
+    def __init__(self, game_id: int, room_id: int, app=None):
         self.game_id = game_id
         self.room_id = room_id
+        self.app = app
         self.is_active = True
         
+        # الحالة الموثوقة في الذاكرة (تكتب لقاعدة البيانات عند حدود المراحل)
+        self.state = GameState(game_id, room_id)
+        
         # المدراء المساعدون
         self.role_manager = RoleManager()
-        self.voting_manager = VotingManager()
-        self.phase_manager = PhaseManager(game_id, self._on_phase_change)
-        
-        # معلومات اللعبة
-        self.players: List[Player] = []
-        self.current_round = 1
+        self.voting_manager = VotingManager(name_resolver=self.state.get_player_name)
+        self.phase_manager = PhaseManager(game_id, self._on_phase_change, state=self.state)
         
         # أقفال للأمان
-        self._lock = threading.Lock()
+        self._lock = InstrumentedLock('game_session')
         
         # معالجات الأحداث
         self.event_callbacks: Dict[str, List[Callable]] = {
@@ -48,6 +56,27 @@ class GameSession:
             'voting_end': []
         }
     
+    @property
+    def players(self) -> List[PlayerState]:
+        """اللاعبون (من الحالة في الذاكرة)"""
+        return list(self.state.players.values())
+    
+    @property
+    def current_round(self) -> int:
+        """الجولة الحالية"""
+        return self.state.current_round
+    
+    def _db_context(self):
+        """سياق التطبيق اللازم للوصول لقاعدة البيانات من خيوط المؤقتات"""
+        if self.app is not None and not has_app_context():
+            return self.app.app_context()
+        return nullcontext()
+    
+    def flush_state(self) -> int:
+        """كتابة التغييرات المعلقة إلى قاعدة البيانات"""
+        with self._db_context():
+            return self.state.flush()
+    
     def add_event_listener(self, event: str, callback: Callable):
         """إضافة مستمع للأحداث"""
         if event in self.event_callbacks:
@@ -65,25 +94,28 @@ class GameSession:
         """معالج تغيير المرحلة"""
         print(f"تغيرت المرحلة إلى {phase.value} - مدة: {duration} ثانية")
         
-        # تحديث اللعبة في قاعدة البيانات
-        game = Game.query.get(self.game_id)
-        if game:
-            game.start_phase(phase, duration)
-        
-        # تشغيل معالجات خاصة لكل مرحلة
-        if phase == GamePhase.VOTING:
-            self._start_voting_phase(**kwargs)
-        elif phase == GamePhase.NIGHT:
-            self._start_night_phase()
-        elif phase == GamePhase.DAY:
-            self._start_day_phase()
-        
-        # إشعار المستمعين
-        self._trigger_event('phase_change', phase=phase, duration=duration, **kwargs)
+        with self._db_context():
+            # حدود المرحلة: كتابة كل ما تراكم في الذاكرة دفعة واحدة
+            self.state.set_phase(phase, duration)
+            try:
+                self.state.flush()
+            except Exception as e:
+                print(f"خطأ في حفظ حالة اللعبة: {e}")
+            
+            # تشغيل معالجات خاصة لكل مرحلة
+            if phase == GamePhase.VOTING:
+                self._start_voting_phase(**kwargs)
+            elif phase == GamePhase.NIGHT:
+                self._start_night_phase()
+            elif phase == GamePhase.DAY:
+                self._start_day_phase()
+            
+            # إشعار المستمعين
+            self._trigger_event('phase_change', phase=phase, duration=duration, **kwargs)
     
     def _start_voting_phase(self, **kwargs):
         """بدء مرحلة التصويت"""
-        alive_players = [p for p in self.players if p.is_alive]
+        alive_players = self.state.get_alive_players()
         eligible_voters = [p.id for p in alive_players]
         eligible_targets = [p.id for p in alive_players]
         
@@ -149,7 +181,7 @@ class GameSession:
     
     def _check_win_condition(self) -> tuple[Optional[WinCondition], Optional[str]]:
         """فحص شروط الفوز"""
-        alive_players = [p for p in self.players if p.is_alive]
+        alive_players = self.state.get_alive_players()
         mafia_count = len([p for p in alive_players if p.role == PlayerRole.MAFIA])
         citizen_count = len(alive_players) - mafia_count
         
@@ -168,34 +200,54 @@ class GameSession:
             
             self.is_active = False
             
-            # تحديث اللعبة في قاعدة البيانات
-            game = Game.query.get(self.game_id)
-            if game:
-                game.finish_game(winner, team)
-            
-            # تحديث إحصائيات اللاعبين
-            self._update_player_statistics(winner, team)
-            
-            # تحديث حالة الغرفة
-            room = Room.query.get(self.room_id)
-            if room:
-                room.finish_game()
-            
             # إيقاف المدراء المساعدين
             self.phase_manager.stop()
             
-            # إشعار المستمعين
-            self._trigger_event('game_end', winner=winner, team=team)
+            with self._db_context():
+                try:
+                    # كتابة الحالة النهائية ونتيجة اللعبة والإحصائيات في معاملة واحدة
+                    self.state.flush(commit=False)
+                    
+                    game = Game.query.get(self.game_id)
+                    if game:
+                        game.finish_game(winner, team, commit=False)
+                    
+                    # تحديث حالة الغرفة
+                    room = Room.query.get(self.room_id)
+                    if room:
+                        room.finish_game(commit=False)
+                    
+                    # تحديث إحصائيات اللاعبين
+                    self._update_player_statistics(winner, team, game)
+                    
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"خطأ في حفظ نهاية اللعبة: {e}")
+                
+                # ضمان كتابة كل سجلات اللعبة قبل إغلاقها
+                log_writer.flush()
+                log_writer.forget_players(self.state.players.keys())
+                
+                # إشعار المستمعين
+                self._trigger_event('game_end', winner=winner, team=team)
             
             print(f"انتهت اللعبة - {winner.value}")
     
-    def _update_player_statistics(self, winner: WinCondition, team: str):
-        """تحديث إحصائيات اللاعبين"""
-        game = Game.query.get(self.game_id)
+    def _update_player_statistics(self, winner: WinCondition, team: str, game: Optional[Game] = None):
+        """تحديث إحصائيات اللاعبين (بدون حفظ)"""
         game_duration = game.get_duration() if game else 0
         
+        # تحميل المستخدمين وإحصائياتهم باستعلامين بدلاً من استعلامين لكل لاعب
+        user_ids = [p.user_id for p in self.players]
+        users = {u.id: u for u in User.query.filter(User.id.in_(user_ids)).all()} if user_ids else {}
+        statistics = {
+            s.user_id: s for s in UserStatistics.query.filter(UserStatistics.user_id.in_(user_ids)).all()
+        } if user_ids else {}
+        
         for player in self.players:
-            if not player.user:
+            user = users.get(player.user_id)
+            if not user:
                 continue
             
             # تحديد الفوز
@@ -209,17 +261,21 @@ class GameSession:
             
             # تحديث إحصائيات المستخدم الأساسية
             if player_won is not None:
-                player.user.update_game_stats(player_won)
+                user.update_game_stats(player_won, commit=False)
             
             # تحديث الإحصائيات المفصلة
-            if hasattr(player.user, 'statistics') and player.user.statistics:
-                stats = player.user.statistics
+            stats = statistics.get(player.user_id)
+            if stats and player.role:
                 stats.update_game_stats(
                     role=player.role.value,
                     won=player_won,
                     game_duration=game_duration,
-                    survived=player.is_alive
+                    survived=player.is_alive,
+                    commit=False
                 )
+        
+        # تحريك ترتيب اللاعبين في لوحة المتصدرين في نفس المعاملة
+        leaderboard.update_users(statistics.values(), commit=False)
     
     def stop(self):
         """إيقاف اللعبة"""
@@ -227,17 +283,24 @@ class GameSession:
             self._end_game(WinCondition.CANCELLED, None)
 
 class GameManager:
-    """المدير الرئيسي للألعاب"""
+    """المدير الرئيسي للألعاب
+    
+    البدء والإنهاء يأخذان قفل شريحة الغرفة فقط، فبدء لعبة بطيء لا يوقف
+    التصويت والإجراءات في الغرف الأخرى. القراءة (get_game_session) بدون قفل:
+    القواميس تعدل بإسناد أو حذف مفتاح واحد، والجلسة تضاف بعد اكتمال إنشائها.
+    """
     
-    def __init__(self):
+    def __init__(self, app=None, lock_stripes: int = 64):
+        self.app = app
         self.active_games: Dict[int, GameSession] = {}  # room_id -> GameSession
         self.game_sessions_by_id: Dict[int, GameSession] = {}  # game_id -> GameSession
-        self._lock = threading.Lock()
+        # قابل لإعادة الدخول: مستمعو نهاية اللعبة قد ينهون غرفة في نفس الشريحة
+        self._room_locks = StripedLock('game_manager.rooms', stripes=lock_stripes, reentrant=True)
     
     def start_game(self, room_id: int) -> tuple[bool, str, Optional[Game]]:
         """بدء لعبة جديدة"""
         
-        with self._lock:
+        with self._room_locks.for_key(room_id):
             # التحقق من وجود لعبة نشطة
             if room_id in self.active_games:
                 return False, "يوجد لعبة نشطة بالفعل في هذه الغرفة", None
@@ -248,6 +311,10 @@ class GameManager:
                 if not room:
                     return False, "الغرفة غير موجودة", None
                 
+                # جلسة اللعبة تعيش في ذاكرة العامل المالك للغرفة فقط
+                if not room_ownership.is_local(room.room_code):
+                    return False, f"الغرفة يديرها العامل {room_ownership.owner(room.room_code)}", None
+                
                 # الحصول على اللاعبين
                 players = room.get_active_players()
                 if len(players) < room.min_players:
@@ -259,19 +326,23 @@ class GameManager:
                 db.session.commit()
                 
                 # إنشاء جلسة لعبة
-                session = GameSession(game.id, room_id)
-                session.players = players
+                session = GameSession(game.id, room_id, app=self.app)
                 
                 # توزيع الأدوار
-                if not session.role_manager.assign_roles(players):
+                if not session.role_manager.assign_roles(players, commit=False):
+                    db.session.rollback()
                     db.session.delete(game)
                     db.session.commit()
                     return False, "فشل في توزيع الأدوار", None
                 
-                # تحديث حالة الغرفة
+                # تحديث حالة الغرفة واللعبة في معاملة واحدة
                 room.status = RoomStatus.PLAYING
+                game.status = GameStatus.ACTIVE
                 db.session.commit()
                 
+                # تحميل اللاعبين إلى الذاكرة - من هنا تصبح الحالة في الذاكرة هي المرجع
+                session.state.load_players(players)
+                
                 # حفظ الجلسة
                 self.active_games[room_id] = session
                 self.game_sessions_by_id[game.id] = session
@@ -337,7 +408,17 @@ class GameManager:
         if not session:
             return False, "لا توجد لعبة نشطة"
         
-        return session.voting_manager.cast_vote(room_id, voter_id, target_id)
+        voter = session.state.get_player(voter_id)
+        if not voter or not voter.can_vote():
+            return False, "لا يمكنك التصويت"
+        
+        # وزن الصوت من الحالة في الذاكرة (العمدة له صوتين)
+        vote_weight = 2 if voter.role == PlayerRole.MAYOR else 1
+        success, message = session.voting_manager.cast_vote(room_id, voter_id, target_id, vote_weight=vote_weight)
+        if success:
+            session.state.record_vote(voter_id, target_id)
+        
+        return success, message
     
     def get_game_status(self, room_id: int) -> Dict:
         """الحصول على حالة اللعبة"""
@@ -351,19 +432,12 @@ class GameManager:
         phase_info = session.phase_manager.get_phase_info()
         voting_results = session.voting_manager.get_voting_results(room_id)
         
-        # معلومات اللاعبين
-        players_info = []
-        for player in session.players:
-            players_info.append({
-                'id': player.id,
-                'user_id': player.user_id,
-                'display_name': player.user.display_name if player.user else 'لاعب',
-                'is_alive': player.is_alive,
-                'status': player.status.value
-            })
+        # معلومات اللاعبين (من الذاكرة بدون استعلامات)
+        players = session.players
+        players_info = [player.to_dict() for player in players]
         
         # إحصائيات اللعبة
-        role_summary = session.role_manager.get_role_summary(session.players)
+        role_summary = session.role_manager.get_role_summary(players)
         
         return {
             'game_id': session.game_id,
@@ -391,6 +465,13 @@ class GameManager:
         # معلومات أساسية
         info = player.to_dict(include_role=True, include_private=True)
         
+        # الحالة الحية من الذاكرة (قد لا تكون كتبت بعد لقاعدة البيانات)
+        live = session.state.get_player(player_id) or player
+        info.update({
+            'is_alive': live.is_alive,
+            'status': live.status.value
+        })
+        
         # معلومات إضافية للعبة
         phase_action = session.phase_manager.get_player_action(player_id)
         vote_info = session.voting_manager.get_player_vote(room_id, player_id)
@@ -398,8 +479,8 @@ class GameManager:
         info.update({
             'current_action': phase_action,
             'current_vote': vote_info,
-            'can_act': session.phase_manager.current_phase == GamePhase.NIGHT and player.can_take_action(),
-            'can_vote': session.phase_manager.current_phase == GamePhase.VOTING and player.can_vote()
+            'can_act': session.phase_manager.current_phase == GamePhase.NIGHT and live.can_take_action(),
+            'can_vote': session.phase_manager.current_phase == GamePhase.VOTING and live.can_vote()
         })
         
         return info
@@ -407,7 +488,7 @@ class GameManager:
     def end_game(self, room_id: int, reason: str = "انتهت اللعبة") -> tuple[bool, str]:
         """إنهاء اللعبة"""
         
-        with self._lock:
+        with self._room_locks.for_key(room_id):
             session = self.get_game_session(room_id)
             if not session:
                 return False, "لا توجد لعبة نشطة"
@@ -417,11 +498,8 @@ class GameManager:
                 session._end_game(WinCondition.CANCELLED, None)
                 
                 # إزالة الجلسة
-                if room_id in self.active_games:
-                    del self.active_games[room_id]
-                
-                if session.game_id in self.game_sessions_by_id:
-                    del self.game_sessions_by_id[session.game_id]
+                self.active_games.pop(room_id, None)
+                self.game_sessions_by_id.pop(session.game_id, None)
                 
                 # تحديث حالة الغرفة
                 room = Room.query.get(room_id)
@@ -436,22 +514,24 @@ class GameManager:
     
     def cleanup_finished_games(self):
         """تنظيف الألعاب المنتهية"""
-        finished_games = []
+        finished_games = 0
         
-        with self._lock:
-            for room_id, session in list(self.active_games.items()):
-                if not session.is_active:
-                    finished_games.append(room_id)
+        # نسخة من القائمة ثم قفل كل غرفة منتهية على حدة
+        for room_id, session in list(self.active_games.items()):
+            if session.is_active:
+                continue
             
-            for room_id in finished_games:
-                session = self.active_games[room_id]
+            with self._room_locks.for_key(room_id):
+                # قد تكون بدأت لعبة جديدة في الغرفة منذ النسخ
+                if self.active_games.get(room_id) is not session:
+                    continue
                 
                 # إزالة من القواميس
                 del self.active_games[room_id]
-                if session.game_id in self.game_sessions_by_id:
-                    del self.game_sessions_by_id[session.game_id]
+                self.game_sessions_by_id.pop(session.game_id, None)
+                finished_games += 1
         
-        return len(finished_games)
+        return finished_games
     
     def get_active_games_count(self) -> int:
         """عدد الألعاب النشطة"""
@@ -462,5 +542,8 @@ class GameManager:
         return {
             'active_games': len(self.active_games),
             'total_sessions': len(self.game_sessions_by_id),
-            'rooms_with_games': list(self.active_games.keys())
+            'rooms_with_games': list(self.active_games.keys()),
+            'timers': get_timer_wheel().get_statistics(),
+            'game_logs': log_writer.get_statistics(),
+            'locks': lock_statistics()
         }
\ No newline at end of file
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+حالة اللعبة في الذاكرة
+In-Memory Game State
+"""
+
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from models import db
+from models.game import Game, GamePhase
+from models.game_log import log_writer
+from models.player import Player, PlayerRole, PlayerStatus, DeathCause
+
+class PlayerState:
+    """حالة لاعب واحد في الذاكرة"""
+
+    __slots__ = (
+        'id', 'user_id', 'display_name', 'role', 'is_alive', 'is_active',
+        'status', 'death_cause', 'death_round', 'killed_by_id'
+    )
+
+    def __init__(self, player: Player):
+        self.id = player.id
+        self.user_id = player.user_id
+        self.display_name = player.user.display_name if player.user else 'لاعب'
+        self.role: Optional[PlayerRole] = player.role
+        self.is_alive = player.is_alive
+        self.is_active = player.is_active
+        self.status = player.status
+        self.death_cause: Optional[DeathCause] = player.death_cause
+        self.death_round = player.death_round
+        self.killed_by_id = player.killed_by_id
+
+    def can_vote(self) -> bool:
+        """التحقق من إمكانية التصويت"""
+        return self.is_alive and self.is_active
+
+    def can_take_action(self) -> bool:
+        """التحقق من إمكانية تنفيذ عمل"""
+        return self.is_alive and self.is_active and self.role in [
+            PlayerRole.DOCTOR, PlayerRole.DETECTIVE,
+            PlayerRole.VIGILANTE, PlayerRole.MAFIA
+        ]
+
+    def to_dict(self) -> Dict:
+        """تحويل الحالة إلى قاموس"""
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'display_name': self.display_name,
+            'is_alive': self.is_alive,
+            'status': self.status.value
+        }
+
+class GameState:
+    """الحالة الموثوقة للعبة أثناء اللعب
+
+    كل التغييرات (الوفيات، الأصوات، أعمال الأدوار، المرحلة والجولة) تطبق هنا
+    فوراً وتسجل كعمليات معلقة، ثم تكتب إلى قاعدة البيانات دفعة واحدة عند
+    حدود المراحل عبر flush().
+    """
+
+    def __init__(self, game_id: int, room_id: int):
+        self.game_id = game_id
+        self.room_id = room_id
+
+        self.players: Dict[int, PlayerState] = {}  # player_id -> PlayerState
+        self.current_round = 1
+        self.phase = GamePhase.DAY
+        self.phase_duration: Optional[int] = None
+
+        # العمليات المعلقة بانتظار الكتابة
+        self._pending_ops: List[Tuple] = []
+        self._phase_dirty = False
+
+        # المقاييس
+        self.flush_count = 0
+        self.flushed_ops = 0
+        self.last_flush_at: Optional[datetime] = None
+
+        self._lock = threading.RLock()
+
+    def load_players(self, players: List[Player]):
+        """تحميل اللاعبين من قاعدة البيانات (مرة واحدة عند بدء اللعبة)"""
+        with self._lock:
+            self.players = {player.id: PlayerState(player) for player in players}
+        
+        # أسماء اللاعبين لسجلات اللعبة بدون استعلامات إضافية
+        log_writer.cache_player_names({p.id: p.display_name for p in self.players.values()})
+
+    def get_player(self, player_id: int) -> Optional[PlayerState]:
+        """الحصول على لاعب"""
+        return self.players.get(player_id)
+
+    def get_player_by_user(self, user_id: int) -> Optional[PlayerState]:
+        """الحصول على لاعب بمعرف المستخدم"""
+        for player in self.players.values():
+            if player.user_id == user_id:
+                return player
+        return None
+
+    def get_player_name(self, player_id: int) -> str:
+        """اسم اللاعب المعروض"""
+        player = self.players.get(player_id)
+        return player.display_name if player else 'لاعب'
+
+    def get_alive_players(self) -> List[PlayerState]:
+        """اللاعبون الأحياء"""
+        return [p for p in self.players.values() if p.is_alive]
+
+    def kill_player(self, player_id: int, cause: DeathCause, killed_by: int = None) -> bool:
+        """قتل لاعب في الذاكرة"""
+        with self._lock:
+            player = self.players.get(player_id)
+            if not player or not player.is_alive:
+                return False
+
+            player.is_alive = False
+            player.status = PlayerStatus.DEAD
+            player.death_cause = cause
+            player.death_round = self.current_round
+            player.killed_by_id = killed_by
+
+            self._pending_ops.append(('kill', player_id, cause, killed_by, self.current_round))
+            return True
+
+    def record_vote(self, voter_id: int, target_id: int = None):
+        """تسجيل صوت"""
+        with self._lock:
+            self._pending_ops.append(('vote', voter_id, target_id))
+
+    def record_action(self, player_id: int, action_type: str, target_id: int = None, details: dict = None):
+        """تسجيل عمل دور خاص"""
+        with self._lock:
+            self._pending_ops.append(('action', player_id, action_type, target_id, details))
+
+    def set_phase(self, phase: GamePhase, duration: int = None):
+        """تغيير المرحلة"""
+        with self._lock:
+            self.phase = phase
+            self.phase_duration = duration
+            self._phase_dirty = True
+
+    def next_round(self):
+        """الانتقال للجولة التالية"""
+        with self._lock:
+            self.current_round += 1
+            self._phase_dirty = True
+
+    def has_pending_changes(self) -> bool:
+        """هل توجد تغييرات لم تكتب بعد"""
+        return bool(self._pending_ops) or self._phase_dirty
+
+    def flush(self, commit: bool = True) -> int:
+        """كتابة التغييرات المعلقة في معاملة واحدة (يتطلب سياق التطبيق)"""
+        with self._lock:
+            ops = self._pending_ops
+            phase_dirty = self._phase_dirty
+            self._pending_ops = []
+            self._phase_dirty = False
+
+        if not ops and not phase_dirty:
+            return 0
+
+        try:
+            # تحميل كل اللاعبين المتأثرين باستعلام واحد
+            player_ids = set()
+            for op in ops:
+                player_ids.add(op[1])
+                if op[0] == 'vote' and op[2]:
+                    player_ids.add(op[2])
+
+            rows = {}
+            if player_ids:
+                rows = {p.id: p for p in Player.query.filter(Player.id.in_(player_ids)).all()}
+
+            # اللعبة والأسماء مرة واحدة للدفعة كلها (بدل استعلامات لكل عملية)
+            game = db.session.get(Game, self.game_id)
+            names = {player_id: player.display_name for player_id, player in self.players.items()}
+
+            for op in ops:
+                player = rows.get(op[1])
+                if not player:
+                    continue
+
+                if op[0] == 'kill':
+                    cause, killed_by, round_number = op[2:]
+                    player.kill(cause, killed_by, round_number, commit=False, game=game, names=names)
+                elif op[0] == 'vote':
+                    player.vote(op[2], commit=False, game=game, names=names, target=rows.get(op[2]))
+                elif op[0] == 'action':
+                    action_type, target_id, details = op[2:]
+                    player.take_action(action_type, target_id, details, commit=False, game=game, names=names)
+
+            if phase_dirty:
+                if game:
+                    game.current_round = self.current_round
+                    game.start_phase(self.phase, self.phase_duration, commit=False)
+
+            if commit:
+                db.session.commit()
+
+        except Exception:
+            db.session.rollback()
+            # إعادة العمليات للمحاولة في الدفعة التالية
+            with self._lock:
+                self._pending_ops = ops + self._pending_ops
+                self._phase_dirty = self._phase_dirty or phase_dirty
+            raise
+
+        self.flush_count += 1
+        self.flushed_ops += len(ops)
+        self.last_flush_at = datetime.utcnow()
+        return len(ops)
+
+    def get_statistics(self) -> Dict:
+        """إحصائيات الكتابة المؤجلة"""
+        return {
+            'pending_ops': len(self._pending_ops),
+            'flush_count': self.flush_count,
+            'flushed_ops': self.flushed_ops,
+            'last_flush': self.last_flush_at.isoformat() if self.last_flush_at else None
+        }
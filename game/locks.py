@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+أقفال مقسمة مع قياس التنافس
+Striped Locks with Contention Metrics
+"""
+
+import threading
+import time
+from typing import Dict, Hashable, List, Optional
+
+from monitoring.metrics import Histogram
+
+class LockStats:
+    """مقاييس كل الأقفال التي تحمل نفس الاسم"""
+
+    # زمن الانتظار أقصر بكثير من زمن الطلبات
+    WAIT_BUCKETS = (
+        0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05,
+        0.1, 0.5, 1.0, 5.0
+    )
+
+    def __init__(self, name: str):
+        self.name = name
+        self.wait = Histogram(self.WAIT_BUCKETS)
+        self._acquisitions = 0
+        self._lock = threading.Lock()  # += ليست ذرية بين الخيوط
+
+    def record_acquisition(self):
+        """عد محاولة أخذ القفل"""
+        with self._lock:
+            self._acquisitions += 1
+
+    @property
+    def acquisitions(self) -> int:
+        return self._acquisitions
+
+    @property
+    def contended(self) -> int:
+        """مرات الانتظار = عدد قياسات زمن الانتظار (تحدث تحت قفل المدرج)"""
+        return self.wait.count
+
+    def to_dict(self) -> Dict:
+        """تحويل المقاييس إلى قاموس"""
+        acquisitions = self.acquisitions
+        contended = self.contended
+        return {
+            'acquisitions': acquisitions,
+            'contended': contended,
+            'contention_ratio': contended / acquisitions if acquisitions else 0.0,
+            'wait_seconds': self.wait.to_dict()
+        }
+
+_registry: Dict[str, LockStats] = {}
+_registry_lock = threading.Lock()
+
+def get_lock_stats(name: str) -> LockStats:
+    """مقاييس قفل بالاسم (تنشأ عند أول استخدام)"""
+    stats = _registry.get(name)
+    if stats is None:
+        with _registry_lock:
+            stats = _registry.setdefault(name, LockStats(name))
+    return stats
+
+def registered_lock_stats() -> List[LockStats]:
+    """كائنات مقاييس كل الأقفال المسجلة مرتبة بالاسم"""
+    with _registry_lock:
+        return [stats for _, stats in sorted(_registry.items())]
+
+def lock_statistics() -> Dict[str, Dict]:
+    """مقاييس كل الأقفال المسجلة"""
+    return {stats.name: stats.to_dict() for stats in registered_lock_stats()}
+
+class InstrumentedLock:
+    """قفل يقيس زمن الانتظار عند التنافس فقط
+
+    المحاولة الأولى بدون انتظار، فالمسار غير المتنافس لا يكلف إلا عداداً؛
+    عند الفشل يقاس زمن الانتظار في مدرج الاسم المشترك.
+    """
+
+    __slots__ = ('_lock', 'stats')
+
+    def __init__(self, name: str, reentrant: bool = False, stats: Optional[LockStats] = None):
+        self._lock = threading.RLock() if reentrant else threading.Lock()
+        self.stats = stats or get_lock_stats(name)
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        """أخذ القفل"""
+        stats = self.stats
+        stats.record_acquisition()
+        if self._lock.acquire(False):
+            return True
+        if not blocking:
+            return False
+
+        started = time.perf_counter()
+        acquired = self._lock.acquire(True, timeout)
+        stats.wait.observe(time.perf_counter() - started)
+        return acquired
+
+    def release(self):
+        """تحرير القفل"""
+        self._lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+class StripedLock:
+    """مجموعة أقفال ثابتة يختار منها المفتاح قفله بالتجزئة
+
+    بدل قفل عام واحد: عمليات الغرف المختلفة لا تنتظر بعضها (إلا إذا وقعت
+    في نفس الشريحة)، ولا حاجة لإنشاء أو حذف قفل لكل غرفة.
+    """
+
+    def __init__(self, name: str, stripes: int = 64, reentrant: bool = False):
+        self.name = name
+        self.stats = get_lock_stats(name)
+        self._stripes: List[InstrumentedLock] = [
+            InstrumentedLock(name, reentrant=reentrant, stats=self.stats) for _ in range(max(1, stripes))
+        ]
+
+    def for_key(self, key: Hashable) -> InstrumentedLock:
+        """قفل المفتاح (room_id أو room_code)"""
+        return self._stripes[hash(key) % len(self._stripes)]
+
+    def get_statistics(self) -> Dict:
+        """مقاييس الأقفال"""
+        return {'stripes': len(self._stripes), **self.stats.to_dict()}
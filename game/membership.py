@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+فهرس عضوية الغرف في الذاكرة
+Room Membership Index
+"""
+
+import threading
+import time
+from typing import Dict, Iterable, Optional, Set
+from models import db, Player, Room
+from models.room import RoomStatus
+
+# حالات الغرفة التي يعتبر فيها اللاعب عضواً
+ACTIVE_ROOM_STATUSES = (RoomStatus.WAITING, RoomStatus.STARTING, RoomStatus.PLAYING)
+
+class RoomRef:
+    """ما تحتاجه معالجات الأحداث من الغرفة، بدون كائن ORM مرتبط بجلسة"""
+
+    __slots__ = ('id', 'room_code', 'creator_id', 'allow_text_chat', 'allow_voice_chat')
+
+    def __init__(self, id: int, room_code: str, creator_id: int,
+                 allow_text_chat: bool = True, allow_voice_chat: bool = True):
+        self.id = id
+        self.room_code = room_code
+        self.creator_id = creator_id
+        self.allow_text_chat = allow_text_chat
+        self.allow_voice_chat = allow_voice_chat
+
+    @classmethod
+    def from_room(cls, room: Room) -> 'RoomRef':
+        return cls(room.id, room.room_code, room.creator_id, room.allow_text_chat, room.allow_voice_chat)
+
+    def __repr__(self):
+        return f'<RoomRef {self.room_code}>'
+
+class MembershipIndex:
+    """فهرس ثنائي الاتجاه: المستخدم ↔ الغرفة
+
+    RoomManager يحدثه عند الانضمام والمغادرة وتعديل الغرفة وحذفها، فهو
+    المرجع لمسار الأحداث الساخن (كل رسالة وصوت ومؤشر كتابة) بدون قاعدة
+    البيانات. المستخدم غير الموجود يبحث عنه مرة في قاعدة البيانات (بعد إعادة
+    التشغيل أو انضمام من عملية أخرى)، وعدم وجوده يحفظ negative_ttl ثانية.
+
+    مع عدة عمليات، الانضمام والمغادرة في عملية أخرى لا يصلان لهذا الفهرس،
+    فالعضوية المعروفة تعاد قراءتها بعد positive_ttl ثانية (0 = بلا انتهاء،
+    لعملية واحدة). check_consistency يقارن الفهرس بقاعدة البيانات ويصلح
+    الفروقات.
+    """
+
+    def __init__(self, negative_ttl: float = 5.0, positive_ttl: float = 0.0):
+        self.negative_ttl = negative_ttl
+        self.positive_ttl = positive_ttl
+
+        self._user_rooms: Dict[int, int] = {}       # user_id -> room_id
+        self._room_users: Dict[int, Set[int]] = {}  # room_id -> user_ids
+        self._rooms: Dict[int, RoomRef] = {}        # room_id -> RoomRef
+        self._verified: Dict[int, float] = {}       # user_id -> انتهاء صلاحية العضوية المعروفة
+        self._absent: Dict[int, float] = {}         # user_id -> انتهاء صلاحية "ليس في غرفة"
+        self._versions: Dict[int, int] = {}         # user_id -> عدد التغييرات (لكشف تغيير أثناء القراءة)
+        self._lock = threading.Lock()
+
+        # المقاييس
+        self.hits = 0
+        self.misses = 0
+        self.database_lookups = 0
+        self.stale_loads = 0
+        self.expirations = 0
+        self.repairs = 0
+
+    # ==================== العضوية ====================
+
+    def add(self, user_id: int, room: Room):
+        """تسجيل المستخدم في الغرفة"""
+        ref = room if isinstance(room, RoomRef) else RoomRef.from_room(room)
+        with self._lock:
+            self._add(user_id, ref)
+
+    def _add(self, user_id: int, ref: RoomRef):
+        # يجب استدعاؤها مع القفل
+        self._discard(user_id)
+        self._rooms[ref.id] = ref
+        self._user_rooms[user_id] = ref.id
+        self._room_users.setdefault(ref.id, set()).add(user_id)
+        self._absent.pop(user_id, None)
+        if self.positive_ttl:
+            self._verified[user_id] = time.monotonic() + self.positive_ttl
+
+    def remove(self, user_id: int) -> Optional[RoomRef]:
+        """إزالة المستخدم من غرفته"""
+        with self._lock:
+            ref = self._discard(user_id)
+            self._absent[user_id] = time.monotonic() + self.negative_ttl
+            return ref
+
+    def _discard(self, user_id: int) -> Optional[RoomRef]:
+        # يجب استدعاؤها مع القفل
+        self._versions[user_id] = self._versions.get(user_id, 0) + 1
+        self._verified.pop(user_id, None)
+        room_id = self._user_rooms.pop(user_id, None)
+        if room_id is None:
+            return None
+
+        members = self._room_users.get(room_id)
+        if members is not None:
+            members.discard(user_id)
+            if not members:
+                del self._room_users[room_id]
+                return self._rooms.pop(room_id, None)
+        return self._rooms.get(room_id)
+
+    def update_room(self, room: Room):
+        """تحديث بيانات الغرفة لكل أعضائها (بعد تعديل الإعدادات أو نقل الملكية)"""
+        with self._lock:
+            if room.id in self._rooms:
+                self._rooms[room.id] = RoomRef.from_room(room)
+
+    def remove_room(self, room_id: int) -> Set[int]:
+        """إزالة كل أعضاء الغرفة"""
+        with self._lock:
+            members = self._room_users.pop(room_id, set())
+            self._rooms.pop(room_id, None)
+            expires = time.monotonic() + self.negative_ttl
+            for user_id in members:
+                self._user_rooms.pop(user_id, None)
+                self._verified.pop(user_id, None)
+                self._versions[user_id] = self._versions.get(user_id, 0) + 1
+                self._absent[user_id] = expires
+            return members
+
+    def get(self, user_id: int) -> Optional[RoomRef]:
+        """غرفة المستخدم من الذاكرة فقط"""
+        room_id = self._user_rooms.get(user_id)
+        return self._rooms.get(room_id) if room_id is not None else None
+
+    def lookup(self, user_id: int) -> Optional[RoomRef]:
+        """غرفة المستخدم (من الذاكرة، أو من قاعدة البيانات عند عدم وجوده)"""
+        ref = self.get(user_id)
+        if ref is not None:
+            expires = self._verified.get(user_id)
+            if expires is None or expires > time.monotonic():
+                self.hits += 1
+                return ref
+            self.expirations += 1
+
+        expires = self._absent.get(user_id)
+        if expires is not None and expires > time.monotonic():
+            self.hits += 1
+            return None
+
+        self.misses += 1
+        return self._load(user_id)
+
+    def _load(self, user_id: int) -> Optional[RoomRef]:
+        """البحث عن عضوية المستخدم في قاعدة البيانات
+
+        النتيجة لا تحفظ إذا تغيرت عضوية المستخدم (add/remove) أثناء القراءة.
+        """
+        self.database_lookups += 1
+        with self._lock:
+            version = self._versions.get(user_id, 0)
+
+        row = db.session.query(
+            Room.id, Room.room_code, Room.creator_id, Room.allow_text_chat, Room.allow_voice_chat
+        ).join(Player, Player.room_id == Room.id).filter(
+            Player.user_id == user_id,
+            Player.is_active == True,
+            Room.status.in_(ACTIVE_ROOM_STATUSES)
+        ).order_by(Player.joined_at.desc()).first()
+
+        with self._lock:
+            if self._versions.get(user_id, 0) != version:
+                # تغيير أحدث من القراءة: الفهرس هو المرجع
+                self.stale_loads += 1
+                return self.get(user_id)
+
+            if row is None:
+                self._discard(user_id)
+                self._absent[user_id] = time.monotonic() + self.negative_ttl
+                return None
+
+            # الغرفة قد تكون في الفهرس بنسخة أحدث
+            ref = RoomRef(*row)
+            ref = self._rooms.get(ref.id, ref)
+            self._add(user_id, ref)
+            return ref
+
+    def members(self, room_id: int) -> Set[int]:
+        """أعضاء الغرفة المعروفون"""
+        return set(self._room_users.get(room_id, ()))
+
+    def count(self) -> int:
+        """عدد المستخدمين في الغرف"""
+        return len(self._user_rooms)
+
+    # ==================== التحقق ====================
+
+    def check_consistency(self, user_ids: Optional[Iterable[int]] = None, chunk_size: int = 500) -> int:
+        """مقارنة الفهرس بقاعدة البيانات وإصلاح الفروقات (عدد الإصلاحات)"""
+        user_ids = list(user_ids if user_ids is not None else list(self._user_rooms))
+        repaired = 0
+
+        for start in range(0, len(user_ids), chunk_size):
+            chunk = user_ids[start:start + chunk_size]
+            rows = db.session.query(
+                Player.user_id, Room.id, Room.room_code, Room.creator_id,
+                Room.allow_text_chat, Room.allow_voice_chat
+            ).join(Room, Player.room_id == Room.id).filter(
+                Player.user_id.in_(chunk),
+                Player.is_active == True,
+                Room.status.in_(ACTIVE_ROOM_STATUSES)
+            ).all()
+            actual = {user_id: RoomRef(*room) for user_id, *room in rows}
+
+            for user_id in chunk:
+                indexed = self.get(user_id)
+                expected = actual.get(user_id)
+                if expected is None and indexed is not None:
+                    self.remove(user_id)
+                elif expected is not None and (indexed is None or indexed.id != expected.id):
+                    self.add(user_id, expected)
+                elif expected is not None and indexed.creator_id != expected.creator_id:
+                    with self._lock:
+                        self._rooms[expected.id] = expected
+                else:
+                    continue
+                repaired += 1
+
+        self.repairs += repaired
+        return repaired
+
+    def get_statistics(self) -> Dict:
+        """إحصائيات الفهرس"""
+        lookups = self.hits + self.misses
+        return {
+            'users': len(self._user_rooms),
+            'rooms': len(self._rooms),
+            'positive_ttl': self.positive_ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+            'database_lookups': self.database_lookups,
+            'stale_loads': self.stale_loads,
+            'expirations': self.expirations,
+            'repairs': self.repairs
+        }
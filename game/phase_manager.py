@@ -10,7 +10,8 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Callable
 from enum import Enum
 from models.game import GamePhase
-from models.player import Player, PlayerRole
+from models.player import Player, PlayerRole, DeathCause
+from .timer_wheel import TimerWheel, TimerHandle, get_timer_wheel
 
 class PhaseAction:
     """إجراء في مرحلة معينة"""
@@ -24,20 +25,18 @@ class PhaseAction:
         self.is_processed = False
 
 class PhaseTimer:
-    """مؤقت المرحلة"""
+    """مؤقت المرحلة (مسجل في عجلة المؤقتات المشتركة)"""
     
-    def __init__(self, duration: int, callback: Callable = None):
+    def __init__(self, duration: int, callback: Callable = None, wheel: TimerWheel = None):
         self.duration = duration
         self.start_time = datetime.utcnow()
         self.end_time = self.start_time + timedelta(seconds=duration)
         self.callback = callback
-        self.timer = None
+        self.handle: Optional[TimerHandle] = None
         self.is_active = True
         
         if callback and duration > 0:
-            self.timer = threading.Timer(duration, self._on_timeout)
-            self.timer.daemon = True
-            self.timer.start()
+            self.handle = (wheel or get_timer_wheel()).schedule(duration, self._on_timeout)
     
     def _on_timeout(self):
         """معالج انتهاء الوقت"""
@@ -59,21 +58,16 @@ class PhaseTimer:
     def cancel(self):
         """إلغاء المؤقت"""
         self.is_active = False
-        if self.timer:
-            self.timer.cancel()
+        if self.handle:
+            self.handle.cancel()
     
     def extend(self, additional_seconds: int):
         """تمديد الوقت"""
         if self.is_active:
             self.end_time += timedelta(seconds=additional_seconds)
-            # إعادة إنشاء المؤقت
-            if self.timer:
-                self.timer.cancel()
-                remaining = self.get_remaining_time()
-                if remaining > 0 and self.callback:
-                    self.timer = threading.Timer(remaining, self._on_timeout)
-                    self.timer.daemon = True
-                    self.timer.start()
+            # نقل المؤقت في العجلة بدلاً من إعادة إنشائه
+            if self.handle:
+                self.handle.extend(additional_seconds)
 
 class PhaseManager:
     """مدير مراحل اللعبة"""
@@ -86,16 +80,18 @@ class PhaseManager:
         GamePhase.TRIAL: 180     # 3 دقائق للمحاكمة
     }
     
-    def __init__(self, game_id: int, on_phase_change: Callable = None):
+    def __init__(self, game_id: int, on_phase_change: Callable = None, state=None):
         self.game_id = game_id
         self.on_phase_change = on_phase_change
+        self.state = state  # GameState - الحالة في الذاكرة إن وجدت
         
         self.current_phase = GamePhase.DAY
         self.phase_timer: Optional[PhaseTimer] = None
         self.phase_actions: Dict[int, PhaseAction] = {}  # player_id -> action
         self.phase_start_time = datetime.utcnow()
         
-        self._lock = threading.Lock()
+        # قفل قابل لإعادة الدخول: معالج انتهاء الوقت يبدأ المرحلة التالية وهو يحمل القفل
+        self._lock = threading.RLock()
         self.is_active = True
         
         # معالجات المراحل
@@ -170,8 +166,10 @@ class PhaseManager:
                 self._process_voting_results()
             
             elif self.current_phase == GamePhase.NIGHT:
-                # معالجة أعمال الليل والانتقال للنهار
+                # معالجة أعمال الليل والانتقال للنهار (جولة جديدة)
                 self._process_night_actions()
+                if self.state:
+                    self.state.next_round()
                 self.start_phase(GamePhase.DAY)
             
             elif self.current_phase == GamePhase.TRIAL:
@@ -194,13 +192,35 @@ class PhaseManager:
             action = PhaseAction(player_id, action_type, target_id, details)
             self.phase_actions[player_id] = action
             
+            if self.state:
+                self.state.record_action(player_id, action_type, target_id, details)
+            
             return True, "تم تسجيل الإجراء"
     
+    def _get_player(self, player_id: int):
+        """الحصول على لاعب (من الذاكرة إن أمكن)"""
+        if self.state:
+            return self.state.get_player(player_id)
+        return Player.query.get(player_id)
+    
+    def _get_player_name(self, player) -> str:
+        """اسم اللاعب المعروض"""
+        if self.state:
+            return player.display_name
+        return player.user.display_name
+    
+    def _kill_player(self, target, cause: DeathCause, killed_by: int):
+        """قتل لاعب (في الذاكرة إن أمكن)"""
+        if self.state:
+            self.state.kill_player(target.id, cause, killed_by)
+        else:
+            target.kill(cause, killed_by)
+    
     def _validate_action(self, player_id: int, action_type: str, target_id: int = None) -> tuple[bool, str]:
         """التحقق من صحة الإجراء"""
         
         # الحصول على اللاعب
-        player = Player.query.get(player_id)
+        player = self._get_player(player_id)
         if not player or not player.is_alive:
             return False, "اللاعب غير موجود أو ميت"
         
@@ -231,7 +251,7 @@ class PhaseManager:
             
             # التحقق من الهدف
             if target_id:
-                target = Player.query.get(target_id)
+                target = self._get_player(target_id)
                 if not target or not target.is_alive:
                     return False, "الهدف غير موجود أو ميت"
                 
@@ -317,7 +337,7 @@ class PhaseManager:
         
         for kill in kills:
             target_id = kill.target_id
-            target = Player.query.get(target_id)
+            target = self._get_player(target_id)
             
             if target and target.is_alive:
                 if target_id in protected_targets:
@@ -326,16 +346,16 @@ class PhaseManager:
                         'action': 'kill_blocked',
                         'killer_id': kill.player_id,
                         'target_id': target_id,
-                        'message': f'تم حماية {target.user.display_name} من القتل'
+                        'message': f'تم حماية {self._get_player_name(target)} من القتل'
                     })
                 else:
                     # قتل ناجح
-                    target.kill('mafia_kill', kill.player_id)
+                    self._kill_player(target, DeathCause.MAFIA_KILL, kill.player_id)
                     results.append({
                         'action': 'kill_success',
                         'killer_id': kill.player_id,
                         'target_id': target_id,
-                        'message': f'تم قتل {target.user.display_name}'
+                        'message': f'تم قتل {self._get_player_name(target)}'
                     })
         
         return results
@@ -346,14 +366,14 @@ class PhaseManager:
         
         for heal in heals:
             target_id = heal.target_id
-            target = Player.query.get(target_id)
+            target = self._get_player(target_id)
             
             if target:
                 results.append({
                     'action': 'heal',
                     'healer_id': heal.player_id,
                     'target_id': target_id,
-                    'message': f'تم حماية {target.user.display_name}'
+                    'message': f'تم حماية {self._get_player_name(target)}'
                 })
         
         return results
@@ -364,7 +384,7 @@ class PhaseManager:
         
         for investigation in investigations:
             target_id = investigation.target_id
-            target = Player.query.get(target_id)
+            target = self._get_player(target_id)
             
             if target:
                 is_mafia = target.role == PlayerRole.MAFIA
@@ -373,7 +393,7 @@ class PhaseManager:
                     'investigator_id': investigation.player_id,
                     'target_id': target_id,
                     'result': 'mafia' if is_mafia else 'citizen',
-                    'message': f'{target.user.display_name} {"من المافيا" if is_mafia else "مواطن بريء"}'
+                    'message': f'{self._get_player_name(target)} {"من المافيا" if is_mafia else "مواطن بريء"}'
                 })
         
         return results
@@ -387,7 +407,7 @@ class PhaseManager:
         
         for kill in vigilante_kills:
             target_id = kill.target_id
-            target = Player.query.get(target_id)
+            target = self._get_player(target_id)
             
             if target and target.is_alive:
                 if target_id in protected_targets:
@@ -396,16 +416,16 @@ class PhaseManager:
                         'action': 'vigilante_kill_blocked',
                         'killer_id': kill.player_id,
                         'target_id': target_id,
-                        'message': f'تم حماية {target.user.display_name} من العدالة الشعبية'
+                        'message': f'تم حماية {self._get_player_name(target)} من العدالة الشعبية'
                     })
                 else:
                     # قتل ناجح
-                    target.kill('vigilante_kill', kill.player_id)
+                    self._kill_player(target, DeathCause.VIGILANTE_KILL, kill.player_id)
                     results.append({
                         'action': 'vigilante_kill_success',
                         'killer_id': kill.player_id,
                         'target_id': target_id,
-                        'message': f'قتلت العدالة الشعبية {target.user.display_name}'
+                        'message': f'قتلت العدالة الشعبية {self._get_player_name(target)}'
                     })
         
         return results
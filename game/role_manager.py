@@ -139,7 +139,7 @@ class RoleManager:
         
         return distribution
     
-    def assign_roles(self, players: List[Player], custom_distribution: Dict[PlayerRole, int] = None) -> bool:
+    def assign_roles(self, players: List[Player], custom_distribution: Dict[PlayerRole, int] = None, commit: bool = True) -> bool:
         """توزيع الأدوار على اللاعبين"""
         try:
             player_count = len(players)
@@ -160,7 +160,7 @@ class RoleManager:
             
             # توزيع الأدوار على اللاعبين
             for i, player in enumerate(players):
-                player.assign_role(role_list[i])
+                player.assign_role(role_list[i], commit=commit)
             
             return True
             
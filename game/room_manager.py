@@ -10,14 +10,17 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 from models import db, Room, Player, User
 from models.room import RoomStatus
+from models.eager_loading import room_list
+from .locks import StripedLock
+from .membership import MembershipIndex, RoomRef
 
 class RoomManager:
     """مدير الغرف في اللعبة"""
     
-    def __init__(self):
-        self.active_rooms: Dict[str, Room] = {}  # room_code -> Room
-        self.player_rooms: Dict[int, str] = {}   # user_id -> room_code
-        self.room_locks: Dict[str, threading.Lock] = {}
+    def __init__(self, lock_stripes: int = 64, membership: Optional[MembershipIndex] = None):
+        self.active_rooms: Dict[str, int] = {}  # room_code -> room_id (الكائنات نفسها مرتبطة بجلسة الطلب)
+        self.membership = membership or MembershipIndex()  # user_id <-> room
+        self.room_locks = StripedLock('room_manager.rooms', stripes=lock_stripes)
         self._cleanup_timer = None
         self._start_cleanup_timer()
     
@@ -30,7 +33,7 @@ class RoomManager:
                 return False, "المستخدم غير موجود", None
             
             # التحقق من وجود اللاعب في غرفة أخرى
-            if creator_id in self.player_rooms:
+            if self.membership.lookup(creator_id):
                 return False, "أنت موجود بالفعل في غرفة أخرى", None
             
             # إنشاء الغرفة
@@ -44,8 +47,7 @@ class RoomManager:
             db.session.commit()
             
             # إضافة الغرفة للذاكرة
-            self.active_rooms[room.room_code] = room
-            self.room_locks[room.room_code] = threading.Lock()
+            self.active_rooms[room.room_code] = room.id
             
             # إضافة المنشئ كلاعب
             success, message = self.join_room(creator_id, room.room_code)
@@ -70,9 +72,9 @@ class RoomManager:
                 return False, "المستخدم غير موجود"
             
             # التحقق من وجود اللاعب في غرفة أخرى
-            if user_id in self.player_rooms:
-                current_room_code = self.player_rooms[user_id]
-                if current_room_code == room_code:
+            current = self.membership.lookup(user_id)
+            if current:
+                if current.room_code == room_code:
                     return False, "أنت موجود بالفعل في هذه الغرفة"
                 else:
                     return False, "يجب مغادرة الغرفة الحالية أولاً"
@@ -83,7 +85,7 @@ class RoomManager:
                 return False, "الغرفة غير موجودة"
             
             # الحصول على قفل الغرفة
-            with self.room_locks.get(room_code, threading.Lock()):
+            with self.room_locks.for_key(room_code):
                 # التحقق من إمكانية الانضمام
                 if not room.can_join():
                     if room.is_full():
@@ -98,7 +100,7 @@ class RoomManager:
                 # إضافة اللاعب
                 success, message = room.add_player(user_id)
                 if success:
-                    self.player_rooms[user_id] = room_code
+                    self.membership.add(user_id, room)
                     user.update_last_seen()
                 
                 return success, message
@@ -110,27 +112,31 @@ class RoomManager:
         """مغادرة الغرفة"""
         try:
             # التحقق من وجود اللاعب في غرفة
-            if user_id not in self.player_rooms:
+            current = self.membership.lookup(user_id)
+            if not current:
                 return False, "لست في أي غرفة"
             
-            room_code = self.player_rooms[user_id]
+            room_code = current.room_code
             room = self.get_room(room_code)
             
             if not room:
                 # إزالة من الذاكرة إذا لم تعد الغرفة موجودة
-                del self.player_rooms[user_id]
+                self.membership.remove(user_id)
                 return False, "الغرفة غير موجودة"
             
             # الحصول على قفل الغرفة
-            with self.room_locks.get(room_code, threading.Lock()):
+            with self.room_locks.for_key(room_code):
                 # إزالة اللاعب من الغرفة
                 success, message = room.remove_player(user_id)
                 if success:
-                    del self.player_rooms[user_id]
+                    self.membership.remove(user_id)
                     
                     # التحقق من حاجة حذف الغرفة
                     if room.current_players == 0:
                         self._cleanup_empty_room(room_code)
+                    else:
+                        # قد تكون الملكية انتقلت للاعب آخر
+                        self.membership.update_room(room)
                 
                 return success, message
                 
@@ -139,7 +145,7 @@ class RoomManager:
     
     def remove_player_from_all_rooms(self, user_id: int):
         """إزالة اللاعب من جميع الغرف (عند قطع الاتصال)"""
-        if user_id in self.player_rooms:
+        if self.membership.lookup(user_id):
             self.leave_room(user_id)
         
         # تحديث حالة المستخدم
@@ -149,26 +155,31 @@ class RoomManager:
     
     def get_room(self, room_code: str) -> Optional[Room]:
         """الحصول على غرفة بالرمز"""
-        # محاولة الحصول من الذاكرة أولاً
-        if room_code in self.active_rooms:
-            return self.active_rooms[room_code]
+        # المعرف من الذاكرة أولاً (الغرفة من خريطة هوية الجلسة الحالية)
+        room_id = self.active_rooms.get(room_code)
+        if room_id is not None:
+            room = db.session.get(Room, room_id)
+            if room:
+                return room
         
         # البحث في قاعدة البيانات
         room = Room.query.filter_by(room_code=room_code).first()
         if room and room.status in [RoomStatus.WAITING, RoomStatus.STARTING, RoomStatus.PLAYING]:
-            self.active_rooms[room_code] = room
-            if room_code not in self.room_locks:
-                self.room_locks[room_code] = threading.Lock()
+            self.active_rooms[room_code] = room.id
         
         return room
     
     def get_user_room(self, user_id: int) -> Optional[Room]:
         """الحصول على غرفة المستخدم"""
-        if user_id in self.player_rooms:
-            room_code = self.player_rooms[user_id]
-            return self.get_room(room_code)
+        current = self.membership.lookup(user_id)
+        if current:
+            return self.get_room(current.room_code)
         return None
     
+    def get_user_room_ref(self, user_id: int) -> Optional[RoomRef]:
+        """غرفة المستخدم من فهرس العضوية (بدون قاعدة البيانات لمسار الأحداث)"""
+        return self.membership.lookup(user_id)
+    
     def get_room_players(self, room_code: str) -> List[Player]:
         """الحصول على لاعبي الغرفة"""
         room = self.get_room(room_code)
@@ -176,16 +187,20 @@ class RoomManager:
             return room.get_active_players()
         return []
     
-    def get_public_rooms(self, limit: int = 20) -> List[Room]:
-        """الحصول على الغرف العامة"""
+    def public_rooms_query(self):
+        """استعلام الغرف العامة المفتوحة (بدون ترتيب)"""
         return Room.query.filter(
             Room.password.is_(None),
             Room.status.in_([RoomStatus.WAITING, RoomStatus.STARTING])
-        ).order_by(Room.created_at.desc()).limit(limit).all()
+        )
+    
+    def get_public_rooms(self, limit: int = 20) -> List[Room]:
+        """الحصول على الغرف العامة"""
+        return room_list(self.public_rooms_query()).order_by(Room.created_at.desc()).limit(limit).all()
     
     def search_rooms(self, query: str, limit: int = 10) -> List[Room]:
         """البحث في الغرف"""
-        return Room.query.filter(
+        return room_list(Room.query).filter(
             Room.name.contains(query),
             Room.password.is_(None),
             Room.status.in_([RoomStatus.WAITING, RoomStatus.STARTING])
@@ -275,6 +290,7 @@ class RoomManager:
                     setattr(room, key, value)
             
             db.session.commit()
+            self.membership.update_room(room)
             return True, "تم تحديث الإعدادات"
             
         except Exception as e:
@@ -292,10 +308,7 @@ class RoomManager:
                 return False, "ليس لديك صلاحية حذف الغرفة"
             
             # إزالة جميع اللاعبين
-            players = self.get_room_players(room_code)
-            for player in players:
-                if player.user_id in self.player_rooms:
-                    del self.player_rooms[player.user_id]
+            self.membership.remove_room(room.id)
             
             # حذف الغرفة
             room.cancel_game()
@@ -312,11 +325,10 @@ class RoomManager:
             if room_code in self.active_rooms:
                 del self.active_rooms[room_code]
             
-            if room_code in self.room_locks:
-                del self.room_locks[room_code]
-            
             # تحديث حالة الغرفة في قاعدة البيانات
             room = Room.query.filter_by(room_code=room_code).first()
+            if room:
+                self.membership.remove_room(room.id)
             if room and room.current_players == 0:
                 room.status = RoomStatus.CANCELLED
                 db.session.commit()
@@ -339,8 +351,7 @@ class RoomManager:
             for room in inactive_rooms:
                 if room.room_code in self.active_rooms:
                     del self.active_rooms[room.room_code]
-                if room.room_code in self.room_locks:
-                    del self.room_locks[room.room_code]
+                self.membership.remove_room(room.id)
                 
                 room.status = RoomStatus.CANCELLED
                 db.session.commit()
@@ -365,7 +376,7 @@ class RoomManager:
     
     def get_total_players_count(self) -> int:
         """عدد اللاعبين الإجمالي"""
-        return len(self.player_rooms)
+        return self.membership.count()
     
     def __del__(self):
         """تنظيف الموارد"""
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+توزيع الغرف على العمال
+Room-to-Worker Ownership
+"""
+
+import zlib
+from typing import Dict
+
+class RoomOwnership:
+    """كل غرفة يملكها عامل واحد ثابت حسب تجزئة رمزها
+
+    جلسات الألعاب (GameManager.active_games) في ذاكرة العامل، فيجب أن تصل
+    كل أحداث الغرفة للعامل نفسه: موازن الأحمال يوجه الاتصال حسب رمز الغرفة
+    بنفس التجزئة (crc32 % worker_count)، وكل عامل يرفض بدء لعبة في غرفة لا
+    يملكها. الرسائل بين العمال تمر عبر طابور رسائل Socket.IO.
+    """
+
+    def __init__(self, worker_index: int = 0, worker_count: int = 1):
+        self.worker_index = worker_index
+        self.worker_count = max(1, worker_count)
+
+    def init_app(self, app):
+        """قراءة الإعدادات من التطبيق"""
+        self.worker_index = app.config.get('WORKER_INDEX', self.worker_index)
+        self.worker_count = max(1, app.config.get('WORKER_COUNT', self.worker_count))
+        if not 0 <= self.worker_index < self.worker_count:
+            raise ValueError(f"WORKER_INDEX={self.worker_index} خارج النطاق (WORKER_COUNT={self.worker_count})")
+
+    def owner(self, room_code: str) -> int:
+        """رقم العامل المالك للغرفة"""
+        return zlib.crc32(room_code.upper().encode('utf-8')) % self.worker_count
+
+    def is_local(self, room_code: str) -> bool:
+        """التحقق من ملكية هذا العامل للغرفة"""
+        return self.worker_count == 1 or self.owner(room_code) == self.worker_index
+
+    def get_statistics(self) -> Dict:
+        """معلومات التوزيع"""
+        return {
+            'worker_index': self.worker_index,
+            'worker_count': self.worker_count
+        }
+
+# التوزيع المشترك
+room_ownership = RoomOwnership()
\ No newline at end of file
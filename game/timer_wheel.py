@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+عجلة المؤقتات المشتركة
+Shared Timer Wheel Scheduler
+"""
+
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Set
+from monitoring.metrics import Histogram
+
+class TimerHandle:
+    """مقبض مؤقت مسجل في العجلة"""
+
+    __slots__ = ('wheel', 'deadline', 'expires_tick', 'callback', 'is_active')
+
+    def __init__(self, wheel: 'TimerWheel', deadline: float, callback: Callable):
+        self.wheel = wheel
+        self.deadline = deadline  # بتوقيت time.monotonic
+        self.expires_tick = 0
+        self.callback = callback
+        self.is_active = True
+
+    def cancel(self) -> bool:
+        """إلغاء المؤقت"""
+        return self.wheel.cancel(self)
+
+    def extend(self, additional_seconds: float) -> bool:
+        """تمديد المؤقت"""
+        return self.wheel.extend(self, additional_seconds)
+
+    def get_remaining_time(self) -> float:
+        """الوقت المتبقي بالثواني"""
+        if not self.is_active:
+            return 0.0
+        return max(0.0, self.deadline - time.monotonic())
+
+class TimerWheel:
+    """عجلة مؤقتات مُجزّأة (hashed timing wheel) يقودها خيط واحد
+
+    الجدولة والإلغاء والتمديد تتم بزمن ثابت O(1): كل مؤقت يوضع في خانة
+    بحسب النبضة التي ينتهي عندها، والخيط يمر على خانة واحدة في كل نبضة.
+    تنفيذ الاستدعاءات يتم في مجمع عمال صغير حتى لا يؤخر استدعاء بطيء باقي المؤقتات.
+    في وضع eventlet/gevent يصبح الخيط والمجمع خيوطاً خضراء بعد الترقيع (async_mode).
+    """
+
+    def __init__(self, tick: float = 0.1, slots: int = 512, workers: int = 4):
+        self.tick = tick
+        self.slot_count = slots
+        self.slots: List[Set[TimerHandle]] = [set() for _ in range(slots)]
+        self.workers = workers
+
+        self.current_tick = 0
+        self.start_time = time.monotonic()
+
+        # المقاييس
+        self.pending_count = 0
+        self.scheduled_total = 0
+        self.fired_total = 0
+        self.cancelled_total = 0
+        self.callback_errors = 0
+        self.lateness = Histogram()
+
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def start(self):
+        """تشغيل خيط العجلة"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+
+            self._stop_event.clear()
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers,
+                thread_name_prefix='timer-wheel-worker'
+            )
+            self._thread = threading.Thread(target=self._run, name='timer-wheel', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """إيقاف خيط العجلة"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=self.tick * 10)
+            self._thread = None
+        if self._executor:
+            self._executor.shutdown(wait=False)
+
+    def schedule(self, delay: float, callback: Callable) -> TimerHandle:
+        """جدولة استدعاء بعد مدة بالثواني (تعيد تشغيل العجلة بعد stop)"""
+        if self._thread is None or not self._thread.is_alive():
+            self.start()
+
+        handle = TimerHandle(self, time.monotonic() + max(0.0, delay), callback)
+        with self._lock:
+            self._insert(handle)
+            self.pending_count += 1
+            self.scheduled_total += 1
+        return handle
+
+    def cancel(self, handle: TimerHandle) -> bool:
+        """إلغاء مؤقت"""
+        with self._lock:
+            if not handle.is_active:
+                return False
+
+            handle.is_active = False
+            self.slots[handle.expires_tick % self.slot_count].discard(handle)
+            self.pending_count -= 1
+            self.cancelled_total += 1
+            return True
+
+    def extend(self, handle: TimerHandle, additional_seconds: float) -> bool:
+        """تمديد مؤقت (نقله إلى خانة أخرى)"""
+        with self._lock:
+            if not handle.is_active:
+                return False
+
+            self.slots[handle.expires_tick % self.slot_count].discard(handle)
+            handle.deadline += additional_seconds
+            self._insert(handle)
+            return True
+
+    def _insert(self, handle: TimerHandle):
+        """وضع المؤقت في خانته (يجب استدعاؤها مع القفل)"""
+        ticks = math.ceil((handle.deadline - self.start_time) / self.tick)
+        handle.expires_tick = max(ticks, self.current_tick + 1)
+        self.slots[handle.expires_tick % self.slot_count].add(handle)
+
+    def _run(self):
+        """حلقة الخيط الرئيسية"""
+        while not self._stop_event.is_set():
+            next_tick_time = self.start_time + (self.current_tick + 1) * self.tick
+            delay = next_tick_time - time.monotonic()
+            if delay > 0 and self._stop_event.wait(delay):
+                break
+
+            # معالجة كل النبضات المستحقة (قد تكون أكثر من نبضة عند التأخر)
+            target_tick = int((time.monotonic() - self.start_time) / self.tick)
+            due: List[TimerHandle] = []
+
+            with self._lock:
+                while self.current_tick < target_tick:
+                    self.current_tick += 1
+                    slot = self.slots[self.current_tick % self.slot_count]
+                    if not slot:
+                        continue
+
+                    expired = [h for h in slot if h.expires_tick <= self.current_tick]
+                    for handle in expired:
+                        slot.discard(handle)
+                        handle.is_active = False
+                    self.pending_count -= len(expired)
+                    due.extend(expired)
+
+            for handle in due:
+                try:
+                    self._executor.submit(self._fire, handle)
+                except RuntimeError:
+                    # تم إيقاف المجمع
+                    return
+
+    def _fire(self, handle: TimerHandle):
+        """تنفيذ استدعاء المؤقت"""
+        self.lateness.observe(max(0.0, time.monotonic() - handle.deadline))
+        with self._lock:
+            self.fired_total += 1
+
+        try:
+            handle.callback()
+        except Exception as e:
+            with self._lock:
+                self.callback_errors += 1
+            print(f"خطأ في استدعاء المؤقت: {e}")
+
+    def get_statistics(self) -> Dict:
+        """إحصائيات العجلة"""
+        return {
+            'pending_timers': self.pending_count,
+            'scheduled_total': self.scheduled_total,
+            'fired_total': self.fired_total,
+            'cancelled_total': self.cancelled_total,
+            'callback_errors': self.callback_errors,
+            'tick_seconds': self.tick,
+            'slots': self.slot_count,
+            'workers': self.workers,
+            'is_running': bool(self._thread and self._thread.is_alive()),
+            'lateness_seconds': self.lateness.to_dict()
+        }
+
+# العجلة المشتركة على مستوى العملية
+_shared_wheel: Optional[TimerWheel] = None
+_shared_wheel_lock = threading.Lock()
+
+def get_timer_wheel() -> TimerWheel:
+    """الحصول على عجلة المؤقتات المشتركة"""
+    global _shared_wheel
+
+    if _shared_wheel is None:
+        with _shared_wheel_lock:
+            if _shared_wheel is None:
+                _shared_wheel = TimerWheel()
+    return _shared_wheel
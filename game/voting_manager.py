@@ -5,12 +5,11 @@
 Voting Manager
 """
 
-import threading
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
-from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Set, Tuple
 from models import db
 from models.player import Player, PlayerRole
+from .locks import InstrumentedLock
 
 class Vote:
     """كلاس يمثل صوت واحد"""
@@ -21,6 +20,70 @@ class Vote:
         self.vote_weight = vote_weight  # للعمدة (صوتين)
         self.timestamp = datetime.utcnow()
 
+class VoteTally:
+    """عد الأصوات التراكمي مع تتبع المتصدرين
+
+    كل صوت أو تغيير صوت يحدث العدد ومجموعة المصوتين للهدف، وينقل الهدف بين
+    حاويات "العدد -> الأهداف"، فالمتصدرون وأعلى عدد متاحون بدون مرور على
+    الأصوات. version يزيد مع كل تغيير لإبطال النتائج المحفوظة.
+    """
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}             # target_id -> vote_count
+        self.voters: Dict[int, Set[int]] = {}        # target_id -> voter_ids
+        self._targets_by_count: Dict[int, Set[int]] = {}  # vote_count -> target_ids
+        self.max_count = 0
+        self.version = 0
+
+    def add(self, target_id: int, voter_id: int, weight: int):
+        """إضافة صوت"""
+        count = self.counts.get(target_id, 0)
+        self._move(target_id, count, count + weight)
+        self.voters.setdefault(target_id, set()).add(voter_id)
+        self.version += 1
+
+    def remove(self, target_id: int, voter_id: int, weight: int):
+        """سحب صوت"""
+        count = self.counts.get(target_id, 0)
+        self._move(target_id, count, max(0, count - weight))
+        voters = self.voters.get(target_id)
+        if voters is not None:
+            voters.discard(voter_id)
+            if not voters:
+                del self.voters[target_id]
+        self.version += 1
+
+    def _move(self, target_id: int, old: int, new: int):
+        if old:
+            bucket = self._targets_by_count[old]
+            bucket.discard(target_id)
+            if not bucket:
+                del self._targets_by_count[old]
+
+        if new:
+            self.counts[target_id] = new
+            self._targets_by_count.setdefault(new, set()).add(target_id)
+            if new > self.max_count:
+                self.max_count = new
+        else:
+            self.counts.pop(target_id, None)
+
+        # أعلى عدد ينزل بمقدار وزن الصوت على الأكثر
+        while self.max_count and self.max_count not in self._targets_by_count:
+            self.max_count -= 1
+
+    def leaders(self) -> List[int]:
+        """الأهداف الحاصلة على أعلى عدد"""
+        return sorted(self._targets_by_count.get(self.max_count, ()))
+
+    def ranking(self) -> List[Tuple[int, int]]:
+        """(الهدف، العدد) من الأعلى للأدنى"""
+        return [
+            (target_id, count)
+            for count in sorted(self._targets_by_count, reverse=True)
+            for target_id in sorted(self._targets_by_count[count])
+        ]
+
 class VotingSession:
     """جلسة تصويت"""
     
@@ -33,25 +96,33 @@ class VotingSession:
         self.end_time = self.start_time + timedelta(seconds=duration)
         
         self.votes: Dict[int, Vote] = {}  # voter_id -> Vote
-        self.vote_counts: Dict[int, int] = defaultdict(int)  # target_id -> vote_count
-        self.eligible_voters: List[int] = []
-        self.eligible_targets: List[int] = []
+        self.tally = VoteTally()
+        self.vote_counts = self.tally.counts  # target_id -> vote_count
+        self.eligible_voters: Set[int] = set()
+        self.eligible_targets: Set[int] = set()
         
         self.is_active = True
         self.is_completed = False
         self.result = None
         
-        self._lock = threading.Lock()
+        # النتائج والملخص المحفوظان (يبطلان بتغير tally.version، ويعاد نسخهما
+        # لكل مستدع حتى لا يعدل أحدهم المحفوظ)
+        self._results_cache: Optional[Tuple[int, Dict]] = None
+        self._summary_cache: Optional[Tuple[int, Dict]] = None
+        
+        self._lock = InstrumentedLock('voting_session')
     
     def add_eligible_voter(self, player_id: int):
         """إضافة لاعب مؤهل للتصويت"""
-        if player_id not in self.eligible_voters:
-            self.eligible_voters.append(player_id)
+        with self._lock:
+            self.eligible_voters.add(player_id)
+            self.tally.version += 1  # total_eligible_voters في النتائج المحفوظة
     
     def add_eligible_target(self, player_id: int):
         """إضافة هدف مؤهل للتصويت عليه"""
-        if player_id not in self.eligible_targets:
-            self.eligible_targets.append(player_id)
+        with self._lock:
+            self.eligible_targets.add(player_id)
+            self.tally.version += 1
     
     def can_vote(self, voter_id: int) -> bool:
         """التحقق من إمكانية التصويت"""
@@ -73,53 +144,91 @@ class VotingSession:
                 return False, "لا يمكن التصويت لهذا اللاعب"
             
             # إزالة الصوت السابق إن وجد
-            if voter_id in self.votes:
-                old_vote = self.votes[voter_id]
-                self.vote_counts[old_vote.target_id] -= old_vote.vote_weight
-                if self.vote_counts[old_vote.target_id] <= 0:
-                    del self.vote_counts[old_vote.target_id]
+            old_vote = self.votes.pop(voter_id, None)
+            if old_vote is not None:
+                self.tally.remove(old_vote.target_id, voter_id, old_vote.vote_weight)
             
-            # تسجيل الصوت الجديد
-            if target_id:  # تصويت حقيقي (ليس امتناع)
-                vote = Vote(voter_id, target_id, vote_weight)
-                self.votes[voter_id] = vote
-                self.vote_counts[target_id] += vote_weight
-            else:  # امتناع عن التصويت
-                if voter_id in self.votes:
-                    del self.votes[voter_id]
+            # تسجيل الصوت الجديد (بدون هدف = امتناع)
+            if target_id:
+                self.votes[voter_id] = Vote(voter_id, target_id, vote_weight)
+                self.tally.add(target_id, voter_id, vote_weight)
             
             return True, "تم تسجيل الصوت"
     
     def get_vote_results(self) -> Dict:
-        """الحصول على نتائج التصويت"""
+        """الحصول على نتائج التصويت (تبنى مرة لكل تغيير في الأصوات)"""
         with self._lock:
-            results = {
-                'session_id': self.session_id,
-                'vote_type': self.vote_type,
+            version = self.tally.version
+            if self._results_cache is None or self._results_cache[0] != version:
+                self._results_cache = (version, {
+                    'session_id': self.session_id,
+                    'vote_type': self.vote_type,
+                    'start_time': self.start_time.isoformat(),
+                    'end_time': self.end_time.isoformat(),
+                    'total_eligible_voters': len(self.eligible_voters),
+                    'total_votes_cast': len(self.votes),
+                    'vote_counts': dict(self.tally.counts),
+                    'voters': {target_id: sorted(voters) for target_id, voters in self.tally.voters.items()},
+                    'leaders': self.tally.leaders(),
+                    'votes': [
+                        {
+                            'voter_id': vote.voter_id,
+                            'target_id': vote.target_id,
+                            'vote_weight': vote.vote_weight,
+                            'timestamp': vote.timestamp.isoformat()
+                        }
+                        for vote in self.votes.values()
+                    ]
+                })
+            
+            # نسخة لكل مستدع: القيم المتداخلة أيضاً
+            cached = self._results_cache[1]
+            results = dict(cached)
+            results.update({
+                'vote_counts': dict(cached['vote_counts']),
+                'voters': {target_id: list(voters) for target_id, voters in cached['voters'].items()},
+                'leaders': list(cached['leaders']),
+                'votes': [dict(vote) for vote in cached['votes']]
+            })
+            
+            # الحالة والوقت تتغير بدون أصوات
+            results.update({
                 'is_active': self.is_active,
                 'is_completed': self.is_completed,
-                'start_time': self.start_time.isoformat(),
-                'end_time': self.end_time.isoformat(),
-                'remaining_time': self.get_remaining_time(),
-                'total_eligible_voters': len(self.eligible_voters),
-                'total_votes_cast': len(self.votes),
-                'vote_counts': dict(self.vote_counts),
-                'votes': [
-                    {
-                        'voter_id': vote.voter_id,
-                        'target_id': vote.target_id,
-                        'vote_weight': vote.vote_weight,
-                        'timestamp': vote.timestamp.isoformat()
-                    }
-                    for vote in self.votes.values()
-                ]
-            }
-            
+                'remaining_time': self.get_remaining_time()
+            })
             if self.result:
-                results['result'] = self.result
+                results['result'] = dict(self.result)
             
             return results
     
+    def get_summary(self, player_name: Callable[[int], str]) -> Dict:
+        """ملخص التصويت بأسماء اللاعبين، مرتباً من الأعلى (يبنى مرة لكل تغيير)"""
+        with self._lock:
+            version = self.tally.version
+            if self._summary_cache is None or self._summary_cache[0] != version:
+                vote_summary = {
+                    target_id: {'player_name': player_name(target_id), 'vote_count': count}
+                    for target_id, count in self.tally.ranking()
+                }
+                leaders = self.tally.leaders()
+                self._summary_cache = (version, {
+                    'session_info': {
+                        'session_id': self.session_id,
+                        'vote_type': self.vote_type,
+                        'total_voters': len(self.eligible_voters),
+                        'votes_cast': len(self.votes)
+                    },
+                    'vote_summary': vote_summary,
+                    'leading_candidate': leaders[0] if leaders else None
+                })
+            
+            cached = self._summary_cache[1]
+            summary = dict(cached)
+            summary['session_info'] = dict(cached['session_info'], remaining_time=self.get_remaining_time())
+            summary['vote_summary'] = {target_id: dict(entry) for target_id, entry in cached['vote_summary'].items()}
+            return summary
+    
     def get_remaining_time(self) -> int:
         """الوقت المتبقي بالثواني"""
         if not self.is_active:
@@ -142,7 +251,7 @@ class VotingSession:
             self.is_completed = True
             
             # حساب النتيجة
-            if not self.vote_counts:
+            if not self.tally.counts:
                 # لا توجد أصوات
                 self.result = {
                     'outcome': 'no_votes',
@@ -150,9 +259,9 @@ class VotingSession:
                     'eliminated_player_id': None
                 }
             else:
-                # العثور على اللاعب الأكثر حصولاً على أصوات
-                max_votes = max(self.vote_counts.values())
-                candidates = [pid for pid, votes in self.vote_counts.items() if votes == max_votes]
+                # المتصدرون من الحاويات مباشرة
+                max_votes = self.tally.max_count
+                candidates = self.tally.leaders()
                 
                 if len(candidates) == 1:
                     # فائز واضح
@@ -175,13 +284,23 @@ class VotingSession:
             return self.result
 
 class VotingManager:
-    """مدير التصويت في اللعبة"""
+    """مدير التصويت في اللعبة (نسخة لكل جلسة لعبة، فقفله خاص بالغرفة)
+
+    name_resolver يعيد اسم اللاعب من حالة اللعبة في الذاكرة؛ بدونه تقرأ الأسماء
+    من قاعدة البيانات.
+    """
     
-    def __init__(self):
+    def __init__(self, name_resolver: Callable[[int], str] = None):
+        self.name_resolver = name_resolver or self._player_name_from_db
         self.active_sessions: Dict[str, VotingSession] = {}
         self.room_sessions: Dict[int, str] = {}  # room_id -> session_id
         self._session_counter = 0
-        self._lock = threading.Lock()
+        self._lock = InstrumentedLock('voting_manager')
+    
+    @staticmethod
+    def _player_name_from_db(player_id: int) -> str:
+        player = Player.query.get(player_id)
+        return player.user.display_name if player and player.user else 'لاعب'
     
     def start_voting_session(self, room_id: int, vote_type: str = "lynch", 
                            duration: int = 60, eligible_voters: List[int] = None, 
@@ -192,7 +311,8 @@ class VotingManager:
             # التحقق من وجود جلسة نشطة
             if room_id in self.room_sessions:
                 current_session = self.active_sessions.get(self.room_sessions[room_id])
-                if current_session and current_session.is_active:
+                # الجلسة المنتهية مدتها لا تمنع جلسة جديدة
+                if current_session and current_session.is_active and not current_session.is_expired():
                     return False, "يوجد تصويت نشط بالفعل", None
             
             # إنشاء جلسة جديدة
@@ -217,7 +337,7 @@ class VotingManager:
             
             return True, "تم بدء التصويت", session
     
-    def cast_vote(self, room_id: int, voter_id: int, target_id: int = None) -> Tuple[bool, str]:
+    def cast_vote(self, room_id: int, voter_id: int, target_id: int = None, vote_weight: int = None) -> Tuple[bool, str]:
         """تسجيل صوت"""
         
         session = self.get_active_session(room_id)
@@ -225,8 +345,9 @@ class VotingManager:
             return False, "لا يوجد تصويت نشط"
         
         # تحديد وزن الصوت (العمدة له صوتين)
-        voter = Player.query.get(voter_id)
-        vote_weight = 2 if voter and voter.role == PlayerRole.MAYOR else 1
+        if vote_weight is None:
+            voter = Player.query.get(voter_id)
+            vote_weight = 2 if voter and voter.role == PlayerRole.MAYOR else 1
         
         return session.cast_vote(voter_id, target_id, vote_weight)
     
@@ -289,31 +410,7 @@ class VotingManager:
         if not session:
             return {'error': 'لا يوجد تصويت نشط'}
         
-        results = session.get_vote_results()
-        
-        # إضافة معلومات اللاعبين
-        vote_summary = {}
-        for target_id, vote_count in results['vote_counts'].items():
-            player = Player.query.get(target_id)
-            vote_summary[target_id] = {
-                'player_name': player.user.display_name if player and player.user else 'لاعب',
-                'vote_count': vote_count
-            }
-        
-        # ترتيب حسب عدد الأصوات
-        sorted_summary = dict(sorted(vote_summary.items(), key=lambda x: x[1]['vote_count'], reverse=True))
-        
-        return {
-            'session_info': {
-                'session_id': results['session_id'],
-                'vote_type': results['vote_type'],
-                'remaining_time': results['remaining_time'],
-                'total_voters': results['total_eligible_voters'],
-                'votes_cast': results['total_votes_cast']
-            },
-            'vote_summary': sorted_summary,
-            'leading_candidate': list(sorted_summary.keys())[0] if sorted_summary else None
-        }
+        return session.get_summary(self.name_resolver)
     
     def get_player_vote(self, room_id: int, player_id: int) -> Optional[Dict]:
         """الحصول على صوت لاعب معين"""
@@ -322,11 +419,10 @@ class VotingManager:
             return None
         
         vote = session.votes[player_id]
-        target_player = Player.query.get(vote.target_id)
         
         return {
             'target_id': vote.target_id,
-            'target_name': target_player.user.display_name if target_player and target_player.user else 'لاعب',
+            'target_name': self.name_resolver(vote.target_id),
             'vote_weight': vote.vote_weight,
             'timestamp': vote.timestamp.isoformat()
         }
@@ -6,6 +6,8 @@ Database Models Package
 """
 
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateColumn
 
 # إنشاء كائن قاعدة البيانات
 db = SQLAlchemy()
@@ -20,11 +22,45 @@ def init_db():
     from .message import Message
     from .game_log import GameLog
     from .statistics import UserStatistics
+    from .leaderboard import LeaderboardEntry
     
     # إنشاء الجداول
     db.create_all()
+    ensure_columns()
+    ensure_indexes()
     print("✅ تم إنشاء جداول قاعدة البيانات بنجاح")
 
+def ensure_columns():
+    """إضافة الأعمدة الناقصة للجداول الموجودة (create_all لا يعدل جدولاً قائماً)"""
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if not column.nullable and column.server_default is None:
+                print(f"⚠️ العمود {table.name}.{column.name} يحتاج قيمة افتراضية في القاعدة لإضافته")
+                continue
+            
+            spec = CreateColumn(column).compile(dialect=db.engine.dialect)
+            try:
+                with db.engine.begin() as conn:
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {spec}'))
+            except Exception as e:
+                print(f"⚠️ فشل في إضافة العمود {table.name}.{column.name}: {e}")
+
+def ensure_indexes():
+    """إنشاء الفهارس الناقصة في الجداول الموجودة (create_all لا يضيفها لجدول قائم)"""
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(bind=db.engine, checkfirst=True)
+            except Exception as e:
+                print(f"⚠️ فشل في إنشاء الفهرس {index.name}: {e}")
+
 # تصدير النماذج للاستخدام الخارجي
 from .user import User
 from .room import Room
@@ -33,8 +69,9 @@ from .player import Player
 from .message import Message
 from .game_log import GameLog
 from .statistics import UserStatistics
+from .leaderboard import LeaderboardEntry
 
 __all__ = [
-    'db', 'init_db', 'User', 'Room', 'Game', 
-    'Player', 'Message', 'GameLog', 'UserStatistics'
+    'db', 'init_db', 'ensure_columns', 'ensure_indexes', 'User', 'Room', 'Game', 
+    'Player', 'Message', 'GameLog', 'UserStatistics', 'LeaderboardEntry'
 ]
\ No newline at end of file
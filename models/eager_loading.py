@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+استراتيجيات التحميل المسبق للعلاقات
+Eager-Loading Strategies
+
+كل دالة تضيف للاستعلام العلاقات التي يلمسها to_dict لنقطة معينة، حتى تحول
+الصفحة بعدد ثابت من الاستعلامات بدل استعلام لكل صف (N+1). العلاقات
+المفردة (many-to-one) تحمل بـ joinedload في نفس الاستعلام.
+"""
+
+from sqlalchemy.orm import joinedload
+from .message import Message
+from .player import Player
+from .room import Room
+
+def room_list(query):
+    """قوائم الغرف: Room.to_dict يقرأ اسم المنشئ"""
+    return query.options(joinedload(Room.creator))
+
+def room_players(room_id: int):
+    """لاعبو الغرفة النشطون مع مستخدميهم (Room.to_dict(include_players=True))"""
+    return Player.query.options(joinedload(Player.user)).filter_by(room_id=room_id, is_active=True)
+
+def game_history(query):
+    """سجل الألعاب (Game, Player): Player.to_dict يقرأ المستخدم"""
+    return query.options(joinedload(Player.user))
+
+def message_page(query):
+    """صفحات الرسائل: Message.to_dict يقرأ اسم المرسل وصورته"""
+    return query.options(joinedload(Message.user))
\ No newline at end of file
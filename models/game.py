@@ -37,6 +37,9 @@ class Game(db.Model):
     """نموذج اللعبة"""
     
     __tablename__ = 'games'
+    __table_args__ = (
+        db.Index('ix_games_room_started', 'room_id', 'started_at', 'id'),
+    )
     
     # المعرف الأساسي
     id = db.Column(db.Integer, primary_key=True)
@@ -95,7 +98,7 @@ class Game(db.Model):
             return json.loads(self.settings)
         return {}
     
-    def start_phase(self, phase, duration=None):
+    def start_phase(self, phase, duration=None, commit=True):
         """بدء مرحلة جديدة"""
         self.phase = phase
         self.phase_start_time = datetime.utcnow()
@@ -106,10 +109,11 @@ class Game(db.Model):
         else:
             self.phase_end_time = None
         
-        db.session.commit()
+        if commit:
+            db.session.commit()
         
         # تسجيل في السجل
-        self.log_action(f"بدء مرحلة {phase.value}")
+        self.log_action(f"بدء مرحلة {phase.value}", commit=commit)
     
     def next_round(self):
         """الانتقال للجولة التالية"""
@@ -118,7 +122,7 @@ class Game(db.Model):
         
         self.log_action(f"بدء الجولة {self.current_round}")
     
-    def finish_game(self, winner, winner_team=None):
+    def finish_game(self, winner, winner_team=None, commit=True):
         """إنهاء اللعبة"""
         self.status = GameStatus.FINISHED
         self.phase = GamePhase.FINISHED
@@ -126,7 +130,8 @@ class Game(db.Model):
         self.winner_team = winner_team
         self.finished_at = datetime.utcnow()
         
-        db.session.commit()
+        if commit:
+            db.session.commit()
         
         # تسجيل في السجل
         winner_text = {
@@ -136,7 +141,7 @@ class Game(db.Model):
             WinCondition.CANCELLED: "ألغيت اللعبة"
         }.get(winner, "نتيجة غير معروفة")
         
-        self.log_action(f"انتهت اللعبة - {winner_text}")
+        self.log_action(f"انتهت اللعبة - {winner_text}", commit=commit)
     
     def cancel_game(self, reason="ألغيت اللعبة"):
         """إلغاء اللعبة"""
@@ -163,21 +168,19 @@ class Game(db.Model):
         
         self.log_action("تم استئناف اللعبة")
     
-    def log_action(self, action, player_id=None, details=None):
-        """تسجيل حدث في سجل اللعبة"""
-        from .game_log import GameLog
+    def log_action(self, action, player_id=None, details=None, commit=True):
+        """تسجيل حدث في سجل اللعبة (عبر الكاتب المؤجل)"""
+        from .game_log import GameLog, log_writer
         
-        log_entry = GameLog(
-            game_id=self.id,
+        entry = GameLog.build_entry(
+            self.id,
+            action,
             player_id=player_id,
-            action=action,
-            details=details,
             round_number=self.current_round,
-            phase=self.phase.value
+            phase=self.phase.value,
+            details=details
         )
-        
-        db.session.add(log_entry)
-        db.session.commit()
+        log_writer.write(entry, commit=commit)
     
     def get_duration(self):
         """حساب مدة اللعبة"""
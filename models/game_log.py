@@ -5,9 +5,14 @@
 Game Log Model
 """
 
+from collections import OrderedDict, deque
 from datetime import datetime
 from enum import Enum
+import atexit
 import json
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
 from . import db
 
 class LogLevel(Enum):
@@ -90,19 +95,35 @@ class GameLog(db.Model):
         
         return data
     
+    @staticmethod
+    def build_entry(game_id, action, **fields) -> Dict:
+        """بناء سجل كقاموس جاهز للإدراج الجماعي"""
+        details = fields.pop('details', None)
+        entry = {
+            'game_id': game_id,
+            'action': action,
+            'player_id': fields.get('player_id'),
+            'description': fields.get('description'),
+            'level': fields.get('level', LogLevel.INFO),
+            'round_number': fields.get('round_number'),
+            'phase': fields.get('phase'),
+            'details': json.dumps(details, ensure_ascii=False) if details else None,
+            'created_at': datetime.utcnow()
+        }
+        return entry
+    
     @staticmethod
     def log_game_start(game_id, total_players):
         """تسجيل بدء اللعبة"""
-        log = GameLog(
-            game_id=game_id,
-            action="بدء اللعبة",
+        entry = GameLog.build_entry(
+            game_id,
+            "بدء اللعبة",
             description=f"بدأت اللعبة بـ {total_players} لاعبين",
             level=LogLevel.GAME,
             round_number=1
         )
-        db.session.add(log)
-        db.session.commit()
-        return log
+        log_writer.write(entry)
+        return entry
     
     @staticmethod
     def log_game_end(game_id, winner, winner_team=None):
@@ -114,25 +135,20 @@ class GameLog(db.Model):
             'cancelled': 'ألغيت اللعبة'
         }.get(winner, 'نتيجة غير معروفة')
         
-        log = GameLog(
-            game_id=game_id,
-            action="انتهاء اللعبة",
+        entry = GameLog.build_entry(
+            game_id,
+            "انتهاء اللعبة",
             description=f"انتهت اللعبة - {winner_text}",
             level=LogLevel.GAME,
             details={'winner': winner, 'winner_team': winner_team}
         )
-        log.set_details({'winner': winner, 'winner_team': winner_team})
-        
-        db.session.add(log)
-        db.session.commit()
-        return log
+        log_writer.write(entry)
+        return entry
     
     @staticmethod
     def log_player_death(game_id, player_id, cause, round_number, phase):
         """تسجيل وفاة لاعب"""
-        from .player import Player
-        player = Player.query.get(player_id)
-        player_name = player.user.display_name if player and player.user else "لاعب"
+        player_name = log_writer.get_player_name(player_id)
         
         cause_text = {
             'mafia_kill': 'قتلته المافيا',
@@ -141,45 +157,37 @@ class GameLog(db.Model):
             'left_game': 'غادر اللعبة'
         }.get(cause, 'مات لسبب غير معروف')
         
-        log = GameLog(
-            game_id=game_id,
+        entry = GameLog.build_entry(
+            game_id,
+            "وفاة لاعب",
             player_id=player_id,
-            action="وفاة لاعب",
             description=f"مات {player_name} - {cause_text}",
             level=LogLevel.GAME,
             round_number=round_number,
-            phase=phase
+            phase=phase,
+            details={'cause': cause}
         )
-        log.set_details({'cause': cause})
-        
-        db.session.add(log)
-        db.session.commit()
-        return log
+        log_writer.write(entry)
+        return entry
     
     @staticmethod
     def log_vote(game_id, voter_id, target_id, round_number, phase):
         """تسجيل تصويت"""
-        from .player import Player
-        voter = Player.query.get(voter_id)
-        target = Player.query.get(target_id)
+        voter_name = log_writer.get_player_name(voter_id)
+        target_name = log_writer.get_player_name(target_id)
         
-        voter_name = voter.user.display_name if voter and voter.user else "لاعب"
-        target_name = target.user.display_name if target and target.user else "لاعب"
-        
-        log = GameLog(
-            game_id=game_id,
+        entry = GameLog.build_entry(
+            game_id,
+            "تصويت",
             player_id=voter_id,
-            action="تصويت",
             description=f"صوت {voter_name} ضد {target_name}",
             level=LogLevel.GAME,
             round_number=round_number,
-            phase=phase
+            phase=phase,
+            details={'voter_id': voter_id, 'target_id': target_id}
         )
-        log.set_details({'voter_id': voter_id, 'target_id': target_id})
-        
-        db.session.add(log)
-        db.session.commit()
-        return log
+        log_writer.write(entry)
+        return entry
     
     @staticmethod
     def log_phase_change(game_id, new_phase, round_number):
@@ -193,28 +201,22 @@ class GameLog(db.Model):
         
         phase_name = phase_names.get(new_phase, new_phase)
         
-        log = GameLog(
-            game_id=game_id,
-            action="تغيير المرحلة",
+        entry = GameLog.build_entry(
+            game_id,
+            "تغيير المرحلة",
             description=f"بدأت مرحلة {phase_name}",
             level=LogLevel.GAME,
             round_number=round_number,
             phase=new_phase
         )
-        
-        db.session.add(log)
-        db.session.commit()
-        return log
+        log_writer.write(entry)
+        return entry
     
     @staticmethod
     def log_role_action(game_id, player_id, action_type, target_id, round_number, phase):
         """تسجيل عمل دور خاص"""
-        from .player import Player
-        player = Player.query.get(player_id)
-        target = Player.query.get(target_id) if target_id else None
-        
-        player_name = player.user.display_name if player and player.user else "لاعب"
-        target_name = target.user.display_name if target and target.user else "لاعب"
+        player_name = log_writer.get_player_name(player_id)
+        target_name = log_writer.get_player_name(target_id) if target_id else "لاعب"
         
         action_names = {
             'heal': 'علاج',
@@ -226,51 +228,365 @@ class GameLog(db.Model):
         action_name = action_names.get(action_type, action_type)
         target_text = f" على {target_name}" if target_id else ""
         
-        log = GameLog(
-            game_id=game_id,
+        entry = GameLog.build_entry(
+            game_id,
+            "عمل دور",
             player_id=player_id,
-            action="عمل دور",
             description=f"نفذ {player_name} عمل {action_name}{target_text}",
             level=LogLevel.GAME,
             round_number=round_number,
-            phase=phase
+            phase=phase,
+            details={
+                'action_type': action_type,
+                'target_id': target_id
+            }
         )
-        log.set_details({
-            'action_type': action_type,
-            'target_id': target_id
-        })
-        
-        db.session.add(log)
-        db.session.commit()
-        return log
+        log_writer.write(entry)
+        return entry
     
     @staticmethod
     def log_suspicious_activity(game_id, player_id, activity_type, details, round_number=None, phase=None):
         """تسجيل نشاط مشبوه"""
-        from .player import Player
-        player = Player.query.get(player_id)
-        player_name = player.user.display_name if player and player.user else "لاعب"
+        player_name = log_writer.get_player_name(player_id)
         
-        log = GameLog(
-            game_id=game_id,
+        entry = GameLog.build_entry(
+            game_id,
+            "نشاط مشبوه",
             player_id=player_id,
-            action="نشاط مشبوه",
             description=f"نشاط مشبوه من {player_name}: {activity_type}",
             level=LogLevel.WARNING,
             round_number=round_number,
-            phase=phase
+            phase=phase,
+            details={
+                'activity_type': activity_type,
+                'details': details
+            }
         )
-        log.set_details({
-            'activity_type': activity_type,
-            'details': details
-        })
-        
-        db.session.add(log)
-        db.session.commit()
-        return log
+        log_writer.write(entry)
+        return entry
     
     def __repr__(self):
         return f'<GameLog {self.id}: {self.action} in Game {self.game_id}>'
     
     def __str__(self):
-        return f"[{self.level.value.upper()}] {self.action}: {self.description}"
\ No newline at end of file
+        return f"[{self.level.value.upper()}] {self.action}: {self.description}"
+
+class GameLogWriter:
+    """كاتب سجلات مؤجل بدفعات
+    
+    السجلات توضع في مخزن محدود ويكتبها خيط خلفي بإدراج جماعي واحد
+    (bulk_insert_mappings) عند امتلاء الدفعة أو مرور الفترة المحددة.
+    عند فشل الدفعة يفحص اتصال قاعدة البيانات: إذا كانت تستجيب فالخطأ في
+    صفوف بعينها، فتكتب الدفعة صفاً صفاً وتعزل الصفوف الفاشلة في dead_letters.
+    وإذا لم تستجب (مثل "database is locked") تعاد المحاولة بتأخير متزايد ثم
+    ترجع الصفوف لآخر المخزن، والصف الذي يرجع max_requeues مرة يعزل أيضاً.
+    سحب الدفعة وكتابتها يتمان تحت قفل الكتابة، فـ flush() تنتظر أي دفعة قيد
+    الكتابة. قبل تهيئة التطبيق تكتب السجلات مباشرة عبر الجلسة الحالية.
+    """
+    
+    def __init__(self, batch_size: int = 200, flush_interval: float = 1.0,
+                 max_queue: int = 10000, name_cache_size: int = 10000,
+                 max_retries: int = 3, retry_backoff: float = 0.2,
+                 max_requeues: int = 3, dead_letter_size: int = 1000):
+        self.app = None
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.max_requeues = max_requeues
+        self.put_timeout = 0.5
+        self.name_cache_size = name_cache_size
+        
+        self._buffer: List[Dict] = []
+        self._buffer_lock = threading.Lock()
+        self._ready = threading.Condition(self._buffer_lock)  # دفعة ممتلئة
+        self._space = threading.Condition(self._buffer_lock)  # مساحة في المخزن
+        self._write_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        
+        # مرات إرجاع كل صف للمخزن (id(entry) -> العدد) والصفوف المعزولة
+        self._requeues: Dict[int, int] = {}
+        self.dead_letters: 'deque[Dict]' = deque(maxlen=dead_letter_size)
+        
+        # ذاكرة أسماء اللاعبين (player_id -> display_name)
+        self._names: 'OrderedDict[int, str]' = OrderedDict()
+        self._names_lock = threading.Lock()
+        
+        # المقاييس
+        self.written_total = 0
+        self.batches_total = 0
+        self.dropped_total = 0
+        self.errors_total = 0
+        self.retries_total = 0
+        self.requeued_total = 0
+        self.dead_lettered_total = 0
+        self.last_batch_size = 0
+    
+    def init_app(self, app):
+        """ربط الكاتب بالتطبيق وتشغيل الخيط الخلفي"""
+        self.app = app
+        self.batch_size = app.config.get('GAME_LOG_BATCH_SIZE', self.batch_size)
+        self.flush_interval = app.config.get('GAME_LOG_FLUSH_INTERVAL', self.flush_interval)
+        self.max_queue = app.config.get('GAME_LOG_QUEUE_SIZE', self.max_queue)
+        self.max_retries = app.config.get('GAME_LOG_MAX_RETRIES', self.max_retries)
+        self.retry_backoff = app.config.get('GAME_LOG_RETRY_BACKOFF', self.retry_backoff)
+        self.max_requeues = app.config.get('GAME_LOG_MAX_REQUEUES', self.max_requeues)
+        app.extensions['game_log_writer'] = self
+        self.start()
+        atexit.register(self.stop)
+    
+    def start(self):
+        """تشغيل خيط الكتابة"""
+        if self._thread and self._thread.is_alive():
+            return
+        
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='game-log-writer', daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        """إيقاف الخيط بعد كتابة ما تبقى"""
+        self._stop_event.set()
+        with self._ready:
+            self._ready.notify()
+        if self._thread:
+            self._thread.join(timeout=self.flush_interval * 2)
+            self._thread = None
+        self.flush()
+    
+    @property
+    def is_running(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+    
+    def write(self, entry: Dict, commit: bool = True):
+        """إضافة سجل (قاموس من GameLog.build_entry)"""
+        if not self.is_running:
+            # بدون خيط خلفي: كتابة مباشرة في جلسة المستدعي
+            db.session.add(GameLog(**entry))
+            if commit:
+                db.session.commit()
+            return
+        
+        if self._offer(entry):
+            return
+        
+        # المخزن ممتلئ: كتابة مباشرة في خيط المستدعي بدل الإسقاط
+        self.flush()
+        if not self._offer(entry, timeout=0):
+            self.dropped_total += 1
+            print("⚠️ مخزن سجلات اللعبة ممتلئ - تم إسقاط سجل")
+    
+    def _offer(self, entry: Dict, timeout: float = None) -> bool:
+        """إضافة سجل للمخزن (انتظار المساحة حتى timeout)"""
+        deadline = time.monotonic() + (self.put_timeout if timeout is None else timeout)
+        with self._space:
+            while len(self._buffer) >= self.max_queue:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._space.wait(remaining)
+            
+            self._buffer.append(entry)
+            if len(self._buffer) >= self.batch_size:
+                self._ready.notify()
+        return True
+    
+    def flush(self) -> int:
+        """كتابة كل السجلات المعلقة فوراً (تستدعى عند انتهاء اللعبة)
+        
+        تنتظر الدفعة التي يكتبها الخيط الخلفي إن وجدت، فعند العودة كل سجل
+        أضيف قبل الاستدعاء مكتوب (أو معزول، أو أعيد للمخزن إذا لم تستجب
+        قاعدة البيانات).
+        """
+        with self._write_lock:
+            return self._write_pending()
+    
+    def _take_pending(self) -> List[Dict]:
+        """سحب كل ما في المخزن"""
+        with self._space:
+            batch = self._buffer
+            self._buffer = []
+            self._space.notify_all()
+        return batch
+    
+    def _write_pending(self) -> int:
+        # يجب استدعاؤها مع قفل الكتابة
+        batch = self._take_pending()
+        if not batch:
+            return 0
+        return self._write_batch(batch)
+    
+    def _run(self):
+        """حلقة الخيط الخلفي: تجميع حسب الحجم أو الوقت"""
+        last_flush = time.monotonic()
+        
+        while not self._stop_event.is_set():
+            with self._ready:
+                timeout = self.flush_interval - (time.monotonic() - last_flush)
+                if len(self._buffer) < self.batch_size and timeout > 0:
+                    self._ready.wait(timeout)
+            
+            with self._write_lock:
+                self._write_pending()
+            last_flush = time.monotonic()
+    
+    def _write_batch(self, batch: List[Dict]) -> int:
+        """إدراج دفعة في معاملة واحدة مع إعادة المحاولة (يجب استدعاؤها مع قفل الكتابة)"""
+        if self.app is not None:
+            # سياق مستقل = جلسة مستقلة لا تتداخل مع جلسة المستدعي
+            with self.app.app_context():
+                return self._write_batch_in_context(batch)
+        return self._write_batch_in_context(batch)
+    
+    def _write_batch_in_context(self, batch: List[Dict]) -> int:
+        for attempt in range(self.max_retries + 1):
+            try:
+                self._insert(batch)
+            except Exception as e:
+                self.errors_total += 1
+                if self._database_available():
+                    # قاعدة البيانات تعمل: صف أو أكثر لا يمكن إدراجه
+                    return self._write_rows(batch)
+                if attempt < self.max_retries:
+                    self.retries_total += 1
+                    time.sleep(self.retry_backoff * (2 ** attempt))
+                    continue
+                
+                print(f"خطأ في كتابة سجلات اللعبة ({len(batch)} سجل) بعد {attempt + 1} محاولات: {e}")
+                self._requeue(batch)
+                return 0
+            
+            self._written(batch)
+            self.batches_total += 1
+            self.last_batch_size = len(batch)
+            return len(batch)
+        return 0
+    
+    def _write_rows(self, batch: List[Dict]) -> int:
+        """كتابة صف صف: الصفوف الفاشلة تعزل ولا تعود للمخزن"""
+        written = []
+        for entry in batch:
+            try:
+                self._insert([entry])
+            except Exception as e:
+                self.errors_total += 1
+                self._dead_letter([entry], e)
+            else:
+                written.append(entry)
+        
+        self._written(written)
+        self.batches_total += 1
+        self.last_batch_size = len(written)
+        return len(written)
+    
+    @staticmethod
+    def _insert(batch: List[Dict]):
+        try:
+            db.session.bulk_insert_mappings(GameLog, batch)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+    
+    @staticmethod
+    def _database_available() -> bool:
+        try:
+            db.session.execute(db.text('SELECT 1'))
+            db.session.rollback()
+            return True
+        except Exception:
+            db.session.rollback()
+            return False
+    
+    def _written(self, entries: List[Dict]):
+        self.written_total += len(entries)
+        if self._requeues:
+            for entry in entries:
+                self._requeues.pop(id(entry), None)
+    
+    def _dead_letter(self, entries: List[Dict], error):
+        """عزل صفوف لا يمكن كتابتها (تبقى آخر dead_letter_size منها للفحص)"""
+        for entry in entries:
+            self._requeues.pop(id(entry), None)
+            self.dead_letters.append(entry)
+        self.dead_lettered_total += len(entries)
+        print(f"⚠️ عزل {len(entries)} من سجلات اللعبة: {error}")
+    
+    def _requeue(self, batch: List[Dict]):
+        """إرجاع دفعة فاشلة لآخر المخزن حتى لا تؤخر السجلات الجديدة
+        
+        الصف الذي أعيد max_requeues مرة يعزل، والأقدم يسقط إذا تجاوز المخزن حده.
+        """
+        retry, expired = [], []
+        for entry in batch:
+            count = self._requeues.get(id(entry), 0) + 1
+            if count > self.max_requeues:
+                expired.append(entry)
+            else:
+                self._requeues[id(entry)] = count
+                retry.append(entry)
+        if expired:
+            self._dead_letter(expired, f"أعيدت {self.max_requeues} مرات")
+        
+        with self._space:
+            self._buffer.extend(retry)
+            overflow = len(self._buffer) - self.max_queue
+            if overflow > 0:
+                for entry in self._buffer[:overflow]:
+                    self._requeues.pop(id(entry), None)
+                del self._buffer[:overflow]
+                self.dropped_total += overflow
+            self.requeued_total += len(retry)
+    
+    def cache_player_names(self, names: Dict[int, str]):
+        """حفظ أسماء اللاعبين في الذاكرة"""
+        with self._names_lock:
+            for player_id, name in names.items():
+                self._names[player_id] = name
+                self._names.move_to_end(player_id)
+            while len(self._names) > self.name_cache_size:
+                self._names.popitem(last=False)
+    
+    def forget_players(self, player_ids: Iterable[int]):
+        """إزالة لاعبين من ذاكرة الأسماء"""
+        with self._names_lock:
+            for player_id in player_ids:
+                self._names.pop(player_id, None)
+    
+    def get_player_name(self, player_id: int) -> str:
+        """اسم اللاعب من الذاكرة (أو من قاعدة البيانات مرة واحدة)"""
+        if not player_id:
+            return "لاعب"
+        
+        with self._names_lock:
+            name = self._names.get(player_id)
+        if name:
+            return name
+        
+        from .player import Player
+        player = Player.query.get(player_id)
+        name = player.user.display_name if player and player.user else "لاعب"
+        if player:
+            self.cache_player_names({player_id: name})
+        return name
+    
+    def get_statistics(self) -> Dict:
+        """إحصائيات الكاتب"""
+        return {
+            'queued': len(self._buffer),
+            'written_total': self.written_total,
+            'batches_total': self.batches_total,
+            'dropped_total': self.dropped_total,
+            'errors_total': self.errors_total,
+            'retries_total': self.retries_total,
+            'requeued_total': self.requeued_total,
+            'dead_lettered_total': self.dead_lettered_total,
+            'last_batch_size': self.last_batch_size,
+            'cached_names': len(self._names),
+            'is_running': self.is_running
+        }
+
+# الكاتب المشترك على مستوى العملية
+log_writer = GameLogWriter()
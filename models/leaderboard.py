@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+لوحة المتصدرين المحسوبة مسبقاً
+Materialized Leaderboard
+"""
+
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import case, delete, func, insert, select, update
+from . import db
+from .statistics import UserStatistics
+from .user import User
+
+def _win_rate_key(stats: UserStatistics) -> Optional[Tuple[float, int]]:
+    # معدل الفوز مع الحد الأدنى من الألعاب، وعدد الألعاب يحسم التعادل
+    if stats.total_games_played < 5:
+        return None
+    return round(stats.get_win_rate(), 4), stats.total_games_played
+
+def _games_won_key(stats: UserStatistics) -> Optional[Tuple[float, int]]:
+    if stats.total_games_played <= 0:
+        return None
+    return stats.games_won, 0
+
+def _total_games_key(stats: UserStatistics) -> Optional[Tuple[float, int]]:
+    if stats.total_games_played <= 0:
+        return None
+    return stats.total_games_played, 0
+
+# أنواع الترتيب: دالة مفتاح الترتيب (None = غير مؤهل للوحة)
+SORT_MODES: Dict[str, Callable[[UserStatistics], Optional[Tuple[float, int]]]] = {
+    'win_rate': _win_rate_key,
+    'games_won': _games_won_key,
+    'total_games': _total_games_key
+}
+
+class LeaderboardEntry(db.Model):
+    """ترتيب مستخدم في أحد أنواع لوحة المتصدرين
+
+    كل نوع ترتيب جدول ترتيب مستقل (sort_mode) مرتب تنازلياً حسب
+    (score, tiebreak, user_id)، والترتيب rank متصل يبدأ من 1. قراءة صفحة
+    تمر على فهرس (sort_mode, rank) فقط، والتحديث عند نهاية اللعبة يعيد إدراج
+    اللاعبين الذين تغيرت إحصائياتهم ويزيح الباقين بعبارة UPDATE واحدة لكل نوع.
+    """
+
+    __tablename__ = 'leaderboard_entries'
+    __table_args__ = (
+        db.UniqueConstraint('sort_mode', 'user_id', name='uq_leaderboard_mode_user'),
+        db.Index('ix_leaderboard_mode_rank', 'sort_mode', 'rank'),
+        db.Index('ix_leaderboard_mode_score', 'sort_mode', 'score', 'tiebreak', 'user_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    sort_mode = db.Column(db.String(20), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    rank = db.Column(db.Integer, nullable=False)
+
+    # مفتاح الترتيب
+    score = db.Column(db.Float, nullable=False)
+    tiebreak = db.Column(db.Integer, default=0, nullable=False)
+
+    # قيم العرض (من UserStatistics وقت التحديث)
+    total_games = db.Column(db.Integer, default=0, nullable=False)
+    games_won = db.Column(db.Integer, default=0, nullable=False)
+    win_rate = db.Column(db.Float, default=0.0, nullable=False)
+    survival_rate = db.Column(db.Float, default=0.0, nullable=False)
+    favorite_role = db.Column(db.String(20), nullable=True)
+
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    @staticmethod
+    def _values(stats: UserStatistics) -> Dict:
+        """قيم العرض من الإحصائيات"""
+        return {
+            'total_games': stats.total_games_played,
+            'games_won': stats.games_won,
+            'win_rate': stats.get_win_rate(),
+            'survival_rate': stats.get_survival_rate(),
+            'favorite_role': stats.get_favorite_role(),
+            'updated_at': datetime.utcnow()
+        }
+
+    def to_dict(self, username=None, display_name=None, avatar_url=None):
+        """تحويل الترتيب إلى قاموس (نفس صيغة لوحة المتصدرين السابقة)"""
+        return {
+            'rank': self.rank,
+            'user_id': self.user_id,
+            'username': username,
+            'display_name': display_name,
+            'avatar_url': avatar_url,
+            'total_games': self.total_games,
+            'games_won': self.games_won,
+            'win_rate': self.win_rate,
+            'survival_rate': self.survival_rate,
+            'favorite_role': self.favorite_role
+        }
+
+    def __repr__(self):
+        return f'<LeaderboardEntry {self.sort_mode} #{self.rank}: User {self.user_id}>'
+
+class Leaderboard:
+    """قراءة وتحديث لوحة المتصدرين المحسوبة مسبقاً
+
+    الصفحات تحفظ في ذاكرة قصيرة المدة (cache_ttl) لأنها أكثر نقطة طلباً،
+    وتمسح عند كل تحديث. التحديثات التدريجية تمر بقفل واحد في العملية؛ مع
+    عدة عمليات قد تنحرف الترتيبات قليلاً عند تزامن نهاية الألعاب، و rebuild
+    (flask rebuild-leaderboard) يعيد حسابها بالكامل.
+    """
+
+    def __init__(self, cache_ttl: float = 10):
+        self.cache_ttl = cache_ttl
+        self._cache: Dict[Tuple, Tuple[float, Dict]] = {}
+        self._cache_lock = threading.Lock()
+        self._update_lock = threading.RLock()
+
+        # المقاييس
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.incremental_updates = 0
+        self.rebuilds = 0
+
+    def init_app(self, app):
+        """قراءة الإعدادات من التطبيق"""
+        self.cache_ttl = app.config.get('LEADERBOARD_CACHE_TTL', self.cache_ttl)
+
+    # ==================== القراءة ====================
+
+    def cached(self, key: Tuple, loader: Callable[[], Dict]) -> Dict:
+        """نتيجة من الذاكرة أو من loader مع حفظها لمدة cache_ttl"""
+        now = time.monotonic()
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry and entry[0] > now:
+                self.cache_hits += 1
+                return entry[1]
+
+        self.cache_misses += 1
+        value = loader()
+        if self.cache_ttl > 0:
+            with self._cache_lock:
+                self._cache[key] = (now + self.cache_ttl, value)
+        return value
+
+    def invalidate(self):
+        """مسح الصفحات المحفوظة"""
+        with self._cache_lock:
+            self._cache.clear()
+
+    def page_query(self, sort_by: str):
+        """استعلام ترتيب نوع واحد مع بيانات المستخدم"""
+        return db.session.query(
+            LeaderboardEntry, User.username, User.display_name, User.avatar_url
+        ).join(User, LeaderboardEntry.user_id == User.id).filter(
+            LeaderboardEntry.sort_mode == sort_by
+        )
+
+    def get_page(self, sort_by: str, after_rank: int = 0, limit: int = 50) -> Dict:
+        """صفحة بعد الترتيب after_rank (من الذاكرة إن وجدت)"""
+        def load():
+            rows = self.page_query(sort_by).filter(
+                LeaderboardEntry.rank > after_rank
+            ).order_by(LeaderboardEntry.rank).limit(limit + 1).all()
+
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+            return {
+                'entries': [entry.to_dict(username, display_name, avatar_url)
+                            for entry, username, display_name, avatar_url in rows],
+                'last_rank': rows[-1][0].rank if has_more else None
+            }
+
+        return self.cached(('page', sort_by, after_rank, limit), load)
+
+    def count(self, sort_by: str) -> int:
+        """عدد المستخدمين في ترتيب نوع واحد"""
+        return self.cached(('count', sort_by), lambda: LeaderboardEntry.query.filter_by(sort_mode=sort_by).count())
+
+    # ==================== التحديث ====================
+
+    def update_users(self, statistics: Iterable[UserStatistics], commit: bool = True):
+        """تحديث ترتيب مستخدمين تغيرت إحصائياتهم (عند نهاية اللعبة)
+
+        عدد ثابت من العبارات مهما كان عدد اللاعبين: المستخدمون وترتيباتهم
+        القديمة، عدد من يسبق كل لاعب في كل نوع (عبارة واحدة)، إزاحة الباقين
+        (UPDATE لكل نوع)، ثم حذف وإدراج ترتيبات اللاعبين.
+        """
+        statistics = {stats.user_id: stats for stats in statistics if stats is not None}
+        if not statistics:
+            return
+        user_ids = list(statistics)
+
+        with self._update_lock:
+            active = {user_id for user_id, is_active in db.session.query(User.id, User.is_active).filter(
+                User.id.in_(user_ids)
+            ) if is_active}
+
+            old_ranks: Dict[str, List[int]] = {sort_mode: [] for sort_mode in SORT_MODES}
+            for sort_mode, rank in db.session.query(LeaderboardEntry.sort_mode, LeaderboardEntry.rank).filter(
+                LeaderboardEntry.user_id.in_(user_ids)
+            ):
+                old_ranks[sort_mode].append(rank)
+
+            # (النوع، المفتاح، المستخدم) لكل لاعب مؤهل
+            ranked = []
+            for sort_mode, key_func in SORT_MODES.items():
+                for user_id in sorted(active):
+                    key = key_func(statistics[user_id])
+                    if key is not None:
+                        ranked.append((sort_mode, key, user_id))
+            ahead = self._count_ahead(ranked, user_ids)
+
+            values = []
+            for sort_mode in SORT_MODES:
+                placed = sorted(
+                    ((key[0], key[1], user_id, ahead[index])
+                     for index, (mode, key, user_id) in enumerate(ranked) if mode == sort_mode),
+                    reverse=True
+                )
+                # من يسبقه من اللاعبين المحدثين هم من قبله في الترتيب نفسه
+                for position, (score, tiebreak, user_id, others) in enumerate(placed):
+                    values.append(dict(sort_mode=sort_mode, user_id=user_id, rank=others + position + 1,
+                                       score=score, tiebreak=tiebreak,
+                                       **LeaderboardEntry._values(statistics[user_id])))
+                self._shift(sort_mode, sorted(old_ranks[sort_mode]),
+                            [others for *_, others in placed], user_ids)
+
+            db.session.execute(delete(LeaderboardEntry).where(LeaderboardEntry.user_id.in_(user_ids)),
+                               execution_options={'synchronize_session': False})
+            if values:
+                db.session.execute(insert(LeaderboardEntry), values)
+            self.incremental_updates += 1
+
+            if commit:
+                db.session.commit()
+        self.invalidate()
+
+    @staticmethod
+    def _count_ahead(ranked: List[Tuple[str, Tuple[float, int], int]], user_ids: List[int]) -> List[int]:
+        """عدد من يسبق كل لاعب من غير المحدثين (عبارة SELECT واحدة)"""
+        if not ranked:
+            return []
+
+        counts = []
+        for sort_mode, (score, tiebreak), user_id in ranked:
+            counts.append(select(func.count(LeaderboardEntry.id)).where(
+                LeaderboardEntry.sort_mode == sort_mode,
+                LeaderboardEntry.user_id.not_in(user_ids),
+                (LeaderboardEntry.score > score)
+                | ((LeaderboardEntry.score == score) & (LeaderboardEntry.tiebreak > tiebreak))
+                | ((LeaderboardEntry.score == score) & (LeaderboardEntry.tiebreak == tiebreak)
+                   & (LeaderboardEntry.user_id > user_id))
+            ).scalar_subquery())
+        return list(db.session.execute(select(*counts)).one())
+
+    @staticmethod
+    def _shift(sort_mode: str, removed: List[int], inserted: List[int], user_ids: List[int]):
+        """إزاحة ترتيبات الباقين بعد حذف ترتيبات removed وإدراج لاعبين
+
+        inserted: عدد الباقين الذين يسبقون كل لاعب مدرج (تصاعدياً). الترتيب
+        القديم r ينقص بعدد المحذوفين قبله ويزيد بعدد المدرجين قبله، والإزاحة
+        ثابتة بين نقاط التغير فتكتب كـ CASE في عبارة UPDATE واحدة.
+        """
+        # أول ترتيب قديم يأتي بعد كل لاعب مدرج (يتخطى الترتيبات المحذوفة)
+        thresholds = []
+        for others in inserted:
+            rank = others + 1
+            for removed_rank in removed:
+                if removed_rank > rank:
+                    break
+                rank += 1
+            thresholds.append(rank)
+
+        points = sorted(set(thresholds) | {rank + 1 for rank in removed})
+        deltas = [(point, bisect_right(thresholds, point) - bisect_left(removed, point)) for point in points]
+        if not any(delta for _, delta in deltas):
+            return
+
+        shift = case(*((LeaderboardEntry.rank >= point, delta) for point, delta in reversed(deltas)), else_=0)
+        db.session.execute(
+            update(LeaderboardEntry).where(
+                LeaderboardEntry.sort_mode == sort_mode,
+                LeaderboardEntry.rank >= points[0],
+                LeaderboardEntry.user_id.not_in(user_ids)
+            ).values(rank=LeaderboardEntry.rank + shift),
+            execution_options={'synchronize_session': False}
+        )
+
+    def rebuild(self, commit: bool = True) -> Dict[str, int]:
+        """إعادة حساب كل الترتيبات من UserStatistics (للإصلاح الدوري)"""
+        with self._update_lock:
+            rows = UserStatistics.query.join(User, UserStatistics.user_id == User.id).filter(
+                User.is_active == True,
+                UserStatistics.total_games_played > 0
+            ).all()
+
+            db.session.execute(delete(LeaderboardEntry))
+
+            counts = {}
+            for sort_mode, key_func in SORT_MODES.items():
+                ranked = []
+                for stats in rows:
+                    key = key_func(stats)
+                    if key is not None:
+                        ranked.append((key[0], key[1], stats.user_id, stats))
+                ranked.sort(key=lambda item: item[:3], reverse=True)
+
+                values = [
+                    dict(sort_mode=sort_mode, user_id=user_id, rank=rank, score=score,
+                         tiebreak=tiebreak, **LeaderboardEntry._values(stats))
+                    for rank, (score, tiebreak, user_id, stats) in enumerate(ranked, 1)
+                ]
+                if values:
+                    db.session.execute(insert(LeaderboardEntry), values)
+                counts[sort_mode] = len(values)
+
+            self.rebuilds += 1
+            if commit:
+                db.session.commit()
+        self.invalidate()
+        return counts
+
+    def get_statistics(self) -> Dict:
+        """إحصائيات لوحة المتصدرين"""
+        return {
+            'cache_ttl': self.cache_ttl,
+            'cached_pages': len(self._cache),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'incremental_updates': self.incremental_updates,
+            'rebuilds': self.rebuilds
+        }
+
+# لوحة المتصدرين المشتركة
+leaderboard = Leaderboard()
\ No newline at end of file
@@ -8,6 +8,7 @@ Message Model
 from datetime import datetime
 from enum import Enum
 import json
+from sqlalchemy import update
 from . import db
 
 class MessageType(Enum):
@@ -31,6 +32,10 @@ class Message(db.Model):
     """نموذج الرسائل في الدردشة"""
     
     __tablename__ = 'messages'
+    __table_args__ = (
+        # سجل الغرفة بالمؤشر (room_id, sent_at, id)
+        db.Index('ix_messages_room_sent', 'room_id', 'sent_at', 'id'),
+    )
     
     # المعرف الأساسي
     id = db.Column(db.Integer, primary_key=True)
@@ -100,7 +105,7 @@ class Message(db.Model):
             return json.loads(self.message_metadata)
         return {}
     
-    def flag_as_suspicious(self, reason, score=0.8):
+    def flag_as_suspicious(self, reason, score=0.8, commit=True):
         """تمييز الرسالة كمشبوهة"""
         self.is_flagged = True
         self.suspicion_score = max(self.suspicion_score, score)
@@ -117,9 +122,10 @@ class Message(db.Model):
         })
         
         self.set_ai_analysis(analysis)
-        db.session.commit()
+        if commit:
+            db.session.commit()
     
-    def hide_message(self, reason="مخالفة للقوانين"):
+    def hide_message(self, reason="مخالفة للقوانين", commit=True):
         """إخفاء الرسالة"""
         self.status = MessageStatus.HIDDEN
         
@@ -129,7 +135,28 @@ class Message(db.Model):
         metadata['hidden_at'] = datetime.utcnow().isoformat()
         self.set_metadata(metadata)
         
-        db.session.commit()
+        if commit:
+            db.session.commit()
+    
+    def get_transcription_status(self):
+        """حالة تحويل الرسالة الصوتية إلى نص (pending / done / failed)"""
+        status = self.get_metadata().get('transcription_status')
+        if status:
+            return status
+        return 'done' if self.transcription else None
+    
+    def set_transcription(self, transcription, status='done', commit=True):
+        """حفظ النص المحول وحالة التحويل"""
+        if transcription:
+            self.transcription = transcription
+            self.content = transcription
+        
+        metadata = self.get_metadata()
+        metadata['transcription_status'] = status
+        self.set_metadata(metadata)
+        
+        if commit:
+            db.session.commit()
     
     def edit_content(self, new_content):
         """تعديل محتوى الرسالة"""
@@ -156,43 +183,22 @@ class Message(db.Model):
         
         return player and player.role == PlayerRole.MAFIA
     
-    def can_be_seen_by(self, user_id):
-        """التحقق من إمكانية رؤية الرسالة"""
-        # الرسائل المحذوفة لا يمكن رؤيتها
-        if self.status == MessageStatus.DELETED:
-            return False
-        
-        # رسائل النظام يمكن رؤيتها من الجميع
-        if self.message_type == MessageType.SYSTEM:
-            return True
+    def can_be_seen_by(self, user_id, visibility=None):
+        """التحقق من إمكانية رؤية الرسالة
         
-        # الرسائل المخفية يمكن رؤيتها من المرسل فقط
-        if self.status == MessageStatus.HIDDEN:
-            return self.user_id == user_id
-        
-        # الرسائل الخاصة
-        if self.message_type == MessageType.PRIVATE:
-            metadata = self.get_metadata()
-            target_user_id = metadata.get('target_user_id')
-            return user_id in [self.user_id, target_user_id]
-        
-        # رسائل المافيا في الليل
-        if self.message_type == MessageType.GAME_ACTION:
-            from .player import Player, PlayerRole
-            player = Player.query.filter_by(
-                user_id=user_id,
-                room_id=self.room_id
-            ).first()
-            
-            # إذا كانت رسالة مافيا، فقط المافيا يمكنهم رؤيتها
-            if self.is_from_mafia():
-                return player and player.role == PlayerRole.MAFIA
-        
-        return True
+        visibility: MessageVisibility مشترك لصفحة كاملة حتى لا تتكرر استعلامات
+        المافيا لكل رسالة.
+        """
+        if visibility is None:
+            from .message_visibility import MessageVisibility
+            visibility = MessageVisibility(self.room_id, user_id)
+        return visibility.can_see(self)
     
-    def get_display_content(self, viewer_user_id=None):
+    def get_display_content(self, viewer_user_id=None, visible=None):
         """الحصول على المحتوى المعروض"""
-        if not self.can_be_seen_by(viewer_user_id):
+        if visible is None:
+            visible = self.can_be_seen_by(viewer_user_id)
+        if not visible:
             return "[رسالة مخفية]"
         
         if self.status == MessageStatus.HIDDEN:
@@ -203,8 +209,14 @@ class Message(db.Model):
         
         return self.content
     
-    def to_dict(self, viewer_user_id=None, include_analysis=False):
-        """تحويل الرسالة إلى قاموس"""
+    def to_dict(self, viewer_user_id=None, include_analysis=False, visibility=None, visible=None):
+        """تحويل الرسالة إلى قاموس
+        
+        لتحويل صفحة كاملة استخدم MessageVisibility.serialize.
+        """
+        if visible is None:
+            visible = self.can_be_seen_by(viewer_user_id, visibility)
+        
         data = {
             'id': self.id,
             'user_id': self.user_id,
@@ -212,14 +224,14 @@ class Message(db.Model):
             'sender_avatar': self.user.avatar_url if self.user else None,
             'room_id': self.room_id,
             'message_type': self.message_type.value,
-            'content': self.get_display_content(viewer_user_id),
+            'content': self.get_display_content(viewer_user_id, visible),
             'status': self.status.value,
             'sent_at': self.sent_at.isoformat(),
             'edited_at': self.edited_at.isoformat() if self.edited_at else None,
             'game_round': self.game_round,
             'game_phase': self.game_phase,
             'is_flagged': self.is_flagged,
-            'can_see': self.can_be_seen_by(viewer_user_id)
+            'can_see': visible
         }
         
         # معلومات الرسائل الصوتية
@@ -227,7 +239,8 @@ class Message(db.Model):
             data.update({
                 'voice_file_path': self.voice_file_path,
                 'voice_duration': self.voice_duration,
-                'transcription': self.transcription
+                'transcription': self.transcription,
+                'transcription_status': self.get_transcription_status()
             })
         
         # تحليل الذكاء الاصطناعي (للمشرفين فقط)
@@ -240,6 +253,23 @@ class Message(db.Model):
         
         return data
     
+    @staticmethod
+    def bulk_update_analysis(rows, commit=True):
+        """تحديث نتائج التحليل لعدة رسائل في استعلام واحد
+        
+        rows: قواميس تحتوي id مع suspicion_score و/أو is_flagged و/أو ai_analysis
+        
+        التحديث الجماعي لا يطلق أحداث الكائنات؛ سجل الرسائل في الذاكرة يلتقطه
+        من do_orm_execute ويطبقه بعد التثبيت.
+        """
+        if not rows:
+            return 0
+        
+        db.session.execute(update(Message), rows)
+        if commit:
+            db.session.commit()
+        return len(rows)
+    
     @staticmethod
     def create_system_message(room_id, content, **kwargs):
         """إنشاء رسالة نظام"""
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+قواعد رؤية الرسائل لمشاهد واحد
+Viewer-Aware Message Visibility
+"""
+
+from typing import Dict, Iterable, List, Optional, Set
+from sqlalchemy.orm.attributes import set_committed_value
+from . import db
+from .message import Message, MessageStatus, MessageType
+from .player import Player, PlayerRole
+from .user import User
+
+class MessageVisibility:
+    """تقييم رؤية صفحة رسائل كاملة لمشاهد واحد
+
+    لاعبو المافيا في الغرفة (ومنهم حالة المشاهد نفسه) يحملون باستعلام واحد
+    عند أول رسالة عمل في اللعبة فقط، بدل استعلامين لكل رسالة في
+    Message.can_be_seen_by. نفس القواعد تطبق على كائنات Message وعلى قواميس
+    سجل الرسائل في الذاكرة.
+    """
+
+    def __init__(self, room_id: int, viewer_user_id: Optional[int]):
+        self.room_id = room_id
+        self.viewer_user_id = viewer_user_id
+        self._mafia_user_ids: Optional[Set[int]] = None
+
+    @property
+    def mafia_user_ids(self) -> Set[int]:
+        if self._mafia_user_ids is None:
+            rows = db.session.query(Player.user_id).filter(
+                Player.room_id == self.room_id,
+                Player.role == PlayerRole.MAFIA
+            ).all()
+            self._mafia_user_ids = {row[0] for row in rows}
+        return self._mafia_user_ids
+
+    @property
+    def viewer_is_mafia(self) -> bool:
+        return self.viewer_user_id in self.mafia_user_ids
+
+    def is_mafia(self, user_id: Optional[int]) -> bool:
+        """التحقق من كون المستخدم من المافيا في الغرفة"""
+        return bool(user_id) and user_id in self.mafia_user_ids
+
+    def _can_see(self, status: str, message_type: str, user_id: Optional[int],
+                 target_user_id: Optional[int]) -> bool:
+        # الرسائل المحذوفة لا يمكن رؤيتها
+        if status == MessageStatus.DELETED.value:
+            return False
+
+        # رسائل النظام يمكن رؤيتها من الجميع
+        if message_type == MessageType.SYSTEM.value:
+            return True
+
+        # الرسائل المخفية يمكن رؤيتها من المرسل فقط
+        if status == MessageStatus.HIDDEN.value:
+            return user_id == self.viewer_user_id
+
+        # الرسائل الخاصة
+        if message_type == MessageType.PRIVATE.value:
+            return self.viewer_user_id in (user_id, target_user_id)
+
+        # رسائل المافيا يراها المافيا فقط
+        if message_type == MessageType.GAME_ACTION.value and self.is_mafia(user_id):
+            return self.viewer_is_mafia
+
+        return True
+
+    def can_see(self, message: Message) -> bool:
+        """التحقق من إمكانية رؤية رسالة"""
+        target_user_id = None
+        if message.message_type == MessageType.PRIVATE:
+            target_user_id = message.get_metadata().get('target_user_id')
+        return self._can_see(message.status.value, message.message_type.value,
+                             message.user_id, target_user_id)
+
+    def can_see_entry(self, entry: Dict) -> bool:
+        """التحقق من إمكانية رؤية رسالة من سجل الذاكرة"""
+        return self._can_see(entry['status'], entry['message_type'],
+                             entry['user_id'], entry['_target_user_id'])
+
+    def serialize(self, messages: Iterable[Message], include_analysis: bool = False) -> List[Dict]:
+        """تصفية صفحة رسائل وتحويلها في مرور واحد (المخفية عن المشاهد تحذف)"""
+        visible = [message for message in messages if self.can_see(message)]
+        preload_senders(visible)
+        return [
+            message.to_dict(self.viewer_user_id, include_analysis, visibility=self, visible=True)
+            for message in visible
+        ]
+
+    def render_entry(self, entry: Dict) -> Dict:
+        """صيغة رسالة من سجل الذاكرة للمشاهد (مثل Message.to_dict)"""
+        data = {key: value for key, value in entry.items() if not key.startswith('_')}
+
+        if entry['status'] == MessageStatus.HIDDEN.value:
+            data['content'] = "[تم إخفاء هذه الرسالة]"
+        else:
+            data['content'] = entry['_content']
+        data['can_see'] = True
+        return data
+
+def preload_senders(messages: List[Message]):
+    """تحميل مرسلي الرسائل باستعلام واحد بدل استعلام لكل رسالة"""
+    missing = {
+        message.user_id for message in messages
+        if message.user_id and 'user' not in message.__dict__
+    }
+    if not missing:
+        return
+
+    users = {user.id: user for user in User.query.filter(User.id.in_(missing)).all()}
+    for message in messages:
+        if message.user_id in missing:
+            set_committed_value(message, 'user', users.get(message.user_id))
\ No newline at end of file
@@ -39,6 +39,9 @@ class Player(db.Model):
     """نموذج اللاعب في اللعبة"""
     
     __tablename__ = 'players'
+    __table_args__ = (
+        db.Index('ix_players_user_room', 'user_id', 'room_id'),
+    )
     
     # المعرف الأساسي
     id = db.Column(db.Integer, primary_key=True)
@@ -87,21 +90,28 @@ class Player(db.Model):
             if hasattr(self, key):
                 setattr(self, key, value)
     
-    def assign_role(self, role):
+    def assign_role(self, role, commit=True):
         """تعيين دور للاعب"""
         self.role = role
-        db.session.commit()
+        if commit:
+            db.session.commit()
         
         # تسجيل في سجل اللعبة
         game = self.get_current_game()
         if game:
             game.log_action(
                 f"تم تعيين دور {self.get_role_name()} للاعب {self.user.display_name}",
-                player_id=self.id
+                player_id=self.id,
+                commit=commit
             )
     
-    def kill(self, cause=DeathCause.OTHER, killed_by=None, round_number=None):
-        """قتل اللاعب"""
+    def kill(self, cause=DeathCause.OTHER, killed_by=None, round_number=None, commit=True,
+             game=None, names=None):
+        """قتل اللاعب
+        
+        game و names (معرف اللاعب -> اسمه) اختياريان لمن حملهما مسبقاً (الكتابة
+        المؤجلة لحالة اللعبة)، وبدونهما تحمل اللعبة الحالية والأسماء من قاعدة البيانات.
+        """
         if not self.is_alive:
             return False, "اللاعب ميت بالفعل"
         
@@ -114,16 +124,18 @@ class Player(db.Model):
         if killed_by:
             self.killed_by_id = killed_by
         
-        db.session.commit()
+        if commit:
+            db.session.commit()
         
         # تسجيل في سجل اللعبة
-        game = self.get_current_game()
+        game = game or self.get_current_game()
         if game:
             cause_text = self.get_death_cause_text()
             game.log_action(
-                f"مات {self.user.display_name} - {cause_text}",
+                f"مات {Player.get_name(self.id, names, self)} - {cause_text}",
                 player_id=self.id,
-                details={'cause': cause.value, 'killed_by': killed_by}
+                details={'cause': cause.value, 'killed_by': killed_by},
+                commit=commit
             )
         
         return True, "تم قتل اللاعب"
@@ -150,29 +162,33 @@ class Player(db.Model):
                 player_id=self.id
             )
     
-    def vote(self, target_player_id=None):
-        """تسجيل صوت"""
+    def vote(self, target_player_id=None, commit=True, game=None, names=None, target=None):
+        """تسجيل صوت (game و names و target اختيارية كما في kill)"""
         self.votes_cast += 1
         
         if target_player_id:
-            target = Player.query.get(target_player_id)
+            if target is None:
+                target = Player.query.get(target_player_id)
             if target:
                 target.votes_received += 1
-                db.session.commit()
+                if commit:
+                    db.session.commit()
                 
                 # تسجيل في سجل اللعبة
-                game = self.get_current_game()
+                game = game or self.get_current_game()
                 if game:
                     game.log_action(
-                        f"صوت {self.user.display_name} ضد {target.user.display_name}",
+                        f"صوت {Player.get_name(self.id, names, self)} ضد {Player.get_name(target.id, names, target)}",
                         player_id=self.id,
-                        details={'target': target_player_id}
+                        details={'target': target_player_id},
+                        commit=commit
                     )
         
-        db.session.commit()
+        if commit:
+            db.session.commit()
     
-    def take_action(self, action_type, target_id=None, details=None):
-        """تنفيذ عمل (للأدوار الخاصة)"""
+    def take_action(self, action_type, target_id=None, details=None, commit=True, game=None, names=None):
+        """تنفيذ عمل للأدوار الخاصة (game و names اختياريان كما في kill)"""
         self.actions_taken += 1
         
         # حفظ تفاصيل العمل
@@ -190,22 +206,33 @@ class Player(db.Model):
         extra_data['actions'].append(action_data)
         self.set_extra_data(extra_data)
         
-        db.session.commit()
+        if commit:
+            db.session.commit()
         
         # تسجيل في سجل اللعبة
-        game = self.get_current_game()
+        game = game or self.get_current_game()
         if game:
             target_name = ""
             if target_id:
-                target = Player.query.get(target_id)
-                target_name = f" على {target.user.display_name}" if target else ""
+                name = Player.get_name(target_id, names)
+                target_name = f" على {name}" if name else ""
             
             game.log_action(
-                f"نفذ {self.user.display_name} عمل {action_type}{target_name}",
+                f"نفذ {Player.get_name(self.id, names, self)} عمل {action_type}{target_name}",
                 player_id=self.id,
-                details=action_data
+                details=action_data,
+                commit=commit
             )
     
+    @staticmethod
+    def get_name(player_id, names=None, player=None):
+        """اسم اللاعب المعروض من names، أو من صفه (يحمل إذا لم يمرر)، أو None"""
+        if names and player_id in names:
+            return names[player_id]
+        if player is None:
+            player = Player.query.get(player_id)
+        return player.user.display_name if player else None
+    
     def set_extra_data(self, data):
         """تعيين البيانات الإضافية"""
         self.extra_data = json.dumps(data, ensure_ascii=False)
@@ -22,6 +22,9 @@ class Room(db.Model):
     """نموذج الغرفة في اللعبة"""
     
     __tablename__ = 'rooms'
+    __table_args__ = (
+        db.Index('ix_rooms_status_created', 'status', 'created_at', 'id'),
+    )
     
     # المعرف الأساسي
     id = db.Column(db.Integer, primary_key=True)
@@ -159,11 +162,12 @@ class Room(db.Model):
         
         return True, "تم بدء اللعبة"
     
-    def finish_game(self):
+    def finish_game(self, commit=True):
         """إنهاء اللعبة"""
         self.status = RoomStatus.FINISHED
         self.finished_at = datetime.utcnow()
-        db.session.commit()
+        if commit:
+            db.session.commit()
     
     def cancel_game(self):
         """إلغاء اللعبة"""
@@ -173,8 +177,8 @@ class Room(db.Model):
     
     def get_active_players(self):
         """الحصول على اللاعبين النشطين"""
-        from .player import Player
-        return Player.query.filter_by(room_id=self.id, is_active=True).all()
+        from .eager_loading import room_players
+        return room_players(self.id).all()
     
     def is_full(self):
         """التحقق من امتلاء الغرفة"""
@@ -13,6 +13,11 @@ class UserStatistics(db.Model):
     """نموذج إحصائيات المستخدم المفصلة"""
     
     __tablename__ = 'user_statistics'
+    __table_args__ = (
+        # ترتيب لوحة المتصدرين بالمؤشر
+        db.Index('ix_user_statistics_games', 'total_games_played', 'user_id'),
+        db.Index('ix_user_statistics_wins', 'games_won', 'user_id'),
+    )
     
     # المعرف الأساسي
     id = db.Column(db.Integer, primary_key=True)
@@ -88,7 +93,7 @@ class UserStatistics(db.Model):
         """إنشاء إحصائيات جديدة للمستخدم"""
         self.user_id = user_id
     
-    def update_game_stats(self, role, won, game_duration, survived=False):
+    def update_game_stats(self, role, won, game_duration, survived=False, commit=True):
         """تحديث إحصائيات اللعبة"""
         # إحصائيات عامة
         self.total_games_played += 1
@@ -115,7 +120,8 @@ class UserStatistics(db.Model):
         self.total_playtime_seconds += int(game_duration)
         self._update_average_game_duration()
         
-        db.session.commit()
+        if commit:
+            db.session.commit()
     
     def update_death_stats(self, cause):
         """تحديث إحصائيات الوفاة"""
@@ -155,7 +161,7 @@ class UserStatistics(db.Model):
         
         db.session.commit()
     
-    def update_chat_stats(self, message_length, suspicion_score=0.0, is_flagged=False):
+    def update_chat_stats(self, message_length, suspicion_score=0.0, is_flagged=False, commit=True):
         """تحديث إحصائيات الدردشة"""
         self.total_messages_sent += 1
         
@@ -171,7 +177,8 @@ class UserStatistics(db.Model):
         if is_flagged:
             self.messages_flagged_suspicious += 1
         
-        db.session.commit()
+        if commit:
+            db.session.commit()
     
     def _update_average_game_duration(self):
         """تحديث متوسط مدة اللعبة"""
@@ -32,6 +32,7 @@ class User(UserMixin, db.Model):
     # معلومات الحالة
     is_active = db.Column(db.Boolean, default=True, nullable=False)
     is_online = db.Column(db.Boolean, default=False, nullable=False)
+    is_admin = db.Column(db.Boolean, default=False, server_default=db.false(), nullable=False)
     last_seen = db.Column(db.DateTime, default=datetime.utcnow)
     
     # معلومات التسجيل
@@ -82,14 +83,15 @@ class User(UserMixin, db.Model):
             return 0.0
         return (self.games_won / self.total_games) * 100
     
-    def update_game_stats(self, won=False):
+    def update_game_stats(self, won=False, commit=True):
         """تحديث إحصائيات اللعبة"""
         self.total_games += 1
         if won:
             self.games_won += 1
         else:
             self.games_lost += 1
-        db.session.commit()
+        if commit:
+            db.session.commit()
     
     def to_dict(self, include_stats=False):
         """تحويل المستخدم إلى قاموس"""
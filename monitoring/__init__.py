@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+حزمة المراقبة والقياس
+Monitoring Package
+"""
+
+from .metrics import Histogram
+from .prometheus import PrometheusWriter
+from .query_counter import count_queries, request_query_counter
+from .query_profiler import query_profiler
+from .socket_metrics import socket_metrics
+from .stats_snapshot import StatsSnapshot
+
+__all__ = [
+    'Histogram', 'PrometheusWriter', 'count_queries', 'request_query_counter',
+    'query_profiler', 'socket_metrics', 'StatsSnapshot'
+]
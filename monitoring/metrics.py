@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+أدوات القياس
+Metrics Primitives
+"""
+
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+class Histogram:
+    """مدرج تكراري بحدود ثابتة (بالثواني افتراضياً)"""
+
+    # حدود الحاويات الافتراضية - مناسبة لقياس زمن الاستجابة
+    DEFAULT_BUCKETS = (
+        0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+        0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+    )
+
+    def __init__(self, buckets: Optional[Sequence[float]] = None):
+        self.buckets = tuple(sorted(buckets or self.DEFAULT_BUCKETS))
+        self.counts = [0] * (len(self.buckets) + 1)  # الحاوية الأخيرة لما يتجاوز الحد الأعلى
+        self.count = 0
+        self.total = 0.0
+        self.max_value = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        """تسجيل قيمة جديدة"""
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += value
+            if value > self.max_value:
+                self.max_value = value
+
+    def percentile(self, percent: float) -> float:
+        """تقدير المئين (الحد الأعلى للحاوية التي يقع فيها)"""
+        with self._lock:
+            if self.count == 0:
+                return 0.0
+
+            rank = self.count * percent / 100.0
+            cumulative = 0
+            for index, bucket_count in enumerate(self.counts):
+                cumulative += bucket_count
+                if cumulative >= rank:
+                    if index < len(self.buckets):
+                        return self.buckets[index]
+                    return self.max_value
+            return self.max_value
+
+    def mean(self) -> float:
+        """المتوسط"""
+        with self._lock:
+            return self.total / self.count if self.count else 0.0
+
+    def snapshot(self) -> Tuple[Tuple[float, ...], List[int], int, float]:
+        """(الحدود، العدد في كل حاوية، العدد الكلي، المجموع) في لحظة واحدة"""
+        with self._lock:
+            return self.buckets, list(self.counts), self.count, self.total
+
+    def reset(self):
+        """تصفير القياسات"""
+        with self._lock:
+            self.counts = [0] * (len(self.buckets) + 1)
+            self.count = 0
+            self.total = 0.0
+            self.max_value = 0.0
+
+    def to_dict(self) -> Dict:
+        """تحويل المدرج إلى قاموس"""
+        return {
+            'count': self.count,
+            'mean': self.mean(),
+            'max': self.max_value,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99)
+        }
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تنسيق Prometheus النصي
+Prometheus Text Exposition
+"""
+
+from typing import Dict, Iterable, List, Tuple
+from .metrics import Histogram
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+def _number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+class PrometheusWriter:
+    """تجميع المقاييس بتنسيق Prometheus (الإصدار 0.0.4)"""
+
+    def __init__(self):
+        self.lines: List[str] = []
+
+    def _header(self, name: str, kind: str, help_text: str):
+        self.lines.append(f'# HELP {name} {help_text}')
+        self.lines.append(f'# TYPE {name} {kind}')
+
+    def metric(self, name: str, kind: str, help_text: str, samples: Iterable[Tuple[Dict[str, str], float]]):
+        """عداد (counter) أو مقياس لحظي (gauge)"""
+        self._header(name, kind, help_text)
+        for labels, value in samples:
+            self.lines.append(f'{name}{_labels(labels)} {_number(value)}')
+
+    def histogram(self, name: str, help_text: str, samples: Iterable[Tuple[Dict[str, str], Histogram]]):
+        """مدرج تكراري: حاويات تراكمية مع _sum و _count"""
+        self._header(name, 'histogram', help_text)
+        for labels, histogram in samples:
+            buckets, counts, count, total = histogram.snapshot()
+            cumulative = 0
+            for bound, bucket_count in zip(buckets, counts):
+                cumulative += bucket_count
+                self.lines.append(f'{name}_bucket{_labels({**labels, "le": _number(float(bound))})} {cumulative}')
+            self.lines.append(f'{name}_bucket{_labels({**labels, "le": "+Inf"})} {count}')
+            self.lines.append(f'{name}_sum{_labels(labels)} {_number(total)}')
+            self.lines.append(f'{name}_count{_labels(labels)} {count}')
+
+    def render(self) -> str:
+        """النص النهائي"""
+        return '\n'.join(self.lines) + '\n'
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+عداد استعلامات SQL
+SQL Statement Counter
+"""
+
+import threading
+from contextlib import contextmanager
+from typing import Dict, List
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from .metrics import Histogram
+
+class QueryCount:
+    """عدد العبارات المنفذة داخل نطاق count_queries"""
+
+    __slots__ = ('count', 'statements')
+
+    def __init__(self):
+        self.count = 0
+        self.statements: List[str] = []
+
+_local = threading.local()
+_installed = False
+_install_lock = threading.Lock()
+
+def _scopes() -> List[QueryCount]:
+    scopes = getattr(_local, 'scopes', None)
+    if scopes is None:
+        scopes = _local.scopes = []
+    return scopes
+
+def _on_execute(conn, cursor, statement, parameters, context, executemany):
+    # المستمع يعمل في الخيط المنفذ للاستعلام، فالنطاقات لكل خيط
+    for scope in _scopes():
+        scope.count += 1
+        scope.statements.append(statement)
+
+    if has_request_context() and 'sql_query_count' in g:
+        g.sql_query_count += 1
+
+def install():
+    """تسجيل المستمع على كل المحركات (مرة واحدة)"""
+    global _installed
+    with _install_lock:
+        if not _installed:
+            event.listen(Engine, 'before_cursor_execute', _on_execute)
+            _installed = True
+
+@contextmanager
+def count_queries():
+    """عد عبارات SQL المنفذة في الخيط الحالي داخل النطاق
+
+        with count_queries() as counter:
+            ...
+        counter.count
+    """
+    install()
+    scope = QueryCount()
+    scopes = _scopes()
+    scopes.append(scope)
+    try:
+        yield scope
+    finally:
+        scopes.remove(scope)
+
+class RequestQueryCounter:
+    """عد استعلامات كل طلب HTTP وتحذير عند تجاوز الحد
+
+    يفعل بـ SQL_QUERY_COUNTING (افتراضياً في وضع التطوير). العدد يضاف في
+    ترويسة X-SQL-Queries، والطلبات التي تتجاوز SQL_QUERY_WARNING_THRESHOLD
+    تسجل كتحذير في سجل التطبيق مع اسم المسار، وهي غالباً استعلامات N+1.
+    """
+
+    def __init__(self, warning_threshold: int = 30):
+        self.warning_threshold = warning_threshold
+        self.enabled = False
+
+        # المقاييس
+        self.requests_total = 0
+        self.warnings_total = 0
+        self.queries_per_request = Histogram((1, 2, 5, 10, 20, 30, 50, 100, 200, 500))
+        self.worst: Dict[str, int] = {}  # أكبر عدد استعلامات لكل مسار
+
+    def init_app(self, app):
+        """قراءة الإعدادات وتسجيل الخطافات"""
+        self.warning_threshold = app.config.get('SQL_QUERY_WARNING_THRESHOLD', self.warning_threshold)
+        self.enabled = app.config.get('SQL_QUERY_COUNTING', app.debug)
+        if not self.enabled:
+            return
+
+        install()
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    def _before_request(self):
+        g.sql_query_count = 0
+
+    def _after_request(self, response):
+        count = g.pop('sql_query_count', None)
+        if count is None:
+            return response
+
+        endpoint = request.endpoint or request.path
+        self.requests_total += 1
+        self.queries_per_request.observe(count)
+        if count > self.worst.get(endpoint, 0):
+            self.worst[endpoint] = count
+
+        response.headers['X-SQL-Queries'] = str(count)
+        if count > self.warning_threshold:
+            self.warnings_total += 1
+            current_app.logger.warning(
+                "⚠️ %s نفذ %d استعلام SQL (الحد %d)", endpoint, count, self.warning_threshold
+            )
+        return response
+
+    def get_statistics(self) -> Dict:
+        """إحصائيات الاستعلامات لكل طلب"""
+        return {
+            'enabled': self.enabled,
+            'warning_threshold': self.warning_threshold,
+            'requests_total': self.requests_total,
+            'warnings_total': self.warnings_total,
+            'queries_per_request': self.queries_per_request.to_dict(),
+            'worst_endpoints': dict(sorted(self.worst.items(), key=lambda item: -item[1])[:10])
+        }
+
+# العداد المشترك
+request_query_counter = RequestQueryCounter()
\ No newline at end of file
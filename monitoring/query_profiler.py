@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+محلل استعلامات SQL
+SQL Query Profiler
+"""
+
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from flask import current_app, has_app_context, has_request_context, request
+from sqlalchemy import event
+
+_WHITESPACE = re.compile(r'\s+')
+_IN_LIST = re.compile(r'\((?:\s*(?:\?|%s)\s*,)+\s*(?:\?|%s)\s*\)')
+_THREAD_NUMBER = re.compile(r'-\d+')
+
+# طول نص الاستعلام في التقرير
+STATEMENT_PREVIEW = 500
+
+def normalize(statement: str) -> str:
+    """شكل الاستعلام: مسافات موحدة وقوائم IN مختصرة (كل الأطوال نفس الاستعلام)"""
+    statement = _WHITESPACE.sub(' ', statement).strip()
+    return _IN_LIST.sub('(?, ...)', statement)
+
+def current_context() -> str:
+    """مصدر الاستعلام: حدث Socket.IO أو مسار HTTP أو خيط خلفي"""
+    if has_request_context():
+        socket_event = getattr(request, 'event', None)
+        if socket_event:
+            return f"socket:{socket_event['message']}"
+        return f"http:{request.endpoint or request.path}"
+    return f"thread:{_THREAD_NUMBER.sub('', threading.current_thread().name)}"
+
+class StatementStats:
+    """إحصائيات شكل استعلام واحد"""
+
+    __slots__ = ('statement', 'count', 'total_time', 'max_time', 'contexts')
+
+    # أقصى عدد مصادر محفوظة لكل استعلام
+    MAX_CONTEXTS = 20
+
+    def __init__(self, statement: str):
+        self.statement = statement
+        self.count = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.contexts: Dict[str, int] = {}
+
+    def add(self, elapsed: float, context: str):
+        self.count += 1
+        self.total_time += elapsed
+        if elapsed > self.max_time:
+            self.max_time = elapsed
+        if context in self.contexts or len(self.contexts) < self.MAX_CONTEXTS:
+            self.contexts[context] = self.contexts.get(context, 0) + 1
+
+    def to_dict(self) -> Dict:
+        """تحويل الإحصائيات إلى قاموس"""
+        return {
+            'statement': self.statement[:STATEMENT_PREVIEW],
+            'count': self.count,
+            'total_time': self.total_time,
+            'mean_time': self.total_time / self.count if self.count else 0.0,
+            'max_time': self.max_time,
+            'contexts': dict(sorted(self.contexts.items(), key=lambda item: -item[1])[:5])
+        }
+
+class QueryProfiler:
+    """تحليل كل عبارات SQL على محرك db (اختياري)
+
+    مستمعا before_cursor_execute و after_cursor_execute يقيسان كل عبارة
+    وينسبانها لمسار HTTP أو حدث Socket.IO المنفذ. يحفظ لكل شكل استعلام العدد
+    والزمن، وسجلاً دواراً للاستعلامات البطيئة، ويكشف N+1: نفس الشكل يتكرر
+    أكثر من n_plus_one_threshold مرة في طلب أو حدث واحد. معطل افتراضياً
+    (SQL_PROFILER_ENABLED)، وعندها لا تسجل المستمعات أصلاً.
+    """
+
+    def __init__(self, slow_threshold: float = 0.1, top_n: int = 20,
+                 n_plus_one_threshold: int = 10, max_statements: int = 2000):
+        self.enabled = False
+        self.slow_threshold = slow_threshold
+        self.top_n = top_n
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.max_statements = max_statements
+
+        self.statements: Dict[str, StatementStats] = {}
+        self.contexts: Dict[str, List] = {}  # context -> [العدد، الزمن]
+        self.slow_queries: deque = deque(maxlen=top_n)
+        self.n_plus_one: Dict[Tuple[str, str], Dict] = {}
+        self.started_at = datetime.utcnow()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """قراءة الإعدادات وتسجيل المستمعات على محرك التطبيق"""
+        from models import db
+
+        self.enabled = app.config.get('SQL_PROFILER_ENABLED', False)
+        self.slow_threshold = app.config.get('SQL_SLOW_QUERY_THRESHOLD', self.slow_threshold)
+        self.top_n = app.config.get('SQL_PROFILER_TOP_N', self.top_n)
+        self.n_plus_one_threshold = app.config.get('SQL_N_PLUS_ONE_THRESHOLD', self.n_plus_one_threshold)
+        self.slow_queries = deque(maxlen=self.top_n)
+        if not self.enabled:
+            return
+
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', self._before_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_execute)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('profiler_started', []).append(time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get('profiler_started')
+        if started:
+            self.record(statement, time.perf_counter() - started.pop())
+
+    # ==================== التسجيل ====================
+
+    def record(self, statement: str, elapsed: float, context: Optional[str] = None):
+        """تسجيل عبارة منفذة"""
+        key = normalize(statement)
+        context = context or current_context()
+
+        with self._lock:
+            stats = self.statements.get(key)
+            if stats is None:
+                if len(self.statements) >= self.max_statements:
+                    self._prune()
+                stats = self.statements[key] = StatementStats(key)
+            stats.add(elapsed, context)
+
+            totals = self.contexts.setdefault(context, [0, 0.0])
+            totals[0] += 1
+            totals[1] += elapsed
+
+            if elapsed >= self.slow_threshold:
+                self.slow_queries.append({
+                    'statement': key[:STATEMENT_PREVIEW],
+                    'duration': elapsed,
+                    'context': context,
+                    'at': datetime.utcnow().isoformat()
+                })
+
+        if elapsed >= self.slow_threshold and has_app_context():
+            current_app.logger.warning("🐢 استعلام بطيء %.3f ث من %s: %s", elapsed, context, key[:200])
+
+        self._track_unit(key, context)
+
+    def _track_unit(self, key: str, context: str):
+        """عد تكرار الشكل داخل الطلب أو الحدث الحالي (N+1)"""
+        if not has_request_context():
+            return
+
+        # كائن الطلب جديد لكل طلب HTTP ولكل حدث Socket.IO
+        unit = getattr(request, 'sql_profile', None)
+        if unit is None:
+            unit = request.sql_profile = {}
+        count = unit[key] = unit.get(key, 0) + 1
+        if count <= self.n_plus_one_threshold:
+            return
+
+        with self._lock:
+            incident = self.n_plus_one.get((context, key))
+            if incident is None:
+                incident = self.n_plus_one[(context, key)] = {
+                    'context': context,
+                    'statement': key[:STATEMENT_PREVIEW],
+                    'occurrences': 0,
+                    'max_repeats': 0,
+                    'last_seen': None
+                }
+            if count == self.n_plus_one_threshold + 1:
+                incident['occurrences'] += 1
+            incident['max_repeats'] = max(incident['max_repeats'], count)
+            incident['last_seen'] = datetime.utcnow().isoformat()
+
+    def _prune(self):
+        # يجب استدعاؤها مع القفل: حذف النصف الأقل تنفيذاً
+        ordered = sorted(self.statements.items(), key=lambda item: item[1].count)
+        for key, _ in ordered[:len(ordered) // 2]:
+            del self.statements[key]
+
+    # ==================== التقرير ====================
+
+    def get_report(self) -> Dict:
+        """أبطأ الاستعلامات وأكثرها تكراراً ومصادرها وحالات N+1"""
+        with self._lock:
+            statements = [stats.to_dict() for stats in self.statements.values()]
+            contexts = [
+                {'context': context, 'statements': count, 'total_time': total}
+                for context, (count, total) in self.contexts.items()
+            ]
+            slow_queries = list(reversed(self.slow_queries))
+            n_plus_one = [dict(incident) for incident in self.n_plus_one.values()]
+
+        top_n = self.top_n
+        return {
+            'enabled': self.enabled,
+            'since': self.started_at.isoformat(),
+            'slow_query_threshold': self.slow_threshold,
+            'n_plus_one_threshold': self.n_plus_one_threshold,
+            'total_statements': sum(item['count'] for item in statements),
+            'total_time': sum(item['total_time'] for item in statements),
+            'slowest': sorted(statements, key=lambda item: -item['max_time'])[:top_n],
+            'most_time': sorted(statements, key=lambda item: -item['total_time'])[:top_n],
+            'most_frequent': sorted(statements, key=lambda item: -item['count'])[:top_n],
+            'contexts': sorted(contexts, key=lambda item: -item['total_time'])[:top_n],
+            'n_plus_one': sorted(n_plus_one, key=lambda item: -item['occurrences'])[:top_n],
+            'slow_queries': slow_queries
+        }
+
+    def reset(self):
+        """تصفير القياسات"""
+        with self._lock:
+            self.statements.clear()
+            self.contexts.clear()
+            self.slow_queries.clear()
+            self.n_plus_one.clear()
+            self.started_at = datetime.utcnow()
+
+# المحلل المشترك
+query_profiler = QueryProfiler()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+قياس أحداث Socket.IO
+Socket.IO Event Metrics
+"""
+
+import threading
+import time
+from functools import wraps
+from typing import Callable, Dict, List
+from .metrics import Histogram
+from .prometheus import PrometheusWriter
+from .query_counter import count_queries
+
+# حجم الحمولة بالبايت
+PAYLOAD_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+# عبارات SQL لكل حدث
+SQL_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+class _Call:
+    """حدث قيد التنفيذ في الخيط الحالي"""
+
+    __slots__ = ('failed',)
+
+    def __init__(self):
+        self.failed = False
+
+_local = threading.local()
+
+def _calls() -> List[_Call]:
+    calls = getattr(_local, 'calls', None)
+    if calls is None:
+        calls = _local.calls = []
+    return calls
+
+# أقصى عمق للمرور على القواميس والقوائم المتداخلة
+MAX_PAYLOAD_DEPTH = 8
+
+def _value_size(value, depth: int) -> int:
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value) if value.isascii() else len(value.encode('utf-8'))
+    if value is None or isinstance(value, bool):
+        return 4
+    if isinstance(value, (int, float)):
+        return 8
+    if depth >= MAX_PAYLOAD_DEPTH:
+        return 0
+    if isinstance(value, dict):
+        return sum(_value_size(key, depth + 1) + _value_size(item, depth + 1) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(_value_size(item, depth + 1) for item in value)
+    return 0
+
+def payload_size(args) -> int:
+    """حجم وسائط الحدث بالبايت تقريباً: طول النصوص والبيانات الثنائية في القواميس والقوائم
+
+    بدون تحويل الحمولة إلى JSON، فالبيانات الثنائية تحسب بطولها الحقيقي.
+    """
+    return sum(_value_size(arg, 0) for arg in args)
+
+class EventMetrics:
+    """مقاييس حدث واحد"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.errors = 0
+        self.in_flight = 0
+        self.latency = Histogram()
+        self.payload_bytes = Histogram(PAYLOAD_BUCKETS)
+        self.sql_statements = Histogram(SQL_BUCKETS)
+        self._lock = threading.Lock()
+
+    def started(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def finished(self, seconds: float, payload: int, statements: int, failed: bool):
+        self.latency.observe(seconds)
+        self.payload_bytes.observe(payload)
+        self.sql_statements.observe(statements)
+        with self._lock:
+            self.in_flight -= 1
+            if failed:
+                self.errors += 1
+
+    def to_dict(self) -> Dict:
+        """تحويل المقاييس إلى قاموس"""
+        return {
+            'count': self.latency.count,
+            'errors': self.errors,
+            'in_flight': self.in_flight,
+            'latency_seconds': self.latency.to_dict(),
+            'payload_bytes': self.payload_bytes.to_dict(),
+            'sql_statements': self.sql_statements.to_dict()
+        }
+
+class SocketMetrics:
+    """تغليف كل معالجات socketio.on بالقياس
+
+    instrument يستبدل socketio.on و socketio.emit في النسخة قبل تسجيل
+    المعالجات، فلا تعديل في وحدات websocket. لكل حدث: العدد، ومدرج الزمن،
+    والأخطاء (استثناء من المعالج أو إرسال حدث error للعميل، لأن المعالجات
+    تلتقط استثناءاتها)، وحجم الحمولة، وعدد عبارات SQL. يعرض في /metrics.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.events: Dict[str, EventMetrics] = {}
+        self.emitted: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app, socketio):
+        """قراءة الإعدادات وتغليف SocketIO"""
+        self.enabled = app.config.get('SOCKET_METRICS_ENABLED', True)
+        if self.enabled:
+            self.instrument(socketio)
+
+    def get(self, name: str) -> EventMetrics:
+        """مقاييس حدث بالاسم (تنشأ عند أول استخدام)"""
+        metrics = self.events.get(name)
+        if metrics is None:
+            with self._lock:
+                metrics = self.events.setdefault(name, EventMetrics(name))
+        return metrics
+
+    def instrument(self, socketio):
+        """تغليف socketio.on و socketio.emit (يستدعى قبل تسجيل المعالجات)"""
+        register = socketio.on
+        emit = socketio.emit
+
+        def on(message, namespace=None):
+            decorator = register(message, namespace)
+
+            def instrumented(handler):
+                decorator(self.wrap(message, handler))
+                return handler
+            return instrumented
+
+        def emit_with_metrics(event, *args, **kwargs):
+            self._count_emit(event)
+            return emit(event, *args, **kwargs)
+
+        socketio.on = on
+        socketio.emit = emit_with_metrics
+
+    def wrap(self, name: str, handler: Callable) -> Callable:
+        """معالج مقاس"""
+        metrics = self.get(name)
+
+        @wraps(handler)
+        def instrumented(*args):
+            call = _Call()
+            calls = _calls()
+            calls.append(call)
+            size = payload_size(args)
+            metrics.started()
+            started = time.perf_counter()
+            try:
+                with count_queries() as queries:
+                    return handler(*args)
+            except Exception:
+                call.failed = True
+                raise
+            finally:
+                calls.pop()
+                metrics.finished(time.perf_counter() - started, size, queries.count, call.failed)
+
+        return instrumented
+
+    def _count_emit(self, event: str):
+        if event == 'error':
+            calls = getattr(_local, 'calls', None)
+            if calls:
+                calls[-1].failed = True
+        with self._lock:
+            self.emitted[event] = self.emitted.get(event, 0) + 1
+
+    def write_prometheus(self, writer: PrometheusWriter):
+        """إضافة المقاييس بتنسيق Prometheus"""
+        events = sorted(self.events.items())
+        writer.metric('mafia_socketio_events_total', 'counter', 'أحداث Socket.IO المعالجة',
+                      (({'event': name}, metrics.latency.count) for name, metrics in events))
+        writer.metric('mafia_socketio_event_errors_total', 'counter', 'أحداث انتهت باستثناء أو بحدث error',
+                      (({'event': name}, metrics.errors) for name, metrics in events))
+        writer.metric('mafia_socketio_events_in_flight', 'gauge', 'معالجات قيد التنفيذ الآن',
+                      (({'event': name}, metrics.in_flight) for name, metrics in events))
+        writer.histogram('mafia_socketio_event_duration_seconds', 'زمن معالجة الحدث',
+                         (({'event': name}, metrics.latency) for name, metrics in events))
+        writer.histogram('mafia_socketio_event_payload_bytes', 'حجم حمولة الحدث',
+                         (({'event': name}, metrics.payload_bytes) for name, metrics in events))
+        writer.histogram('mafia_socketio_event_sql_statements', 'عبارات SQL لكل حدث',
+                         (({'event': name}, metrics.sql_statements) for name, metrics in events))
+        writer.metric('mafia_socketio_emits_total', 'counter', 'الأحداث المرسلة من الخادم',
+                      (({'event': name}, count) for name, count in sorted(self.emitted.items())))
+
+    def get_statistics(self) -> Dict:
+        """إحصائيات كل الأحداث"""
+        return {
+            'enabled': self.enabled,
+            'events': {name: metrics.to_dict() for name, metrics in sorted(self.events.items())},
+            'emitted': dict(sorted(self.emitted.items()))
+        }
+
+# المقاييس المشتركة
+socket_metrics = SocketMetrics()
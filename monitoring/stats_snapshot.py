@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+لقطة الإحصائيات في الذاكرة
+In-Memory Stats Snapshot
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+from sqlalchemy import func, select
+from models import db, Game, Room, User
+from models.game import GameStatus
+from models.room import RoomStatus
+from models.statistics import UserStatistics
+from .metrics import Histogram
+
+class StatsSnapshot:
+    """عدادات الصحة والصفحة الرئيسية تحدث في الخلفية كل interval ثانية
+
+    فحوص /health لا تلمس قاعدة البيانات: العدادات تقرأ من آخر تحديث، وكل
+    التحديث استعلام واحد (استعلامات فرعية للعدادات) مهما كان عدد الفحوص.
+    فشل التحديث أو تأخره أكثر من stale_after يجعل الحالة degraded.
+    الإحصائيات السريعة لكل مستخدم تحفظ لمدة quick_stats_ttl.
+    """
+
+    def __init__(self, app=None, interval: float = 15, stale_after: Optional[float] = None,
+                 quick_stats_ttl: float = 30, max_users: int = 10000):
+        self.app = app
+        self.interval = interval
+        self.stale_after = stale_after or interval * 3
+        self.quick_stats_ttl = quick_stats_ttl
+        self.max_users = max_users
+
+        self._counters: Dict = dict.fromkeys(
+            ('active_games', 'total_games', 'active_rooms', 'online_users', 'total_users'), 0
+        )
+        self._refreshed_at: Optional[float] = None
+        self._database_ok = False
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._quick_stats: 'OrderedDict[int, Tuple[float, Dict]]' = OrderedDict()
+        self.started_at = time.time()
+
+        # المقاييس
+        self.refreshes_total = 0
+        self.refresh_errors = 0
+        self.quick_stats_hits = 0
+        self.quick_stats_misses = 0
+        self.refresh_latency = Histogram()
+
+    def start(self):
+        """تشغيل خيط التحديث"""
+        if self._thread and self._thread.is_alive():
+            return
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='stats-snapshot', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """إيقاف خيط التحديث"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    def _run(self):
+        """حلقة التحديث"""
+        while not self._stop_event.wait(self.interval):
+            self.refresh()
+
+    def refresh(self) -> bool:
+        """تحديث العدادات من قاعدة البيانات"""
+        started = time.monotonic()
+        try:
+            if self.app is not None:
+                with self.app.app_context():
+                    counters = self._query_counters()
+            else:
+                counters = self._query_counters()
+        except Exception as e:
+            self.refresh_errors += 1
+            with self._lock:
+                self._database_ok = False
+            print(f"⚠️ فشل في تحديث لقطة الإحصائيات: {e}")
+            return False
+
+        self.refresh_latency.observe(time.monotonic() - started)
+        with self._lock:
+            self._counters = counters
+            self._refreshed_at = time.time()
+            self._database_ok = True
+            self.refreshes_total += 1
+        return True
+
+    @staticmethod
+    def _query_counters() -> Dict:
+        """كل العدادات في استعلام واحد"""
+        online_since = datetime.utcnow() - timedelta(minutes=15)
+
+        def count(model, *conditions):
+            return select(func.count(model.id)).where(*conditions).scalar_subquery()
+
+        row = db.session.execute(select(
+            count(Game, Game.status == GameStatus.ACTIVE).label('active_games'),
+            count(Game, Game.status == GameStatus.FINISHED).label('total_games'),
+            count(Room, Room.status == RoomStatus.WAITING).label('active_rooms'),
+            count(User, User.last_seen > online_since).label('online_users'),
+            count(User).label('total_users')
+        )).one()
+        return dict(row._mapping)
+
+    def get(self) -> Dict:
+        """آخر العدادات (التحديث الأول متزامن ثم يبدأ الخيط)"""
+        if self._refreshed_at is None:
+            self.refresh()
+            self.start()
+
+        with self._lock:
+            age = time.time() - self._refreshed_at if self._refreshed_at else None
+            return {
+                **self._counters,
+                'database_ok': self._database_ok,
+                'stale': age is None or age > self.stale_after,
+                'age_seconds': round(age, 3) if age is not None else None
+            }
+
+    def quick_stats(self, user_id: int) -> Dict:
+        """إحصائيات لوحة التحكم لمستخدم (محفوظة لمدة قصيرة)"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._quick_stats.get(user_id)
+            if entry and entry[0] > now:
+                self._quick_stats.move_to_end(user_id)
+                self.quick_stats_hits += 1
+                return entry[1]
+
+        self.quick_stats_misses += 1
+        user_stats = UserStatistics.query.filter_by(user_id=user_id).first()
+        stats = {
+            'total_games': user_stats.total_games_played if user_stats else 0,
+            'win_rate': round(user_stats.get_win_rate(), 2) if user_stats else 0,
+            'messages_sent': user_stats.total_messages_sent if user_stats else 0,
+            'playtime_hours': round(user_stats.total_playtime_seconds / 3600, 2) if user_stats else 0
+        }
+
+        with self._lock:
+            self._quick_stats[user_id] = (now + self.quick_stats_ttl, stats)
+            self._quick_stats.move_to_end(user_id)
+            while len(self._quick_stats) > self.max_users:
+                self._quick_stats.popitem(last=False)
+        return stats
+
+    def uptime(self) -> float:
+        """مدة تشغيل العملية بالثواني"""
+        return time.time() - self.started_at
+
+    def get_statistics(self) -> Dict:
+        """إحصائيات اللقطة"""
+        return {
+            'interval': self.interval,
+            'refreshes_total': self.refreshes_total,
+            'refresh_errors': self.refresh_errors,
+            'quick_stats_cached': len(self._quick_stats),
+            'quick_stats_hits': self.quick_stats_hits,
+            'quick_stats_misses': self.quick_stats_misses,
+            'refresh_seconds': self.refresh_latency.to_dict()
+        }
\ No newline at end of file
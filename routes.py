@@ -5,7 +5,7 @@
 Frontend Routes
 """
 
-from flask import render_template, redirect, url_for, request, flash, session, jsonify
+from flask import render_template, redirect, url_for, request, flash, session, jsonify, Response
 from flask_login import login_required, current_user, logout_user
 from models import db, User, Room, Game, Player, Message
 from models.room import RoomStatus
@@ -13,6 +13,10 @@ from models.game import GameStatus
 from models.statistics import UserStatistics
 from game import RoomManager, GameManager
 from ai import StatsAnalyzer
+from game.locks import registered_lock_stats
+from monitoring.prometheus import CONTENT_TYPE, PrometheusWriter
+from monitoring.query_profiler import query_profiler
+from monitoring.socket_metrics import socket_metrics
 import datetime
 
 def register_routes(app):
@@ -21,15 +25,8 @@ def register_routes(app):
     @app.route('/')
     def index():
         """الصفحة الرئيسية"""
-        # إحصائيات عامة للعرض
-        stats = {
-            'total_users': User.query.count(),
-            'total_games': Game.query.filter(Game.status == GameStatus.FINISHED).count(),
-            'active_rooms': Room.query.filter(Room.status == RoomStatus.WAITING).count(),
-            'online_users': User.query.filter(
-                User.last_seen > datetime.datetime.utcnow() - datetime.timedelta(minutes=15)
-            ).count()
-        }
+        # إحصائيات عامة للعرض (من لقطة الذاكرة)
+        stats = app.stats_snapshot.get()
         
         return render_template('index.html', stats=stats)
     
@@ -193,6 +190,25 @@ def register_routes(app):
         
         return render_template('admin/dashboard.html')
     
+    @app.route('/admin/sql-profile')
+    @login_required
+    def admin_sql_profile():
+        """تقرير محلل الاستعلامات"""
+        if not current_user.is_admin:
+            return jsonify({'error': 'ليس لديك صلاحية'}), 403
+        
+        return jsonify(query_profiler.get_report())
+    
+    @app.route('/admin/sql-profile/reset', methods=['POST'])
+    @login_required
+    def admin_sql_profile_reset():
+        """تصفير محلل الاستعلامات"""
+        if not current_user.is_admin:
+            return jsonify({'error': 'ليس لديك صلاحية'}), 403
+        
+        query_profiler.reset()
+        return jsonify({'success': True})
+    
     @app.route('/rules')
     def rules():
         """قوانين اللعبة"""
@@ -252,27 +268,17 @@ def register_routes(app):
     
     @app.route('/health')
     def health():
-        """فحص صحة الطبيق"""
-        try:
-            # فحص قاعدة البيانات
-            db.session.execute(db.text('SELECT 1'))
-            db_status = 'healthy'
-        except Exception:
-            db_status = 'error'
-        
-        # إحصائيات سريعة
-        active_games = Game.query.filter(Game.status == GameStatus.ACTIVE).count()
-        active_rooms = Room.query.filter(Room.status == RoomStatus.WAITING).count()
-        online_users = User.query.filter(
-            User.last_seen > datetime.datetime.utcnow() - datetime.timedelta(minutes=15)
-        ).count()
+        """فحص صحة الطبيق (من لقطة الذاكرة بدون استعلامات)"""
+        snapshot = app.stats_snapshot.get()
+        db_status = 'healthy' if snapshot['database_ok'] and not snapshot['stale'] else 'error'
         
         health_data = {
             'status': 'healthy' if db_status == 'healthy' else 'degraded',
             'database': db_status,
-            'active_games': active_games,
-            'active_rooms': active_rooms,
-            'online_users': online_users,
+            'active_games': snapshot['active_games'],
+            'active_rooms': snapshot['active_rooms'],
+            'online_users': snapshot['online_users'],
+            'snapshot_age': snapshot['age_seconds'],
             'ai_enabled': bool(app.config.get('OPENAI_API_KEY')),
             'timestamp': datetime.datetime.utcnow().isoformat()
         }
@@ -280,6 +286,51 @@ def register_routes(app):
         status_code = 200 if health_data['status'] == 'healthy' else 503
         return jsonify(health_data), status_code
     
+    @app.route('/health/live')
+    def health_live():
+        """فحص الحياة: العملية تستجيب (بدون قاعدة البيانات)"""
+        return jsonify({
+            'status': 'alive',
+            'uptime': round(app.stats_snapshot.uptime(), 1),
+            'timestamp': datetime.datetime.utcnow().isoformat()
+        })
+    
+    @app.route('/health/ready')
+    def health_ready():
+        """فحص الجاهزية: قاعدة البيانات تستجيب لاستعلام بسيط"""
+        try:
+            db.session.execute(db.text('SELECT 1'))
+            ready = True
+        except Exception:
+            db.session.rollback()
+            ready = False
+        
+        return jsonify({
+            'status': 'ready' if ready else 'unavailable',
+            'database': 'healthy' if ready else 'error',
+            'timestamp': datetime.datetime.utcnow().isoformat()
+        }), 200 if ready else 503
+    
+    @app.route('/metrics')
+    def metrics():
+        """مقاييس Prometheus: أحداث Socket.IO والأقفال"""
+        token = app.config.get('METRICS_TOKEN')
+        if token and request.headers.get('Authorization') != f'Bearer {token}':
+            return jsonify({'error': 'غير مصرح'}), 401
+        
+        writer = PrometheusWriter()
+        socket_metrics.write_prometheus(writer)
+        
+        locks = registered_lock_stats()
+        writer.metric('mafia_lock_acquisitions_total', 'counter', 'مرات أخذ القفل',
+                      (({'lock': stats.name}, stats.acquisitions) for stats in locks))
+        writer.metric('mafia_lock_contended_total', 'counter', 'مرات انتظار القفل',
+                      (({'lock': stats.name}, stats.contended) for stats in locks))
+        writer.histogram('mafia_lock_wait_seconds', 'زمن انتظار القفل عند التنافس',
+                         (({'lock': stats.name}, stats.wait) for stats in locks))
+        
+        return Response(writer.render(), content_type=CONTENT_TYPE)
+    
     @app.route('/api/tips/random')
     @login_required
     def random_tip():
@@ -319,16 +370,9 @@ def register_routes(app):
     @login_required
     def dashboard_quick_stats():
         """إحصائيات سريعة للوحة التحكم"""
-        user_stats = UserStatistics.query.filter_by(user_id=current_user.id).first()
-        
         return jsonify({
             'success': True,
-            'stats': {
-                'total_games': user_stats.total_games_played if user_stats else 0,
-                'win_rate': user_stats.win_rate if user_stats else 0,
-                'messages_sent': user_stats.total_messages_sent if user_stats else 0,
-                'playtime_hours': user_stats.total_playtime_hours if user_stats else 0
-            }
+            'stats': app.stats_snapshot.quick_stats(current_user.id)
         })
     
     # معالجة الأخطاء
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+إعدادات الاختبارات المشتركة
+Shared Test Fixtures
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from flask_login import LoginManager
+from models import db, User
+from monitoring.query_counter import RequestQueryCounter
+
+@pytest.fixture(scope='session')
+def make_app(tmp_path_factory):
+    """تطبيق صغير بقاعدة SQLite مؤقتة (بدون SocketIO ولا الذكاء الاصطناعي)"""
+    directory = tmp_path_factory.mktemp('db')
+
+    def factory(name: str, blueprints=()) -> Flask:
+        app = Flask(name)
+        app.config.update(
+            SECRET_KEY='tests',
+            SQLALCHEMY_DATABASE_URI=f"sqlite:///{directory / f'{name}.db'}",
+            SQL_QUERY_COUNTING=True
+        )
+        db.init_app(app)
+        app.query_counter = RequestQueryCounter()
+        app.query_counter.init_app(app)
+
+        login_manager = LoginManager()
+        login_manager.init_app(app)
+        login_manager.user_loader(lambda user_id: db.session.get(User, int(user_id)))
+
+        for blueprint, prefix in blueprints:
+            app.register_blueprint(blueprint, url_prefix=prefix)
+
+        with app.app_context():
+            db.create_all()
+        return app
+
+    return factory
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبار تحديث لوحة المتصدرين
+Leaderboard Update Tests
+
+التحديث التدريجي عند نهاية اللعبة يعطي نفس ترتيبات إعادة الحساب الكاملة
+(rebuild)، وبعدد ثابت من عبارات SQL مهما كان عدد اللاعبين.
+"""
+
+import random
+
+import pytest
+
+from models import db, User, UserStatistics
+from models.leaderboard import LeaderboardEntry, Leaderboard
+from monitoring.query_counter import count_queries
+
+USERS = 60
+
+# المستخدمون + الترتيبات القديمة + من يسبق كل لاعب + إزاحة لكل نوع + حذف + إدراج
+MAX_STATEMENTS = 8
+
+def create_users(count: int):
+    users = [User(f'user{i}', f'لاعب {i}') for i in range(count)]
+    for user in users:
+        user.password_hash = '-'  # بدون تكلفة تشفير كلمة المرور
+    db.session.add_all(users)
+    db.session.flush()
+
+    for user in users:
+        stats = UserStatistics(user.id)
+        stats.total_games_played = random.randint(0, 12)
+        stats.games_won = random.randint(0, stats.total_games_played)
+        db.session.add(stats)
+    db.session.commit()
+
+def play_game(players):
+    """نتيجة لعبة عشوائية لمجموعة لاعبين (مع تعطيل حساب أحياناً)"""
+    for stats in players:
+        stats.total_games_played += 1
+        if random.random() < 0.5:
+            stats.games_won += 1
+        if random.random() < 0.05:
+            db.session.get(User, stats.user_id).is_active = False
+
+def rankings():
+    return sorted(db.session.query(LeaderboardEntry.sort_mode, LeaderboardEntry.user_id, LeaderboardEntry.rank))
+
+@pytest.fixture
+def board(make_app, request):
+    random.seed(7)
+    app = make_app(f'leaderboard_{request.node.name}')
+    with app.app_context():
+        create_users(USERS)
+        board = Leaderboard(cache_ttl=0)
+        board.rebuild()
+        yield board
+        db.session.remove()
+
+def test_incremental_matches_rebuild(board):
+    all_stats = UserStatistics.query.all()
+    for _ in range(30):
+        players = random.sample(all_stats, random.randint(1, 12))
+        play_game(players)
+        board.update_users(players)
+
+        incremental = rankings()
+        board.rebuild()
+        assert incremental == rankings()
+
+def test_update_statements_are_fixed(board):
+    all_stats = UserStatistics.query.all()
+    for size in (2, 20):
+        players = random.sample(all_stats, size)
+        play_game(players)
+        db.session.flush()  # تحديث الإحصائيات نفسها ليس من عبارات اللوحة
+        with count_queries() as counter:
+            board.update_users(players, commit=False)
+        db.session.commit()
+        assert counter.count <= MAX_STATEMENTS, size
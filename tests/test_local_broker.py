@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبار الوسيط المحلي
+Local Broker Tests
+
+آلاف الإطارات من ناشر واحد تصل كلها للمشترك (اتصال النشر لا يستقبل
+شيئاً فلا يمتلئ)، والمشترك الذي لا يقرأ يفصل دون أن يوقف الباقين.
+"""
+
+import threading
+import time
+
+import pytest
+
+from websocket.local_broker import (
+    LocalBroker, LocalPubSubManager, ROLE_SUBSCRIBER, decode_message
+)
+
+KEY = 'tests'
+FRAMES = 3000
+PAYLOAD = 'x' * 1024
+
+@pytest.fixture
+def start_broker(tmp_path):
+    """تشغيل وسيط على مقبس مؤقت: (العنوان، الوسيط)"""
+    brokers = []
+
+    def start(**kwargs):
+        path = str(tmp_path / f'broker{len(brokers)}.sock')
+        brokers.append(LocalBroker(path, KEY, **kwargs).start())
+        return f'local://{path}', brokers[-1]
+
+    yield start
+    for broker in brokers:
+        broker.stop()
+
+def subscribe(manager: LocalPubSubManager, received: list, done: threading.Event):
+    """جمع الرسائل في خيط حتى تصل FRAMES رسالة"""
+    def listen():
+        for data in manager._listen():
+            received.append(data)
+            if len(received) == FRAMES:
+                done.set()
+                return
+    threading.Thread(target=listen, daemon=True).start()
+
+def wait_for_subscribers(broker: LocalBroker, count: int):
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        with broker._lock:
+            if sum(s is not None for s in broker._connections.values()) >= count:
+                return
+        time.sleep(0.01)
+    raise AssertionError('المشترك لم يتصل')
+
+def publish_all(manager: LocalPubSubManager, paced_by: list = None) -> threading.Thread:
+    """النشر في خيط؛ paced_by: انتظار المشترك كل 100 إطار"""
+    def publish():
+        for i in range(FRAMES):
+            if paced_by is not None and i % 100 == 0:
+                deadline = time.monotonic() + 10
+                while len(paced_by) < i and time.monotonic() < deadline:
+                    time.sleep(0.001)
+            manager._publish({'i': i, 'data': PAYLOAD})
+    thread = threading.Thread(target=publish, daemon=True)
+    thread.start()
+    return thread
+
+def test_thousands_of_frames_reach_subscriber(start_broker):
+    url, broker = start_broker()
+    manager = LocalPubSubManager(url, authkey=KEY)
+    received, done = [], threading.Event()
+    subscribe(manager, received, done)
+    wait_for_subscribers(broker, 1)
+
+    publisher = publish_all(manager)
+    publisher.join(timeout=30)
+    assert not publisher.is_alive(), 'الناشر عالق'
+    assert done.wait(timeout=30), f'وصل {len(received)} من {FRAMES}'
+    assert [data['i'] for data in received] == list(range(FRAMES))
+
+def test_slow_subscriber_is_dropped(start_broker):
+    url, local_broker = start_broker(max_pending=500)
+    stalled = LocalPubSubManager(url, authkey=KEY)._connect(ROLE_SUBSCRIBER)  # لا يقرأ أبداً
+
+    manager = LocalPubSubManager(url, authkey=KEY)
+    received, done = [], threading.Event()
+    subscribe(manager, received, done)
+    wait_for_subscribers(local_broker, 2)
+
+    publisher = publish_all(manager, paced_by=received)
+    publisher.join(timeout=30)
+    assert not publisher.is_alive(), 'الناشر عالق'
+    assert done.wait(timeout=30), f'وصل {len(received)} من {FRAMES}'
+    assert [data['i'] for data in received] == list(range(FRAMES))
+    assert local_broker.slow_subscribers == 1
+
+    # المشترك المفصول يقرأ ما وصله ثم ينتهي الاتصال
+    with pytest.raises((EOFError, OSError)):
+        while True:
+            decode_message(stalled.recv_bytes())
+    stalled.close()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبار استعلامات ورؤية صفحة رسائل
+Message Visibility Tests
+
+تحويل صفحة بـ MessageVisibility.serialize يبقى ضمن عدد ثابت من عبارات SQL
+(المرسلون + المافيا) مهما كان طول الصفحة، وقواعد الرؤية (أعمال المافيا،
+الرسائل الخاصة والمخفية) كما هي.
+"""
+
+import pytest
+
+from models import db, User, Room, Player, Message
+from models.message import MessageStatus, MessageType
+from models.message_visibility import MessageVisibility
+from models.player import PlayerRole
+from monitoring.query_counter import count_queries
+
+PLAYERS = 8
+MAFIA = 2
+
+# المرسلون + المافيا
+MAX_STATEMENTS = 2
+
+def create_room(messages: int):
+    """غرفة برسائل مختلطة: (معرف الغرفة، معرفات المستخدمين)"""
+    users = [User(f'user{i}', f'لاعب {i}') for i in range(PLAYERS)]
+    for user in users:
+        user.password_hash = '-'  # بدون تكلفة تشفير كلمة المرور
+    db.session.add_all(users)
+    db.session.flush()
+
+    room = Room('غرفة الاختبار', users[0].id)
+    db.session.add(room)
+    db.session.flush()
+
+    for i, user in enumerate(users):
+        role = PlayerRole.MAFIA if i < MAFIA else PlayerRole.CITIZEN
+        db.session.add(Player(user.id, room.id, role=role))
+
+    for i in range(messages):
+        sender = users[i % PLAYERS]
+        kind = i % 10
+        if kind < 3:
+            message = Message(room.id, f'عمل {i}', sender.id, MessageType.GAME_ACTION)
+        elif kind == 3:
+            message = Message(room.id, f'خاصة {i}', sender.id, MessageType.PRIVATE)
+            message.set_metadata({'target_user_id': users[(i + 1) % PLAYERS].id})
+        elif kind == 4:
+            message = Message(room.id, f'نظام {i}', None, MessageType.SYSTEM)
+        else:
+            message = Message(room.id, f'رسالة {i}', sender.id)
+            if kind == 9:
+                message.status = MessageStatus.HIDDEN
+        db.session.add(message)
+
+    db.session.commit()
+    return room.id, [user.id for user in users]
+
+def load_page(room_id: int):
+    """الصفحة بجلسة نظيفة (المرسلون ليسوا في ذاكرة الجلسة)"""
+    db.session.expunge_all()
+    return Message.query.filter_by(room_id=room_id).order_by(Message.sent_at.desc(), Message.id.desc()).all()
+
+def serialize_page(make_app, messages: int, viewer_index):
+    """(عدد العبارات، الصفحة، الرسائل، معرفات المستخدمين) لمشاهد واحد"""
+    app = make_app(f'visibility_{messages}_{viewer_index}')
+    with app.app_context():
+        room_id, user_ids = create_room(messages)
+        viewer_id = user_ids[viewer_index] if viewer_index is not None else None
+
+        page = load_page(room_id)
+        with count_queries() as counter:
+            data = MessageVisibility(room_id, viewer_id).serialize(page)
+
+        rows = {m.id: (m.message_type, m.status, m.user_id, m.get_metadata()) for m in page}
+        return counter.count, data, rows, user_ids
+
+@pytest.mark.parametrize('viewer_index', [0, PLAYERS - 1, None], ids=['mafia', 'citizen', 'anonymous'])
+def test_page_statements_are_fixed(make_app, viewer_index):
+    small, *_ = serialize_page(make_app, 20, viewer_index)
+    large, *_ = serialize_page(make_app, 200, viewer_index)
+
+    assert small == large, 'عدد العبارات يزيد مع طول الصفحة (N+1)'
+    assert large <= MAX_STATEMENTS
+
+@pytest.mark.parametrize('viewer_index', [0, PLAYERS - 1], ids=['mafia', 'citizen'])
+def test_visibility_rules(make_app, viewer_index):
+    _, data, rows, user_ids = serialize_page(make_app, 50, viewer_index)
+    viewer_id = user_ids[viewer_index]
+    mafia_ids = set(user_ids[:MAFIA])
+    seen = {item['id'] for item in data}
+
+    for message_id, (message_type, status, sender_id, metadata) in rows.items():
+        if status == MessageStatus.HIDDEN:
+            expected = sender_id == viewer_id
+        elif message_type == MessageType.PRIVATE:
+            expected = viewer_id in (sender_id, metadata.get('target_user_id'))
+        elif message_type == MessageType.GAME_ACTION and sender_id in mafia_ids:
+            expected = viewer_id in mafia_ids
+        else:
+            expected = True
+        assert (message_id in seen) == expected, (message_id, message_type, status)
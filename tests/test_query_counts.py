@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اختبار عدد استعلامات SQL للنقاط الأساسية
+Fixed Query Count Tests
+
+قائمة الغرف وتفاصيل الغرفة مع لاعبيها (عبر مسارات API وترويسة
+X-SQL-Queries) وسجل ألعابي وصفحة الرسائل (عبر count_queries) تقاس بحجمي
+بيانات مختلفين: عدد الاستعلامات ثابت لا يزيد مع عدد الصفوف وضمن الحد
+المتوقع (اختبار رجوع لاستعلامات N+1).
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import db, User, Room, Game, Player, Message
+from models.message import MessageType
+from models.player import PlayerRole
+from models.room import RoomStatus
+from monitoring.query_counter import count_queries
+from websocket.message_history import MessageHistory
+from api import room_bp, stats_bp
+from game import RoomManager
+
+SMALL = 5
+LARGE = 40
+
+# الحد الأقصى المتوقع لكل نقطة (يشمل تحميل المستخدم المسجل)
+EXPECTED = {
+    'room_list': 2,     # المستخدم + الغرف مع منشئيها
+    'room_detail': 3,   # المستخدم + الغرفة + اللاعبون مع مستخدميهم
+    'game_history': 2,  # المستخدم + الألعاب مع اللاعب ومستخدمه
+    'message_page': 2   # الرسائل مع مرسليها + المافيا
+}
+
+def create_data(size: int):
+    """size غرفة (لكل منها size لاعب ولعبة) وsize*2 رسالة في الغرفة الأولى"""
+    users = [User(f'user{i}', f'لاعب {i}') for i in range(size)]
+    for user in users:
+        user.password_hash = '-'  # بدون تكلفة تشفير كلمة المرور
+    db.session.add_all(users)
+    db.session.flush()
+
+    started = datetime.utcnow()
+    rooms = []
+    for i in range(size):
+        room = Room(f'غرفة {i}', users[i].id)
+        room.status = RoomStatus.WAITING
+        room.current_players = size
+        db.session.add(room)
+        db.session.flush()
+        rooms.append(room)
+
+        for j, user in enumerate(users):
+            role = PlayerRole.MAFIA if j % 4 == 0 else PlayerRole.CITIZEN
+            db.session.add(Player(user.id, room.id, role=role))
+        db.session.add(Game(room.id, size, started_at=started - timedelta(minutes=i)))
+
+    for i in range(size * 2):
+        sender = users[i % size]
+        message_type = MessageType.GAME_ACTION if i % 3 == 0 else MessageType.TEXT
+        db.session.add(Message(rooms[0].id, f'رسالة {i}', sender.id, message_type))
+
+    db.session.commit()
+    return users[0].id, rooms[0]
+
+def measure(make_app, size: int) -> dict:
+    """عدد استعلامات كل نقطة لحجم بيانات واحد"""
+    app = make_app(f'query_counts_{size}', [(room_bp, '/api/room'), (stats_bp, '/api/stats')])
+    counts = {}
+
+    with app.app_context():
+        viewer_id, room = create_data(size)
+        room_id, room_code = room.id, room.room_code
+        app.room_manager = RoomManager()
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(viewer_id)
+
+    def request_count(url: str) -> int:
+        response = client.get(url)
+        assert response.status_code == 200, (url, response.get_data(as_text=True))
+        return int(response.headers['X-SQL-Queries'])
+
+    counts['room_list'] = request_count(f'/api/room/list?type=all&limit={size}')
+    counts['room_detail'] = request_count(f'/api/room/{room_code}')
+    counts['game_history'] = request_count(f'/api/stats/my-games?limit={size}')
+
+    with app.app_context():
+        history = MessageHistory(capacity=size * 4)
+        with count_queries() as counter:
+            history.get_page(room_id, viewer_id, limit=size * 2)
+        counts['message_page'] = counter.count
+
+    return counts
+
+@pytest.fixture(scope='module')
+def counts(make_app):
+    return {size: measure(make_app, size) for size in (SMALL, LARGE)}
+
+@pytest.mark.parametrize('name', sorted(EXPECTED))
+def test_query_count_is_fixed(counts, name):
+    assert counts[SMALL][name] == counts[LARGE][name], f'{name} يزيد مع عدد الصفوف (N+1)'
+    assert counts[LARGE][name] <= EXPECTED[name]
@@ -11,6 +11,7 @@ from flask_login import current_user
 from models import db
 from models.message import Message, MessageType
 from models.player import Player
+from .message_history import message_history
 
 def register_chat_events(socketio):
     """تسجيل أحداث الدردشة"""
@@ -32,7 +33,7 @@ def register_chat_events(socketio):
             
             # الحصول على الغرفة
             room_manager = current_app.room_manager
-            room = room_manager.get_user_room(current_user.id)
+            room = room_manager.get_user_room_ref(current_user.id)
             
             if not room:
                 emit('error', {'message': 'لست في أي غرفة'})
@@ -75,53 +76,16 @@ def register_chat_events(socketio):
             db.session.add(message)
             db.session.commit()
             
-            # تحليل الرسالة بالذكاء الاصطناعي
-            if hasattr(current_app, 'ai_analyzer'):
-                try:
-                    analysis = current_app.ai_analyzer.analyze_message(
-                        message.id,
-                        content,
-                        current_user.id,
-                        room.id,
-                        session.current_round if session else None,
-                        session.phase_manager.current_phase.value if session else None
-                    )
-                    
-                    if analysis.get('is_suspicious', False):
-                        message.flag_as_suspicious(
-                            analysis.get('reason', 'محتوى مشبوه'),
-                            analysis.get('suspicion_score', 0.5)
-                        )
-                        
-                        # إخفاء الرسالة إذا كانت مخالفة شديدة
-                        if analysis.get('suspicion_score', 0) > 0.8:
-                            message.hide_message(analysis.get('reason', 'مخالفة شديدة'))
-                            
-                            # إشعار المرسل
-                            emit('message_hidden', {
-                                'message_id': message.id,
-                                'reason': analysis.get('reason', 'مخالفة شديدة')
-                            })
-                            
-                except Exception as e:
-                    print(f"خطأ في تحليل الرسالة: {e}")
-            
-            # تحديث إحصائيات الدردشة
-            if current_user.statistics:
-                current_user.statistics.update_chat_stats(
-                    len(content),
-                    message.suspicion_score,
-                    message.is_flagged
-                )
-            
-            # إرسال الرسالة للمستقبلين المناسبين
+            # إرسال الرسالة للمستقبلين المناسبين فوراً (التحليل يتم لاحقاً)
             message_data = message.to_dict(current_user.id)
+            target_room = f"user_{current_user.id}"
             
             if msg_type == MessageType.PRIVATE:
                 # رسالة خاصة
                 target_user_id = data.get('target_user_id')
                 if target_user_id:
-                    emit('new_message', {'message': message_data}, room=f"user_{target_user_id}")
+                    target_room = f"user_{target_user_id}"
+                    emit('new_message', {'message': message_data}, room=target_room)
                     emit('new_message', {'message': message_data})  # للمرسل أيضاً
             else:
                 # رسالة عامة
@@ -146,6 +110,21 @@ def register_chat_events(socketio):
                 'status': message.status.value
             })
             
+            # تحليل الرسالة في خط الإشراف (يرسل message_flagged / message_hidden لاحقاً)
+            if hasattr(current_app, 'moderation_pipeline'):
+                current_app.moderation_pipeline.submit(
+                    message.id,
+                    content,
+                    current_user.id,
+                    room.id,
+                    target_room,
+                    message.game_round,
+                    message.game_phase
+                )
+            elif current_user.statistics:
+                # تحديث إحصائيات الدردشة
+                current_user.statistics.update_chat_stats(len(content))
+            
         except Exception as e:
             db.session.rollback()
             emit('error', {'message': f'خطأ في إرسال الرسالة: {str(e)}'})
@@ -159,35 +138,27 @@ def register_chat_events(socketio):
         
         try:
             room_manager = current_app.room_manager
-            room = room_manager.get_user_room(current_user.id)
+            room = room_manager.get_user_room_ref(current_user.id)
             
             if not room:
                 emit('error', {'message': 'لست في أي غرفة'})
                 return
             
-            # معايير الاستعلام
-            limit = min(int(data.get('limit', 50)), 100)
-            offset = int(data.get('offset', 0))
-            
-            # استعلام الرسائل
-            messages_query = Message.query.filter_by(
-                room_id=room.id
-            ).order_by(Message.sent_at.desc())
+            # معايير الاستعلام: before مؤشر الصفحة السابقة (next_cursor من الرد السابق)
+            limit = max(1, min(int(data.get('limit', 50)), 100))
+            before = data.get('before')
             
-            total_count = messages_query.count()
-            messages = messages_query.offset(offset).limit(limit).all()
-            
-            # تنسيق الرسائل
-            messages_data = []
-            for message in reversed(messages):  # عكس الترتيب للعرض الصحيح
-                if message.can_be_seen_by(current_user.id):
-                    messages_data.append(message.to_dict(current_user.id))
+            try:
+                page = message_history.get_page(room.id, current_user.id, limit, before)
+            except ValueError:
+                emit('error', {'message': 'مؤشر الصفحة غير صالح'})
+                return
             
             emit('messages_loaded', {
-                'messages': messages_data,
-                'total_count': total_count,
-                'loaded_count': len(messages_data),
-                'offset': offset
+                'messages': page['messages'],
+                'loaded_count': len(page['messages']),
+                'has_more': page['has_more'],
+                'next_cursor': page['next_cursor']
             })
             
         except Exception as e:
@@ -379,7 +350,7 @@ def register_chat_events(socketio):
         
         try:
             room_manager = current_app.room_manager
-            room = room_manager.get_user_room(current_user.id)
+            room = room_manager.get_user_room_ref(current_user.id)
             
             if room:
                 emit('user_typing', {
@@ -399,7 +370,7 @@ def register_chat_events(socketio):
         
         try:
             room_manager = current_app.room_manager
-            room = room_manager.get_user_room(current_user.id)
+            room = room_manager.get_user_room_ref(current_user.id)
             
             if room:
                 emit('user_typing', {
@@ -23,7 +23,7 @@ def register_game_events(socketio):
         
         try:
             room_manager = current_app.room_manager
-            room = room_manager.get_user_room(current_user.id)
+            room = room_manager.get_user_room_ref(current_user.id)
             
             if not room:
                 emit('error', {'message': 'لست في أي غرفة'})
@@ -85,16 +85,23 @@ def register_game_events(socketio):
                 return
             
             room_manager = current_app.room_manager
-            room = room_manager.get_user_room(current_user.id)
+            room = room_manager.get_user_room_ref(current_user.id)
             
             if not room:
                 emit('error', {'message': 'لست في أي غرفة'})
                 return
             
+            # الجلسة تعرف اللاعب بمعرف اللاعب لا المستخدم
             game_manager = current_app.game_manager
+            session = game_manager.get_game_session(room.id)
+            player = session.state.get_player_by_user(current_user.id) if session else None
+            if not player:
+                emit('error', {'message': 'لست لاعباً في هذه اللعبة'})
+                return
+            
             success, message = game_manager.submit_action(
                 room.id,
-                current_user.id,
+                player.id,
                 action_type,
                 target_id,
                 **details
@@ -131,16 +138,23 @@ def register_game_events(socketio):
             target_id = data.get('target_id')
             
             room_manager = current_app.room_manager
-            room = room_manager.get_user_room(current_user.id)
+            room = room_manager.get_user_room_ref(current_user.id)
             
             if not room:
                 emit('error', {'message': 'لست في أي غرفة'})
                 return
             
+            # الجلسة تعرف اللاعب بمعرف اللاعب لا المستخدم
             game_manager = current_app.game_manager
+            session = game_manager.get_game_session(room.id)
+            player = session.state.get_player_by_user(current_user.id) if session else None
+            if not player:
+                emit('error', {'message': 'لست لاعباً في هذه اللعبة'})
+                return
+            
             success, message = game_manager.cast_vote(
                 room.id,
-                current_user.id,
+                player.id,
                 target_id
             )
             
@@ -151,11 +165,7 @@ def register_game_events(socketio):
                 })
                 
                 # إشعار جميع اللاعبين بالتصويت (بدون كشف الهوية)
-                target_name = "لا أحد"
-                if target_id:
-                    target_player = Player.query.get(target_id)
-                    if target_player and target_player.user:
-                        target_name = target_player.user.display_name
+                target_name = session.state.get_player_name(target_id) if target_id else "لا أحد"
                 
                 emit('vote_update', {
                     'voter_name': current_user.display_name,
@@ -163,8 +173,7 @@ def register_game_events(socketio):
                     'message': f"صوت {current_user.display_name} {'ضد ' + target_name if target_id else 'بالامتناع'}"
                 }, room=room.room_code)
                 
-                # تحديث إحصائيات التصويت
-                session = game_manager.get_game_session(room.id)
+                # تحديث إحصائيات التصويت (محفوظ حتى الصوت التالي)
                 if session:
                     voting_summary = session.voting_manager.get_vote_summary(room.id)
                     emit('voting_summary', voting_summary, room=room.room_code)
@@ -184,7 +193,7 @@ def register_game_events(socketio):
         
         try:
             room_manager = current_app.room_manager
-            room = room_manager.get_user_room(current_user.id)
+            room = room_manager.get_user_room_ref(current_user.id)
             
             if not room:
                 emit('error', {'message': 'لست في أي غرفة'})
@@ -207,7 +216,7 @@ def register_game_events(socketio):
         
         try:
             room_manager = current_app.room_manager
-            room = room_manager.get_user_room(current_user.id)
+            room = room_manager.get_user_room_ref(current_user.id)
             
             if not room:
                 emit('error', {'message': 'لست في أي غرفة'})
@@ -242,7 +251,7 @@ def register_game_events(socketio):
             channel_type = data.get('channel_type')  # 'mafia', 'dead', etc.
             
             room_manager = current_app.room_manager
-            room = room_manager.get_user_room(current_user.id)
+            room = room_manager.get_user_room_ref(current_user.id)
             
             if not room:
                 emit('error', {'message': 'لست في أي غرفة'})
@@ -298,7 +307,7 @@ def register_game_events(socketio):
         try:
             # التحقق من الصلاحية (المنشئ أو مشرف)
             room_manager = current_app.room_manager
-            room = room_manager.get_user_room(current_user.id)
+            room = room_manager.get_user_room_ref(current_user.id)
             
             if not room or room.creator_id != current_user.id:
                 emit('error', {'message': 'ليس لديك صلاحية تغيير مرحلة اللعبة'})
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+وسيط رسائل محلي لـ Socket.IO بين العمليات
+Local Pub/Sub Broker for Socket.IO
+
+بديل محلي لـ Redis في التطوير والاختبار: وسيط صغير على مقبس Unix (أو
+منفذ TCP على عنوان الحلقة المحلية) يعيد كل رسالة لكل المشتركين، ومدير
+عملاء لـ python-socketio يستخدمه حتى تصل رسائل emit(room=...) للعملاء
+المتصلين بعمليات أخرى.
+
+العنوان:
+    local:///tmp/mafia-socketio.sock   مقبس Unix
+    local://127.0.0.1:5900             منفذ TCP محلي (الحلقة المحلية فقط)
+
+الوسيط عملية مستقلة، والعمال يتصلون به فقط:
+    SOCKETIO_BROKER_KEY=... python -m websocket.local_broker local:///tmp/mafia-socketio.sock
+
+الرسائل إطارات JSON (send_bytes/recv_bytes) وليست كائنات pickle، والمفتاح
+SOCKETIO_BROKER_KEY إلزامي للوسيط والعمال.
+
+كل اتصال يعلن دوره في أول إطار: الناشر يرسل فقط والمشترك يستقبل فقط. الوسيط
+يوزع على المشتركين عبر طابور محدود لكل مشترك وخيط كتابة خاص به، والمشترك
+الذي يمتلئ طابوره يفصل (ويعيد الاتصال بنفسه) بدل أن يوقف الباقين.
+"""
+
+import base64
+import json
+import os
+import queue
+import socket
+import sys
+import threading
+import time
+from multiprocessing.connection import Client, Connection, Listener
+from typing import Dict, Optional, Tuple, Union
+
+import socketio
+
+Address = Union[str, Tuple[str, int]]
+
+# عناوين TCP المقبولة
+LOOPBACK_HOSTS = ('127.0.0.1', 'localhost', '::1')
+
+# أقصى حجم لإطار واحد
+MAX_MESSAGE_BYTES = 16 * 1024 * 1024
+
+# أول إطار في كل اتصال: دوره
+ROLE_PUBLISHER = b'publish'
+ROLE_SUBSCRIBER = b'subscribe'
+
+# الإطارات المنتظرة لكل مشترك قبل فصله
+MAX_PENDING_FRAMES = 10000
+
+def parse_address(url: str) -> Address:
+    """تحويل local://... إلى عنوان multiprocessing.connection"""
+    if not url.startswith('local://'):
+        raise ValueError(f"عنوان الوسيط المحلي غير صالح: {url}")
+
+    location = url[len('local://'):]
+    if location.startswith('/'):
+        return location
+
+    host, _, port = location.rpartition(':')
+    if not host or not port.isdigit():
+        raise ValueError(f"عنوان الوسيط المحلي غير صالح: {url}")
+    host = host.strip('[]')
+    if host not in LOOPBACK_HOSTS:
+        raise ValueError(f"الوسيط المحلي يقبل عنوان الحلقة المحلية فقط: {url}")
+    return host, int(port)
+
+def require_key(key: Optional[Union[str, bytes]]) -> bytes:
+    """مفتاح المصادقة (ValueError إذا لم يعين SOCKETIO_BROKER_KEY)"""
+    if isinstance(key, str):
+        key = key.encode('utf-8')
+    if not key:
+        raise ValueError("الوسيط المحلي يحتاج SOCKETIO_BROKER_KEY")
+    return key
+
+def _json_default(value):
+    if isinstance(value, (bytes, bytearray)):
+        return {'__bytes__': base64.b64encode(bytes(value)).decode('ascii')}
+    raise TypeError(f"لا يمكن تحويل {type(value).__name__} إلى JSON")
+
+def _json_object(value: dict):
+    if len(value) == 1 and '__bytes__' in value:
+        return base64.b64decode(value['__bytes__'])
+    return value
+
+def encode_message(channel: str, data) -> bytes:
+    """إطار JSON للرسالة (البيانات الثنائية بـ base64)"""
+    return json.dumps([channel, data], default=_json_default, separators=(',', ':')).encode('utf-8')
+
+def decode_message(frame: bytes) -> Tuple[str, object]:
+    """فك إطار JSON إلى (القناة، البيانات)"""
+    channel, data = json.loads(frame.decode('utf-8'), object_hook=_json_object)
+    return channel, data
+
+def _socket_in_use(path: str) -> bool:
+    """هل يستمع أحد على مقبس Unix؟ (الاتصال ينجح حتى لو كان الوسيط بطيئاً)"""
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+        return True
+    except (ConnectionRefusedError, FileNotFoundError):
+        return False
+    except OSError:
+        return True  # لا نحذف ما لا نعرف حالته
+    finally:
+        probe.close()
+
+def _shutdown(conn: Connection):
+    """إيقاف المقبس بدون إغلاقه: يوقظ خيطاً عالقاً في send_bytes على نفس الاتصال"""
+    try:
+        sock = socket.socket(fileno=os.dup(conn.fileno()))
+    except (OSError, ValueError):
+        return
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+    finally:
+        sock.close()
+
+class _Subscriber:
+    """اتصال مشترك مع طابوره المحدود"""
+
+    __slots__ = ('conn', 'frames')
+
+    def __init__(self, conn: Connection, max_pending: int):
+        self.conn = conn
+        self.frames: queue.Queue = queue.Queue(max_pending)
+
+class LocalBroker:
+    """وسيط نشر/اشتراك: كل إطار يصل من أي اتصال يرسل لكل الاتصالات"""
+
+    def __init__(self, address: Address, authkey: bytes, max_pending: int = MAX_PENDING_FRAMES):
+        self.address = address
+        self.authkey = require_key(authkey)
+        self.max_pending = max_pending
+        self._listener: Optional[Listener] = None
+        self._connections: Dict[Connection, Optional[_Subscriber]] = {}  # None للناشرين
+        self._lock = threading.Lock()
+        self._running = False
+
+        # المقاييس
+        self.messages_total = 0
+        self.slow_subscribers = 0
+
+    def start(self) -> 'LocalBroker':
+        """بدء الوسيط في خيط
+
+        RuntimeError إذا كان وسيط آخر يستمع على نفس المقبس؛ المقبس المتروك من
+        عملية انتهت (الاتصال به مرفوض) يحذف.
+        """
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            if _socket_in_use(self.address):
+                raise RuntimeError(f"وسيط آخر يعمل على {self.address}")
+            os.remove(self.address)
+
+        self._listener = Listener(self.address, authkey=self.authkey)
+        self._running = True
+        threading.Thread(target=self._accept_loop, name='local-broker', daemon=True).start()
+        return self
+
+    def stop(self):
+        """إيقاف الوسيط وإغلاق الاتصالات"""
+        self._running = False
+        if self._listener is not None:
+            self._listener.close()
+        with self._lock:
+            connections = list(self._connections)
+        for conn in connections:
+            _shutdown(conn)
+            self._drop(conn)
+
+    def _accept_loop(self):
+        while self._running:
+            try:
+                conn = self._listener.accept()
+            except Exception:
+                if not self._running:
+                    return
+                continue  # فشل المصادقة لعميل واحد
+
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn: Connection):
+        try:
+            role = conn.recv_bytes(64)
+        except (EOFError, OSError):
+            conn.close()
+            return
+
+        if role == ROLE_SUBSCRIBER:
+            subscriber = _Subscriber(conn, self.max_pending)
+            with self._lock:
+                self._connections[conn] = subscriber
+            self._write_loop(subscriber)
+        elif role == ROLE_PUBLISHER:
+            with self._lock:
+                self._connections[conn] = None
+            self._read_loop(conn)
+        else:
+            conn.close()
+
+    def _read_loop(self, conn: Connection):
+        # الإطارات تمرر كما هي: الوسيط لا يفك أي رسالة
+        try:
+            while self._running:
+                self._fan_out(conn.recv_bytes(MAX_MESSAGE_BYTES))
+        except (EOFError, OSError):
+            pass
+        finally:
+            self._drop(conn)
+
+    def _write_loop(self, subscriber: _Subscriber):
+        # الخيط الوحيد الذي يكتب على هذا الاتصال
+        try:
+            while self._running:
+                frame = subscriber.frames.get()
+                if frame is None:
+                    break
+                subscriber.conn.send_bytes(frame)
+        except (OSError, ValueError):
+            pass
+        finally:
+            self._drop(subscriber.conn)
+            subscriber.conn.close()
+
+    def _fan_out(self, frame: bytes):
+        with self._lock:
+            self.messages_total += 1
+            subscribers = [s for s in self._connections.values() if s is not None]
+
+        for subscriber in subscribers:
+            try:
+                subscriber.frames.put_nowait(frame)
+            except queue.Full:
+                # مشترك لا يقرأ: يفصل ولا يؤخر الباقين
+                with self._lock:
+                    self.slow_subscribers += 1
+                self._drop(subscriber.conn)
+
+    def _drop(self, conn: Connection):
+        with self._lock:
+            subscriber = self._connections.pop(conn, None)
+        if subscriber is None:
+            conn.close()
+            return
+
+        # خيط الكتابة يغلق الاتصال بنفسه: قد يكون عالقاً في send_bytes أو في انتظار إطار
+        _shutdown(conn)
+        try:
+            subscriber.frames.put_nowait(None)
+        except queue.Full:
+            pass
+
+class LocalPubSubManager(socketio.PubSubManager):
+    """مدير عملاء Socket.IO عبر الوسيط المحلي (بديل RedisManager)
+
+    يتصل بوسيط يعمل مسبقاً ولا يشغل وسيطاً بنفسه.
+    """
+
+    name = 'local'
+
+    def __init__(self, url: str = 'local:///tmp/mafia-socketio.sock', channel: str = 'flask-socketio',
+                 write_only: bool = False, logger=None, authkey: bytes = None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.address = parse_address(url)
+        self.authkey = require_key(authkey)
+
+        self._publisher: Optional[Connection] = None
+        self._publish_lock = threading.Lock()
+
+    def _connect(self, role: bytes) -> Connection:
+        conn = Client(self.address, authkey=self.authkey)
+        conn.send_bytes(role)
+        return conn
+
+    def _publish(self, data):
+        frame = encode_message(self.channel, data)
+        with self._publish_lock:
+            for attempt in range(2):
+                try:
+                    if self._publisher is None:
+                        self._publisher = self._connect(ROLE_PUBLISHER)
+                    self._publisher.send_bytes(frame)
+                    return
+                except (OSError, EOFError):
+                    self._publisher = None
+                    if attempt:
+                        self._get_logger().error('Cannot publish to local broker... giving up')
+                    else:
+                        self._get_logger().error('Cannot publish to local broker... retrying')
+
+    def _listen(self):
+        retry_sleep = 1
+        while True:
+            try:
+                conn = self._connect(ROLE_SUBSCRIBER)
+                retry_sleep = 1
+                while True:
+                    try:
+                        channel, data = decode_message(conn.recv_bytes(MAX_MESSAGE_BYTES))
+                    except (ValueError, TypeError):
+                        continue  # إطار غير صالح
+                    if channel == self.channel:
+                        yield data
+            except (OSError, EOFError):
+                self._get_logger().error(
+                    'Cannot receive from local broker... retrying in %s secs', retry_sleep)
+                time.sleep(retry_sleep)
+                retry_sleep = min(retry_sleep * 2, 60)
+
+def create_client_manager(url: Optional[str], channel: str = 'flask-socketio',
+                          authkey: bytes = None, write_only: bool = False):
+    """مدير العملاء لعنوان local://، أو None ليختار Flask-SocketIO (redis:// وغيره)"""
+    if url and url.startswith('local://'):
+        return LocalPubSubManager(url, channel=channel, write_only=write_only, authkey=authkey)
+    return None
+
+if __name__ == '__main__':
+    url = sys.argv[1] if len(sys.argv) > 1 else 'local:///tmp/mafia-socketio.sock'
+    try:
+        broker = LocalBroker(parse_address(url), os.environ.get('SOCKETIO_BROKER_KEY')).start()
+    except (ValueError, RuntimeError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print(f"📡 الوسيط المحلي يعمل على {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        broker.stop()
@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+سجل الرسائل الأخيرة في الذاكرة
+In-Memory Message History
+"""
+
+import threading
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, object_session
+from models.message import Message, MessageType
+from models.message_visibility import MessageVisibility
+from models.eager_loading import message_page
+from models.user import User
+from api.pagination import InvalidCursor, decode_cursor, encode_cursor, keyset_filter
+
+_PENDING_KEY = 'message_history_pending'
+_UNTRACKED_KEY = 'message_history_untracked'
+_BULK_KEY = 'message_history_bulk'
+
+# حقول التحديث الجماعي: ما لا يظهر في الذاكرة، وما يعدل فيها مباشرة
+_UNCACHED_FIELDS = frozenset({'id', 'suspicion_score', 'ai_analysis'})
+_PATCHABLE_FIELDS = frozenset({'is_flagged'})
+
+# أقصى انتظار لتحميل غرفة تحملها طلبات أخرى (ثوانٍ)
+LOAD_WAIT_TIMEOUT = 10.0
+
+class RoomHistory:
+    """آخر capacity رسالة في غرفة مرتبة حسب (وقت الإرسال، المعرف)"""
+
+    __slots__ = ('keys', 'entries', 'complete')
+
+    def __init__(self):
+        self.keys: List[Tuple[datetime, int]] = []
+        self.entries: Dict[int, Dict] = {}
+        self.complete = False  # كل رسائل الغرفة موجودة (الغرفة أصغر من السعة)
+
+class RoomLoad:
+    """تحميل غرفة قيد التنفيذ: الطلبات الأخرى تنتظره، والكتابات أثناءه تجمع"""
+
+    __slots__ = ('done', 'captured', 'stale', 'room')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.captured: List[Dict] = []  # رسائل ثبتت بعد بدء التحميل
+        self.stale = False  # كتابة لم تحول قبل بدء التحميل قد لا تكون في نتيجته
+        self.room: Optional[RoomHistory] = None
+
+class MessageHistory:
+    """ذاكرة دائرية لكل غرفة لآخر الرسائل بصيغتها المحولة
+
+    الصفحة الأحدث (وأغلب طلبات التمرير وإعادة الاتصال) تقرأ من الذاكرة بدون
+    قاعدة البيانات، والصفحات الأقدم تقرأ بمؤشر (sent_at, id) بدون COUNT.
+    الذاكرة تتحدث من أحداث SQLAlchemy بعد نجاح المعاملة، فكل طرق إنشاء أو
+    تعديل أو إخفاء الرسائل تنعكس عليها تلقائياً (بما فيها التحديث الجماعي
+    update(Message) الذي لا يطلق أحداث الكائنات). الغرفة تحمل من قاعدة
+    البيانات عند أول طلب فقط (طلب واحد يحمل والبقية تنتظره، والرسائل التي
+    تثبت أثناء التحميل تدمج بعده)، والغرف الأقل استخداماً تخرج عند امتلاء
+    الذاكرة.
+
+    الذاكرة ترى كتابات عمليتها فقط. مع عدة عمليات (SOCKETIO_MESSAGE_QUEUE)
+    رسائل العمليات الأخرى (مثل رسائل النظام من مسارات REST) لا تصلها، لذلك
+    MESSAGE_HISTORY_ENABLED معطل افتراضياً وقتها وكل الصفحات تقرأ من قاعدة
+    البيانات.
+    """
+
+    def __init__(self, capacity: int = 200, max_rooms: int = 1000, max_senders: int = 5000):
+        self.capacity = capacity
+        self.max_rooms = max_rooms
+        self.max_senders = max_senders
+
+        self.enabled = True
+        self._rooms: 'OrderedDict[int, RoomHistory]' = OrderedDict()
+        self._loading: Dict[int, RoomLoad] = {}
+        self._senders: 'OrderedDict[int, Tuple[str, Optional[str]]]' = OrderedDict()  # الاسم والصورة
+        self._lock = threading.Lock()
+        self._installed = False
+
+        # المقاييس
+        self.memory_pages = 0
+        self.database_pages = 0
+        self.room_loads = 0
+        self.load_waits = 0
+        self.stale_loads = 0
+        self.updates_applied = 0
+
+    def init_app(self, app):
+        """قراءة الإعدادات وتسجيل أحداث قاعدة البيانات"""
+        self.capacity = app.config.get('MESSAGE_HISTORY_SIZE', self.capacity)
+        self.max_rooms = app.config.get('MESSAGE_HISTORY_ROOMS', self.max_rooms)
+        self.enabled = app.config.get('MESSAGE_HISTORY_ENABLED', True)
+        if self.enabled:
+            self.install()
+
+    def install(self):
+        """تسجيل أحداث SQLAlchemy (مرة واحدة)"""
+        if self._installed:
+            return
+
+        event.listen(Message, 'after_insert', self._capture)
+        event.listen(Message, 'after_update', self._capture)
+        event.listen(Session, 'do_orm_execute', self._capture_bulk)
+        event.listen(Session, 'after_commit', self._apply_pending)
+        event.listen(Session, 'after_rollback', self._discard_pending)
+        self._installed = True
+
+    # ===== تحديث الذاكرة =====
+
+    def _capture(self, mapper, connection, message: Message):
+        """تحويل الرسالة عند الكتابة وتأجيل تطبيقها حتى نجاح المعاملة"""
+        session = object_session(message)
+        if session is None:
+            return
+
+        room_id = message.room_id
+        if room_id not in self._rooms and room_id not in self._loading:
+            # قد يبدأ تحميل الغرفة قبل التثبيت فلا تظهر الرسالة في نتيجته
+            session.info.setdefault(_UNTRACKED_KEY, set()).add(room_id)
+            return
+
+        entry = self._serialize(message, connection)
+        session.info.setdefault(_PENDING_KEY, []).append(entry)
+
+    def _capture_bulk(self, state):
+        """تسجيل التحديث الجماعي للرسائل لتطبيقه بعد نجاح المعاملة"""
+        if not state.is_update or state.bind_mapper is None or state.bind_mapper.class_ is not Message:
+            return
+
+        rows = state.parameters
+        bulk = state.session.info.setdefault(_BULK_KEY, [])
+        if isinstance(rows, list) and all(isinstance(row, dict) and 'id' in row for row in rows):
+            bulk.extend(rows)
+        else:
+            bulk.append(None)  # تحديث بشرط: الرسائل المتأثرة غير معروفة
+
+    def _apply_pending(self, session):
+        entries = session.info.pop(_PENDING_KEY, None)
+        untracked = session.info.pop(_UNTRACKED_KEY, None)
+        bulk = session.info.pop(_BULK_KEY, None)
+        if bulk:
+            self._apply_bulk(bulk)
+        if not entries and not untracked:
+            return
+
+        with self._lock:
+            for entry in entries or ():
+                room_id = entry['room_id']
+                room = self._rooms.get(room_id)
+                if room is not None:
+                    self._store(room, entry)
+                    self.updates_applied += 1
+                elif room_id in self._loading:
+                    self._loading[room_id].captured.append(entry)
+
+            # غرفة بدأ تحميلها بين التحويل والتثبيت: نتيجتها غير مضمونة
+            for room_id in untracked or ():
+                load = self._loading.get(room_id)
+                if load is not None:
+                    load.stale = True
+                elif self._rooms.pop(room_id, None) is not None:
+                    self.stale_loads += 1
+
+    def _discard_pending(self, session):
+        session.info.pop(_PENDING_KEY, None)
+        session.info.pop(_UNTRACKED_KEY, None)
+        session.info.pop(_BULK_KEY, None)
+
+    def _apply_bulk(self, rows: List[Optional[Dict]]):
+        """تعديل الرسائل المحدثة جماعياً في الذاكرة أو حذف غرفها"""
+        with self._lock:
+            # التحميل الجاري قد يكون قرأ القيم القديمة
+            for load in self._loading.values():
+                load.stale = True
+
+            if any(row is None for row in rows):
+                self._rooms.clear()
+                return
+
+            changes = {row['id']: row for row in rows}
+            for room_id, room in list(self._rooms.items()):
+                smaller, larger = sorted((room.entries, changes), key=len)
+                for message_id in [message_id for message_id in smaller if message_id in larger]:
+                    fields = changes[message_id].keys() - _UNCACHED_FIELDS
+                    if not fields <= _PATCHABLE_FIELDS:
+                        del self._rooms[room_id]  # حقل يغير المحتوى أو الرؤية
+                        break
+                    if fields:
+                        patch = {field: changes[message_id][field] for field in fields}
+                        room.entries[message_id] = dict(room.entries[message_id], **patch)
+                        self.updates_applied += 1
+
+    def _store(self, room: RoomHistory, entry: Dict):
+        """إضافة أو استبدال رسالة في ذاكرة الغرفة (يجب استدعاؤها مع القفل)"""
+        message_id = entry['id']
+        if message_id in room.entries:
+            room.entries[message_id] = entry
+            return
+
+        key = (entry['_sent_at'], message_id)
+        if room.keys and len(room.keys) >= self.capacity and key < room.keys[0]:
+            return  # أقدم من محتوى الذاكرة
+
+        insort(room.keys, key)
+        room.entries[message_id] = entry
+
+        while len(room.keys) > self.capacity:
+            _, oldest_id = room.keys.pop(0)
+            room.entries.pop(oldest_id, None)
+            room.complete = False
+
+    def _sender(self, user_id: Optional[int], connection=None) -> Tuple[str, Optional[str]]:
+        """اسم وصورة المرسل من الذاكرة أو من قاعدة البيانات"""
+        if not user_id:
+            return "النظام", None
+
+        sender = self._senders.get(user_id)
+        if sender is None and connection is not None:
+            row = connection.execute(
+                select(User.display_name, User.avatar_url).where(User.id == user_id)
+            ).first()
+            sender = (row[0], row[1]) if row else ("النظام", None)
+            self._remember_sender(user_id, sender)
+        return sender or ("النظام", None)
+
+    def _remember_sender(self, user_id: int, sender: Tuple[str, Optional[str]]):
+        self._senders[user_id] = sender
+        self._senders.move_to_end(user_id)
+        while len(self._senders) > self.max_senders:
+            self._senders.popitem(last=False)
+
+    def _serialize(self, message: Message, connection=None) -> Dict:
+        """الصيغة المشتركة لكل المشاهدين (المحتوى والرؤية تحسب لكل مشاهد)"""
+        user = message.__dict__.get('user')
+        if user is not None:
+            self._remember_sender(user.id, (user.display_name, user.avatar_url))
+        sender_name, sender_avatar = self._sender(message.user_id, connection)
+
+        metadata = message.get_metadata()
+        entry = {
+            'id': message.id,
+            'user_id': message.user_id,
+            'sender_name': sender_name,
+            'sender_avatar': sender_avatar,
+            'room_id': message.room_id,
+            'message_type': message.message_type.value,
+            'status': message.status.value,
+            'sent_at': message.sent_at.isoformat(),
+            'edited_at': message.edited_at.isoformat() if message.edited_at else None,
+            'game_round': message.game_round,
+            'game_phase': message.game_phase,
+            'is_flagged': message.is_flagged,
+            # حقول داخلية لحساب الرؤية والمحتوى
+            '_sent_at': message.sent_at,
+            '_content': message.content,
+            '_target_user_id': metadata.get('target_user_id')
+        }
+
+        if message.message_type == MessageType.VOICE:
+            entry.update({
+                'voice_file_path': message.voice_file_path,
+                'voice_duration': message.voice_duration,
+                'transcription': message.transcription,
+                'transcription_status': metadata.get('transcription_status') or (
+                    'done' if message.transcription else None
+                )
+            })
+
+        return entry
+
+    # ===== القراءة =====
+
+    def _load_room(self, room_id: int) -> Optional[RoomHistory]:
+        """تحميل آخر رسائل الغرفة من قاعدة البيانات (تحميل واحد لكل غرفة)
+
+        None إذا فشل التحميل أو لم تكتمل نتيجته، فيقرأ الطلب من قاعدة البيانات.
+        """
+        with self._lock:
+            room = self._rooms.get(room_id)
+            if room is not None:
+                return room
+            load = self._loading.get(room_id)
+            owner = load is None
+            if owner:
+                # التسجيل قبل الاستعلام: الرسائل المثبتة من الآن تجمع في load
+                load = self._loading[room_id] = RoomLoad()
+
+        if not owner:
+            self.load_waits += 1
+            load.done.wait(LOAD_WAIT_TIMEOUT)
+            return load.room
+
+        try:
+            messages = message_page(Message.query).filter(
+                Message.room_id == room_id
+            ).order_by(Message.sent_at.desc(), Message.id.desc()).limit(self.capacity).all()
+
+            room = RoomHistory()
+            room.complete = len(messages) < self.capacity
+            for message in messages:
+                entry = self._serialize(message)
+                room.keys.append((entry['_sent_at'], entry['id']))
+                room.entries[entry['id']] = entry
+            room.keys.reverse()
+
+            with self._lock:
+                # الرسائل المثبتة أثناء الاستعلام (بترتيب التثبيت، فالأحدث يغلب)
+                for entry in load.captured:
+                    self._store(room, entry)
+
+                if load.stale:
+                    self.stale_loads += 1
+                else:
+                    self._rooms[room_id] = room
+                    self._rooms.move_to_end(room_id)
+                    while len(self._rooms) > self.max_rooms:
+                        self._rooms.popitem(last=False)
+                    load.room = room
+
+            self.room_loads += 1
+            return load.room
+        finally:
+            with self._lock:
+                self._loading.pop(room_id, None)
+            load.done.set()
+
+    def get_page(self, room_id: int, viewer_user_id: int, limit: int = 50,
+                 before: Optional[str] = None) -> Dict:
+        """صفحة رسائل للمشاهد (من الأقدم للأحدث) مع مؤشر الصفحة السابقة"""
+        cursor = None
+        if before:
+            values = decode_cursor(before)
+            if len(values) != 2 or not isinstance(values[0], datetime):
+                raise InvalidCursor('مؤشر سجل الرسائل')
+            cursor = (values[0], values[1])
+
+        entries = self._page_from_memory(room_id, limit, cursor) if self.enabled else None
+        if entries is None:
+            entries = self._page_from_database(room_id, limit, cursor)
+            self.database_pages += 1
+        else:
+            self.memory_pages += 1
+
+        has_more = len(entries) > limit
+        entries = entries[-limit:] if has_more else entries
+
+        visibility = MessageVisibility(room_id, viewer_user_id)
+        messages = [visibility.render_entry(entry) for entry in entries if visibility.can_see_entry(entry)]
+
+        return {
+            'messages': messages,
+            'has_more': has_more,
+            'next_cursor': encode_cursor([entries[0]['_sent_at'], entries[0]['id']]) if has_more else None
+        }
+
+    def _page_from_memory(self, room_id: int, limit: int,
+                          cursor: Optional[Tuple[datetime, int]]) -> Optional[List[Dict]]:
+        """limit+1 رسالة قبل المؤشر من الذاكرة، أو None إذا لم تكن كلها في الذاكرة"""
+        with self._lock:
+            room = self._rooms.get(room_id)
+            if room is not None:
+                self._rooms.move_to_end(room_id)
+
+        if room is None:
+            if cursor is not None:
+                return None
+            room = self._load_room(room_id)
+            if room is None:
+                return None
+
+        with self._lock:
+            keys = room.keys
+            end = len(keys)
+            if cursor is not None:
+                if not keys or cursor <= keys[0]:
+                    return [] if room.complete else None
+                end = bisect_left(keys, cursor)
+
+            start = end - (limit + 1)
+            if start < 0 and not room.complete:
+                return None
+
+            return [room.entries[message_id] for _, message_id in keys[max(start, 0):end]]
+
+    def _page_from_database(self, room_id: int, limit: int,
+                            cursor: Optional[Tuple[datetime, int]]) -> List[Dict]:
+        """limit+1 رسالة قبل المؤشر بالاستعلام بالمؤشر (بدون OFFSET ولا COUNT)"""
+        query = message_page(Message.query).filter(Message.room_id == room_id)
+        if cursor is not None:
+            query = query.filter(keyset_filter([(Message.sent_at, True), (Message.id, True)], cursor))
+
+        messages = query.order_by(Message.sent_at.desc(), Message.id.desc()).limit(limit + 1).all()
+        return [self._serialize(message) for message in reversed(messages)]
+
+    def invalidate(self, room_id: int):
+        """حذف ذاكرة غرفة"""
+        with self._lock:
+            self._rooms.pop(room_id, None)
+
+    def get_statistics(self) -> Dict:
+        """إحصائيات سجل الرسائل"""
+        pages = self.memory_pages + self.database_pages
+        return {
+            'enabled': self.enabled,
+            'rooms_cached': len(self._rooms),
+            'capacity': self.capacity,
+            'memory_pages': self.memory_pages,
+            'database_pages': self.database_pages,
+            'memory_hit_rate': self.memory_pages / pages if pages else 0.0,
+            'room_loads': self.room_loads,
+            'load_waits': self.load_waits,
+            'stale_loads': self.stale_loads,
+            'updates_applied': self.updates_applied
+        }
+
+# السجل المشترك
+message_history = MessageHistory()
@@ -25,8 +25,20 @@ def register_room_events(socketio):
             room_code = data.get('room_code', '').upper()
             password = data.get('password')
             
-            # الانضمام عبر RoomManager
             room_manager = current_app.room_manager
+            
+            # عضو بالفعل (إعادة اتصال أو منشئ الغرفة): ربط الاتصال الجديد بغرفة WebSocket فقط
+            current = room_manager.get_user_room_ref(current_user.id)
+            if current and current.room_code == room_code:
+                join_room(room_code)
+                room = room_manager.get_room(room_code)
+                emit('room_joined', {
+                    'room': room.to_dict(include_players=True) if room else None,
+                    'message': 'تمت إعادة الاتصال بالغرفة'
+                })
+                return
+            
+            # الانضمام عبر RoomManager
             success, message = room_manager.join_room(current_user.id, room_code, password)
             
             if success:
@@ -83,7 +95,7 @@ def register_room_events(socketio):
             room_manager = current_app.room_manager
             
             # الحصول على الغرفة الحالية
-            room = room_manager.get_user_room(current_user.id)
+            room = room_manager.get_user_room_ref(current_user.id)
             if not room:
                 emit('error', {'message': 'لست في أي غرفة'})
                 return
@@ -191,7 +203,7 @@ def register_room_events(socketio):
         
         try:
             room_manager = current_app.room_manager
-            room = room_manager.get_user_room(current_user.id)
+            room = room_manager.get_user_room_ref(current_user.id)
             
             if not room:
                 emit('error', {'message': 'لست في أي غرفة'})
@@ -249,7 +261,7 @@ def register_room_events(socketio):
         if current_user.is_authenticated:
             try:
                 room_manager = current_app.room_manager
-                room = room_manager.get_user_room(current_user.id)
+                room = room_manager.get_user_room_ref(current_user.id)
                 
                 if room:
                     room_code = room.room_code
@@ -6,13 +6,21 @@ Voice WebSocket Events
 """
 
 import os
+import re
 import base64
 from datetime import datetime
-from flask import current_app
+from flask import current_app, request
 from flask_socketio import emit
 from flask_login import current_user
 from models import db
 from models.message import Message, MessageType
+from .voice_upload import voice_uploads, voice_filename
+
+# حجم كتلة فك تشفير base64 (مضاعف للعدد 4)
+BASE64_DECODE_BLOCK = 64 * 1024
+
+# ما يتجاهله b64decode (المسافات وفواصل الأسطر وغيرها)
+_NON_BASE64 = re.compile(r'[^A-Za-z0-9+/=]')
 
 def register_voice_events(socketio):
     """تسجيل أحداث الصوت"""
@@ -35,7 +43,7 @@ def register_voice_events(socketio):
             
             # الحصول على الغرفة
             room_manager = current_app.room_manager
-            room = room_manager.get_user_room(current_user.id)
+            room = room_manager.get_user_room_ref(current_user.id)
             
             if not room:
                 emit('error', {'message': 'لست في أي غرفة'})
@@ -53,90 +61,110 @@ def register_voice_events(socketio):
                 emit('error', {'message': 'فشل في حفظ الملف الصوتي'})
                 return
             
-            # تحويل الصوت إلى نص
-            transcription = ""
-            if hasattr(current_app, 'speech_to_text'):
-                try:
-                    transcription = current_app.speech_to_text.transcribe(voice_file_path)
-                except Exception as e:
-                    print(f"خطأ في تحويل الصوت إلى نص: {e}")
-            
-            # إنشاء الرسالة الصوتية
-            game_manager = current_app.game_manager
-            session = game_manager.get_game_session(room.id)
-            
-            message = Message(
-                room_id=room.id,
-                user_id=current_user.id,
-                content=transcription or "[رسالة صوتية]",
-                message_type=MessageType.VOICE,
-                voice_file_path=voice_file_path,
-                voice_duration=duration,
-                transcription=transcription
-            )
+            publish_voice_message(room, voice_file_path, duration)
             
-            # إضافة معلومات اللعبة
-            if session:
-                message.game_round = session.current_round
-                message.game_phase = session.phase_manager.current_phase.value
-            
-            db.session.add(message)
-            db.session.commit()
-            
-            # تحليل الرسالة الصوتية بالذكاء الاصطناعي
-            if hasattr(current_app, 'ai_analyzer') and transcription:
-                try:
-                    analysis = current_app.ai_analyzer.analyze_voice_message(
-                        message.id,
-                        transcription,
-                        voice_file_path,
-                        current_user.id,
-                        room.id,
-                        session.current_round if session else None,
-                        session.phase_manager.current_phase.value if session else None
-                    )
-                    
-                    if analysis.get('is_suspicious', False):
-                        message.flag_as_suspicious(
-                            analysis.get('reason', 'محتوى صوتي مشبوه'),
-                            analysis.get('suspicion_score', 0.5)
-                        )
-                        
-                        # إخفاء الرسالة إذا كانت مخالفة شديدة
-                        if analysis.get('suspicion_score', 0) > 0.8:
-                            message.hide_message(analysis.get('reason', 'مخالفة صوتية شديدة'))
-                            
-                            emit('voice_message_hidden', {
-                                'message_id': message.id,
-                                'reason': analysis.get('reason', 'مخالفة صوتية شديدة')
-                            })
-                            
-                except Exception as e:
-                    print(f"خطأ في تحليل الرسالة الصوتية: {e}")
-            
-            # تحديث إحصائيات الدردشة
-            if current_user.statistics:
-                current_user.statistics.update_chat_stats(
-                    len(transcription) if transcription else 10,  # تقدير طول الرسالة الصوتية
-                    message.suspicion_score,
-                    message.is_flagged
-                )
+        except Exception as e:
+            db.session.rollback()
+            emit('error', {'message': f'خطأ في إرسال الرسالة الصوتية: {str(e)}'})
+    
+    @socketio.on('voice_chunk_start')
+    def handle_voice_chunk_start(data):
+        """بدء رفع رسالة صوتية على أجزاء ثنائية"""
+        if not current_user.is_authenticated:
+            emit('error', {'message': 'يجب تسجيل الدخول أولاً'})
+            return
+        
+        try:
+            room_manager = current_app.room_manager
+            room = room_manager.get_user_room_ref(current_user.id)
             
-            # إرسال الرسالة الصوتية
-            message_data = message.to_dict(current_user.id)
-            emit('new_voice_message', {'message': message_data}, room=room.room_code)
+            if not room:
+                emit('error', {'message': 'لست في أي غرفة'})
+                return
             
-            # إشعار بنجاح الإرسال
-            emit('voice_message_sent', {
-                'message_id': message.id,
-                'transcription': transcription,
-                'duration': duration
+            if not room.allow_voice_chat:
+                emit('error', {'message': 'الدردشة الصوتية معطلة في هذه الغرفة'})
+                return
+            
+            max_bytes = current_app.config.get('MAX_CONTENT_LENGTH') or 16 * 1024 * 1024
+            success, message, upload = voice_uploads.start(
+                current_user.id,
+                room.id,
+                voice_directory(),
+                max_bytes,
+                duration=data.get('duration', 0),
+                declared_size=data.get('size'),
+                sid=request.sid
+            )
+            
+            if not success:
+                emit('error', {'message': message})
+                return
+            
+            emit('voice_chunk_ready', {
+                'upload_id': upload.upload_id,
+                'chunk_size': voice_uploads.chunk_size,
+                'max_bytes': max_bytes
             })
             
+        except Exception as e:
+            emit('error', {'message': f'خطأ في بدء رفع الرسالة الصوتية: {str(e)}'})
+    
+    @socketio.on('voice_chunk')
+    def handle_voice_chunk(data):
+        """استلام جزء من الرسالة الصوتية (القيمة المرجعة تصل للعميل كتأكيد)"""
+        if not current_user.is_authenticated:
+            return {'success': False, 'message': 'يجب تسجيل الدخول أولاً'}
+        
+        upload_id = data.get('upload_id')
+        success, message, received = voice_uploads.append(
+            upload_id, current_user.id, data.get('seq'), data.get('chunk')
+        )
+        
+        if not success:
+            emit('voice_upload_failed', {'upload_id': upload_id, 'message': message})
+        
+        return {'success': success, 'received': received}
+    
+    @socketio.on('voice_chunk_end')
+    def handle_voice_chunk_end(data):
+        """إنهاء الرفع وإرسال الرسالة الصوتية"""
+        if not current_user.is_authenticated:
+            emit('error', {'message': 'يجب تسجيل الدخول أولاً'})
+            return
+        
+        try:
+            upload_id = data.get('upload_id')
+            success, message, upload, voice_file_path = voice_uploads.finish(upload_id, current_user.id)
+            
+            if not success:
+                emit('voice_upload_failed', {'upload_id': upload_id, 'message': message})
+                return
+            
+            # التحقق من أن المستخدم ما زال في غرفة الرفع
+            room_manager = current_app.room_manager
+            room = room_manager.get_user_room_ref(current_user.id)
+            
+            if not room or room.id != upload.room_id:
+                os.remove(os.path.join(current_app.root_path, voice_file_path))
+                emit('error', {'message': 'لست في غرفة الرفع'})
+                return
+            
+            emit('voice_upload_complete', {'upload_id': upload_id, 'size': upload.received})
+            publish_voice_message(room, voice_file_path, data.get('duration', upload.duration))
+            
         except Exception as e:
             db.session.rollback()
             emit('error', {'message': f'خطأ في إرسال الرسالة الصوتية: {str(e)}'})
     
+    @socketio.on('voice_chunk_cancel')
+    def handle_voice_chunk_cancel(data):
+        """إلغاء رفع جارٍ"""
+        if not current_user.is_authenticated:
+            return
+        
+        voice_uploads.abort(data.get('upload_id'), current_user.id)
+    
     @socketio.on('voice_chat_join')
     def handle_voice_chat_join():
         """الانضمام للدردشة الصوتية المباشرة"""
@@ -146,7 +174,7 @@ def register_voice_events(socketio):
         
         try:
             room_manager = current_app.room_manager
-            room = room_manager.get_user_room(current_user.id)
+            room = room_manager.get_user_room_ref(current_user.id)
             
             if not room:
                 emit('error', {'message': 'لست في أي غرفة'})
@@ -183,7 +211,7 @@ def register_voice_events(socketio):
         
         try:
             room_manager = current_app.room_manager
-            room = room_manager.get_user_room(current_user.id)
+            room = room_manager.get_user_room_ref(current_user.id)
             
             if not room:
                 emit('error', {'message': 'لست في أي غرفة'})
@@ -215,7 +243,7 @@ def register_voice_events(socketio):
             is_muted = data.get('muted', False)
             
             room_manager = current_app.room_manager
-            room = room_manager.get_user_room(current_user.id)
+            room = room_manager.get_user_room_ref(current_user.id)
             
             if not room:
                 emit('error', {'message': 'لست في أي غرفة'})
@@ -261,11 +289,32 @@ def register_voice_events(socketio):
                 emit('error', {'message': 'ليس لديك صلاحية لرؤية هذه الرسالة'})
                 return
             
+            transcription_queue = getattr(current_app, 'transcription_queue', None)
+            
             # إرسال النص المحول إن وجد
             if message.transcription:
                 emit('transcription_result', {
                     'message_id': message_id,
-                    'transcription': message.transcription
+                    'transcription': message.transcription,
+                    'status': 'done'
+                })
+            elif transcription_queue is not None and message.voice_file_path:
+                # التحويل جارٍ أو يعاد في الخلفية والنتيجة تصل للغرفة
+                if message.get_transcription_status() != 'pending':
+                    # الحالة تحفظ قبل الإضافة حتى لا تغطي نتيجة العامل
+                    message.set_transcription(None, 'pending')
+                    if not transcription_queue.submit(
+                        message.id, message.voice_file_path, message.user_id, message.room_id,
+                        message.room.room_code, message.game_round, message.game_phase
+                    ):
+                        message.set_transcription(None, 'failed')
+                        emit('error', {'message': 'خدمة تحويل الصوت إلى نص مشغولة، حاول لاحقاً'})
+                        return
+                
+                emit('transcription_result', {
+                    'message_id': message_id,
+                    'transcription': None,
+                    'status': 'pending'
                 })
             else:
                 # محاولة تحويل الصوت إلى نص
@@ -290,36 +339,167 @@ def register_voice_events(socketio):
         except Exception as e:
             emit('error', {'message': f'خطأ: {str(e)}'})
 
+def publish_voice_message(room, voice_file_path, duration):
+    """حفظ الرسالة الصوتية وإذاعتها ثم إرسالها للتحويل إلى نص"""
+    # إنشاء الرسالة الصوتية
+    game_manager = current_app.game_manager
+    session = game_manager.get_game_session(room.id)
+    game_round = session.current_round if session else None
+    game_phase = session.phase_manager.current_phase.value if session else None
+    
+    message = Message(
+        room_id=room.id,
+        user_id=current_user.id,
+        content="[رسالة صوتية]",
+        message_type=MessageType.VOICE,
+        voice_file_path=voice_file_path,
+        voice_duration=duration,
+        game_round=game_round,
+        game_phase=game_phase
+    )
+    
+    # التحويل إلى نص يتم في الخلفية بعد الإذاعة
+    transcription_queue = getattr(current_app, 'transcription_queue', None)
+    transcription = ""
+    if transcription_queue is not None:
+        message.set_metadata({'transcription_status': 'pending'})
+    elif hasattr(current_app, 'speech_to_text'):
+        try:
+            transcription = current_app.speech_to_text.transcribe(voice_file_path)
+        except Exception as e:
+            print(f"خطأ في تحويل الصوت إلى نص: {e}")
+        if transcription:
+            message.transcription = transcription
+            message.content = transcription
+    
+    db.session.add(message)
+    db.session.commit()
+    
+    # إرسال الرسالة الصوتية فوراً
+    message_data = message.to_dict(current_user.id)
+    emit('new_voice_message', {'message': message_data}, room=room.room_code)
+    
+    emit('voice_message_sent', {
+        'message_id': message.id,
+        'transcription': transcription,
+        'transcription_status': message.get_transcription_status(),
+        'duration': duration
+    })
+    
+    if transcription_queue is not None:
+        queued = transcription_queue.submit(
+            message.id, voice_file_path, current_user.id, room.id,
+            room.room_code, game_round, game_phase
+        )
+        if not queued:
+            # الطابور ممتلئ: يمكن طلب التحويل لاحقاً عبر request_transcription
+            message.set_transcription(None, 'failed')
+            emit('transcription_result', {
+                'message_id': message.id,
+                'transcription': None,
+                'status': 'failed'
+            }, room=room.room_code)
+        return
+    
+    # تحليل الرسالة الصوتية بالذكاء الاصطناعي
+    if hasattr(current_app, 'ai_analyzer') and transcription:
+        try:
+            analysis = current_app.ai_analyzer.analyze_voice_message(
+                message.id,
+                transcription,
+                voice_file_path,
+                current_user.id,
+                room.id,
+                game_round,
+                game_phase
+            )
+            
+            if analysis.get('is_suspicious', False):
+                message.flag_as_suspicious(
+                    analysis.get('reason', 'محتوى صوتي مشبوه'),
+                    analysis.get('suspicion_score', 0.5)
+                )
+                
+                # إخفاء الرسالة إذا كانت مخالفة شديدة
+                if analysis.get('suspicion_score', 0) > 0.8:
+                    message.hide_message(analysis.get('reason', 'مخالفة صوتية شديدة'))
+                    
+                    emit('voice_message_hidden', {
+                        'message_id': message.id,
+                        'reason': analysis.get('reason', 'مخالفة صوتية شديدة')
+                    })
+                    
+        except Exception as e:
+            print(f"خطأ في تحليل الرسالة الصوتية: {e}")
+    
+    # تحديث إحصائيات الدردشة
+    if current_user.statistics:
+        current_user.statistics.update_chat_stats(
+            len(transcription) if transcription else 10,  # تقدير طول الرسالة الصوتية
+            message.suspicion_score,
+            message.is_flagged
+        )
+
+def voice_directory():
+    """مجلد الملفات الصوتية"""
+    return os.path.join(current_app.root_path, 'static', 'voice_messages')
+
+def iter_base64_blocks(data, block_size: int = BASE64_DECODE_BLOCK):
+    """فك base64 على كتل بنفس نتيجة b64decode للنص كاملاً
+
+    الأحرف خارج الأبجدية تحذف أولاً، وكل كتلة تفك بطول من مضاعفات 4 والباقي
+    ينقل للكتلة التالية.
+    """
+    if isinstance(data, (bytes, bytearray)):
+        data = data.decode('latin-1')
+    
+    pending = ''
+    for start in range(0, len(data), block_size):
+        chunk = pending + _NON_BASE64.sub('', data[start:start + block_size])
+        usable = len(chunk) - len(chunk) % 4
+        pending = chunk[usable:]
+        if usable:
+            yield base64.b64decode(chunk[:usable])
+    
+    if pending:
+        yield base64.b64decode(pending)  # حشو ناقص: نفس خطأ b64decode
+
 def save_voice_file(audio_data_base64, user_id):
     """حفظ الملف الصوتي"""
+    file_path = None
     try:
+        # رفض الملفات الأكبر من المسموح قبل فك التشفير
+        max_bytes = current_app.config.get('MAX_CONTENT_LENGTH')
+        if max_bytes and len(audio_data_base64) * 3 // 4 > max_bytes:
+            print(f"خطأ في حفظ الملف الصوتي: الحجم أكبر من المسموح ({max_bytes} بايت)")
+            return None
+        
         # إنشاء مجلد الملفات الصوتية إن لم يكن موجوداً
-        voice_dir = os.path.join(current_app.root_path, 'static', 'voice_messages')
+        voice_dir = voice_directory()
         os.makedirs(voice_dir, exist_ok=True)
         
-        # فك تشفير البيانات
-        audio_data = base64.b64decode(audio_data_base64)
-        
         # إنشاء اسم ملف فريد
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"voice_{user_id}_{timestamp}.wav"
+        filename = voice_filename(user_id)
         file_path = os.path.join(voice_dir, filename)
         
-        # حفظ الملف
+        # فك التشفير على كتل بدل نسخة ثنائية كاملة في الذاكرة
         with open(file_path, 'wb') as f:
-            f.write(audio_data)
+            for block in iter_base64_blocks(audio_data_base64):
+                f.write(block)
         
         # إرجاع المسار النسبي
         return f"static/voice_messages/{filename}"
         
     except Exception as e:
         print(f"خطأ في حفظ الملف الصوتي: {e}")
+        if file_path and os.path.exists(file_path):
+            os.remove(file_path)
         return None
 
 def cleanup_old_voice_files():
     """تنظيف الملفات الصوتية القديمة"""
     try:
-        voice_dir = os.path.join(current_app.root_path, 'static', 'voice_messages')
+        voice_dir = voice_directory()
         
         if not os.path.exists(voice_dir):
             return
@@ -345,18 +525,19 @@ def cleanup_old_voice_files():
         print(f"خطأ في تنظيف الملفات الصوتية: {e}")
 
 # إضافة مهمة التنظيف الدورية
-def setup_voice_cleanup():
+def setup_voice_cleanup(socketio):
     """إعداد تنظيف الملفات الصوتية الدوري"""
-    import threading
-    import time
     
     def cleanup_worker():
         while True:
-            time.sleep(86400)  # كل 24 ساعة
+            socketio.sleep(86400)  # كل 24 ساعة
             cleanup_old_voice_files()
     
-    cleanup_thread = threading.Thread(target=cleanup_worker, daemon=True)
-    cleanup_thread.start()
+    # مهمة خلفية تعاونية في وضع eventlet/gevent
+    socketio.start_background_task(cleanup_worker)
 
 # تصدير الوظائف
-__all__ = ['register_voice_events', 'save_voice_file', 'cleanup_old_voice_files', 'setup_voice_cleanup']
\ No newline at end of file
+__all__ = [
+    'register_voice_events', 'publish_voice_message', 'save_voice_file',
+    'cleanup_old_voice_files', 'setup_voice_cleanup'
+]
\ No newline at end of file
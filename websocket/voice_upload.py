@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+رفع الرسائل الصوتية على أجزاء
+Chunked Voice Uploads
+"""
+
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+class VoiceUpload:
+    """رفع جارٍ: الأجزاء تكتب مباشرة في ملف مؤقت"""
+
+    __slots__ = (
+        'upload_id', 'user_id', 'room_id', 'sid', 'directory', 'temp_path', 'file',
+        'received', 'next_seq', 'max_bytes', 'duration', 'updated_at', 'closed', 'lock'
+    )
+
+    def __init__(self, user_id: int, room_id: int, directory: str, max_bytes: int, duration: float = 0,
+                 sid: str = None):
+        self.upload_id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.room_id = room_id
+        self.sid = sid  # اتصال Socket.IO الذي بدأ الرفع
+        self.directory = directory
+        self.temp_path = os.path.join(directory, f".upload_{self.upload_id}.part")
+        self.file = open(self.temp_path, 'wb')
+        self.received = 0
+        self.next_seq = 0
+        self.max_bytes = max_bytes
+        self.duration = duration
+        self.updated_at = time.monotonic()
+        self.closed = False
+        self.lock = threading.Lock()  # الأجزاء قد تصل في خيوط مختلفة
+
+    def close(self):
+        """إغلاق الملف المؤقت"""
+        with self.lock:
+            self.closed = True
+            self.file.close()
+
+    def discard(self):
+        """إغلاق الملف المؤقت وحذفه"""
+        try:
+            self.close()
+        finally:
+            if os.path.exists(self.temp_path):
+                os.remove(self.temp_path)
+
+class VoiceUploadManager:
+    """إدارة الرفع الجاري لكل مستخدم
+
+    الذاكرة المستخدمة لكل رفع لا تتجاوز حجم جزء واحد لأن كل جزء يكتب في
+    الملف فور وصوله، والحد الأقصى للحجم (MAX_CONTENT_LENGTH) يتحقق منه مع
+    كل جزء. رفع الاتصال المنقطع يلغى عند قطع الاتصال (abort_session)،
+    والرفع المتروك أكثر من idle_timeout يحذف عند بدء رفع جديد ومع مهام التنظيف.
+    """
+
+    def __init__(self, chunk_size: int = 64 * 1024, idle_timeout: float = 60, max_per_user: int = 2):
+        self.chunk_size = chunk_size
+        self.idle_timeout = idle_timeout
+        self.max_per_user = max_per_user
+
+        self._uploads: Dict[str, VoiceUpload] = {}
+        self._lock = threading.Lock()
+
+        # المقاييس
+        self.completed_total = 0
+        self.aborted_total = 0
+        self.rejected_total = 0
+        self.bytes_total = 0
+
+    def init_app(self, app):
+        """قراءة الإعدادات من التطبيق"""
+        self.chunk_size = app.config.get('VOICE_CHUNK_SIZE', self.chunk_size)
+        self.idle_timeout = app.config.get('VOICE_UPLOAD_IDLE_TIMEOUT', self.idle_timeout)
+        self.max_per_user = app.config.get('VOICE_UPLOADS_PER_USER', self.max_per_user)
+
+    def start(self, user_id: int, room_id: int, directory: str, max_bytes: int,
+              duration: float = 0, declared_size: int = None,
+              sid: str = None) -> Tuple[bool, str, Optional[VoiceUpload]]:
+        """بدء رفع جديد"""
+        self.sweep()
+
+        if declared_size is not None:
+            # الحجم من العميل: رقم صحيح غير سالب فقط (bool من int في بايثون)
+            if not isinstance(declared_size, int) or isinstance(declared_size, bool) or declared_size < 0:
+                self.rejected_total += 1
+                return False, "حجم الملف الصوتي غير صالح", None
+            if declared_size > max_bytes:
+                self.rejected_total += 1
+                return False, "حجم الملف الصوتي أكبر من المسموح", None
+
+        with self._lock:
+            active = sum(1 for upload in self._uploads.values() if upload.user_id == user_id)
+            if active >= self.max_per_user:
+                self.rejected_total += 1
+                return False, "يوجد رفع صوتي جارٍ بالفعل", None
+
+            os.makedirs(directory, exist_ok=True)
+            upload = VoiceUpload(user_id, room_id, directory, max_bytes, duration, sid=sid)
+            self._uploads[upload.upload_id] = upload
+
+        return True, "تم بدء الرفع", upload
+
+    def append(self, upload_id: str, user_id: int, seq: int, data: bytes) -> Tuple[bool, str, int]:
+        """إضافة جزء للملف (يلغى الرفع عند تجاوز الحجم أو خطأ الترتيب)"""
+        upload = self._get(upload_id, user_id)
+        if not upload:
+            return False, "الرفع غير موجود", 0
+
+        error = None
+        with upload.lock:
+            if upload.closed:
+                return False, "الرفع غير موجود", upload.received
+
+            if not isinstance(data, (bytes, bytearray)):
+                error = "يجب إرسال الأجزاء كبيانات ثنائية"
+            elif len(data) > self.chunk_size:
+                error = f"حجم الجزء أكبر من المسموح ({self.chunk_size} بايت)"
+            elif seq != upload.next_seq:
+                error = f"ترتيب الأجزاء غير صحيح (المتوقع {upload.next_seq})"
+            elif upload.received + len(data) > upload.max_bytes:
+                error = "حجم الملف الصوتي أكبر من المسموح"
+                self.rejected_total += 1
+            else:
+                upload.file.write(data)
+                upload.received += len(data)
+                upload.next_seq += 1
+                upload.updated_at = time.monotonic()
+            received = upload.received
+
+        if error:
+            self.abort(upload_id)
+            return False, error, received
+
+        self.bytes_total += len(data)
+        return True, "تم استلام الجزء", received
+
+    def finish(self, upload_id: str, user_id: int) -> Tuple[bool, str, Optional[VoiceUpload], Optional[str]]:
+        """إنهاء الرفع ونقل الملف لاسمه النهائي (يعيد المسار النسبي)"""
+        with self._lock:
+            upload = self._uploads.get(upload_id)
+            if not upload or upload.user_id != user_id:
+                return False, "الرفع غير موجود", None, None
+            del self._uploads[upload_id]
+
+        if upload.received == 0:
+            upload.discard()
+            self.aborted_total += 1
+            return False, "الملف الصوتي فارغ", None, None
+
+        upload.close()
+        filename = voice_filename(user_id)
+        os.replace(upload.temp_path, os.path.join(upload.directory, filename))
+
+        self.completed_total += 1
+        return True, "تم رفع الملف", upload, f"static/voice_messages/{filename}"
+
+    def abort(self, upload_id: str, user_id: int = None) -> bool:
+        """إلغاء رفع وحذف ملفه المؤقت"""
+        with self._lock:
+            upload = self._uploads.get(upload_id)
+            if not upload or (user_id is not None and upload.user_id != user_id):
+                return False
+            del self._uploads[upload_id]
+
+        upload.discard()
+        self.aborted_total += 1
+        return True
+
+    def abort_session(self, sid: str) -> int:
+        """إلغاء كل رفع بدأه اتصال منقطع"""
+        with self._lock:
+            uploads = [upload_id for upload_id, upload in self._uploads.items() if upload.sid == sid]
+
+        return sum(1 for upload_id in uploads if self.abort(upload_id))
+
+    def sweep(self) -> int:
+        """حذف الرفع المتروك"""
+        cutoff = time.monotonic() - self.idle_timeout
+        with self._lock:
+            stale = [upload_id for upload_id, upload in self._uploads.items() if upload.updated_at < cutoff]
+
+        return sum(1 for upload_id in stale if self.abort(upload_id))
+
+    def _get(self, upload_id: str, user_id: int) -> Optional[VoiceUpload]:
+        upload = self._uploads.get(upload_id)
+        if upload and upload.user_id == user_id:
+            return upload
+        return None
+
+    def get_statistics(self) -> Dict:
+        """إحصائيات الرفع"""
+        return {
+            'active_uploads': len(self._uploads),
+            'received_bytes': sum(upload.received for upload in list(self._uploads.values())),
+            'completed_total': self.completed_total,
+            'aborted_total': self.aborted_total,
+            'rejected_total': self.rejected_total,
+            'bytes_total': self.bytes_total
+        }
+
+def voice_filename(user_id: int) -> str:
+    """اسم فريد لملف صوتي"""
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    return f"voice_{user_id}_{timestamp}_{uuid.uuid4().hex[:8]}.wav"
+
+# المدير المشترك
+voice_uploads = VoiceUploadManager()